@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+# Stages faster than this are dominated by timer noise and are never flagged
+DEFAULT_MIN_SECONDS = 0.001
+
+
+@dataclass
+class Regression:
+    scale: str
+    stage: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline
+
+    def __str__(self):
+        return (f"{self.stage} @ {self.scale}: {self.baseline * 1000:.2f} ms -> {self.current * 1000:.2f} ms "
+                f"({(self.ratio - 1) * 100:+.0f}%)")
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 0.25,
+                    min_seconds: float = DEFAULT_MIN_SECONDS) -> List[Regression]:
+    """
+    Compares benchmark results against a baseline and returns every stage that slowed down.
+
+    Parameters:
+    baseline (Dict): The baseline results, as written by run_benchmarks.
+    current (Dict): The current results, as written by run_benchmarks.
+    threshold (float): The allowed relative slowdown, e.g. 0.25 for 25%.
+    min_seconds (float): Stages whose baseline and current timings are both below this are ignored.
+
+    Returns:
+    List[Regression]: The stages slower than baseline * (1 + threshold).
+    """
+    regressions = []
+    for scale, stages in current.get("scales", {}).items():
+        baseline_stages = baseline.get("scales", {}).get(scale, {})
+        for stage, timing in stages.items():
+            if stage not in baseline_stages:
+                continue
+            baseline_seconds, current_seconds = baseline_stages[stage]["median"], timing["median"]
+            if max(baseline_seconds, current_seconds) < min_seconds:
+                continue
+            if current_seconds > baseline_seconds * (1 + threshold):
+                regressions.append(Regression(scale, stage, baseline_seconds, current_seconds))
+    return regressions
+
+
+def same_host(baseline: Dict, current: Dict) -> bool:
+    """
+    Tells whether two results were recorded on the same host, the only case where their timings compare.
+    Results without a host, e.g. written by an older harness, are taken to come from another host.
+    """
+    baseline_meta, current_meta = baseline.get("meta", {}), current.get("meta", {})
+    return (baseline_meta.get("host") is not None
+            and all(baseline_meta.get(key) == current_meta.get(key) for key in ("host", "platform", "python")))
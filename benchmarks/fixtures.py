@@ -0,0 +1,98 @@
+import random
+from typing import List
+
+from src.commons.models.archived_response import ArchivedResponse
+from src.replay.http_archive import HttpArchive
+
+HEADERS = ["Animal", "Young", "Female", "Male", "Collective noun", "Collateral adjective", "Culinary noun for meat"]
+ADJECTIVES = ["vulpine", "canine", "feline", "ursine", "leonine", "lupine", "equine", "bovine"]
+JPEG_HEADER = b"\xff\xd8\xff\xe0"
+
+
+def animal_path(index: int) -> str:
+    return f"/wiki/Animal_{index}"
+
+
+def build_list_page(rows: int, seed: int = 0, tables: int = 1) -> str:
+    """
+    Builds a synthetic page shaped like List_of_animal_names with wikitables of the given total size.
+
+    Parameters:
+    rows (int): The number of animal rows across all tables.
+    seed (int): The random seed, so every run produces the same page.
+    tables (int): The number of wikitables the rows are split into.
+
+    Returns:
+    str: The HTML content of the page.
+    """
+    rng = random.Random(seed)
+    header_row = "<tr>" + "".join(f"<th>{header}</th>" for header in HEADERS) + "</tr>"
+    rows_per_table = max(1, -(-rows // tables))
+    lines = ['<html><body><div id="mw-content-text">']
+    skip_female = False
+    for index in range(rows):
+        if index % rows_per_table == 0:
+            if index:
+                lines.append("</table>")
+            lines += ['<table class="wikitable sortable">', header_row]
+        adjective = rng.choice(ADJECTIVES)
+        if index % 7 == 0:
+            adjective = f"{adjective}<br/>{rng.choice(ADJECTIVES)}"
+        elif index % 11 == 0:
+            adjective = "—"
+        cells = [f'<td><a href="{animal_path(index)}">Animal {index}</a><sup>[{index}]</sup></td>',
+                 "<td>cub<br/>pup <i>(informal)</i></td>"]
+        if skip_female:
+            skip_female = False
+        elif index % 5 == 0 and index + 1 < rows and (index + 1) % rows_per_table:
+            cells.append('<td rowspan="2">she-animal</td>')
+            skip_female = True
+        else:
+            cells.append("<td>female</td>")
+        cells += ["<td>male</td>", f"<td>herd of {index}</td>", f"<td>{adjective}</td>", "<td>meat</td>"]
+        lines.append("<tr>" + "".join(cells) + "</tr>")
+    lines.append("</table></div></body></html>")
+    return "\n".join(lines)
+
+
+def build_article_page(index: int, images: int = 3) -> str:
+    """
+    Builds a synthetic article page containing a few images.
+    """
+    tags = [f'<img src="//upload.example.org/animal_{index}_{image}.jpg" width="220" height="165"/>'
+            for image in range(images)]
+    tags.append(f'<img src="//upload.example.org/animal_{index}_map.png" width="120" height="80"/>')
+    return f'<html><body><p>Animal {index}</p>{"".join(tags)}</body></html>'
+
+
+def build_archive(path: str, base_url: str, articles: int, images_per_article: int = 3,
+                  image_size: int = 20_000) -> HttpArchive:
+    """
+    Builds an HttpArchive with article pages and images, so link extraction and image fetching can be
+    benchmarked through the replay transport.
+
+    Parameters:
+    path (str): The path the archive is written to.
+    base_url (str): The base URL of the article pages.
+    articles (int): The number of article pages.
+    images_per_article (int): The number of .jpg images on each article.
+    image_size (int): The size of every image body in bytes.
+
+    Returns:
+    HttpArchive: The saved archive.
+    """
+    archive = HttpArchive(path)
+    body = JPEG_HEADER + b"\x00" * (image_size - len(JPEG_HEADER))
+    for index in range(articles):
+        archive.add(ArchivedResponse(method="GET", url=base_url + animal_path(index), status=200,
+                                     body=build_article_page(index, images_per_article).encode(),
+                                     headers={"Content-Type": "text/html; charset=utf-8"}))
+        for image in range(images_per_article):
+            archive.add(ArchivedResponse(method="GET", url=f"https://upload.example.org/animal_{index}_{image}.jpg",
+                                         status=200, body=body, headers={"Content-Type": "image/jpeg"}))
+    archive.save()
+    return archive
+
+
+def article_urls(base_url: str, articles: int) -> List[str]:
+    return [base_url + animal_path(index) for index in range(articles)]
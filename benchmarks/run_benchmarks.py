@@ -0,0 +1,349 @@
+"""
+End-to-end benchmark harness for the scraping pipeline.
+
+Every stage (HTML parse, table extraction, each TableProcessor transform, table rendering and export, URL
+deduplication, work queue round trips, serial and process-parallel multi-table processing, link extraction,
+image fetch and image save) is timed on synthetic fixtures at several scales. Network stages run through the HTTP
+replay transport, so results do not depend on Wikipedia or MinIO. Interpreter startup (importing the entry point,
+as reported by -X importtime, and running --help) is tracked under the "startup" scale, and near-duplicate image
+lookups in a HammingIndex of --hash-index-size hashes under the "hashes_<size>" scale.
+
+Timings only compare on the machine that recorded them: record a baseline on the host that runs the comparison
+(--update-baseline, or --baseline pointing at a file of your own). Against a baseline from another host, or
+the committed one, slowdowns are reported but do not fail the run.
+
+Usage:
+    python -m benchmarks.run_benchmarks --update-baseline --baseline benchmarks/results/baseline.json
+    python -m benchmarks.run_benchmarks --scales 100 1000 --baseline benchmarks/results/baseline.json
+    python -m benchmarks.run_benchmarks --hash-index-size 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.compare import compare_results, same_host
+from benchmarks.fixtures import article_urls, build_archive, build_list_page
+from src.commons.models.table_details import TableDetails
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.data_fetchers.image_link_extractor import ImageLinkExtractor
+from src.distributed.sqlite_queue import SQLiteWorkQueue
+from src.manager.table_worker import process_table_html
+from src.parsers.beautiful_soup_parser import BeautifulSoupParser
+from src.parsers.header_extractor import BeautifulSoupHeaderExtractor
+from src.parsers.row_extractor import RowExtractor
+from src.parsers.table_extractor import TableExtractor
+from src.processors.column_builder import BasicBuilder
+from src.processors.pipeline import get_pipeline
+from src.processors.table_processor import TableProcessor
+from src.replay.http_replay import HttpReplay
+from src.storage.file_system_saver import FileSystemSaver
+from src.storage.table_writer import create_table_writer
+from src.utils.bloom_filter import SeenUrls
+from src.utils.hamming_index import HammingIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "results", "latest.json")
+BASE_URL = "https://en.wikipedia.org"
+# Network stages are capped so large table scales do not turn into minutes of replayed downloads
+MAX_ARTICLES = 200
+# Perceptual hash lookups are timed in batches, as one is far below the timer's useful resolution
+HASH_LOOKUPS = 1000
+
+
+def measure(stage: Callable[[Any], Any], setup: Optional[Callable[[], Any]] = None, repeat: int = 5) -> Dict:
+    """
+    Times a stage several times, excluding the time spent in its setup.
+
+    Parameters:
+    stage (Callable[[Any], Any]): The stage to time, called with the value returned by setup.
+    setup (Optional[Callable[[], Any]]): Builds a fresh input for every run.
+    repeat (int): The number of timed runs.
+
+    Returns:
+    Dict: The median, min and max timings in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        value = setup() if setup else None
+        start = time.perf_counter()
+        stage(value)
+        timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings), "max": max(timings), "runs": repeat}
+
+
+def benchmark_table_stages(rows: int, repeat: int) -> Dict[str, Dict]:
+    html = build_list_page(rows)
+    results = {"html_parse": measure(lambda _: BeautifulSoupParser(html), repeat=repeat)}
+
+    def fresh_table():
+        return TableExtractor(BeautifulSoupParser(html)).extract_tables()[0]
+
+    results["extract_tables"] = measure(lambda _: TableExtractor(BeautifulSoupParser(html)).extract_tables(),
+                                        repeat=repeat)
+    # Column building decomposes <i> tags, so every run needs a freshly parsed table
+    row_extractor = RowExtractor(column_builder=BasicBuilder())
+    results["extract_rows"] = measure(row_extractor.extract_rows_from_table, fresh_table, repeat)
+    results["extract_headers"] = measure(BeautifulSoupHeaderExtractor().extract_headers_from_table,
+                                         fresh_table, repeat)
+    results["extract_column_headers"] = measure(BeautifulSoupHeaderExtractor().extract_column_headers,
+                                                fresh_table, repeat)
+
+    table = fresh_table()
+    table_details = TableDetails(headers=BeautifulSoupHeaderExtractor().extract_headers_from_table(table),
+                                 rows=row_extractor.extract_rows_from_table(table))
+
+    results["schema_build"] = measure(lambda t: t.schema, table_details.clone, repeat)
+    results["pipeline_plan"] = measure(get_pipeline().run, table_details.clone, repeat)
+
+    transforms = [
+        ("find_cells_to_update", lambda t: (TableProcessor.find_cells_to_update(t), t)),
+        ("insert_values_at_indexes",
+         lambda t: TableProcessor.insert_values_at_indexes(TableProcessor.find_cells_to_update(t), t)),
+        ("select_columns_by_names",
+         lambda t: TableProcessor.select_columns_by_names(t, ["collateral adjective", "animal"])),
+        ("explode_cells", TableProcessor.explode_cells),
+        ("filter_rows_by_column_value",
+         lambda t: TableProcessor.filter_rows_by_column_value(t, "collateral adjective", r'^(?!.*[ —]).*$')),
+        ("get_all_links_by_column", lambda t: (TableProcessor.get_all_links_by_column(t, "animal"), t)),
+    ]
+    for name, transform in transforms:
+        results[name] = measure(transform, table_details.clone, repeat)
+        output = transform(table_details.clone())
+        # Stages returning a tuple only inspect the table; the pipeline continues with the same table
+        table_details = output[1] if isinstance(output, tuple) else output
+
+    results["render_table"] = measure(lambda _: table_details.render(), repeat=repeat)
+
+    def export(table_format):
+        path = os.path.join(tempfile.gettempdir(), f"benchmark_table.{table_format}")
+        with create_table_writer(path) as writer:
+            writer.write(table_details)
+        os.remove(path)
+
+    for table_format in ("csv", "jsonl"):
+        results[f"export_{table_format}"] = measure(lambda _: export(table_format), repeat=repeat)
+
+    # Every article URL twice, as when the same animal appears in several tables
+    urls = article_urls(BASE_URL, rows) * 2
+    results["url_dedup"] = measure(lambda seen_urls: seen_urls.unseen(urls), SeenUrls, repeat)
+
+    def queue_roundtrip(queue_path):
+        queue = SQLiteWorkQueue(queue_path)
+        queue.put("articles", urls)
+        while True:
+            leases = queue.lease("articles", count=20)
+            if not leases:
+                break
+            for lease in leases:
+                queue.ack(lease)
+        queue.close()
+
+    def fresh_queue_path():
+        queue_path = os.path.join(tempfile.gettempdir(), "benchmark_queue.db")
+        if os.path.exists(queue_path):
+            os.remove(queue_path)
+        return queue_path
+
+    results["queue_roundtrip"] = measure(queue_roundtrip, fresh_queue_path, repeat)
+    return results
+
+
+def benchmark_multi_table_stages(rows: int, repeat: int, tables: int = 8) -> Dict[str, Dict]:
+    """
+    Times extracting and transforming a page split into several tables, serially and in a process pool.
+    """
+    table_htmls = [str(table) for table in
+                   TableExtractor(BeautifulSoupParser(build_list_page(rows, tables=tables))).extract_tables()]
+    workers = min(tables, os.cpu_count() or 1)
+
+    def parallel(_):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(process_table_html, table_htmls))
+
+    return {
+        "tables_serial": measure(lambda _: [process_table_html(table_html) for table_html in table_htmls],
+                                 repeat=repeat),
+        "tables_parallel": measure(parallel, repeat=repeat),
+    }
+
+
+def benchmark_network_stages(articles: int, repeat: int, work_dir: str) -> Dict[str, Dict]:
+    archive_path = os.path.join(work_dir, f"archive_{articles}.jsonl.gz")
+    build_archive(archive_path, BASE_URL, articles)
+    urls = article_urls(BASE_URL, articles)
+    results = {}
+
+    with HttpReplay(archive_path, mode="replay"):
+        results["link_extraction"] = measure(
+            lambda _: asyncio.run(ImageLinkExtractor().load_all_image_links(urls)), repeat=repeat)
+        image_links = asyncio.run(ImageLinkExtractor().load_all_image_links(urls))
+
+        async def fetch_all():
+            loader = ImageDataLoader()
+            async with aiohttp.ClientSession() as session:
+                return await asyncio.gather(*[loader.fetch_image_data(session, url) for url in image_links])
+
+        results["image_fetch"] = measure(lambda _: asyncio.run(fetch_all()), repeat=repeat)
+        images = asyncio.run(fetch_all())
+
+    async def save_all(saver):
+        await asyncio.gather(*[saver.save_image(image) for image in images])
+
+    def fresh_saver():
+        return FileSystemSaver(tempfile.mkdtemp(dir=work_dir))
+
+    results["image_save"] = measure(lambda saver: asyncio.run(save_all(saver)), fresh_saver, repeat)
+    return results
+
+
+def import_time(module: str) -> float:
+    """
+    Measures the cumulative import time of a module in a fresh interpreter with -X importtime.
+
+    Parameters:
+    module (str): The module to import.
+
+    Returns:
+    float: The cumulative import time in seconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def benchmark_startup(repeat: int) -> Dict[str, Dict]:
+    timings = [import_time("src.main") for _ in range(repeat)]
+    results = {"import_src_main": {"median": statistics.median(timings), "min": min(timings),
+                                   "max": max(timings), "runs": repeat}}
+    results["cli_help"] = measure(
+        lambda _: subprocess.run([sys.executable, "-m", "src.main", "--help"], cwd=ROOT,
+                                 capture_output=True, check=True), repeat=repeat)
+    return results
+
+
+def benchmark_hash_index(size: int, repeat: int) -> Dict[str, Dict]:
+    """
+    Times HASH_LOOKUPS near-duplicate lookups in a HammingIndex of size random 64-bit hashes, at the distances
+    worth configuring: half of the queries are a few bits from an indexed hash, half match nothing.
+    """
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(size)]
+    results = {}
+    for max_distance in (4, 6, 8):
+        index = HammingIndex(max_distance, capacity=size)
+        for value in hashes:
+            index.add(value)
+        queries = [hashes[rng.randrange(size)] ^ (1 << rng.randrange(64)) for _ in range(HASH_LOOKUPS // 2)]
+        queries += [rng.getrandbits(64) for _ in range(HASH_LOOKUPS - len(queries))]
+        results[f"hamming_lookup_x{HASH_LOOKUPS}_d{max_distance}"] = measure(
+            lambda _: [index.find(query) for query in queries], repeat=repeat)
+    return results
+
+
+def run(scales: List[int], repeat: int, hash_index_size: int = 0) -> Dict:
+    """
+    Runs every stage at every scale.
+
+    Parameters:
+    scales (List[int]): The table sizes (in rows) to benchmark.
+    repeat (int): The number of timed runs per stage.
+    hash_index_size (int): The number of hashes indexed for the near-duplicate lookups, 0 to skip them.
+
+    Returns:
+    Dict: The benchmark results.
+    """
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "host": platform.node(),
+            "repeat": repeat,
+        },
+        "scales": {},
+    }
+    results["scales"]["startup"] = benchmark_startup(repeat)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for rows in scales:
+            stages = benchmark_table_stages(rows, repeat)
+            stages.update(benchmark_multi_table_stages(rows, repeat))
+            stages.update(benchmark_network_stages(min(rows, MAX_ARTICLES), repeat, work_dir))
+            results["scales"][str(rows)] = stages
+    if hash_index_size:
+        results["scales"][f"hashes_{hash_index_size}"] = benchmark_hash_index(hash_index_size, repeat)
+    return results
+
+
+def write_json(path: str, data: Dict) -> None:
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "w") as result_file:
+        json.dump(data, result_file, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Benchmark every stage of the scraping pipeline.")
+    arg_parser.add_argument("--scales", type=int, nargs="+", default=[100, 1000], help="Table sizes in rows")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage")
+    arg_parser.add_argument("--hash-index-size", type=int, default=10_000,
+                            help="Hashes indexed for the near-duplicate lookup stages, e.g. 1000000 for production "
+                                 "scale, 0 to skip them")
+    arg_parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the results JSON")
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown per stage")
+    arg_parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.scales, args.repeat, args.hash_index_size)
+    write_json(args.output, results)
+    for scale, stages in results["scales"].items():
+        print(f"\nScale {scale}" + (" rows" if scale.isdigit() else ""))
+        for stage, timing in stages.items():
+            print(f"  {stage:<28} {timing['median'] * 1000:10.2f} ms")
+
+    if args.update_baseline:
+        write_json(args.baseline, results)
+        print(f"\nBaseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare_results(baseline, results, args.threshold)
+    comparable = same_host(baseline, results)
+    if not comparable:
+        print(f"\n{args.baseline} was not recorded on this host, so slowdowns are not failures; record a baseline "
+              f"here with --update-baseline")
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1 if comparable else 0
+    print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,15 @@ class ImageDataLoaderException(Exception):
         super().__init__(f"{message} (URL: {url})")
 
 
+class ImageRejectedError(ImageDataLoaderException):
+    """
+    Custom exception class for image responses rejected by ImageGuards before or while reading their body.
+    """
+    def __init__(self, message: str, url: str, reason: str):
+        super().__init__(message, url)
+        self.reason = reason
+
+
 class ImageLinkExtractorError(Exception):
     """
     Custom exception class for ImageLinkExtractor errors.
@@ -15,3 +24,31 @@ class ImageLinkExtractorError(Exception):
     def __init__(self, message: str, url: str):
         super().__init__(message)
         self.url = url
+
+
+class PipelineSpecError(Exception):
+    """
+    Custom exception class for invalid table pipeline specs.
+    """
+    def __init__(self, message: str, location: str = "spec"):
+        super().__init__(f"{location}: {message}")
+        self.location = location
+
+
+class WorkQueueError(Exception):
+    """
+    Custom exception class for unusable work queue URLs and backends.
+    """
+    def __init__(self, message: str, url: str):
+        super().__init__(f"{message} (queue: {url})")
+        self.url = url
+
+
+class CircuitOpenError(Exception):
+    """
+    Custom exception class for requests refused without being sent, because their host's circuit breaker is open.
+    """
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host}, retrying in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
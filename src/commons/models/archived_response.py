@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass
+class ArchivedResponse:
+    """
+    A dataclass to store a recorded HTTP response.
+    """
+    method: str
+    url: str
+    status: int
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    # The Range header of the request, so partial and full downloads of a URL are recorded apart
+    request_range: Optional[str] = None
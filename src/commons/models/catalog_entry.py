@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass
+class CatalogEntry:
+    """
+    A dataclass to store a stored image as recorded by an ImageCatalog, with the table row it belongs to.
+    """
+    # The object key (file name) the saver stored the image under
+    key: str
+    source_url: str
+    size: int
+    sha256: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    content_type: Optional[str] = None
+    article_url: Optional[str] = None
+    # Header -> cell value of the processed table row, empty for lookups by image
+    values: Dict[str, str] = field(default_factory=dict)
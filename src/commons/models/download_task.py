@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class DownloadTask:
+    """
+    A dataclass to store an image download planned by a DownloadScheduler.
+    """
+    url: str
+    page: str
+    # Position of the image within its article; 0 for the first image
+    rank: int
+    # The caller's priority of the article, lower first
+    priority: float = 0.0
+    # Whether the image failed on an earlier run
+    failed_before: bool = False
+
+    @property
+    def sort_key(self):
+        return self.rank, self.failed_before, self.priority
@@ -0,0 +1,19 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ImageCandidate:
+    """
+    A dataclass to store an image found on an article, with its rendered size when the page declares it.
+    """
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    in_infobox: bool = False
+
+    @property
+    def pixels(self) -> Optional[int]:
+        if self.width is None or self.height is None:
+            return None
+        return self.width * self.height
@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class Lease:
+    """
+    A dataclass to store a task handed to a worker by a WorkQueue; only the holder of the token can ack it.
+    """
+    queue: str
+    payload: str
+    attempts: int
+    token: str
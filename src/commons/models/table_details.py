@@ -1,7 +1,11 @@
 from dataclasses import dataclass
-from typing import Sequence, List
+from typing import Sequence, List, Optional
 
 from src.commons.models.row_details import RowDetails
+from src.commons.models.table_schema import TableSchema
+
+# Rows rendered by str(table); log lines and reprs of big tables stay bounded
+DEFAULT_MAX_RENDERED_ROWS = 50
 
 
 @dataclass
@@ -16,37 +20,51 @@ class TableDetails:
 
         return TableDetails(headers=self.headers[:], rows=new_rows)
 
-    def __str__(self):
-        # Call the print_table method and capture the output as a string
-        from io import StringIO
-        import sys
+    def __setattr__(self, name, value):
+        # Replacing the headers invalidates the cached schema
+        if name == "headers":
+            self.__dict__.pop("_schema", None)
+        super().__setattr__(name, value)
 
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
+    @property
+    def schema(self) -> TableSchema:
+        """
+        The schema of the table, built on first use and rebuilt only if the headers are replaced.
+        """
+        schema = self.__dict__.get("_schema")
+        if schema is None:
+            schema = self.__dict__["_schema"] = TableSchema.from_table(tuple(self.headers), self.rows)
+        return schema
 
-        self.print_table()
+    def __str__(self):
+        return self.render(DEFAULT_MAX_RENDERED_ROWS)
 
-        output = sys.stdout.getvalue()
-        sys.stdout = old_stdout
+    def render(self, max_rows: Optional[int] = None) -> str:
+        """
+        Renders the table as aligned text in a single pass over the cells.
 
-        return output
+        Parameters:
+        max_rows (Optional[int]): The number of rows to render, None for all of them.
 
-    def print_table(self):
-        # Determine column widths based on the headers and the rows
+        Returns:
+        str: The header line, a separator line, one line per rendered row and, when rows were cut, a summary line.
+        """
+        rows = self.rows if max_rows is None else self.rows[:max_rows]
+
+        # Every column is as wide as its longest value among the header and the rendered rows
         column_widths = [len(header) for header in self.headers]
-        for row in self.rows:
-            for col in row.cols:
-                column_widths = [
-                    max(width, len(col.value))
-                    for width in column_widths
-                ]
+        for row in rows:
+            for index, col in enumerate(row.cols[:len(column_widths)]):
+                if len(col.value) > column_widths[index]:
+                    column_widths[index] = len(col.value)
 
-        # Print headers
         header_row = " | ".join(header.ljust(width) for header, width in zip(self.headers, column_widths))
-        print(header_row)
-        print("-" * len(header_row))  # Print a separator line
+        lines = [header_row, "-" * len(header_row)]
+        for row in rows:
+            lines.append(" | ".join(col.value.ljust(width) for col, width in zip(row.cols, column_widths)))
+        if len(rows) < len(self.rows):
+            lines.append(f"... {len(self.rows) - len(rows)} more rows")
+        return "\n".join(lines) + "\n"
 
-        # Print rows
-        for row in self.rows:
-            row_values = " | ".join(col.value.ljust(width) for col, width in zip(row.cols, column_widths))
-            print(row_values)
+    def print_table(self):
+        print(self.render(), end="")
@@ -0,0 +1,130 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from config import WORD_SEPERATOR
+
+# Multi-level headers are flattened into a single name, e.g. "young / male"
+LEVEL_SEPARATOR = " / "
+# Rows looked at when inferring column types
+TYPE_SAMPLE_ROWS = 100
+
+_FOOTNOTE = re.compile(r'\[[^\]]*\]')
+_WHITESPACE = re.compile(r'\s+')
+_INTEGER = re.compile(r'^[+-]?\d[\d,]*$')
+_NUMBER = re.compile(r'^[+-]?(\d[\d,]*)?\.?\d+([eE][+-]?\d+)?$')
+
+
+def normalize_header(name: str) -> str:
+    """
+    Normalizes a header name: lowercase, footnote markers like "[a]" removed and whitespace collapsed.
+
+    Parameters:
+    name (str): The header text.
+
+    Returns:
+    str: The normalized name used for lookups.
+    """
+    return _WHITESPACE.sub(" ", _FOOTNOTE.sub("", name)).strip().lower()
+
+
+def _infer_type(values: List[str], links: int) -> str:
+    if not values:
+        return "empty"
+    if links * 2 > len(values):
+        return "link"
+    if any(WORD_SEPERATOR in value for value in values):
+        return "list"
+    if all(_INTEGER.match(value) for value in values):
+        return "integer"
+    if all(_NUMBER.match(value.replace(",", "")) for value in values):
+        return "number"
+    return "string"
+
+
+@dataclass
+class ColumnSchema:
+    name: str
+    index: int
+    path: Tuple[str, ...]
+    type: str = "string"
+
+
+@dataclass
+class TableSchema:
+    """
+    A dataclass to store the columns of a table with an O(1) name to index lookup.
+
+    Names are matched after normalize_header, so "Collateral adjective[a]" and "collateral adjective" resolve to
+    the same column. Duplicate names keep every position.
+    """
+    columns: List[ColumnSchema]
+    _positions: Dict[str, List[int]] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        for column in self.columns:
+            self._positions.setdefault(normalize_header(column.name), []).append(column.index)
+
+    @classmethod
+    def from_table(cls, headers: Sequence[str], rows: Sequence = ()) -> 'TableSchema':
+        """
+        Builds the schema of a table, inferring column types from up to TYPE_SAMPLE_ROWS rows.
+
+        Parameters:
+        headers (Sequence[str]): The header names; multi-level names are joined with LEVEL_SEPARATOR.
+        rows (Sequence[RowDetails]): The rows to infer types from.
+
+        Returns:
+        TableSchema: The schema.
+        """
+        sample = rows[:TYPE_SAMPLE_ROWS]
+        columns = []
+        for index, header in enumerate(headers):
+            values, links = [], 0
+            for row in sample:
+                if index < len(row.cols) and row.cols[index].value:
+                    values.append(row.cols[index].value)
+                    links += 1 if row.cols[index].link else 0
+            columns.append(ColumnSchema(name=header, index=index, path=tuple(header.split(LEVEL_SEPARATOR)),
+                                        type=_infer_type(values, links)))
+        return cls(columns)
+
+    @property
+    def names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+    def __contains__(self, name: str) -> bool:
+        return normalize_header(name) in self._positions
+
+    def index(self, name: str) -> int:
+        """
+        Returns the index of the first column with a name.
+
+        Parameters:
+        name (str): The column name.
+
+        Returns:
+        int: The column index.
+
+        Raises:
+        ValueError: If no column has that name.
+        """
+        positions = self._positions.get(normalize_header(name))
+        if not positions:
+            raise ValueError(f"Column '{name}' not found in the table headers.")
+        return positions[0]
+
+    def indexes(self, names: Sequence[str]) -> List[int]:
+        """
+        Returns the indexes of every column matching one of the names, in column order; unknown names are skipped.
+
+        Parameters:
+        names (Sequence[str]): The column names.
+
+        Returns:
+        List[int]: The sorted column indexes.
+        """
+        found = set()
+        for name in names:
+            found.update(self._positions.get(normalize_header(name), ()))
+        return sorted(found)
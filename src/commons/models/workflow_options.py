@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass
+class WorkflowOptions:
+    """
+    A dataclass to store the run settings of a WorkflowManager.
+    """
+    link_source: str = "html"
+    max_concurrent_requests: int = 100
+    output: str = "s3"
+    output_dir: str = "images"
+    bucket_name: str = "images"
+    table_output: Optional[str] = None
+    table_format: Optional[str] = None
+    workers: int = 1
+    pipeline: Optional[str] = None
+    table_cache: Optional[str] = None
+    table_cache_max_bytes: int = 64 * 1024 * 1024
+    skip_unchanged: bool = False
+    incremental: Optional[str] = None
+    gc_removed: bool = False
+    dedup_urls: bool = False
+    seen_urls_dir: Optional[str] = None
+    dedup_error_rate: float = 0.001
+    queue: Optional[str] = None
+    queue_batch_size: int = 20
+    visibility_timeout: float = 60.0
+    image_policy: str = "all"
+    image_top_k: int = 1
+    min_image_px: int = 0
+    image_guards: bool = True
+    max_image_bytes: Optional[int] = 20 * 1024 * 1024
+    image_types: Tuple[str, ...] = ("image/jpeg", "image/png", "image/gif", "image/webp")
+    resume_downloads: bool = False
+    spool_dir: Optional[str] = None
+    download_retries: int = 3
+    parallel_range_bytes: Optional[int] = None
+    connect_timeout: Optional[float] = 10.0
+    read_timeout: Optional[float] = 30.0
+    request_timeout: Optional[float] = 300.0
+    run_deadline: Optional[float] = None
+    hedge_quantile: Optional[float] = None
+    breaker_failures: int = 5
+    breaker_reset: float = 30.0
+    download_rate: Optional[float] = None
+    upload_rate: Optional[float] = None
+    time_budget: Optional[float] = None
+    drain_timeout: float = 10.0
+    failed_log: Optional[str] = None
+    catalog: Optional[str] = None
+    catalog_parquet: Optional[str] = None
+    # Hamming distance under which a downloaded image is not stored, None to store every image
+    near_duplicate_distance: Optional[int] = None
+    near_duplicate_hash: str = "phash"
+    hash_workers: Optional[int] = None
@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from src.commons.models.download_task import DownloadTask
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+# Matches the per-host connection limit of the download sessions, so the queue order is the request order
+DEFAULT_CONCURRENCY = 10
+FAILURE_LOG_VERSION = 1
+
+
+@dataclass
+class ScheduleReport:
+    """
+    A dataclass to store the outcome of a scheduled run, including the work a time budget left undone.
+    """
+    done: List[DownloadTask] = field(default_factory=list)
+    failed: List[DownloadTask] = field(default_factory=list)
+    # Never started, or cancelled when the drain timeout ran out, in scheduling order
+    left: List[DownloadTask] = field(default_factory=list)
+    budget_reached: bool = False
+
+    @property
+    def pages_without_image(self) -> List[str]:
+        covered = {task.page for task in self.done}
+        pages = dict.fromkeys(task.page for task in self.failed + self.left)
+        return [page for page in pages if page not in covered]
+
+    def __str__(self):
+        summary = f"{len(self.done)} images done, {len(self.failed)} failed, {len(self.left)} left undone"
+        if self.budget_reached:
+            summary += f" by the time budget; {len(self.pages_without_image)} articles still have no image"
+        return summary
+
+
+class DownloadScheduler:
+    """
+    A class to run image downloads from a priority queue instead of in extraction order, so a run cut short by its
+    time budget spreads what it did fetch over as many articles as possible.
+
+    Tasks are ordered by rank (the first image of every article, then the second of every article, and so on),
+    then images that failed on an earlier run after the others, then the caller's priority of the article. A
+    fixed number of workers pull from the queue. Once the budget is spent they start nothing new; downloads in
+    flight get drain_timeout more seconds to finish before they are cancelled.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, budget: Optional[float] = None,
+                 drain_timeout: float = 10.0, priority: Optional[Callable[[str], float]] = None,
+                 failed_before: Iterable[str] = ()):
+        """
+        Initializes the DownloadScheduler.
+
+        Parameters:
+        concurrency (int): The number of downloads run at once.
+        budget (Optional[float]): The seconds after which no new download starts, None for no limit.
+        drain_timeout (float): The seconds downloads in flight may still take once the budget is spent.
+        priority (Optional[Callable[[str], float]]): Maps an article URL to its priority, lower first. Defaults
+            to the order the articles were given in.
+        failed_before (Iterable[str]): Image URLs that failed on an earlier run, tried after the others.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+        self.concurrency = concurrency
+        self.budget = budget
+        self.drain_timeout = drain_timeout
+        self.priority = priority
+        self.failed_before: Set[str] = set(failed_before)
+
+    def plan(self, links_by_page: Dict[str, List[str]]) -> List[DownloadTask]:
+        """
+        Turns the image links of every article into tasks, in scheduling order. An image shared by several
+        articles is planned once, at its best rank.
+
+        Parameters:
+        links_by_page (Dict[str, List[str]]): The image URLs of every article URL, in page order.
+
+        Returns:
+        List[DownloadTask]: The tasks.
+        """
+        tasks: Dict[str, DownloadTask] = {}
+        for position, (page, links) in enumerate(links_by_page.items()):
+            priority = self.priority(page) if self.priority else position
+            for rank, url in enumerate(links):
+                task = DownloadTask(url, page, rank, priority, failed_before=url in self.failed_before)
+                if url not in tasks or task.sort_key < tasks[url].sort_key:
+                    tasks[url] = task
+        return sorted(tasks.values(), key=lambda task: task.sort_key)
+
+    async def run(self, tasks: List[DownloadTask],
+                  process: Callable[[DownloadTask], Awaitable[bool]]) -> ScheduleReport:
+        """
+        Runs the tasks, highest priority first, within the budget.
+
+        Parameters:
+        tasks (List[DownloadTask]): The tasks, e.g. from plan.
+        process (Callable[[DownloadTask], Awaitable[bool]]): Downloads and saves one image; returns whether it
+            succeeded. An exception counts as a failure.
+
+        Returns:
+        ScheduleReport: What was done, what failed and what was left undone.
+        """
+        queue = [(task.sort_key, sequence, task) for sequence, task in enumerate(tasks)]
+        heapq.heapify(queue)
+        report = ScheduleReport()
+        in_flight: Dict[int, DownloadTask] = {}
+        loop = asyncio.get_running_loop()
+        deadline = None if self.budget is None else loop.time() + self.budget
+
+        async def worker():
+            while queue and (deadline is None or loop.time() < deadline):
+                _, sequence, task = heapq.heappop(queue)
+                in_flight[sequence] = task
+                try:
+                    succeeded = await process(task)
+                except Exception as e:
+                    logger.error("Download of %s failed: %s", task.url, e)
+                    succeeded = False
+                del in_flight[sequence]
+                (report.done if succeeded else report.failed).append(task)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.concurrency, len(queue)))]
+        if workers:
+            _, pending = await asyncio.wait(workers, timeout=self.budget)
+            if pending:
+                report.budget_reached = True
+                logger.info("Time budget of %.1fs spent, draining %d downloads in flight", self.budget,
+                            len(in_flight))
+                _, pending = await asyncio.wait(pending, timeout=self.drain_timeout)
+                for pending_worker in pending:
+                    pending_worker.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        report.budget_reached = report.budget_reached or bool(queue)
+        cancelled = sorted(in_flight.items())
+        report.left = [task for _, task in cancelled] + [task for _, _, task in sorted(queue)]
+        for outcome, outcome_tasks in (("done", report.done), ("failed", report.failed), ("left", report.left)):
+            if outcome_tasks:
+                metrics.count("scheduled_downloads_total", len(outcome_tasks), outcome=outcome)
+        return report
+
+
+class FailureLog:
+    """
+    A class to remember, between runs, the image URLs whose download failed, so the next run tries them last.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the FailureLog.
+
+        Parameters:
+        path (str): The JSON file, created on the first save.
+        """
+        self.path = path
+        self.urls: Set[str] = self._load()
+
+    def _load(self) -> Set[str]:
+        if not os.path.exists(self.path):
+            return set()
+        try:
+            with open(self.path) as log_file:
+                payload = json.load(log_file)
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable failure log {self.path}: {e}")
+            return set()
+        if payload.get("version") != FAILURE_LOG_VERSION:
+            logger.warning(f"Ignoring failure log {self.path} of version {payload.get('version')}")
+            return set()
+        return set(payload["failed"])
+
+    def update(self, report: ScheduleReport) -> None:
+        self.urls.difference_update(task.url for task in report.done)
+        self.urls.update(task.url for task in report.failed)
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as log_file:
+            json.dump({"version": FAILURE_LOG_VERSION, "failed": sorted(self.urls)}, log_file)
+        os.replace(temp_path, self.path)
@@ -1,9 +1,15 @@
 import os
+from typing import Optional
 from urllib.parse import urlparse
 import aiohttp
 
-from src.commons.exceptions.exception import ImageDataLoaderException
+from src.commons.exceptions.exception import CircuitOpenError, ImageDataLoaderException, ImageRejectedError
 from src.commons.models.image_data import ImageData
+from src.data_fetchers.image_guards import DEFAULT_CHUNK_SIZE, SNIFF_BYTES, ImageGuards
+from src.data_fetchers.request_policy import RequestPolicy
+from src.data_fetchers.resumable_download import ResumableDownloader
+from src.telemetry import metrics
+from src.utils.token_bucket import TokenBucket
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +20,26 @@ class ImageDataLoader:
     A class to handle loading image data from URLs.
     """
 
+    def __init__(self, guards: Optional[ImageGuards] = None, downloader: Optional[ResumableDownloader] = None,
+                 policy: Optional[RequestPolicy] = None, limiter: Optional[TokenBucket] = None):
+        """
+        Initializes the ImageDataLoader.
+
+        Parameters:
+        guards (Optional[ImageGuards]): Checks applied to the headers and the streamed body of every response,
+            so bad or oversized responses are aborted early. Without guards every 200 response is read in full.
+        downloader (Optional[ResumableDownloader]): Spools bodies to disk and resumes them with Range requests
+            after dropped connections. Without one a failed transfer is lost.
+        policy (Optional[RequestPolicy]): The deadlines, hedging and circuit breakers applied to image requests.
+            Spooled downloads are never hedged, as both copies would write the same spool.
+        limiter (Optional[TokenBucket]): The download bandwidth shared with the other streams of the run; bodies
+            are then read chunk by chunk at its pace.
+        """
+        self.guards = guards
+        self.downloader = downloader
+        self.policy = policy
+        self.limiter = limiter
+
     async def fetch_image_data(self, session: aiohttp.ClientSession, img_url: str) -> ImageData:
         """
         Fetches the image data from a given URL.
@@ -29,15 +55,71 @@ class ImageDataLoader:
         ImageDataLoaderException: If there is an error fetching the image data.
         """
         try:
-            async with session.get(img_url) as response:
-                if response.status == 200:
-                    img_name = os.path.basename(urlparse(img_url).path)
-                    img_data = await response.read()
-                    logger.debug(f"Fetched image {img_name} successfully")
-                    return ImageData(name=img_name, data=img_data)
+            with metrics.span("download", url=img_url) as span:
+                if self.policy is not None:
+                    img_data = await self.policy.call(img_url, lambda: self._fetch(session, img_url), kind="image",
+                                                      hedge=self.downloader is None)
                 else:
-                    logger.debug(f"Failed to fetch image {img_url}, status code: {response.status}")
-                    raise ImageDataLoaderException(f"Failed to fetch image, status code {response.status}", img_url)
+                    img_data = await self._fetch(session, img_url)
+                img_name = os.path.basename(urlparse(img_url).path)
+                span.set_attribute("bytes", len(img_data))
+                metrics.count("pipeline_bytes_total", len(img_data), stage="download")
+                metrics.count("pipeline_items_total", stage="download")
+                logger.debug("Fetched image %s successfully", img_name)
+                return ImageData(name=img_name, data=img_data)
+        except ImageRejectedError as e:
+            metrics.count("images_rejected_total", reason=e.reason)
+            logger.warning("Rejected image %s: %s", img_url, e.message)
+            raise
+        except CircuitOpenError as e:
+            logger.debug("Skipped image %s: %s", img_url, e)
+            raise ImageDataLoaderException(str(e), img_url)
         except Exception as e:
-            logger.error(f"Failed to fetch image {img_url}: {e}")
+            metrics.count("pipeline_errors_total", stage="download")
+            logger.error("Failed to fetch image %s: %s", img_url, e)
             raise ImageDataLoaderException(f"Exception occurred: {e}", img_url)
+
+    async def _fetch(self, session: aiohttp.ClientSession, img_url: str) -> bytes:
+        if self.downloader is not None:
+            return await self.downloader.fetch(session, img_url, self.guards)
+        async with session.get(img_url) as response:
+            if response.status >= 500 or response.status == 429:
+                # Raised as a response error, so a RequestPolicy counts it against the host
+                response.raise_for_status()
+            if response.status != 200:
+                logger.debug("Failed to fetch image %s, status code: %s", img_url, response.status)
+                raise ImageDataLoaderException(f"Failed to fetch image, status code {response.status}", img_url)
+            if self.guards or self.limiter:
+                return await self._read_streamed(response, img_url)
+            return await response.read()
+
+    async def _read_streamed(self, response: aiohttp.ClientResponse, img_url: str) -> bytes:
+        """
+        Streams a response body through the guards, dropping the connection as soon as a check fails so the rest
+        of the body is never transferred, and paces the reads by the limiter. Bytes left unread stay in the socket
+        buffers, so TCP flow control slows the sender down to the same pace.
+        """
+        body = bytearray()
+        try:
+            if self.guards:
+                self.guards.check_headers(img_url, response.headers.get("Content-Type"), response.content_length)
+            sniffed = not self.guards
+            async for chunk in response.content.iter_chunked(self.guards.chunk_size if self.guards
+                                                             else DEFAULT_CHUNK_SIZE):
+                body.extend(chunk)
+                if self.limiter:
+                    await self.limiter.acquire(len(chunk))
+                if self.guards:
+                    self.guards.check_size(img_url, len(body))
+                if not sniffed and len(body) >= SNIFF_BYTES:
+                    self.guards.check_head(img_url, bytes(body[:SNIFF_BYTES]))
+                    sniffed = True
+            if not sniffed:
+                self.guards.check_head(img_url, bytes(body))
+            return bytes(body)
+        except ImageRejectedError:
+            if response.content_length is not None:
+                metrics.count("image_bytes_avoided_total", max(0, response.content_length - len(body)),
+                              reason="rejected")
+            response.close()
+            raise
@@ -1,11 +1,21 @@
 import asyncio
-from typing import List
+from typing import Dict, List, Optional, Set
 import aiohttp
 import logging
 
+from src.commons.exceptions.exception import ImageDataLoaderException, ImageRejectedError
+from src.commons.models.download_task import DownloadTask
+from src.data_fetchers.download_scheduler import DownloadScheduler, ScheduleReport
 from src.data_fetchers.image_data_loader import ImageDataLoader
 from src.data_fetchers.image_link_extractor import ImageLinkExtractor
+from src.data_fetchers.image_link_source import ImageLinkSource
+from src.data_fetchers.near_duplicates import NearDuplicateFilter
+from src.data_fetchers.request_policy import session_timeout
+from src.data_fetchers.session_pool import SessionPool, open_session
+from src.storage.image_catalog import ImageCatalog
 from src.storage.image_saver import ImageSaver
+from src.telemetry import metrics
+from src.utils.bloom_filter import SeenUrls
 
 logger = logging.getLogger(__name__)
 
@@ -15,42 +25,220 @@ class ImageDownloadManager:
     A class to manage the process of extracting image links, loading image data, and saving images.
     """
 
-    def __init__(self, urls: List[str], saver: ImageSaver, max_concurrent_requests: int = 100):
+    def __init__(self, urls: List[str], saver: ImageSaver, max_concurrent_requests: int = 100,
+                 link_extractor: Optional[ImageLinkSource] = None, seen_urls: Optional[SeenUrls] = None,
+                 data_loader: Optional[ImageDataLoader] = None, deadline: Optional[float] = None,
+                 scheduler: Optional[DownloadScheduler] = None, sessions: Optional[SessionPool] = None,
+                 catalog: Optional[ImageCatalog] = None, near_duplicates: Optional[NearDuplicateFilter] = None):
         """
         Initializes the ImageDownloadManager with the URLs, saving strategy, and concurrency settings.
 
         Parameters:
         urls (List[str]): The list of URLs to process.
         saver (ImageSaver): The saving strategy to use (FileSystemSaver or S3Saver).
-        max_concurrent_requests (int): Maximum number of concurrent requests.
+        max_concurrent_requests (int): Maximum number of concurrent requests, in total and per host.
+        link_extractor (Optional[ImageLinkSource]): The backend resolving article URLs into image URLs.
+            Defaults to scraping the article HTML with ImageLinkExtractor.
+        seen_urls (Optional[SeenUrls]): When given, article and image URLs seen before (in this run or, if it is
+            persisted, in earlier runs) are skipped before any request is made. A URL is marked as seen once it
+            was downloaded: an image when it was saved (or skipped as empty, rejected or a near-duplicate), an
+            article when all of its images were.
+        data_loader (Optional[ImageDataLoader]): The loader fetching image bodies, e.g. one with ImageGuards.
+        deadline (Optional[float]): The seconds a run may take; downloads still running then are cancelled.
+        scheduler (Optional[DownloadScheduler]): Runs the downloads by priority (the first image of every article
+            before the extras) within a time budget. Without one every image is downloaded at once, in
+            extraction order.
+        sessions (Optional[SessionPool]): Keeps the image connections open across runs of a long-running process.
+        catalog (Optional[ImageCatalog]): Records the image URLs of every article and every saved image. Articles
+            are only recorded when links are loaded by page, i.e. with a scheduler or by run_by_page.
+        near_duplicates (Optional[NearDuplicateFilter]): Skips storing images that look like one already stored;
+            their articles are mapped to the stored image instead, once it was saved.
         """
         self.urls = urls
-        self._link_extractor = ImageLinkExtractor(max_concurrent_requests)
-        self._data_loader = ImageDataLoader()
+        self.max_concurrent_requests = max_concurrent_requests
+        self._link_extractor = link_extractor or ImageLinkExtractor(max_concurrent_requests)
+        self._data_loader = data_loader or ImageDataLoader()
         self._saver = saver
+        self._seen_urls = seen_urls
+        self.deadline = deadline
+        self._scheduler = scheduler
+        self.schedule_report: Optional[ScheduleReport] = None
+        self._sessions = sessions
+        self._catalog = catalog
+        self._near_duplicates = near_duplicates
+        # Image URLs whose download or save failed; rejected and empty images are not failures, they would be
+        # rejected again
+        self.failed_urls: Set[str] = set()
 
-    async def run(self) -> None:
+    def _unseen(self, urls: List[str], kind: str) -> List[str]:
+        if self._seen_urls is None:
+            return urls
+        new_urls = self._seen_urls.unseen(urls)
+        if len(new_urls) < len(urls):
+            metrics.count("dedup_skipped_total", len(urls) - len(new_urls), kind=kind)
+            logger.info("Skipping %d already seen %s URLs", len(urls) - len(new_urls), kind)
+        return new_urls
+
+    def _mark_seen(self, urls: List[str]) -> None:
+        if self._seen_urls is not None:
+            for url in urls:
+                self._seen_urls.add(url)
+
+    def _session(self):
+        return open_session(self._sessions, "images", limit=self.max_concurrent_requests,
+                            limit_per_host=self.max_concurrent_requests,
+                            timeout=session_timeout(self._data_loader.policy))
+
+    async def _within_deadline(self, coroutine):
+        if self.deadline is None:
+            return await coroutine
+        try:
+            return await asyncio.wait_for(coroutine, self.deadline)
+        except asyncio.TimeoutError:
+            metrics.count("run_deadline_exceeded_total")
+            logger.warning("Run deadline of %.1fs reached, unfinished downloads were cancelled", self.deadline)
+            raise
+
+    @property
+    def completed(self) -> bool:
+        """
+        Whether no image failed and the time budget left none undone.
+        """
+        return not self.failed_urls and (self.schedule_report is None or not self.schedule_report.left)
+
+    async def run(self) -> bool:
         """
         Runs the process to get image links, load image data, and save images using the specified strategy.
+        Images saved before the deadline are kept when it is reached.
+
+        Returns:
+        bool: Whether every image was downloaded and saved, see completed.
         """
-        image_links = await self._link_extractor.load_all_image_links(self.urls)
-        connector = aiohttp.TCPConnector(limit_per_host=10)
-        async with aiohttp.ClientSession(connector=connector) as session:
+        try:
+            await self._within_deadline(self._run())
+        except asyncio.TimeoutError:
+            return False
+        return self.completed
+
+    async def _run(self) -> None:
+        urls = self._unseen(self.urls, "article")
+        if self._scheduler is not None:
+            links_by_page = await self._link_extractor.load_image_links_by_page(urls) if urls else {}
+            if self._catalog is not None:
+                self._catalog.add_links(links_by_page)
+            # Ranks are planned before seen images are dropped, so an article's extras stay extras
+            tasks = self._scheduler.plan(links_by_page)
+            unseen = set(self._unseen([task.url for task in tasks], "image"))
+            await self._run_scheduled([task for task in tasks if task.url in unseen])
+            undone = {task.url for task in self.schedule_report.left} | self.failed_urls
+            self._mark_seen([url for url, links in links_by_page.items() if undone.isdisjoint(links)])
+            return
+        image_links = self._unseen(await self._link_extractor.load_all_image_links(urls), "image") if urls else []
+        async with self._session() as session:
             tasks = [self.process_image(session, img_url) for img_url in image_links]
             await asyncio.gather(*tasks)
+        # Links are not grouped by article here, and none are returned when an article fails, so articles are
+        # marked only when every image of every one of them was downloaded
+        if image_links and self.completed:
+            self._mark_seen(urls)
+
+    async def run_by_page(self) -> Dict[str, List[str]]:
+        """
+        Runs the same process as run, keeping track of which article every saved image came from.
 
-    async def process_image(self, session: aiohttp.ClientSession, img_url: str) -> None:
+        Incremental runs decide what to fetch from their row index, so seen_urls is not consulted here.
+
+        Returns:
+        Dict[str, List[str]]: A mapping from each article URL to the names of the images saved for it.
+
+        Raises:
+        asyncio.TimeoutError: If the deadline is reached, as a partial mapping would mark the missing images done.
+        """
+        return await self._within_deadline(self._run_by_page())
+
+    async def _run_by_page(self) -> Dict[str, List[str]]:
+        links_by_page = await self._link_extractor.load_image_links_by_page(self.urls)
+        if self._catalog is not None:
+            self._catalog.add_links(links_by_page)
+        if self._scheduler is not None:
+            names = await self._run_scheduled(self._scheduler.plan(links_by_page))
+            undone = {task.url for task in self.schedule_report.left} | self.failed_urls
+        else:
+            async with self._session() as session:
+                # An image shared by several articles is downloaded once
+                unique_links = list(dict.fromkeys(link for links in links_by_page.values() for link in links))
+                saved = await asyncio.gather(*[self.process_image(session, img_url) for img_url in unique_links])
+            names = dict(zip(unique_links, saved))
+            undone = self.failed_urls
+        # Articles with images left undone or failed are left out, so they count as failed and are retried;
+        # rejected and empty images are simply missing from their article
+        return {url: [names[link] for link in links if names.get(link)] for url, links in links_by_page.items()
+                if undone.isdisjoint(links)}
+
+    async def _run_scheduled(self, tasks: List[DownloadTask]) -> Dict[str, Optional[str]]:
+        names: Dict[str, Optional[str]] = {}
+        async with self._session() as session:
+            async def process(task: DownloadTask) -> bool:
+                names[task.url] = await self.process_image(session, task.url)
+                return names[task.url] is not None
+
+            self.schedule_report = await self._scheduler.run(tasks, process)
+        if self.schedule_report.budget_reached or self.schedule_report.failed:
+            logger.warning("Scheduled downloads: %s", self.schedule_report)
+        else:
+            logger.info("Scheduled downloads: %s", self.schedule_report)
+        return names
+
+    async def process_image(self, session: aiohttp.ClientSession, img_url: str) -> Optional[str]:
         """
         Processes an image by loading its data and saving it using the specified strategy.
 
         Parameters:
         session (ClientSession): The aiohttp client session.
         img_url (str): The URL of the image to process.
+
+        Returns:
+        Optional[str]: The name the image was saved under (for a near-duplicate, the name of the stored image it
+            duplicates), or None if it was skipped.
         """
-        logger.debug(f"Processing image: {img_url}")
-        image_data = await self._data_loader.fetch_image_data(session, img_url)
+        logger.debug("Processing image: %s", img_url)
+        try:
+            image_data = await self._data_loader.fetch_image_data(session, img_url)
+        except ImageRejectedError:
+            # Already logged by the loader; one rejected image does not abort the others
+            self._mark_seen([img_url])
+            return None
+        except ImageDataLoaderException:
+            # Already logged by the loader; one failed image does not abort the others
+            self.failed_urls.add(img_url)
+            return None
         if image_data.name and image_data.data:
-            logger.debug(f"Saving image: {image_data.name}")
-            await self._saver.save_image(image_data)
-        else:
-            logger.debug(f"Skipping empty image: {img_url}")
+            if self._near_duplicates is not None:
+                duplicate_of = await self._near_duplicates.admit(image_data, key=img_url)
+                if duplicate_of is not None:
+                    if self._catalog is not None:
+                        self._catalog.add_duplicate(img_url, duplicate_of)
+                    self._mark_seen([img_url])
+                    return duplicate_of
+            logger.debug("Saving image: %s", image_data.name)
+            try:
+                await self._saver.save_image(image_data)
+            except BaseException as e:
+                self.failed_urls.add(img_url)
+                if self._near_duplicates is not None:
+                    # Later look-alikes must not be mapped to an image that was never stored
+                    self._near_duplicates.discard(img_url)
+                if not isinstance(e, Exception):
+                    raise
+                # Already logged by the saver; one failed save does not abort the others
+                logger.debug("Failed to save image %s: %s", img_url, e)
+                return None
+            if self._near_duplicates is not None:
+                self._near_duplicates.stored(img_url)
+            if self._catalog is not None:
+                self._catalog.add_image(img_url, image_data)
+            self._mark_seen([img_url])
+            return image_data.name
+        logger.debug("Skipping empty image: %s", img_url)
+        self._mark_seen([img_url])
+        return None
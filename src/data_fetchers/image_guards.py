@@ -0,0 +1,104 @@
+from typing import Optional, Tuple
+
+from src.commons.exceptions.exception import ImageRejectedError
+
+DEFAULT_IMAGE_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+DEFAULT_MAX_IMAGE_BYTES = 20 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Enough leading bytes to recognise every format below
+SNIFF_BYTES = 12
+# Content types that say nothing about the body; sniffing decides
+_UNTYPED = ("", "application/octet-stream", "binary/octet-stream")
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """
+    Identifies a file format from its magic bytes.
+
+    Parameters:
+    head (bytes): The first bytes of the body, ideally SNIFF_BYTES or more.
+
+    Returns:
+    Optional[str]: The content type, "text/html" for markup, or None if the format is unknown.
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "image/tiff"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    if head.lstrip()[:1] == b"<":
+        return "text/html"
+    return None
+
+
+class ImageGuards:
+    """
+    A class to reject bad or oversized image responses before their body is read, or after its first chunk.
+
+    The Content-Type and Content-Length headers are checked first, so an HTML error page or a declared 50 MB TIFF
+    costs no body bytes at all. The body is then streamed: the first chunk is sniffed for a known image format
+    and the transfer is aborted as soon as it exceeds max_bytes, whatever the headers said.
+    """
+
+    def __init__(self, allowed_types: Tuple[str, ...] = DEFAULT_IMAGE_TYPES,
+                 max_bytes: Optional[int] = DEFAULT_MAX_IMAGE_BYTES, sniff: bool = True,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Initializes the ImageGuards.
+
+        Parameters:
+        allowed_types (Tuple[str, ...]): The accepted image content types.
+        max_bytes (Optional[int]): The largest accepted body, None for no limit.
+        sniff (bool): Check the magic bytes of the first chunk against allowed_types.
+        chunk_size (int): The size of the chunks the body is streamed in.
+        """
+        self.allowed_types = tuple(allowed_types)
+        self.max_bytes = max_bytes
+        self.sniff = sniff
+        self.chunk_size = chunk_size
+
+    def check_headers(self, url: str, content_type: Optional[str], content_length: Optional[int]) -> None:
+        """
+        Checks the response headers.
+
+        Parameters:
+        url (str): The image URL, for the error.
+        content_type (Optional[str]): The Content-Type header.
+        content_length (Optional[int]): The Content-Length header.
+
+        Raises:
+        ImageRejectedError: If the declared type is not an allowed image type or the declared size is too large.
+        """
+        media_type = (content_type or "").split(";")[0].strip().lower()
+        if media_type not in _UNTYPED and media_type not in self.allowed_types:
+            raise ImageRejectedError(f"content type {media_type} is not allowed", url, "content_type")
+        if self.max_bytes is not None and content_length is not None and content_length > self.max_bytes:
+            raise ImageRejectedError(f"{content_length} bytes exceed the {self.max_bytes} byte limit", url, "too_large")
+
+    def check_head(self, url: str, head: bytes) -> None:
+        """
+        Checks the magic bytes at the start of the body.
+
+        Parameters:
+        url (str): The image URL, for the error.
+        head (bytes): The first bytes of the body.
+
+        Raises:
+        ImageRejectedError: If the body is not in one of the allowed formats.
+        """
+        if not self.sniff:
+            return
+        sniffed = sniff_content_type(head)
+        if sniffed not in self.allowed_types:
+            raise ImageRejectedError(f"body looks like {sniffed or 'an unknown format'}", url, "content_mismatch")
+
+    def check_size(self, url: str, size: int) -> None:
+        if self.max_bytes is not None and size > self.max_bytes:
+            raise ImageRejectedError(f"body exceeds the {self.max_bytes} byte limit", url, "too_large")
@@ -1,29 +1,49 @@
 import asyncio
 import logging
-from typing import List
-from urllib.parse import urljoin
+from typing import Dict, List, Optional
 
 import aiohttp
 from bs4 import BeautifulSoup
 
-from src.commons.exceptions.exception import ImageLinkExtractorError
+from src.commons.exceptions.exception import CircuitOpenError, ImageLinkExtractorError
+from src.data_fetchers.image_link_source import ImageLinkSource
+from src.data_fetchers.request_policy import RequestPolicy, session_timeout
+from src.data_fetchers.image_selection import ImageSelectionPolicy, image_candidates
+from src.data_fetchers.session_pool import SessionPool, open_session
+from src.telemetry import metrics
+from src.utils.token_bucket import DEFAULT_BURST, TokenBucket
 
 logger = logging.getLogger(__name__)
 
 
-class ImageLinkExtractor:
+class ImageLinkExtractor(ImageLinkSource):
     """
     A class to handle fetching and extracting image links from webpages.
     """
 
-    def __init__(self, max_concurrent_requests: int = 100):
+    def __init__(self, max_concurrent_requests: int = 100, selection: Optional[ImageSelectionPolicy] = None,
+                 policy: Optional[RequestPolicy] = None, limiter: Optional[TokenBucket] = None,
+                 sessions: Optional[SessionPool] = None):
         """
         Initializes the ImageLinkExtractor with the specified maximum number of concurrent requests.
 
         Parameters:
         max_concurrent_requests (int): Maximum number of concurrent requests.
+        selection (Optional[ImageSelectionPolicy]): The policy picking which images of an article to download.
+            Defaults to every image.
+        policy (Optional[RequestPolicy]): The deadlines, hedging and circuit breakers applied to page requests.
+        limiter (Optional[TokenBucket]): The download bandwidth shared with the image downloads of the run.
+        sessions (Optional[SessionPool]): Keeps the page connections open across runs of a long-running process.
         """
         self.max_concurrent_requests = max_concurrent_requests
+        self.selection = selection or ImageSelectionPolicy()
+        self.policy = policy
+        self.limiter = limiter
+        self.sessions = sessions
+
+    def _session(self):
+        return open_session(self.sessions, "pages", limit=self.max_concurrent_requests,
+                            timeout=session_timeout(self.policy))
 
     async def fetch_page(self, session: aiohttp.ClientSession, url: str) -> str:
         """
@@ -40,13 +60,30 @@ class ImageLinkExtractor:
         ImageLinkExtractorError: If the page fetch fails.
         """
         try:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                return await response.text()
-        except aiohttp.ClientError as e:
-            logger.error(f"Failed to fetch {url}: {e}")
+            with metrics.span("fetch", url=url) as span:
+                if self.policy is not None:
+                    html_content = await self.policy.call(url, lambda: self._read_page(session, url), kind="page")
+                else:
+                    html_content = await self._read_page(session, url)
+                span.set_attribute("bytes", len(html_content))
+                metrics.count("pipeline_bytes_total", len(html_content), stage="fetch")
+                return html_content
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+            metrics.count("pipeline_errors_total", stage="fetch")
+            logger.error("Failed to fetch %s: %s", url, e)
             raise ImageLinkExtractorError(f"Failed to fetch {url}", url) from e
 
+    async def _read_page(self, session: aiohttp.ClientSession, url: str) -> str:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            if self.limiter is None:
+                return await response.text()
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(DEFAULT_BURST):
+                body.extend(chunk)
+                await self.limiter.acquire(len(chunk))
+            return body.decode(response.get_encoding())
+
     async def extract_image_links(self, session: aiohttp.ClientSession, url: str) -> List[str]:
         """
         Extracts image links (only .jpg or .jpeg) from a given webpage.
@@ -63,22 +100,18 @@ class ImageLinkExtractor:
         """
         try:
             html_content = await self.fetch_page(session, url)
-            soup = BeautifulSoup(html_content, 'html.parser')
-            image_tags = soup.find_all('img')
-            image_links = []
-
-            for img in image_tags:
-                img_url = img.get('src')
-                if img_url and (img_url.endswith('.jpg') or img_url.endswith('.jpeg')):
-                    img_url = urljoin(url, img_url)  # Handle relative URLs
-                    image_links.append(img_url)
+            with metrics.span("parse", url=url):
+                soup = BeautifulSoup(html_content, 'html.parser')
+                candidates = image_candidates(soup, url)
+            image_links = [candidate.url for candidate in self.selection.select(candidates)]
+            metrics.count("pipeline_items_total", len(image_links), stage="link_extraction")
 
             if not image_links:
                 raise ImageLinkExtractorError(f"No image links found at {url}", url)
 
             return image_links
         except ImageLinkExtractorError as e:
-            logger.error(f"Error extracting image links from {url}: {e}")
+            logger.error("Error extracting image links from %s: %s", url, e)
             raise
 
     async def load_all_image_links(self, urls: List[str]) -> List[str]:
@@ -91,8 +124,7 @@ class ImageLinkExtractor:
         Returns:
         List[str]: A list of all image URLs extracted from the given URLs.
         """
-        connector = aiohttp.TCPConnector(limit=self.max_concurrent_requests)
-        async with aiohttp.ClientSession(connector=connector) as session:
+        async with self._session() as session:
             tasks = [self.extract_image_links(session, url) for url in urls]
             try:
                 image_links_list = await asyncio.gather(*tasks)
@@ -100,4 +132,31 @@ class ImageLinkExtractor:
                 # If an error occurs, it will be logged by the individual methods
                 return []
             image_links = [img_url for sublist in image_links_list for img_url in sublist]
+            self._log_selection()
             return image_links
+
+    async def load_image_links_by_page(self, urls: List[str]) -> Dict[str, List[str]]:
+        """
+        Loads image links grouped by page. Pages that failed or had no images are left out of the mapping.
+
+        Parameters:
+        urls (List[str]): The list of URLs to process.
+
+        Returns:
+        Dict[str, List[str]]: A mapping from each URL to the image URLs extracted from it.
+        """
+        async with self._session() as session:
+            tasks = [self.extract_image_links(session, url) for url in urls]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        links_by_page = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+            if not isinstance(result, Exception):
+                links_by_page[url] = result
+        self._log_selection()
+        return links_by_page
+
+    def _log_selection(self) -> None:
+        if self.selection.report.avoided_requests:
+            logger.info("Image selection (%s) %s", self.selection.mode, self.selection.report)
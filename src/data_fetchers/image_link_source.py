@@ -0,0 +1,35 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+
+
+class ImageLinkSource(ABC):
+    """
+    Abstract base class for backends that resolve article URLs into image URLs.
+    """
+
+    @abstractmethod
+    async def load_all_image_links(self, urls: List[str]) -> List[str]:
+        """
+        Loads image links from a list of article URLs.
+
+        Parameters:
+        urls (List[str]): The list of article URLs to process.
+
+        Returns:
+        List[str]: A list of all image URLs found for the given articles.
+        """
+        pass
+
+    async def load_image_links_by_page(self, urls: List[str]) -> Dict[str, List[str]]:
+        """
+        Loads image links grouped by the article they were found on.
+
+        Backends should override this; the default resolves one article at a time.
+
+        Parameters:
+        urls (List[str]): The list of article URLs to process.
+
+        Returns:
+        Dict[str, List[str]]: A mapping from each article URL to its image URLs.
+        """
+        return {url: await self.load_all_image_links([url]) for url in urls}
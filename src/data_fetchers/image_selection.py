@@ -0,0 +1,134 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, Tag
+
+from src.commons.models.image_candidate import ImageCandidate
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+SELECTION_MODES = ("all", "lead", "top-k")
+# Typical size of a JPEG thumbnail per rendered pixel, used to estimate the bytes of images that are not fetched
+JPEG_BYTES_PER_PIXEL = 0.25
+
+_DIMENSION = re.compile(r'^\s*(\d+)')
+
+
+def _dimension(img: Tag, name: str) -> Optional[int]:
+    match = _DIMENSION.match(img.get(name) or "")
+    return int(match.group(1)) if match else None
+
+
+def image_candidates(soup: BeautifulSoup, page_url: str,
+                     extensions: Tuple[str, ...] = ('.jpg', '.jpeg')) -> List[ImageCandidate]:
+    """
+    Lists the images of an article with their rendered size and whether they sit in the infobox.
+
+    Parameters:
+    soup (BeautifulSoup): The parsed article.
+    page_url (str): The article URL, to resolve relative image URLs.
+    extensions (Tuple[str, ...]): The image URL endings kept.
+
+    Returns:
+    List[ImageCandidate]: The images, in page order.
+    """
+    infobox_images = {id(img) for infobox in soup.find_all('table', class_='infobox')
+                      for img in infobox.find_all('img')}
+    candidates = []
+    for img in soup.find_all('img'):
+        img_url = img.get('src')
+        if img_url and img_url.endswith(extensions):
+            candidates.append(ImageCandidate(url=urljoin(page_url, img_url), width=_dimension(img, 'width'),
+                                             height=_dimension(img, 'height'), in_infobox=id(img) in infobox_images))
+    return candidates
+
+
+@dataclass
+class SelectionReport:
+    """
+    A dataclass to store what an ImageSelectionPolicy let through and what it saved.
+    """
+    candidates: int = 0
+    selected: int = 0
+    avoided_pixels: int = 0
+    # Skipped images without width and height attributes, whose bytes cannot be estimated
+    avoided_unsized: int = 0
+
+    @property
+    def avoided_requests(self) -> int:
+        return self.candidates - self.selected
+
+    @property
+    def avoided_bytes(self) -> int:
+        return int(self.avoided_pixels * JPEG_BYTES_PER_PIXEL)
+
+    def __str__(self):
+        return (f"kept {self.selected} of {self.candidates} images, avoided {self.avoided_requests} requests and "
+                f"~{self.avoided_bytes} bytes")
+
+
+class ImageSelectionPolicy:
+    """
+    A class to pick the images worth downloading from an article before any image request is made.
+
+    Modes:
+        all: every image (the default).
+        lead: the representative image, i.e. the first infobox image, else the first image of the article.
+        top-k: the k images with the largest rendered size, in page order.
+    Images whose declared width or height is under min_px are dropped first, in every mode.
+    """
+
+    def __init__(self, mode: str = "all", k: int = 1, min_px: int = 0):
+        """
+        Initializes the ImageSelectionPolicy.
+
+        Parameters:
+        mode (str): One of SELECTION_MODES.
+        k (int): The number of images kept by top-k.
+        min_px (int): The minimum rendered width and height; images without size attributes are kept.
+        """
+        if mode not in SELECTION_MODES:
+            raise ValueError(f"Unknown image selection mode '{mode}', expected one of {SELECTION_MODES}")
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.mode = mode
+        self.k = k
+        self.min_px = min_px
+        self.report = SelectionReport()
+
+    def _large_enough(self, candidate: ImageCandidate) -> bool:
+        return all(size is None or size >= self.min_px for size in (candidate.width, candidate.height))
+
+    def select(self, candidates: List[ImageCandidate]) -> List[ImageCandidate]:
+        """
+        Picks the images to download and records the skipped ones in the report.
+
+        Parameters:
+        candidates (List[ImageCandidate]): The images of one article, in page order.
+
+        Returns:
+        List[ImageCandidate]: The selected images, in page order.
+        """
+        selected = [candidate for candidate in candidates if self._large_enough(candidate)]
+        if self.mode == "lead" and selected:
+            selected = [next((candidate for candidate in selected if candidate.in_infobox), selected[0])]
+        elif self.mode == "top-k" and len(selected) > self.k:
+            largest = sorted(selected, key=lambda candidate: candidate.pixels or 0, reverse=True)[:self.k]
+            kept = {id(candidate) for candidate in largest}
+            selected = [candidate for candidate in selected if id(candidate) in kept]
+
+        kept = {id(candidate) for candidate in selected}
+        skipped = [candidate for candidate in candidates if id(candidate) not in kept]
+        avoided_pixels = sum(candidate.pixels or 0 for candidate in skipped)
+        self.report.candidates += len(candidates)
+        self.report.selected += len(selected)
+        self.report.avoided_pixels += avoided_pixels
+        self.report.avoided_unsized += sum(candidate.pixels is None for candidate in skipped)
+        if skipped:
+            metrics.count("images_avoided_total", len(skipped), mode=self.mode)
+            metrics.count("image_bytes_avoided_total", int(avoided_pixels * JPEG_BYTES_PER_PIXEL), reason="selection")
+        return selected
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import aiohttp
+
+from src.commons.exceptions.exception import CircuitOpenError, ImageLinkExtractorError
+from src.data_fetchers.image_link_source import ImageLinkSource
+from src.data_fetchers.request_policy import RequestPolicy, session_timeout
+from src.data_fetchers.session_pool import SessionPool, open_session
+from src.telemetry import metrics
+from src.utils.token_bucket import DEFAULT_BURST, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# The MediaWiki API accepts at most 50 titles per query for regular clients
+MAX_TITLES_PER_QUERY = 50
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+class MediaWikiImageLinkExtractor(ImageLinkSource):
+    """
+    A class to resolve article image links through the MediaWiki action API instead of scraping article HTML.
+
+    Titles are batched into `action=query&prop=pageimages|images` requests, so one small JSON response
+    replaces up to 50 full article page downloads.
+    """
+
+    def __init__(self, api_url: str, max_concurrent_requests: int = 100, all_images: bool = False,
+                 batch_size: int = MAX_TITLES_PER_QUERY, sessions: Optional[SessionPool] = None,
+                 policy: Optional[RequestPolicy] = None, limiter: Optional[TokenBucket] = None):
+        """
+        Initializes the MediaWikiImageLinkExtractor.
+
+        Parameters:
+        api_url (str): The URL of the MediaWiki api.php endpoint.
+        max_concurrent_requests (int): Maximum number of concurrent requests.
+        all_images (bool): Whether to return every .jpg/.jpeg file used on the article, not only the lead image.
+        batch_size (int): Number of titles sent per API query (at most 50).
+        sessions (Optional[SessionPool]): Keeps the API connections open across runs of a long-running process.
+        policy (Optional[RequestPolicy]): The deadlines, hedging and circuit breakers applied to API requests.
+        limiter (Optional[TokenBucket]): The download bandwidth shared with the image downloads of the run.
+        """
+        self.api_url = api_url
+        self.max_concurrent_requests = max_concurrent_requests
+        self.all_images = all_images
+        self.batch_size = min(batch_size, MAX_TITLES_PER_QUERY)
+        self.sessions = sessions
+        self.policy = policy
+        self.limiter = limiter
+
+    @staticmethod
+    def title_from_url(url: str) -> Optional[str]:
+        """
+        Extracts the article title from a /wiki/<title> article URL.
+
+        Parameters:
+        url (str): The article URL.
+
+        Returns:
+        Optional[str]: The article title, or None if the URL is not an article URL.
+        """
+        path = urlparse(url).path
+        if not path.startswith('/wiki/'):
+            return None
+        title = unquote(path[len('/wiki/'):]).replace('_', ' ')
+        return title or None
+
+    @staticmethod
+    def _is_image_link(url: str) -> bool:
+        return url.lower().endswith(IMAGE_EXTENSIONS)
+
+    async def query(self, session: aiohttp.ClientSession, params: Dict[str, str]) -> List[dict]:
+        """
+        Runs an API query and follows `continue` markers until the result set is complete.
+
+        Parameters:
+        session (ClientSession): The aiohttp client session.
+        params (Dict[str, str]): The query parameters.
+
+        Returns:
+        List[dict]: The `query` objects of every response page.
+
+        Raises:
+        ImageLinkExtractorError: If the API request fails, times out, is rejected by an open circuit or returns an
+            error.
+        """
+        request_params = {'action': 'query', 'format': 'json', 'formatversion': '2', **params}
+        results = []
+        while True:
+            try:
+                with metrics.span("fetch", url=self.api_url) as span:
+                    if self.policy is not None:
+                        body, data = await self.policy.call(self.api_url,
+                                                            lambda: self._read_query(session, request_params),
+                                                            kind="api")
+                    else:
+                        body, data = await self._read_query(session, request_params)
+                    span.set_attribute("bytes", len(body))
+                    metrics.count("pipeline_bytes_total", len(body), stage="fetch")
+            except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+                metrics.count("pipeline_errors_total", stage="fetch")
+                logger.error("Failed to query %s: %s", self.api_url, e)
+                raise ImageLinkExtractorError(f"Failed to query {self.api_url}", self.api_url) from e
+
+            if 'error' in data:
+                raise ImageLinkExtractorError(f"MediaWiki API error: {data['error'].get('info')}", self.api_url)
+            if 'query' in data:
+                results.append(data['query'])
+            if 'continue' not in data:
+                return results
+            request_params = {**request_params, **data['continue']}
+
+    async def _read_query(self, session: aiohttp.ClientSession, params: Dict[str, str]) -> Tuple[bytes, dict]:
+        async with session.get(self.api_url, params=params) as response:
+            response.raise_for_status()
+            if self.limiter is None:
+                body = await response.read()
+            else:
+                chunks = bytearray()
+                async for chunk in response.content.iter_chunked(DEFAULT_BURST):
+                    chunks.extend(chunk)
+                    await self.limiter.acquire(len(chunk))
+                body = bytes(chunks)
+        return body, json.loads(body)
+
+    @staticmethod
+    def _resolve_titles(query_results: List[dict]) -> Dict[str, str]:
+        """
+        Builds a mapping from every requested title to its final title after normalization and redirects.
+        """
+        mapping = {}
+        for result in query_results:
+            for key in ('normalized', 'redirects'):
+                for item in result.get(key, []):
+                    mapping[item['from']] = item['to']
+
+        resolved = {}
+        for title in mapping:
+            final, seen = title, set()
+            while final in mapping and final not in seen:
+                seen.add(final)
+                final = mapping[final]
+            resolved[title] = final
+        return resolved
+
+    async def fetch_batch(self, session: aiohttp.ClientSession, titles: List[str]) -> Dict[str, List[str]]:
+        """
+        Fetches the image links for one batch of titles.
+
+        Parameters:
+        session (ClientSession): The aiohttp client session.
+        titles (List[str]): The article titles (at most batch_size).
+
+        Returns:
+        Dict[str, List[str]]: A mapping from each requested title to its image URLs.
+        """
+        props = 'pageimages|images' if self.all_images else 'pageimages'
+        params = {'prop': props, 'titles': '|'.join(titles), 'redirects': '1',
+                  'piprop': 'original', 'pilimit': str(MAX_TITLES_PER_QUERY)}
+        if self.all_images:
+            params['imlimit'] = 'max'
+        query_results = await self.query(session, params)
+
+        resolved = self._resolve_titles(query_results)
+        lead_images: Dict[str, str] = {}
+        files: Dict[str, List[str]] = {}
+        for result in query_results:
+            for page in result.get('pages', []):
+                title = page.get('title')
+                original = page.get('original', {}).get('source')
+                if original:
+                    lead_images[title] = original
+                for image in page.get('images', []):
+                    if self._is_image_link(image['title']):
+                        files.setdefault(title, []).append(image['title'])
+
+        file_urls = await self.fetch_file_urls(session, sorted({f for names in files.values() for f in names}))
+
+        links_by_title = {}
+        for title in titles:
+            final_title = resolved.get(title, title)
+            links = []
+            lead = lead_images.get(final_title)
+            if lead and self._is_image_link(lead):
+                links.append(lead)
+            for file_title in files.get(final_title, []):
+                file_url = file_urls.get(file_title)
+                if file_url and file_url not in links:
+                    links.append(file_url)
+            links_by_title[title] = links
+        return links_by_title
+
+    async def fetch_file_urls(self, session: aiohttp.ClientSession, file_titles: List[str]) -> Dict[str, str]:
+        """
+        Resolves File: titles to their original upload URLs.
+
+        Parameters:
+        session (ClientSession): The aiohttp client session.
+        file_titles (List[str]): The File: page titles to resolve.
+
+        Returns:
+        Dict[str, str]: A mapping from file title to file URL.
+        """
+        urls = {}
+        for start in range(0, len(file_titles), self.batch_size):
+            batch = file_titles[start:start + self.batch_size]
+            query_results = await self.query(session, {'prop': 'imageinfo', 'iiprop': 'url',
+                                                       'titles': '|'.join(batch)})
+            resolved = self._resolve_titles(query_results)
+            pages = {page['title']: page for result in query_results for page in result.get('pages', [])}
+            for file_title in batch:
+                page = pages.get(resolved.get(file_title, file_title), {})
+                image_info = page.get('imageinfo') or [{}]
+                if image_info[0].get('url'):
+                    urls[file_title] = image_info[0]['url']
+        return urls
+
+    async def load_image_links_by_page(self, urls: List[str]) -> Dict[str, List[str]]:
+        """
+        Loads image links for a list of article URLs using batched API queries, grouped by article.
+
+        Parameters:
+        urls (List[str]): The list of article URLs to process.
+
+        Returns:
+        Dict[str, List[str]]: A mapping from each article URL to its image URLs, in article order. URLs that are
+            not wiki articles are left out, and so are the articles of a batch whose API request failed.
+        """
+        titles, links_by_title, _ = await self._load_links_by_title(urls)
+        return {url: links_by_title[title] for url, title in titles.items() if title in links_by_title}
+
+    async def _load_links_by_title(self, urls: List[str]) -> Tuple[Dict[str, str], Dict[str, List[str]], bool]:
+        """
+        Returns the title of every article URL, the image links of every title whose batch succeeded, and
+        whether a batch failed.
+        """
+        titles = {}
+        for url in urls:
+            title = self.title_from_url(url)
+            if title is None:
+                logger.warning("Skipping URL that is not a wiki article: %s", url)
+                continue
+            titles.setdefault(url, title)
+
+        unique_titles = list(dict.fromkeys(titles.values()))
+        batches = [unique_titles[start:start + self.batch_size]
+                   for start in range(0, len(unique_titles), self.batch_size)]
+        logger.info(f"Querying {len(unique_titles)} titles in {len(batches)} API requests")
+
+        async with open_session(self.sessions, "api", limit=self.max_concurrent_requests,
+                                timeout=session_timeout(self.policy)) as session:
+            tasks = [self.fetch_batch(session, batch) for batch in batches]
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        # A failed batch only leaves out its own titles
+        links_by_title = {}
+        failed = False
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+            if isinstance(result, Exception):
+                failed = True
+                # Errors of the API requests are logged by query
+                if not isinstance(result, ImageLinkExtractorError):
+                    logger.error("Failed to fetch image links of %d titles: %s", len(batch), result)
+                continue
+            for title in batch:
+                links_by_title[title] = result.get(title, [])
+        return titles, links_by_title, failed
+
+    async def load_all_image_links(self, urls: List[str]) -> List[str]:
+        """
+        Loads image links for a list of article URLs using batched API queries.
+
+        Parameters:
+        urls (List[str]): The list of article URLs to process.
+
+        Returns:
+        List[str]: A list of all image URLs found for the given articles, in article order; empty if an API
+            request fails, like ImageLinkExtractor.load_all_image_links.
+        """
+        titles, links_by_title, failed = await self._load_links_by_title(urls)
+        if failed:
+            return []
+        image_links = []
+        # Several URLs may point at the same article; its images are listed once
+        for title in dict.fromkeys(titles.values()):
+            image_links.extend(links_by_title[title])
+        metrics.count("pipeline_items_total", len(image_links), stage="link_extraction")
+        return image_links
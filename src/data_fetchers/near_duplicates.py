@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from src.commons.models.image_data import ImageData
+from src.telemetry import metrics
+from src.utils.hamming_index import HammingIndex
+from src.utils.perceptual_hash import HASH_ALGORITHMS, HASH_BITS, perceptual_hash
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class NearDuplicateReport:
+    """
+    A dataclass to store what a NearDuplicateFilter hashed, skipped and saved.
+    """
+    checked: int = 0
+    skipped: int = 0
+    # Images that could not be decoded, e.g. SVG or truncated files; they are stored
+    unhashable: int = 0
+    bytes_saved: int = 0
+    hash_seconds: float = 0.0
+    lookup_seconds: float = 0.0
+    lookups: int = 0
+
+    @property
+    def seconds_per_lookup(self) -> float:
+        return self.lookup_seconds / self.lookups if self.lookups else 0.0
+
+    def __str__(self):
+        return (f"skipped {self.skipped} of {self.checked} images as near-duplicates, saved {self.bytes_saved} bytes, "
+                f"{self.unhashable} could not be hashed, {self.seconds_per_lookup * 1e6:.0f}us per lookup")
+
+
+class NearDuplicateFilter:
+    """
+    A class to skip storing images that look like an image already stored, e.g. the same photo at another size
+    or re-encoded, which a content hash does not catch.
+
+    The perceptual hash of every downloaded image is computed in a process pool, so decoding does not block the
+    event loop and uses every core. Hashes are indexed in a HammingIndex; an image within max_distance bits of
+    an indexed one is a near-duplicate. The index lives as long as the filter, i.e. one run, or every refresh of
+    a daemon.
+
+    Every admitted image is identified by a key, e.g. its URL, since different images may share a file name. It
+    is pending until the caller reports it stored (or discards it): a look-alike of a pending image waits, so it
+    is only mapped to an image that was actually stored.
+    """
+
+    def __init__(self, max_distance: int, algorithm: str = "phash", workers: Optional[int] = None,
+                 executor: Optional[Executor] = None, hasher: Callable[[bytes, str], int] = perceptual_hash):
+        """
+        Initializes the NearDuplicateFilter.
+
+        Parameters:
+        max_distance (int): The largest Hamming distance, out of 64 bits, between near-duplicates.
+        algorithm (str): The perceptual hash, one of HASH_ALGORITHMS.
+        workers (Optional[int]): The processes hashing images, the number of CPUs when omitted.
+        executor (Optional[Executor]): Runs the hasher instead of a process pool of its own.
+        hasher (Callable[[bytes, str], int]): Computes the hash of an image; it must be picklable to run in a
+            process pool.
+
+        Raises:
+        ValueError: If the algorithm is unknown or max_distance is out of range.
+        ImportError: If Pillow, used by the default hasher, is not installed.
+        """
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unknown hash algorithm '{algorithm}', expected one of {HASH_ALGORITHMS}")
+        if hasher is perceptual_hash:
+            try:
+                import PIL  # noqa: F401
+            except ImportError as e:
+                raise ImportError("Near-duplicate detection requires Pillow: pip install Pillow") from e
+        self.algorithm = algorithm
+        self.index = HammingIndex(max_distance, bits=HASH_BITS)
+        self.report = NearDuplicateReport()
+        # Key -> hash and name of every admitted image; the index holds the keys
+        self._entries: Dict[str, Tuple[int, str]] = {}
+        # Name -> keys of the admitted images stored under it, so they can be forgotten by name
+        self._keys_by_name: Dict[str, Set[str]] = {}
+        # Key -> future of every admitted image not stored yet, resolved with whether it was stored
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._hasher = hasher
+        self._owns_executor = executor is None
+        self._executor = executor or ProcessPoolExecutor(max_workers=workers)
+
+    async def _hash(self, image_data: ImageData) -> Optional[int]:
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._hasher, image_data.data,
+                                                                    self.algorithm)
+        except Exception as e:
+            logger.debug("Cannot hash %s: %s", image_data.name, e)
+            self.report.unhashable += 1
+            return None
+        finally:
+            self.report.hash_seconds += time.perf_counter() - started
+
+    async def admit(self, image_data: ImageData, key: Optional[str] = None) -> Optional[str]:
+        """
+        Checks whether an image is a near-duplicate of one admitted before, and admits it if not.
+
+        The lookup and the insertion happen without yielding to the event loop, so of two near-duplicates
+        downloaded at the same time only the first is admitted. Call stored once the admitted image is stored,
+        or discard if it is not stored after all. A look-alike of an image still pending waits for it, and is
+        checked again if that image was discarded.
+
+        Parameters:
+        image_data (ImageData): The downloaded image.
+        key (Optional[str]): Identifies the image for stored and discard, e.g. its URL; its name when omitted.
+
+        Returns:
+        Optional[str]: The name of the admitted image it duplicates, None if it is to be stored.
+        """
+        key = image_data.name if key is None else key
+        self.report.checked += 1
+        value = await self._hash(image_data)
+        if value is None:
+            return None
+        while True:
+            started = time.perf_counter()
+            match = self.index.find(value)
+            self.report.lookup_seconds += time.perf_counter() - started
+            self.report.lookups += 1
+            if match is None:
+                # An image admitted again under its key, e.g. by a later refresh, replaces the earlier one
+                self.discard(key)
+                self.index.add(value, key)
+                self._entries[key] = (value, image_data.name)
+                self._keys_by_name.setdefault(image_data.name, set()).add(key)
+                self._pending[key] = asyncio.get_running_loop().create_future()
+                return None
+            distance, match_key = match
+            name = self._entries[match_key][1]
+            pending = self._pending.get(match_key)
+            # Shielded, so a look-alike cancelled while it waits does not cancel the future others wait for
+            if pending is None or await asyncio.shield(pending):
+                break
+        self.report.skipped += 1
+        self.report.bytes_saved += len(image_data.data)
+        metrics.count("near_duplicates_skipped_total")
+        metrics.count("near_duplicates_bytes_saved_total", len(image_data.data))
+        logger.debug("Skipping %s, %d bits from %s", image_data.name, distance, name)
+        return name
+
+    def stored(self, key: str) -> None:
+        """
+        Marks an admitted image as stored, so look-alikes waiting for it are mapped to it.
+        """
+        self._resolve(key, True)
+
+    def discard(self, key: str) -> None:
+        """
+        Drops an admitted image that was not stored, e.g. one that failed to save, so look-alikes are stored again.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            value, name = entry
+            self.index.remove(value, key)
+            keys = self._keys_by_name[name]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_name[name]
+        self._resolve(key, False)
+
+    def forget(self, name: str) -> None:
+        """
+        Drops the admitted images stored under a name, e.g. once it was deleted, so look-alikes are stored again.
+        """
+        for key in list(self._keys_by_name.get(name, ())):
+            self.discard(key)
+
+    def _resolve(self, key: str, stored: bool) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is not None and not pending.done():
+            pending.set_result(stored)
+
+    def close(self) -> None:
+        if self._owns_executor:
+            self._executor.shutdown()
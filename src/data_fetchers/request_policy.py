@@ -0,0 +1,282 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+import aiohttp
+
+from src.commons.exceptions.exception import CircuitOpenError
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def is_host_failure(error: BaseException) -> bool:
+    """
+    Tells whether an error says the host is unhealthy (unreachable, too slow or failing server side), as opposed to
+    a well-served answer the caller did not want, like a 404.
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)):
+        return True
+    return error.__cause__ is not None and is_host_failure(error.__cause__)
+
+
+class LatencyTracker:
+    """
+    A class to keep the latencies of the most recent requests and answer quantile queries over them.
+    """
+
+    def __init__(self, window: int = 512):
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._sorted: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def add(self, latency: float) -> None:
+        if len(self._recent) == self._recent.maxlen:
+            del self._sorted[bisect.bisect_left(self._sorted, self._recent[0])]
+        self._recent.append(latency)
+        bisect.insort(self._sorted, latency)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._sorted:
+            return None
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class CircuitBreaker:
+    """
+    A class to stop sending requests to a host that keeps failing.
+
+    After failure_threshold host failures in a row the circuit opens and requests fail fast with CircuitOpenError.
+    Once reset_timeout seconds have passed, one probe request is let through (half open): its success closes the
+    circuit, its failure opens it again.
+    """
+
+    def __init__(self, host: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._clock = clock
+
+    def before_request(self) -> None:
+        """
+        Raises:
+        CircuitOpenError: If the circuit is open, or half open with its probe still running.
+        """
+        if self.state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        if self.state != CLOSED:
+            metrics.count("circuit_rejections_total", host=self.host)
+            raise CircuitOpenError(self.host, max(0.0, self._opened_at + self.reset_timeout - self._clock()))
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_cancelled(self) -> None:
+        # A cancelled probe says nothing about the host; let the next request probe instead
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self._opened_at = self._clock()
+            self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        logger.warning("Circuit for %s is now %s", self.host, state.replace("_", " "))
+        metrics.count("circuit_transitions_total", host=self.host, state=state)
+        self.state = state
+
+
+@dataclass
+class RequestStats:
+    """
+    A dataclass to store the tail latency, hedging and circuit breaker outcomes of a RequestPolicy.
+    """
+    requests: int = 0
+    failures: int = 0
+    hedged: int = 0
+    hedges_won: int = 0
+    latency_quantiles: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    circuits: Dict[str, str] = field(default_factory=dict)
+    rejected: int = 0
+
+    def __str__(self):
+        latencies = "; ".join(f"{kind} " + ", ".join(f"{name} {value:.3f}s" for name, value in quantiles.items())
+                              for kind, quantiles in self.latency_quantiles.items())
+        unhealthy = [host for host, state in self.circuits.items() if state != CLOSED]
+        return (f"{self.requests} requests ({self.failures} failed); {latencies or 'no latencies'}; "
+                f"{self.hedged} hedged ({self.hedges_won} won); {self.rejected} refused by open circuits"
+                + (f" ({', '.join(unhealthy)} still unhealthy)" if unhealthy else ""))
+
+
+class RequestPolicy:
+    """
+    A class to keep slow and failing hosts from stalling a run.
+
+    - Deadlines: sessions use client_timeout, so a stuck connect or read fails instead of holding an asyncio.gather.
+    - Hedging: a request still running past the hedge_quantile latency of its kind gets a duplicate, and the first
+      answer wins. At most hedge_budget of all requests are hedged, so a slow host does not see twice the load.
+    - Circuit breakers: a host failing repeatedly gets no requests for a while, see CircuitBreaker.
+    """
+
+    def __init__(self, connect_timeout: Optional[float] = 10.0, read_timeout: Optional[float] = 30.0,
+                 total_timeout: Optional[float] = 300.0, hedge_quantile: Optional[float] = None,
+                 hedge_budget: float = 0.1, min_samples: int = 20, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes the RequestPolicy.
+
+        Parameters:
+        connect_timeout (Optional[float]): The seconds allowed to connect, None for no limit.
+        read_timeout (Optional[float]): The seconds allowed between two reads of a response, None for no limit.
+        total_timeout (Optional[float]): The seconds allowed for a whole request, None for no limit.
+        hedge_quantile (Optional[float]): The latency quantile after which a request is hedged, e.g. 0.95; None
+            disables hedging.
+        hedge_budget (float): The largest share of requests that may be hedged.
+        min_samples (int): The latencies of a kind measured before its requests are hedged.
+        failure_threshold (int): The host failures in a row that open a host's circuit, 0 to disable breakers.
+        reset_timeout (float): The seconds an open circuit waits before letting a probe request through.
+        """
+        self.client_timeout = aiohttp.ClientTimeout(total=total_timeout, sock_connect=connect_timeout,
+                                                    sock_read=read_timeout)
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.stats = RequestStats()
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._clock = clock
+
+    def breaker(self, url: str) -> Optional[CircuitBreaker]:
+        if not self.failure_threshold:
+            return None
+        host = urlparse(url).hostname or ""
+        if host not in self._breakers:
+            self._breakers[host] = CircuitBreaker(host, self.failure_threshold, self.reset_timeout, self._clock)
+        return self._breakers[host]
+
+    async def call(self, url: str, request: Callable[[], Awaitable[T]], kind: str = "request",
+                   hedge: bool = True) -> T:
+        """
+        Runs a request under the policy.
+
+        Parameters:
+        url (str): The requested URL, whose host picks the circuit breaker.
+        request (Callable[[], Awaitable[T]]): Makes the request; called a second time for a hedge.
+        kind (str): The latency class of the request, e.g. "page" or "image", each with its own quantiles.
+        hedge (bool): Whether the request may be duplicated; off for requests with side effects.
+
+        Returns:
+        T: The result of the first request to succeed.
+
+        Raises:
+        CircuitOpenError: If the host's circuit is open; the request is not sent.
+        """
+        breaker = self.breaker(url)
+        if breaker is not None:
+            try:
+                breaker.before_request()
+            except CircuitOpenError:
+                self.stats.rejected += 1
+                raise
+        latencies = self._latencies.setdefault(kind, LatencyTracker())
+        self.stats.requests += 1
+        started = self._clock()
+        try:
+            if hedge and self._hedge_delay(latencies) is not None:
+                result = await self._hedged(request, self._hedge_delay(latencies), kind)
+            else:
+                result = await request()
+        except asyncio.CancelledError:
+            if breaker is not None:
+                breaker.record_cancelled()
+            raise
+        except Exception as e:
+            self.stats.failures += 1
+            if breaker is not None and is_host_failure(e):
+                breaker.record_failure()
+            elif breaker is not None:
+                # A 404 or a rejected body still comes from a healthy host
+                breaker.record_success()
+            raise
+        latency = self._clock() - started
+        latencies.add(latency)
+        metrics.observe("request_seconds", latency, kind=kind)
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+    def _hedge_delay(self, latencies: LatencyTracker) -> Optional[float]:
+        if self.hedge_quantile is None or len(latencies) < self.min_samples:
+            return None
+        if self.stats.hedged >= self.hedge_budget * self.stats.requests:
+            return None
+        return latencies.quantile(self.hedge_quantile)
+
+    async def _hedged(self, request: Callable[[], Awaitable[T]], delay: float, kind: str) -> T:
+        primary = asyncio.ensure_future(request())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            self.stats.hedged += 1
+            metrics.count("hedged_requests_total", kind=kind, outcome="fired")
+            tasks.add(asyncio.ensure_future(request()))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats.hedges_won += 1
+                            metrics.count("hedged_requests_total", kind=kind, outcome="won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def report(self) -> RequestStats:
+        """
+        Returns:
+        RequestStats: The stats so far, with p50/p95/p99/max latencies per kind and the state of every circuit.
+        """
+        self.stats.latency_quantiles = {
+            kind: {name: latencies.quantile(q) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99),
+                                                                 ("max", 1.0))}
+            for kind, latencies in self._latencies.items() if len(latencies)}
+        self.stats.circuits = {host: breaker.state for host, breaker in self._breakers.items()}
+        return self.stats
+
+
+def session_timeout(policy: Optional[RequestPolicy]) -> aiohttp.ClientTimeout:
+    return policy.client_timeout if policy is not None else aiohttp.client.DEFAULT_TIMEOUT
@@ -0,0 +1,337 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from typing import Awaitable, Callable, Optional, Tuple
+
+import aiohttp
+
+from src.commons.exceptions.exception import ImageDataLoaderException, ImageRejectedError
+from src.data_fetchers.image_guards import DEFAULT_CHUNK_SIZE, SNIFF_BYTES, ImageGuards
+from src.telemetry import metrics
+from src.utils.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_DIR = os.path.join(tempfile.gettempdir(), "image-spool")
+# Statuses worth another attempt; any other error status is final
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+_TRANSFER_ERRORS = (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+class _Retry(Exception):
+    """Raised inside an attempt when the transfer should be tried again."""
+
+
+class _Changed(Exception):
+    """Raised by a ranged part when the server no longer serves the version the other parts were fetched from."""
+
+
+def _validator(response: aiohttp.ClientResponse) -> Optional[str]:
+    """
+    Returns the value a later `If-Range` can use to make sure the bytes of a resumed download belong to the same
+    version: a strong ETag, else Last-Modified. Weak ETags are not allowed in If-Range.
+    """
+    if response.headers.get("Accept-Ranges", "").lower() == "none":
+        return None
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _content_range(response: aiohttp.ClientResponse) -> Tuple[int, Optional[int]]:
+    match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+    if not match:
+        raise _Changed(f"unusable Content-Range {response.headers.get('Content-Range')!r}")
+    return int(match.group(1)), None if match.group(3) == "*" else int(match.group(3))
+
+
+class _Spool:
+    """
+    A download in progress on disk: the body received so far, and a metadata file with the validator and length
+    it was received under, so another attempt (or the next run) can ask for the rest only.
+    """
+
+    def __init__(self, directory: str, url: str):
+        os.makedirs(directory, exist_ok=True)
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        self.url = url
+        self.path = os.path.join(directory, f"{key}.part")
+        self.meta_path = os.path.join(directory, f"{key}.json")
+        self.validator: Optional[str] = None
+        self.length: Optional[int] = None
+        self.offset = 0
+        self.discarded = False
+        try:
+            with open(self.meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if meta.get("url") == url and meta.get("validator"):
+                self.offset = os.path.getsize(self.path)
+                self.validator, self.length = meta["validator"], meta.get("length")
+        except (OSError, ValueError):
+            self.offset = 0
+        self.file = open(self.path, "r+b" if self.offset else "w+b")
+        self.head = self.file.read(SNIFF_BYTES)
+        self.file.seek(self.offset)
+
+    def start(self, validator: Optional[str], length: Optional[int]) -> None:
+        """Drops the bytes received so far, for a response that carries the body from its first byte."""
+        self.reset()
+        self.validator, self.length = validator, length
+        if validator:
+            with open(self.meta_path, "w") as meta_file:
+                json.dump({"url": self.url, "validator": validator, "length": length}, meta_file)
+
+    def reset(self) -> None:
+        self.file.seek(0)
+        self.file.truncate()
+        self.offset = 0
+        self.head = b""
+        self.validator = None
+
+    def write(self, chunk: bytes) -> None:
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+        self.file.write(chunk)
+        self.offset += len(chunk)
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self) -> None:
+        """Closes the spool, keeping it on disk only if a later attempt can resume it."""
+        self.file.close()
+        if self.discarded or not (self.validator and self.offset):
+            for path in (self.path, self.meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class _Part:
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+        self.position = start
+
+
+class ResumableDownloader:
+    """
+    A class to download image bodies that survive dropped connections.
+
+    The body is spooled to a file in spool_dir, next to a small metadata file holding the response's validator (a
+    strong ETag, else Last-Modified). When the connection drops, the download is retried with `Range: bytes=N-` and
+    `If-Range`, so only the missing bytes are fetched; a 200 answer instead of 206 means the image changed, and the
+    download starts over. A spool left behind by a failed run is resumed the same way by the next one.
+
+    Bodies of at least parallel_threshold bytes are fetched as concurrent ranges when a HEAD request shows the
+    server supports them. The spool directory should not be shared by processes fetching the same URLs at once.
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None, retries: int = 3, retry_delay: float = 0.5,
+                 parallel_threshold: Optional[int] = None, parts: int = 4, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 limiter: Optional[TokenBucket] = None):
+        """
+        Initializes the ResumableDownloader.
+
+        Parameters:
+        spool_dir (Optional[str]): The folder partial downloads are kept in, a temporary folder by default.
+        retries (int): The attempts allowed in a row without receiving a new byte; attempts that made progress
+            do not count, so a large body may take any number of them.
+        retry_delay (float): The seconds before a retry, multiplied by the number of failed attempts in a row.
+        parallel_threshold (Optional[int]): The body size from which ranges are fetched concurrently, None to
+            always fetch bodies in one piece.
+        parts (int): The number of concurrent ranges.
+        chunk_size (int): The size of the chunks bodies are streamed in.
+        limiter (Optional[TokenBucket]): The download bandwidth shared with the other streams of the run.
+        """
+        if parts < 1:
+            raise ValueError(f"parts must be at least 1, got {parts}")
+        self.spool_dir = spool_dir or DEFAULT_SPOOL_DIR
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.parallel_threshold = parallel_threshold
+        self.parts = parts
+        self.chunk_size = chunk_size
+        self.limiter = limiter
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, guards: Optional[ImageGuards] = None) -> bytes:
+        """
+        Downloads a body, resuming it after dropped connections.
+
+        Parameters:
+        session (ClientSession): The aiohttp client session.
+        url (str): The URL to fetch.
+        guards (Optional[ImageGuards]): Checks applied to the headers and the body as it arrives.
+
+        Returns:
+        bytes: The body.
+
+        Raises:
+        ImageRejectedError: If the guards rejected the response.
+        ImageDataLoaderException: If the server answered with an error, or the retries ran out.
+        """
+        spool = _Spool(self.spool_dir, url)
+        try:
+            fetched = False
+            if self.parallel_threshold is not None and not spool.offset:
+                fetched = await self._fetch_parts(session, url, spool, guards)
+            if not fetched:
+                await self._with_retries(url, lambda: self._attempt(session, url, spool, guards),
+                                         lambda: spool.offset)
+            if guards is not None and len(spool.head) < SNIFF_BYTES:
+                guards.check_head(url, spool.head)
+            body = spool.read()
+            spool.discarded = True
+            return body
+        except ImageRejectedError:
+            spool.discarded = True
+            raise
+        finally:
+            spool.close()
+
+    async def _with_retries(self, url: str, attempt: Callable[[], Awaitable[None]],
+                            progress: Callable[[], int]) -> None:
+        stalled = 0
+        while True:
+            before = progress()
+            try:
+                return await attempt()
+            except _TRANSFER_ERRORS + (_Retry,) as e:
+                stalled = 0 if progress() > before else stalled + 1
+                if stalled > self.retries:
+                    raise ImageDataLoaderException(f"Download failed after {self.retries} retries: {e}", url) from e
+                metrics.count("download_retries_total", resumed=progress() > 0)
+                logger.info("Retrying %s from byte %d: %s", url, progress(), str(e) or type(e).__name__)
+                await asyncio.sleep(self.retry_delay * stalled)
+
+    async def _attempt(self, session: aiohttp.ClientSession, url: str, spool: _Spool,
+                       guards: Optional[ImageGuards]) -> None:
+        headers = {}
+        if spool.offset and spool.validator:
+            headers = {"Range": f"bytes={spool.offset}-", "If-Range": spool.validator}
+        async with session.get(url, headers=headers) as response:
+            content_type = response.headers.get("Content-Type")
+            if response.status == 206 and headers:
+                try:
+                    start, length = _content_range(response)
+                except _Changed as e:
+                    spool.reset()
+                    raise _Retry(str(e))
+                if start != spool.offset:
+                    spool.reset()
+                    raise _Retry(f"range starts at byte {start} instead of {spool.offset}")
+                if guards is not None:
+                    guards.check_headers(url, content_type, length)
+            elif response.status == 200:
+                if spool.offset:
+                    logger.info("%s changed since byte %d was received, starting over", url, spool.offset)
+                    metrics.count("download_restarts_total")
+                if guards is not None:
+                    guards.check_headers(url, content_type, response.content_length)
+                spool.start(_validator(response), response.content_length)
+            elif response.status == 416:
+                spool.reset()
+                raise _Retry("range not satisfiable")
+            elif response.status in RETRY_STATUSES:
+                raise _Retry(f"status code {response.status}")
+            else:
+                raise ImageDataLoaderException(f"Failed to fetch image, status code {response.status}", url)
+
+            try:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    sniffed = len(spool.head) >= SNIFF_BYTES
+                    spool.write(chunk)
+                    if self.limiter is not None:
+                        await self.limiter.acquire(len(chunk))
+                    if guards is not None:
+                        guards.check_size(url, spool.offset)
+                        if not sniffed and len(spool.head) >= SNIFF_BYTES:
+                            guards.check_head(url, spool.head)
+            except ImageRejectedError:
+                response.close()
+                raise
+        if spool.length is not None and spool.offset < spool.length:
+            raise _Retry(f"body ended at byte {spool.offset} of {spool.length}")
+
+    async def _fetch_parts(self, session: aiohttp.ClientSession, url: str, spool: _Spool,
+                           guards: Optional[ImageGuards]) -> bool:
+        """
+        Fetches a large body as concurrent ranges, each resumed on its own after a dropped connection.
+
+        Returns:
+        bool: False if the body is small, the server cannot serve validated ranges or the image changed while
+            the ranges were fetched, so the caller downloads it in one piece instead.
+        """
+        try:
+            async with session.head(url, allow_redirects=True) as response:
+                if response.status != 200:
+                    return False
+                validator, length = _validator(response), response.content_length
+                if guards is not None:
+                    guards.check_headers(url, response.headers.get("Content-Type"), length)
+                if response.headers.get("Accept-Ranges", "").lower() != "bytes":
+                    return False
+        except _TRANSFER_ERRORS:
+            return False
+        if not validator or not length or length < self.parallel_threshold:
+            return False
+
+        # The file is written out of order, so it is never left behind for a later run to resume
+        spool.reset()
+        spool.file.truncate(length)
+        size = -(-length // self.parts)
+        parts = [_Part(start, min(start + size, length) - 1) for start in range(0, length, size)]
+        tasks = [asyncio.ensure_future(self._with_retries(url, lambda part=part: self._fetch_part(
+            session, url, spool.file.fileno(), validator, part, guards), lambda part=part: part.position))
+            for part in parts]
+        try:
+            await asyncio.gather(*tasks)
+        except _Changed as e:
+            logger.info("Falling back to a single download of %s: %s", url, e)
+            spool.reset()
+            return False
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        spool.offset = length
+        spool.head = os.pread(spool.file.fileno(), SNIFF_BYTES, 0)
+        metrics.count("download_ranges_total", len(parts))
+        return True
+
+    async def _fetch_part(self, session: aiohttp.ClientSession, url: str, fd: int, validator: str, part: _Part,
+                          guards: Optional[ImageGuards]) -> None:
+        headers = {"Range": f"bytes={part.position}-{part.end}", "If-Range": validator}
+        async with session.get(url, headers=headers) as response:
+            if response.status == 200:
+                raise _Changed("the server answered 200 to a ranged request")
+            if response.status in RETRY_STATUSES:
+                raise _Retry(f"status code {response.status}")
+            if response.status != 206:
+                raise ImageDataLoaderException(f"Failed to fetch image, status code {response.status}", url)
+            if _content_range(response)[0] != part.position:
+                raise _Changed("the server answered with another range")
+            try:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    chunk = chunk[:part.end + 1 - part.position]
+                    os.pwrite(fd, chunk, part.position)
+                    if self.limiter is not None:
+                        await self.limiter.acquire(len(chunk))
+                    sniffed = part.position >= SNIFF_BYTES
+                    part.position += len(chunk)
+                    if guards is not None and part.start == 0 and not sniffed and part.position >= SNIFF_BYTES:
+                        guards.check_head(url, os.pread(fd, SNIFF_BYTES, 0))
+            except ImageRejectedError:
+                response.close()
+                raise
+        if part.position <= part.end:
+            raise _Retry(f"range ended at byte {part.position} of {part.end + 1}")
@@ -0,0 +1,57 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+def _new_session(limit: int, limit_per_host: int, timeout: Optional[aiohttp.ClientTimeout]) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+class SessionPool:
+    """
+    A class to keep aiohttp sessions, and so their open connections and TLS sessions, alive across runs.
+
+    Sessions are created on first use, one per name (e.g. "pages" and "images"), with the settings of that first
+    use. They belong to the event loop they were created on, so every run using the pool must run on that loop.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def get(self, name: str, limit: int = 100, limit_per_host: int = 0,
+            timeout: Optional[aiohttp.ClientTimeout] = None) -> aiohttp.ClientSession:
+        session = self._sessions.get(name)
+        if session is None or session.closed:
+            logger.debug(f"Opening the shared '{name}' session")
+            session = self._sessions[name] = _new_session(limit, limit_per_host, timeout)
+        return session
+
+    async def close(self) -> None:
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+
+@asynccontextmanager
+async def open_session(pool: Optional[SessionPool], name: str, limit: int = 100, limit_per_host: int = 0,
+                       timeout: Optional[aiohttp.ClientTimeout] = None) -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Yields the pool's session of that name, which stays open, or without a pool a new session closed on exit.
+
+    Parameters:
+    pool (Optional[SessionPool]): The pool of a long-running process, None for a single run.
+    name (str): The name the session is shared under.
+    limit (int): The connections allowed in total.
+    limit_per_host (int): The connections allowed per host, 0 for no limit.
+    timeout (Optional[aiohttp.ClientTimeout]): The session timeouts, aiohttp's default if None.
+    """
+    if pool is not None:
+        yield pool.get(name, limit, limit_per_host, timeout)
+        return
+    async with _new_session(limit, limit_per_host, timeout) as session:
+        yield session
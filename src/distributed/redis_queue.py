@@ -0,0 +1,164 @@
+import logging
+import time
+import uuid
+from typing import Iterable, List
+
+from src.commons.models.lease import Lease
+from src.distributed.work_queue import DEFAULT_MAX_ATTEMPTS, DEFAULT_VISIBILITY_TIMEOUT, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+# Every queue uses these keys under "<prefix>:<queue>:": "ready" is a sorted set of payloads scored by the time
+# they become visible, "attempts" and "tokens" are hashes by payload, "done" and "dead" are sets. The scripts keep
+# every state change atomic, so any number of workers on any number of hosts can share the queue.
+
+_PUT = """
+local added = 0
+for i = 2, #ARGV do
+    if redis.call('SISMEMBER', KEYS[2], ARGV[i]) == 0 and redis.call('SISMEMBER', KEYS[3], ARGV[i]) == 0 then
+        added = added + redis.call('ZADD', KEYS[1], 'NX', ARGV[1], ARGV[i])
+    end
+end
+return added
+"""
+
+_LEASE = """
+local now, count, timeout, max_attempts = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local leased = {}
+while #leased < 2 * count do
+    local payloads = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, count)
+    if #payloads == 0 then
+        break
+    end
+    for _, payload in ipairs(payloads) do
+        local attempts = tonumber(redis.call('HGET', KEYS[2], payload) or '0')
+        if attempts >= max_attempts then
+            redis.call('ZREM', KEYS[1], payload)
+            redis.call('HDEL', KEYS[2], payload)
+            redis.call('HDEL', KEYS[3], payload)
+            redis.call('SADD', KEYS[4], payload)
+        elseif #leased < 2 * count then
+            attempts = redis.call('HINCRBY', KEYS[2], payload, 1)
+            redis.call('ZADD', KEYS[1], now + timeout, payload)
+            redis.call('HSET', KEYS[3], payload, ARGV[5])
+            table.insert(leased, payload)
+            table.insert(leased, attempts)
+        end
+    end
+end
+return leased
+"""
+
+_ACK = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('SADD', KEYS[4], ARGV[1])
+return 1
+"""
+
+_RELEASE = """
+if redis.call('HGET', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+if tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or '0') >= tonumber(ARGV[4]) then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[3], ARGV[1])
+    redis.call('SADD', KEYS[4], ARGV[1])
+else
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+end
+return 1
+"""
+
+_PENDING = """
+local total = redis.call('ZCARD', KEYS[1])
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, payload in ipairs(expired) do
+    if tonumber(redis.call('HGET', KEYS[2], payload) or '0') >= tonumber(ARGV[2]) then
+        total = total - 1
+    end
+end
+return total
+"""
+
+
+class RedisWorkQueue(WorkQueue):
+    """
+    A work queue in Redis, shared by workers on any number of hosts. Leases are timed with each client's clock,
+    so hosts should be kept in sync (e.g. NTP) within a small fraction of the visibility timeout.
+    """
+
+    def __init__(self, url: str, prefix: str = "adaptive_shield:queue", max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 client=None, clock=time.time):
+        """
+        Initializes the RedisWorkQueue.
+
+        Parameters:
+        url (str): The Redis URL, e.g. "redis://localhost:6379/0".
+        prefix (str): The prefix of every key of the queues.
+        max_attempts (int): The number of leases after which a task is dead.
+        client (Optional[redis.Redis]): An existing client to use instead of connecting to url.
+        clock (Callable[[], float]): The time source, in seconds.
+        """
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self._client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._put = client.register_script(_PUT)
+        self._lease = client.register_script(_LEASE)
+        self._ack = client.register_script(_ACK)
+        self._release = client.register_script(_RELEASE)
+        self._pending = client.register_script(_PENDING)
+
+    def _key(self, queue: str, name: str) -> str:
+        return f"{self.prefix}:{queue}:{name}"
+
+    def put(self, queue: str, payloads: Iterable[str]) -> int:
+        payloads = list(payloads)
+        if not payloads:
+            return 0
+        keys = [self._key(queue, "ready"), self._key(queue, "done"), self._key(queue, "dead")]
+        return int(self._put(keys=keys, args=[self._clock(), *payloads]))
+
+    def lease(self, queue: str, count: int = 1, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> List[Lease]:
+        # Leased payloads must leave the visible range, or the script would hand them out twice
+        if visibility_timeout <= 0:
+            raise ValueError(f"visibility_timeout must be positive, got {visibility_timeout}")
+        token = uuid.uuid4().hex
+        keys = [self._key(queue, "ready"), self._key(queue, "attempts"), self._key(queue, "tokens"),
+                self._key(queue, "dead")]
+        result = self._lease(keys=keys, args=[self._clock(), count, visibility_timeout, self.max_attempts, token])
+        return [Lease(queue=queue, payload=result[i], attempts=int(result[i + 1]), token=token)
+                for i in range(0, len(result), 2)]
+
+    def ack(self, lease: Lease) -> bool:
+        keys = [self._key(lease.queue, "ready"), self._key(lease.queue, "tokens"),
+                self._key(lease.queue, "attempts"), self._key(lease.queue, "done")]
+        acked = bool(self._ack(keys=keys, args=[lease.payload, lease.token]))
+        if not acked:
+            logger.warning("Lease of %s expired before it was acked", lease.payload)
+        return acked
+
+    def release(self, lease: Lease, delay: float = 0.0) -> None:
+        keys = [self._key(lease.queue, "ready"), self._key(lease.queue, "tokens"),
+                self._key(lease.queue, "attempts"), self._key(lease.queue, "dead")]
+        self._release(keys=keys, args=[lease.payload, lease.token, self._clock() + delay, self.max_attempts])
+
+    def pending(self, queue: str) -> int:
+        keys = [self._key(queue, "ready"), self._key(queue, "attempts")]
+        return int(self._pending(keys=keys, args=[self._clock(), self.max_attempts]))
+
+    def purge(self, queue: str) -> None:
+        self._client.delete(self._key(queue, "done"), self._key(queue, "dead"))
+
+    def close(self) -> None:
+        self._client.close()
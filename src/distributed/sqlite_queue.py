@@ -0,0 +1,124 @@
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from typing import Iterable, List
+
+from src.commons.models.lease import Lease
+from src.distributed.work_queue import DEFAULT_MAX_ATTEMPTS, DEFAULT_VISIBILITY_TIMEOUT, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    queue TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',
+    visible_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    token TEXT,
+    PRIMARY KEY (queue, payload)
+);
+CREATE INDEX IF NOT EXISTS tasks_visible ON tasks (queue, status, visible_at);
+"""
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """
+    A work queue in a SQLite file, shared by the processes of one host (or hosts sharing a local file system).
+
+    Leases are taken in IMMEDIATE transactions, so concurrent workers never get the same task; the database runs
+    in WAL mode so readers do not block the writer.
+    """
+
+    def __init__(self, path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS, clock=time.time):
+        """
+        Initializes the SQLiteWorkQueue, creating the database if missing.
+
+        Parameters:
+        path (str): The database file.
+        max_attempts (int): The number of leases after which a task is dead.
+        clock (Callable[[], float]): The time source, in seconds.
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.max_attempts = max_attempts
+        self._clock = clock
+        # Transactions are managed explicitly below
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def put(self, queue: str, payloads: Iterable[str]) -> int:
+        now = self._clock()
+        with self._transaction():
+            cursor = self._connection.executemany(
+                "INSERT OR IGNORE INTO tasks (queue, payload, visible_at) VALUES (?, ?, ?)",
+                ((queue, payload, now) for payload in payloads))
+        return cursor.rowcount
+
+    def lease(self, queue: str, count: int = 1, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> List[Lease]:
+        now = self._clock()
+        token = uuid.uuid4().hex
+        with self._transaction():
+            # Expired leases of tasks out of attempts are not handed out again
+            self._connection.execute(
+                "UPDATE tasks SET status = 'dead', token = NULL "
+                "WHERE queue = ? AND status = 'ready' AND visible_at <= ? AND attempts >= ?",
+                (queue, now, self.max_attempts))
+            rows = self._connection.execute(
+                "SELECT payload, attempts FROM tasks WHERE queue = ? AND status = 'ready' AND visible_at <= ? "
+                "ORDER BY visible_at LIMIT ?", (queue, now, count)).fetchall()
+            self._connection.executemany(
+                "UPDATE tasks SET visible_at = ?, attempts = attempts + 1, token = ? WHERE queue = ? AND payload = ?",
+                ((now + visibility_timeout, token, queue, payload) for payload, _ in rows))
+        return [Lease(queue=queue, payload=payload, attempts=attempts + 1, token=token) for payload, attempts in rows]
+
+    def ack(self, lease: Lease) -> bool:
+        with self._transaction():
+            cursor = self._connection.execute(
+                "UPDATE tasks SET status = 'done', token = NULL WHERE queue = ? AND payload = ? AND token = ?",
+                (lease.queue, lease.payload, lease.token))
+        if not cursor.rowcount:
+            logger.warning("Lease of %s expired before it was acked", lease.payload)
+        return bool(cursor.rowcount)
+
+    def release(self, lease: Lease, delay: float = 0.0) -> None:
+        with self._transaction():
+            self._connection.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'ready' END, visible_at = ?, "
+                "token = NULL WHERE queue = ? AND payload = ? AND token = ?",
+                (self.max_attempts, self._clock() + delay, lease.queue, lease.payload, lease.token))
+
+    def pending(self, queue: str) -> int:
+        now = self._clock()
+        (count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM tasks WHERE queue = ? AND status = 'ready' "
+            "AND NOT (visible_at <= ? AND attempts >= ?)", (queue, now, self.max_attempts)).fetchone()
+        return count
+
+    def purge(self, queue: str) -> None:
+        with self._transaction():
+            # Ready and leased tasks (status 'ready', leased ones with a token) are kept
+            self._connection.execute("DELETE FROM tasks WHERE queue = ? AND status IN ('done', 'dead') "
+                                     "AND token IS NULL", (queue,))
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+
+class _Transaction:
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def __enter__(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
@@ -0,0 +1,123 @@
+from typing import Iterable, List
+
+from src.commons.exceptions.exception import WorkQueueError
+from src.commons.models.lease import Lease
+
+# The queues of a distributed run: article URLs to resolve into image links, then image URLs to download
+ARTICLES = "articles"
+IMAGES = "images"
+
+DEFAULT_VISIBILITY_TIMEOUT = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class WorkQueue:
+    """
+    Abstract base class for work queues shared by a coordinator and any number of workers.
+
+    A task is a payload string, unique per queue: putting a payload that is pending or finished again is a no-op,
+    so links found on several articles are processed once. A lease hides a task from other workers for its
+    visibility timeout; if the worker does not ack it in time (e.g. it crashed), the task becomes visible again.
+    A task released or expired max_attempts times is dead and not handed out anymore.
+    """
+
+    def put(self, queue: str, payloads: Iterable[str]) -> int:
+        """
+        Enqueues tasks, skipping payloads the queue already holds.
+
+        Parameters:
+        queue (str): The queue name.
+        payloads (Iterable[str]): The task payloads.
+
+        Returns:
+        int: The number of tasks added.
+        """
+        raise NotImplementedError("put method not implemented")
+
+    def lease(self, queue: str, count: int = 1, visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT) -> List[Lease]:
+        """
+        Hands out up to count visible tasks, hiding them from other workers for visibility_timeout seconds.
+
+        Parameters:
+        queue (str): The queue name.
+        count (int): The maximum number of tasks.
+        visibility_timeout (float): The seconds the worker has to ack the tasks.
+
+        Returns:
+        List[Lease]: The leased tasks, oldest first; empty if none is visible.
+        """
+        raise NotImplementedError("lease method not implemented")
+
+    def ack(self, lease: Lease) -> bool:
+        """
+        Marks a leased task as finished.
+
+        Parameters:
+        lease (Lease): The lease.
+
+        Returns:
+        bool: False if the lease had expired and the task was handed to someone else in the meantime.
+        """
+        raise NotImplementedError("ack method not implemented")
+
+    def release(self, lease: Lease, delay: float = 0.0) -> None:
+        """
+        Gives a leased task back after a failure, to be retried after delay seconds unless it ran out of attempts.
+
+        Parameters:
+        lease (Lease): The lease.
+        delay (float): The seconds before the task is visible again.
+        """
+        raise NotImplementedError("release method not implemented")
+
+    def pending(self, queue: str) -> int:
+        """
+        Counts the tasks that are neither finished nor dead, including leased ones.
+
+        Parameters:
+        queue (str): The queue name.
+
+        Returns:
+        int: The number of unfinished tasks.
+        """
+        raise NotImplementedError("pending method not implemented")
+
+    def purge(self, queue: str) -> None:
+        """
+        Forgets finished and dead tasks, so their payloads can be enqueued again, e.g. by the next crawl. Ready and
+        leased tasks are kept, so a lease taken before the purge can still be acked.
+
+        Parameters:
+        queue (str): The queue name.
+        """
+        raise NotImplementedError("purge method not implemented")
+
+    def close(self) -> None:
+        pass
+
+
+def create_work_queue(url: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> WorkQueue:
+    """
+    Opens the work queue a URL points at.
+
+    Parameters:
+    url (str): "redis://host:port/db" for Redis, "sqlite:///path/to/queue.db" or a plain file path for SQLite.
+    max_attempts (int): The number of leases after which a task is dead.
+
+    Returns:
+    WorkQueue: The queue.
+
+    Raises:
+    WorkQueueError: If the URL scheme is not supported.
+    """
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        from src.distributed.redis_queue import RedisWorkQueue
+
+        return RedisWorkQueue(url, max_attempts=max_attempts)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    elif "://" in url:
+        raise WorkQueueError("Unsupported work queue URL, expected redis:// or sqlite:///", url)
+    from src.distributed.sqlite_queue import SQLiteWorkQueue
+
+    return SQLiteWorkQueue(url, max_attempts=max_attempts)
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from src.commons.exceptions.exception import ImageDataLoaderException, ImageRejectedError
+from src.commons.models.lease import Lease
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.data_fetchers.image_link_source import ImageLinkSource
+from src.data_fetchers.request_policy import session_timeout
+from src.distributed.work_queue import ARTICLES, DEFAULT_VISIBILITY_TIMEOUT, IMAGES, WorkQueue
+from src.storage.image_saver import ImageSaver
+from src.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Coordinator:
+    """
+    A class to start a distributed crawl: it enqueues the article URLs of the processed tables for the workers.
+    """
+
+    def __init__(self, queue: WorkQueue):
+        self.queue = queue
+
+    def enqueue_articles(self, urls: List[str], fresh: bool = True) -> int:
+        """
+        Enqueues article URLs.
+
+        Parameters:
+        urls (List[str]): The article URLs.
+        fresh (bool): Forget the articles and images finished by earlier crawls first, so they are fetched again.
+
+        Returns:
+        int: The number of articles enqueued; URLs already pending are skipped.
+        """
+        if fresh:
+            self.queue.purge(ARTICLES)
+            self.queue.purge(IMAGES)
+        added = self.queue.put(ARTICLES, urls)
+        metrics.count("queue_tasks_total", added, queue=ARTICLES, event="enqueued")
+        logger.info("Enqueued %d of %d article URLs", added, len(urls))
+        return added
+
+
+class Worker:
+    """
+    A class to process the tasks of a distributed crawl. Any number of workers, on any number of hosts, can share
+    a queue: each one leases article URLs, resolves them into image URLs which it enqueues, and leases image URLs,
+    which it downloads and saves.
+
+    Saves are idempotent: an image is stored under a name derived from its URL, so a task handed out again after
+    an expired lease overwrites the same object with the same bytes.
+    """
+
+    def __init__(self, queue: WorkQueue, link_source: ImageLinkSource, saver: ImageSaver, batch_size: int = 20,
+                 visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT, retry_delay: float = 5.0,
+                 poll_interval: float = 1.0, data_loader: Optional[ImageDataLoader] = None):
+        """
+        Initializes the Worker.
+
+        Parameters:
+        queue (WorkQueue): The shared queue.
+        link_source (ImageLinkSource): The backend resolving article URLs into image URLs.
+        saver (ImageSaver): The saving strategy to use.
+        batch_size (int): The number of tasks leased at once from each queue.
+        visibility_timeout (float): The seconds a batch may take before its tasks are handed to another worker.
+        retry_delay (float): The seconds before a failed task is retried.
+        poll_interval (float): The seconds to wait when both queues are empty.
+        data_loader (Optional[ImageDataLoader]): The loader fetching image bodies, e.g. one with ImageGuards.
+        """
+        self.queue = queue
+        self._link_source = link_source
+        self._saver = saver
+        self._data_loader = data_loader or ImageDataLoader()
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.processed: Dict[str, int] = {ARTICLES: 0, IMAGES: 0}
+
+    async def run(self, idle_timeout: float = 0.0) -> Dict[str, int]:
+        """
+        Processes tasks until no task is left and none arrived for idle_timeout seconds.
+
+        Parameters:
+        idle_timeout (float): The seconds to keep polling once the queues are drained, e.g. while a coordinator
+            on another host is still enqueueing.
+
+        Returns:
+        Dict[str, int]: The number of tasks this worker finished, per queue.
+        """
+        connector = aiohttp.TCPConnector(limit_per_host=10)
+        idle_since = None
+        async with aiohttp.ClientSession(connector=connector,
+                                         timeout=session_timeout(self._data_loader.policy)) as session:
+            while True:
+                articles = self.queue.lease(ARTICLES, self.batch_size, self.visibility_timeout)
+                if articles:
+                    await self.process_articles(articles)
+                images = self.queue.lease(IMAGES, self.batch_size, self.visibility_timeout)
+                if images:
+                    await self.process_images(session, images)
+                if articles or images:
+                    idle_since = None
+                    continue
+
+                # Tasks leased by other workers come back if those workers die, so wait for them as well
+                if self.queue.pending(ARTICLES) or self.queue.pending(IMAGES):
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = time.monotonic()
+                if idle_since is not None and time.monotonic() - idle_since >= idle_timeout:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        logger.info(f"Worker finished {self.processed[ARTICLES]} articles and {self.processed[IMAGES]} images")
+        return self.processed
+
+    async def process_articles(self, leases: List[Lease]) -> None:
+        """
+        Resolves leased article URLs into image URLs and enqueues them.
+
+        Parameters:
+        leases (List[Lease]): The leased article tasks.
+        """
+        links_by_page = await self._link_source.load_image_links_by_page([lease.payload for lease in leases])
+        for lease in leases:
+            if lease.payload not in links_by_page:
+                self._failed(lease)
+                continue
+            # Images go in before the article is acked, so a crash in between only repeats the article
+            added = self.queue.put(IMAGES, links_by_page[lease.payload])
+            metrics.count("queue_tasks_total", added, queue=IMAGES, event="enqueued")
+            self._finished(lease)
+
+    async def process_images(self, session: aiohttp.ClientSession, leases: List[Lease]) -> None:
+        """
+        Downloads and saves leased image URLs.
+
+        Parameters:
+        session (ClientSession): The aiohttp client session.
+        leases (List[Lease]): The leased image tasks.
+        """
+        results = await asyncio.gather(*[self.process_image(session, lease) for lease in leases],
+                                       return_exceptions=True)
+        # One broken task must not abort the batch, or its other leases would wait for the visibility timeout
+        for lease, result in zip(leases, results):
+            if isinstance(result, Exception):
+                logger.error("Task %s of %s raised: %s", lease.payload, lease.queue, result)
+                self._failed(lease)
+            elif isinstance(result, BaseException):
+                raise result
+
+    async def process_image(self, session: aiohttp.ClientSession, lease: Lease) -> None:
+        try:
+            image_data = await self._data_loader.fetch_image_data(session, lease.payload)
+        except ImageRejectedError:
+            # Retrying would fetch the same unwanted content again
+            self._finished(lease)
+            return
+        except ImageDataLoaderException:
+            self._failed(lease)
+            return
+        if image_data.name and image_data.data:
+            try:
+                await self._saver.save_image(image_data)
+            except Exception:
+                # Already logged by the saver; the image is retried rather than acked and lost
+                self._failed(lease)
+                return
+        self._finished(lease)
+
+    def _finished(self, lease: Lease) -> None:
+        if self.queue.ack(lease):
+            self.processed[lease.queue] += 1
+            metrics.count("queue_tasks_total", queue=lease.queue, event="acked")
+
+    def _failed(self, lease: Lease) -> None:
+        logger.warning("Task %s of %s failed (attempt %d)", lease.payload, lease.queue, lease.attempts)
+        metrics.count("queue_tasks_total", queue=lease.queue, event="failed")
+        self.queue.release(lease, delay=self.retry_delay)
@@ -1,19 +1,391 @@
+import argparse
 import logging
-from src.manager.workflow_manager import WorkflowManager
-from src.utils.logging_config import setup_logging
+import os
+import tempfile
+from contextlib import ExitStack
+from typing import Callable, List, Optional
+
 from dotenv import load_dotenv
 
+from src.commons.models.workflow_options import WorkflowOptions
+from src.utils.logging_config import setup_logging
+
+# Heavy backends (bs4, aiohttp, minio, the replay transport, exporters, the profiler) are imported inside
+# main() only when the selected options need them, which keeps `--help` and short jobs fast to start.
 
-setup_logging()
 logger = logging.getLogger(__name__)
 
+DEFAULT_URL = "https://en.wikipedia.org/wiki/List_of_animal_names"
+DEFAULT_BASE_URL = "https://en.wikipedia.org"
+DAEMON_TABLE_CACHE = os.path.join(tempfile.gettempdir(), "adaptive_shield_tables")
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+def _byte_rate(value: str) -> float:
+    """Parses a rate in bytes per second, with an optional K, M or G suffix (powers of 1024)."""
+    multiplier = 1024 ** ("KMG".index(value[-1].upper()) + 1) if value and value[-1].upper() in "KMG" else 1
+    try:
+        return float(value[:-1] if multiplier > 1 else value) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid byte rate '{value}', expected e.g. 500K or 2M")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parses the command line. Defaults come from the environment (and config/.env) where one exists.
+    """
+    arg_parser = argparse.ArgumentParser(description="Scrape the animal names table and download animal images.")
+    arg_parser.add_argument("--url", default=os.getenv("SCRAPE_URL", DEFAULT_URL), help="The list page to scrape")
+    arg_parser.add_argument("--base-url", default=os.getenv("BASE_URL", DEFAULT_BASE_URL),
+                            help="The base URL article links are resolved against")
+    arg_parser.add_argument("--link-source", choices=("html", "mediawiki"), default=os.getenv("LINK_SOURCE", "html"),
+                            help="How image links are found: scrape article HTML or query the MediaWiki API")
+    arg_parser.add_argument("--concurrency", type=int, default=int(os.getenv("MAX_CONCURRENT_REQUESTS", "100")),
+                            help="Maximum number of concurrent requests")
+    arg_parser.add_argument("--pipeline", default=os.getenv("PIPELINE"),
+                            help="YAML or JSON table pipeline spec, e.g. config/pipeline.yaml (default: built-in recipe)")
+    arg_parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", "1")),
+                            help="Processes used to extract and transform tables in parallel, 0 for one per CPU")
+    arg_parser.add_argument("--image-policy", choices=("all", "lead", "top-k"),
+                            default=os.getenv("IMAGE_POLICY", "all"),
+                            help="Images downloaded per article: all, the lead (infobox) image, or the --image-top-k "
+                                 "largest")
+    arg_parser.add_argument("--image-top-k", type=int, default=int(os.getenv("IMAGE_TOP_K", "1")),
+                            help="Images kept per article by --image-policy top-k")
+    arg_parser.add_argument("--min-image-px", type=int, default=int(os.getenv("MIN_IMAGE_PX", "0")),
+                            help="Skip images rendered narrower or shorter than this many pixels")
+    arg_parser.add_argument("--max-image-mb", type=float, default=float(os.getenv("MAX_IMAGE_MB", "20")),
+                            help="Abort image downloads larger than this many MB, 0 for no limit")
+    arg_parser.add_argument("--image-types",
+                            default=os.getenv("IMAGE_TYPES", "image/jpeg,image/png,image/gif,image/webp"),
+                            help="Comma-separated content types accepted for images, checked against headers and "
+                                 "magic bytes")
+    arg_parser.add_argument("--near-duplicates", metavar="DISTANCE", type=int,
+                            default=os.getenv("NEAR_DUPLICATE_DISTANCE"),
+                            help="Do not store images whose perceptual hash is within this many bits (of 64) of a "
+                                 "stored image's, e.g. 4 (needs Pillow)")
+    arg_parser.add_argument("--hash-algorithm", choices=("ahash", "dhash", "phash"),
+                            default=os.getenv("NEAR_DUPLICATE_HASH", "phash"),
+                            help="Perceptual hash used by --near-duplicates")
+    arg_parser.add_argument("--hash-workers", type=int, default=int(os.getenv("HASH_WORKERS", "0")),
+                            help="Processes hashing images for --near-duplicates, 0 for one per CPU")
+    arg_parser.add_argument("--no-image-guards", action="store_true", default=_env_flag("NO_IMAGE_GUARDS"),
+                            help="Read every 200 image response in full, without type and size checks")
+    arg_parser.add_argument("--resume-downloads", action="store_true", default=_env_flag("RESUME_DOWNLOADS"),
+                            help="Spool image bodies to disk and resume dropped transfers with Range requests")
+    arg_parser.add_argument("--spool-dir", default=os.getenv("SPOOL_DIR"),
+                            help="Keep partial downloads in this folder, so later runs resume them too (implies "
+                                 "--resume-downloads)")
+    arg_parser.add_argument("--download-retries", type=int, default=int(os.getenv("DOWNLOAD_RETRIES", "3")),
+                            help="Retries of an image transfer that stopped without receiving new bytes")
+    arg_parser.add_argument("--parallel-range-mb", type=float, default=_env_float("PARALLEL_RANGE_MB"),
+                            help="With --resume-downloads, fetch images of at least this many MB as concurrent "
+                                 "ranges")
+    arg_parser.add_argument("--connect-timeout", type=float, default=float(os.getenv("CONNECT_TIMEOUT", "10")),
+                            help="Seconds allowed to connect to a host, 0 for no limit")
+    arg_parser.add_argument("--read-timeout", type=float, default=float(os.getenv("READ_TIMEOUT", "30")),
+                            help="Seconds allowed between two reads of a response, 0 for no limit")
+    arg_parser.add_argument("--request-timeout", type=float, default=float(os.getenv("REQUEST_TIMEOUT", "300")),
+                            help="Seconds allowed for a whole request, 0 for no limit")
+    arg_parser.add_argument("--run-deadline", type=float, default=_env_float("RUN_DEADLINE"),
+                            help="Seconds the image downloads may take; unfinished downloads are cancelled then")
+    arg_parser.add_argument("--hedge-quantile", type=float, default=_env_float("HEDGE_QUANTILE"),
+                            help="Send a duplicate of requests slower than this latency quantile, e.g. 0.95")
+    arg_parser.add_argument("--breaker-failures", type=int, default=int(os.getenv("BREAKER_FAILURES", "5")),
+                            help="Failures in a row after which a host gets no requests for a while, 0 to disable")
+    arg_parser.add_argument("--breaker-reset", type=float, default=float(os.getenv("BREAKER_RESET", "30")),
+                            help="Seconds before a host whose circuit opened is probed again")
+    arg_parser.add_argument("--download-rate", type=_byte_rate, default=os.getenv("DOWNLOAD_RATE"),
+                            help="Bytes per second shared by all page and image downloads, e.g. 2M")
+    arg_parser.add_argument("--upload-rate", type=_byte_rate, default=os.getenv("UPLOAD_RATE"),
+                            help="Bytes per second shared by all MinIO uploads, e.g. 500K")
+    arg_parser.add_argument("--time-budget", type=float, default=_env_float("TIME_BUDGET"),
+                            help="Seconds after which no new image download starts; first images of every article "
+                                 "go first")
+    arg_parser.add_argument("--drain-timeout", type=float, default=float(os.getenv("DRAIN_TIMEOUT", "10")),
+                            help="Seconds downloads in flight may still take once the time budget is spent")
+    arg_parser.add_argument("--failed-log", default=os.getenv("FAILED_LOG"),
+                            help="JSON file of image URLs that failed, downloaded after the others on the next run")
+    arg_parser.add_argument("--output", choices=("s3", "fs"),
+                            default=os.getenv("OUTPUT", "fs" if os.getenv("OUTPUT_DIR") else "s3"),
+                            help="Save images to MinIO/S3 or to the local file system")
+    arg_parser.add_argument("--output-dir", default=os.getenv("OUTPUT_DIR", "images"),
+                            help="Destination folder when --output is fs")
+    arg_parser.add_argument("--bucket", default=os.getenv("MINIO_BUCKET", "images"),
+                            help="Destination bucket when --output is s3")
+
+    arg_parser.add_argument("--table-output", default=os.getenv("TABLE_OUTPUT"),
+                            help="Export the processed tables to this file (.csv, .jsonl or .parquet, optionally .gz)")
+    arg_parser.add_argument("--table-format", choices=("csv", "jsonl", "parquet"),
+                            help="Export format, inferred from --table-output when omitted")
+    arg_parser.add_argument("--catalog", default=os.getenv("IMAGE_CATALOG"),
+                            help="Record which image was stored for which table row in this SQLite file")
+    arg_parser.add_argument("--catalog-parquet", default=os.getenv("IMAGE_CATALOG_PARQUET"),
+                            help="Export the catalog to this Parquet file after every run (needs pyarrow)")
+    arg_parser.add_argument("--find", metavar="COLUMN=VALUE",
+                            help="Print the catalogued images of the rows with this cell value as JSON lines and exit, "
+                                 "e.g. animal=fox or sha256=<hex>")
+
+    arg_parser.add_argument("--table-cache", default=os.getenv("TABLE_CACHE"),
+                            help="Cache processed tables in this folder, keyed by page revision and pipeline")
+    arg_parser.add_argument("--table-cache-size", type=float, default=float(os.getenv("TABLE_CACHE_SIZE_MB", "64")),
+                            help="Maximum size of the table cache in MB; least recently used entries are evicted")
+    arg_parser.add_argument("--skip-unchanged", action="store_true", default=_env_flag("SKIP_UNCHANGED"),
+                            help="Do nothing when the page revision was already processed")
+    arg_parser.add_argument("--invalidate-cache", action="store_true",
+                            help="Drop the cached tables of --url before running")
+
+    arg_parser.add_argument("--incremental", default=os.getenv("INCREMENTAL_INDEX"),
+                            help="Keep a row index in this file and only download images of rows changed since the "
+                                 "last run")
+    arg_parser.add_argument("--gc-removed", action="store_true", default=_env_flag("GC_REMOVED"),
+                            help="With --incremental, delete saved images of rows removed from the table")
+
+    arg_parser.add_argument("--dedup-urls", action="store_true", default=_env_flag("DEDUP_URLS"),
+                            help="Skip article and image URLs already seen in this run, using a Bloom filter")
+    arg_parser.add_argument("--seen-urls", default=os.getenv("SEEN_URLS_DIR"),
+                            help="Persist the seen URLs in this folder, so later runs skip them too (implies "
+                                 "--dedup-urls)")
+    arg_parser.add_argument("--dedup-error-rate", type=float, default=_env_float("DEDUP_ERROR_RATE") or 0.001,
+                            help="Share of new URLs the Bloom filter may wrongly skip")
+
+    arg_parser.add_argument("--queue", default=os.getenv("WORK_QUEUE"),
+                            help="Hand article and image URLs to workers through this queue (redis://host:port/db or "
+                                 "sqlite:///path) instead of downloading them")
+    arg_parser.add_argument("--worker", action="store_true",
+                            help="Process tasks from --queue instead of scraping --url")
+    arg_parser.add_argument("--idle-timeout", type=float, default=float(os.getenv("WORKER_IDLE_TIMEOUT", "30")),
+                            help="Seconds a worker keeps polling a drained queue before it exits")
+    arg_parser.add_argument("--queue-batch", type=int, default=20, help="Tasks a worker leases at once")
+    arg_parser.add_argument("--visibility-timeout", type=float, default=60.0,
+                            help="Seconds before tasks leased by an unresponsive worker are handed out again")
+
+    arg_parser.add_argument("--daemon", action="store_true", default=_env_flag("DAEMON"),
+                            help="Stay resident and refresh on a schedule or on POST /refresh, reusing connections, "
+                                 "the saver and the table cache")
+    arg_parser.add_argument("--refresh-interval", type=float, default=_env_float("REFRESH_INTERVAL"),
+                            help="With --daemon, seconds between scheduled refreshes; by default only triggers refresh")
+    arg_parser.add_argument("--daemon-port", type=int, default=int(os.getenv("DAEMON_PORT", "8080")),
+                            help="With --daemon, the port of /healthz, /metrics and POST /refresh")
+    arg_parser.add_argument("--daemon-host", default=os.getenv("DAEMON_HOST", "127.0.0.1"),
+                            help="With --daemon, the interface to bind, e.g. 0.0.0.0 to serve other hosts")
+
+    replay = arg_parser.add_mutually_exclusive_group()
+    replay.add_argument("--record", default=os.getenv("HTTP_RECORD"), help="Record all HTTP responses to this archive")
+    replay.add_argument("--replay", default=os.getenv("HTTP_REPLAY"), help="Serve HTTP responses from this archive")
+    arg_parser.add_argument("--replay-latency", type=float, default=_env_float("HTTP_REPLAY_LATENCY") or 0.0,
+                            help="Seconds of latency injected per replayed request")
+    arg_parser.add_argument("--replay-bandwidth", type=float, default=_env_float("HTTP_REPLAY_BANDWIDTH"),
+                            help="Bytes per second used to delay replayed bodies")
+
+    arg_parser.add_argument("--metrics-file", default=os.getenv("METRICS_FILE"),
+                            help="Write Prometheus text metrics to this file at the end of the run")
+    arg_parser.add_argument("--metrics-port", type=int, default=int(os.getenv("METRICS_PORT", "0")) or None,
+                            help="Serve Prometheus metrics on this port while running")
+    arg_parser.add_argument("--trace-file", default=os.getenv("TRACE_FILE"),
+                            help="Append the run's spans to this file in OTLP/JSON format")
+
+    arg_parser.add_argument("--log-async", action="store_true", default=_env_flag("LOG_ASYNC"),
+                            help="Write logs from a background thread instead of the calling thread")
+    arg_parser.add_argument("--log-json", action="store_true", default=_env_flag("LOG_JSON"),
+                            help="Write logs as JSON lines")
+    arg_parser.add_argument("--log-rate", type=float, default=_env_float("LOG_RATE"),
+                            help="Messages per second allowed for each log message template")
+    arg_parser.add_argument("--log-burst", type=int, default=20,
+                            help="Messages allowed per template before --log-rate applies")
+
+    arg_parser.add_argument("--profile", action="store_true",
+                            help="Profile the run and write a hot-path report and collapsed stacks")
+    arg_parser.add_argument("--profile-output", default="profile", help="Path prefix of the profile report files")
+    arg_parser.add_argument("--profile-top", type=int, default=25, help="Number of hot functions to report")
+    arg_parser.add_argument("--profile-interval", type=float, default=0.005, help="Seconds between stack samples")
+    arg_parser.add_argument("--slow-callback", type=float, default=0.05,
+                            help="Report event loop callbacks blocking longer than this many seconds")
+    arg_parser.add_argument("--memory-report", default=os.getenv("MEMORY_REPORT"),
+                            help="Trace allocations and write the memory of every pipeline stage to this JSON file")
+    arg_parser.add_argument("--memory-top", type=int, default=10,
+                            help="Allocation sites reported per stage and as leak suspects, 0 for byte counts only")
+    arg_parser.add_argument("--memory-frames", type=int, default=1,
+                            help="Stack frames recorded per allocation; more attribute it better, at a higher cost")
+    args = arg_parser.parse_args(argv)
+    if args.worker and not args.queue:
+        arg_parser.error("--worker needs --queue (or WORK_QUEUE)")
+    if args.find and not args.catalog:
+        arg_parser.error("--find needs --catalog (or IMAGE_CATALOG)")
+    if args.find and "=" not in args.find:
+        arg_parser.error("--find expects COLUMN=VALUE")
+    if args.near_duplicates is not None and not 0 <= args.near_duplicates < 64:
+        arg_parser.error("--near-duplicates expects a distance between 0 and 63 bits")
+    if args.daemon and args.worker:
+        arg_parser.error("--daemon and --worker cannot be combined")
+    if args.daemon and not args.table_cache:
+        # Refreshes of an unchanged page then skip parsing and table processing
+        args.table_cache = DAEMON_TABLE_CACHE
+    return args
+
 
-def main():
+def build_options(args: argparse.Namespace) -> WorkflowOptions:
+    return WorkflowOptions(
+        link_source=args.link_source,
+        max_concurrent_requests=args.concurrency,
+        workers=args.workers or os.cpu_count() or 1,
+        pipeline=args.pipeline,
+        table_cache=args.table_cache,
+        table_cache_max_bytes=int(args.table_cache_size * 1024 * 1024),
+        skip_unchanged=args.skip_unchanged,
+        incremental=args.incremental,
+        gc_removed=args.gc_removed,
+        dedup_urls=args.dedup_urls,
+        seen_urls_dir=args.seen_urls,
+        dedup_error_rate=args.dedup_error_rate,
+        queue=args.queue,
+        image_policy=args.image_policy,
+        image_top_k=args.image_top_k,
+        min_image_px=args.min_image_px,
+        image_guards=not args.no_image_guards,
+        max_image_bytes=int(args.max_image_mb * 1024 * 1024) or None,
+        image_types=tuple(image_type.strip() for image_type in args.image_types.split(",") if image_type.strip()),
+        resume_downloads=args.resume_downloads,
+        spool_dir=args.spool_dir,
+        download_retries=args.download_retries,
+        parallel_range_bytes=int(args.parallel_range_mb * 1024 * 1024) if args.parallel_range_mb else None,
+        connect_timeout=args.connect_timeout or None,
+        read_timeout=args.read_timeout or None,
+        request_timeout=args.request_timeout or None,
+        run_deadline=args.run_deadline,
+        hedge_quantile=args.hedge_quantile,
+        breaker_failures=args.breaker_failures,
+        breaker_reset=args.breaker_reset,
+        download_rate=args.download_rate,
+        upload_rate=args.upload_rate,
+        time_budget=args.time_budget,
+        drain_timeout=args.drain_timeout,
+        failed_log=args.failed_log,
+        catalog=args.catalog,
+        catalog_parquet=args.catalog_parquet,
+        near_duplicate_distance=args.near_duplicates,
+        near_duplicate_hash=args.hash_algorithm,
+        hash_workers=args.hash_workers or None,
+        queue_batch_size=args.queue_batch,
+        visibility_timeout=args.visibility_timeout,
+        output=args.output,
+        output_dir=args.output_dir,
+        bucket_name=args.bucket,
+        table_output=args.table_output,
+        table_format=args.table_format,
+    )
+
+
+def run_workflow(manager, args: argparse.Namespace, after_refresh: Optional[Callable[[], None]] = None) -> None:
+    def refresh():
+        succeeded = manager.run()
+        if after_refresh:
+            after_refresh()
+        return succeeded
+
+    def run():
+        if args.worker:
+            manager.run_worker(args.idle_timeout)
+        elif args.daemon:
+            from src.manager.daemon import RefreshDaemon
+
+            RefreshDaemon(refresh, interval=args.refresh_interval, port=args.daemon_port,
+                          host=args.daemon_host).serve_forever()
+        else:
+            manager.run()
+
+    if args.record or args.replay:
+        from src.replay.http_replay import HttpReplay
+
+        with HttpReplay(args.record or args.replay, mode="record" if args.record else "replay",
+                        latency=args.replay_latency, bandwidth=args.replay_bandwidth):
+            run()
+    else:
+        run()
+
+
+def find_in_catalog(path: str, query: str) -> None:
+    import json
+    from dataclasses import asdict
+    from src.storage.image_catalog import ImageCatalog
+
+    column, value = query.split("=", 1)
+    catalog = ImageCatalog(path)
+    try:
+        entries = catalog.find_by_hash(value) if column == "sha256" else catalog.find(column, value)
+    finally:
+        catalog.close()
+    for entry in entries:
+        print(json.dumps(asdict(entry), ensure_ascii=False))
+
+
+def main(argv: Optional[List[str]] = None):
     load_dotenv()
-    url = "https://en.wikipedia.org/wiki/List_of_animal_names"
-    base_wikipedia = "https://en.wikipedia.org"
-    manager = WorkflowManager(url, base_wikipedia)
-    manager.run()
+    args = parse_args(argv)
+    setup_logging(async_logging=args.log_async, json_lines=args.log_json, rate_limit=args.log_rate,
+                  burst=args.log_burst)
+
+    if args.find:
+        find_in_catalog(args.catalog, args.find)
+        return
+
+    from src.manager.workflow_manager import WorkflowManager
+    from src.telemetry import metrics
+
+    runtime = None
+    if args.daemon:
+        from src.manager.daemon import WarmRuntime
+
+        runtime = WarmRuntime()
+    manager = WorkflowManager(args.url, args.base_url, options=build_options(args), runtime=runtime)
+    if args.invalidate_cache and args.table_cache:
+        manager.create_table_cache().invalidate(url=args.url)
+
+    telemetry = args.metrics_file or args.metrics_port or args.trace_file or args.daemon or args.memory_report
+    registry = metrics.enable() if telemetry else None
+    span_exporter = None
+    if registry:
+        from src.telemetry.exporters import OtlpJsonSpanExporter, PrometheusServer, write_prometheus_file
+
+        if args.trace_file:
+            span_exporter = OtlpJsonSpanExporter(args.trace_file)
+            registry.add_span_exporter(span_exporter)
+        if args.metrics_port:
+            PrometheusServer(registry, args.metrics_port).start()
+
+    def after_refresh():
+        # Called after every refresh of a daemon, so it does not hold everything until it stops, and at exit
+        if args.metrics_file:
+            write_prometheus_file(registry, args.metrics_file)
+        if span_exporter:
+            span_exporter.flush()
+
+    with ExitStack() as profilers:
+        if args.profile:
+            from src.utils.profiler import RunProfiler
+
+            profilers.enter_context(RunProfiler(args.profile_output, top=args.profile_top,
+                                                interval=args.profile_interval,
+                                                slow_callback_duration=args.slow_callback))
+        if args.memory_report:
+            from src.utils.memory_profiler import MemoryProfiler
+
+            profilers.enter_context(MemoryProfiler(args.memory_report, registry, top=args.memory_top,
+                                                   frames=args.memory_frames))
+        run_workflow(manager, args, after_refresh)
+
+    manager.close()
+    if runtime is not None:
+        runtime.close()
+    after_refresh()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+import asyncio
+import contextvars
+import json
+import logging
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+import requests
+
+from src.data_fetchers.session_pool import SessionPool
+from src.telemetry import metrics
+from src.telemetry.exporters import PROMETHEUS_CONTENT_TYPE, render_prometheus
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+
+class WarmRuntime:
+    """
+    A class holding what a resident process keeps warm between refreshes: an event loop running on a background
+    thread, the aiohttp sessions used on it and the requests session fetching the list page.
+
+    Every async stage of a refresh runs on the same loop, so the pooled connections (and their TLS sessions) are
+    reused instead of being opened again by each run.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.sessions = SessionPool()
+        self.http = requests.Session()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="warm-runtime", daemon=True)
+        self._thread.start()
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the runtime's loop and waits for its result, like asyncio.run.
+
+        The coroutine sees the caller's context variables, so its spans nest under the caller's span.
+        """
+        context = contextvars.copy_context()
+
+        async def in_caller_context():
+            return await self.loop.create_task(coroutine, context=context)
+
+        return asyncio.run_coroutine_threadsafe(in_caller_context(), self.loop).result()
+
+    def close(self) -> None:
+        self.run(self.sessions.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self.http.close()
+
+
+class RefreshDaemon:
+    """
+    A class to keep the scraper resident and run refreshes on a schedule or when triggered over HTTP.
+
+    Refreshes run one at a time on the calling thread. Triggers arriving during a refresh are coalesced into a
+    single follow-up refresh. A small HTTP server answers:
+    - GET /healthz: the refresh state as JSON, with status 503 while the last refresh failed
+    - GET /metrics: the Prometheus metrics of the process
+    - POST /refresh: schedules a refresh now (202)
+    """
+
+    def __init__(self, refresh: Callable[[], Optional[bool]], interval: Optional[float] = None,
+                 port: int = DEFAULT_PORT, host: str = DEFAULT_HOST):
+        """
+        Initializes the RefreshDaemon.
+
+        Parameters:
+        refresh (Callable[[], Optional[bool]]): Runs one refresh, e.g. WorkflowManager.run. A refresh fails when
+            it raises or returns False.
+        interval (Optional[float]): The seconds between the starts of scheduled refreshes, None to refresh only
+            at startup and when triggered.
+        port (int): The port of the health, metrics and trigger endpoints, 0 for any free port.
+        host (str): The interface to bind; POST /refresh is unauthenticated, so only the loopback one by default.
+        """
+        self.refresh = refresh
+        self.interval = interval
+        self.refreshes = 0
+        self.failures = 0
+        self.running = False
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._triggered = threading.Event()
+        self._stopped = threading.Event()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="daemon-http", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def health(self) -> dict:
+        return {
+            "status": "failing" if self.last_error else "ok",
+            "running": self.running,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_refresh_age": None if self.last_started is None else round(time.time() - self.last_started, 3),
+            "last_refresh_seconds": self.last_duration,
+            "last_error": self.last_error,
+        }
+
+    def trigger(self) -> None:
+        self._triggered.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._triggered.set()
+
+    def _handler(self):
+        daemon = self
+
+        class DaemonHandler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/healthz":
+                    health = daemon.health()
+                    self._reply(503 if health["last_error"] else 200, json.dumps(health).encode("utf-8"))
+                elif path == "/metrics":
+                    registry = metrics.get_registry()
+                    body = render_prometheus(registry) if registry is not None else ""
+                    self._reply(200, body.encode("utf-8"), PROMETHEUS_CONTENT_TYPE)
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path.split("?")[0] != "/refresh":
+                    self.send_error(404)
+                    return
+                daemon.trigger()
+                self._reply(202, json.dumps({"queued": True, "running": daemon.running}).encode("utf-8"))
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return DaemonHandler
+
+    def _run_refresh(self) -> None:
+        self.running = True
+        self.last_started = time.time()
+        started = time.monotonic()
+        try:
+            if self.refresh() is False:
+                self.last_error = "the refresh reported a failure, see the log"
+                self.failures += 1
+                outcome = "error"
+            else:
+                self.last_error = None
+                outcome = "ok"
+        except Exception as e:
+            logger.exception("Refresh failed")
+            self.last_error = str(e) or type(e).__name__
+            self.failures += 1
+            outcome = "error"
+        self.last_duration = round(time.monotonic() - started, 3)
+        self.refreshes += 1
+        metrics.observe("refresh_duration_seconds", self.last_duration)
+        metrics.count("refreshes_total", outcome=outcome)
+        self.running = False
+        logger.info("Refresh %d finished in %.2fs (%s)", self.refreshes, self.last_duration, outcome)
+
+    def serve_forever(self) -> None:
+        """
+        Serves the endpoints and runs a refresh at startup, then on every tick of the interval and every trigger,
+        until stop is called, SIGTERM is received or the process is interrupted.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        self._server_thread.start()
+        logger.info(f"Daemon listening on port {self.port}"
+                    + (f", refreshing every {self.interval:.0f}s" if self.interval else ""))
+        try:
+            while not self._stopped.is_set():
+                started = time.monotonic()
+                self._triggered.clear()
+                self._run_refresh()
+                timeout = None if self.interval is None else max(0.0, self.interval - (time.monotonic() - started))
+                self._triggered.wait(timeout)
+        except KeyboardInterrupt:
+            logger.info("Interrupted")
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+            logger.info(f"Daemon stopped after {self.refreshes} refreshes")
@@ -0,0 +1,70 @@
+import logging
+from typing import Any, Dict, Optional
+
+from bs4 import Tag
+
+from src.commons.models.table_details import TableDetails
+from src.parsers.beautiful_soup_parser import BeautifulSoupParser
+from src.parsers.header_extractor import BeautifulSoupHeaderExtractor
+from src.parsers.row_extractor import RowExtractor
+from src.parsers.table_extractor import TableExtractor
+from src.processors.column_builder import BasicBuilder
+from src.processors.pipeline import PipelinePlan, get_pipeline
+
+# The functions below run in worker processes as well as in the main process; they take and return plain
+# picklable values (HTML strings and TableDetails) so tables can be shipped to a ProcessPoolExecutor.
+
+logger = logging.getLogger(__name__)
+
+_header_extractor = BeautifulSoupHeaderExtractor()
+_row_extractor = RowExtractor(column_builder=BasicBuilder())
+
+
+def extract_table_details(table: Tag) -> TableDetails:
+    """
+    Extracts the headers and rows of a <table> tag.
+
+    Parameters:
+    table (Tag): The table element.
+
+    Returns:
+    TableDetails: The raw table details.
+    """
+    logger.info("Extracting rows from the table")
+    row_details = _row_extractor.extract_rows_from_table(table)
+
+    logger.info("Extracting headers from the table")
+    headers = _header_extractor.extract_column_headers(table)
+    return TableDetails(headers=headers, rows=row_details)
+
+
+def transform_table(table_details: TableDetails, plan: Optional[PipelinePlan] = None) -> TableDetails:
+    """
+    Runs the pipeline plan that turns a raw animal names table into (adjective, animal) rows.
+
+    Parameters:
+    table_details (TableDetails): The raw table details.
+    plan (Optional[PipelinePlan]): The compiled pipeline; the default recipe when omitted.
+
+    Returns:
+    TableDetails: The processed table details.
+    """
+    return (plan or get_pipeline()).run(table_details)
+
+
+def process_table_html(table_html: str, spec: Optional[Dict[str, Any]] = None) -> Optional[TableDetails]:
+    """
+    Parses, extracts and transforms a single serialised wikitable; the unit of work of a parallel run.
+
+    Parameters:
+    table_html (str): The HTML of one <table class="wikitable"> element.
+    spec (Optional[Dict[str, Any]]): The pipeline spec, compiled once per worker process; the default recipe
+        when omitted.
+
+    Returns:
+    Optional[TableDetails]: The processed table details, or None if the HTML holds no wikitable.
+    """
+    tables = TableExtractor(BeautifulSoupParser(table_html)).extract_tables()
+    if not tables:
+        return None
+    return transform_table(extract_table_details(tables[0]), get_pipeline(spec))
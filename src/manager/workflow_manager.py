@@ -1,114 +1,650 @@
-import asyncio
 import logging
 import os
+from typing import Optional
 
-from src.parsers.beautiful_soup_parser import BeautifulSoupParser
-from src.processors.column_builder import BasicBuilder
-from src.commons.models.table_details import TableDetails
-from src.parsers.header_extractor import BeautifulSoupHeaderExtractor
-from src.data_fetchers.image_download_manager import ImageDownloadManager
-from src.parsers.row_extractor import RowExtractor
-from src.storage.s3_saver import MinioSaver
+from src.commons.models.workflow_options import WorkflowOptions
+from src.data_fetchers.image_link_source import ImageLinkSource
 from src.parsers.table_extractor import TableExtractor
-from src.processors.table_processor import TableProcessor
-from src.utils.logging_config import setup_logging
+from src.processors.pipeline import get_pipeline, load_pipeline_spec, pipeline_hash
+from src.storage.image_saver import ImageSaver
+from src.telemetry import metrics
 from src.utils.url_utils import concat_url
-from src.parsers.web_scraper import WebScraper
 
-setup_logging()
+# bs4, aiohttp, requests and minio are imported where they are first used, so importing the workflow
+# (e.g. for --help or a scheduled job that hits the parsed-table cache) does not pay for every backend.
+
 logger = logging.getLogger(__name__)
 
 
+LINK_SOURCES = ("html", "mediawiki")
+OUTPUTS = ("s3", "fs")
+
+
 class WorkflowManager:
-    def __init__(self, url: str, base_wikipedia: str):
+    def __init__(self, url: str, base_wikipedia: str, options: Optional[WorkflowOptions] = None,
+                 saver: Optional[ImageSaver] = None, runtime=None):
+        self.options = options or WorkflowOptions()
+        if self.options.link_source not in LINK_SOURCES:
+            raise ValueError(f"Unknown link source '{self.options.link_source}', expected one of {LINK_SOURCES}")
+        if self.options.output not in OUTPUTS:
+            raise ValueError(f"Unknown output '{self.options.output}', expected one of {OUTPUTS}")
+        if self.options.workers < 1:
+            raise ValueError(f"workers must be at least 1, got {self.options.workers}")
         self.url = url
         self.base_wikipedia = base_wikipedia
+        self.saver = saver
+        # A WarmRuntime of a long-running process; its event loop and connections are reused by every run
+        self.runtime = runtime
+        self.table_cache = None
+        self.seen_urls = None
+        self.image_selection = None
+        self.request_policy = None
+        self.limiters = {}
+        self.failure_log = None
+        self.catalog = None
+        self.near_duplicates = None
+        # Rows of the current run, recorded in the catalog once the run succeeded
+        self._catalog_rows = []
+        # Whether every image download of the last process_tables succeeded
+        self.downloads_succeeded = True
+        # Whether the shared queue forgot the tasks finished by earlier crawls, once per run before its first enqueue
+        self._queue_purged = False
+        # The spec is validated and compiled up front, so a bad recipe fails before anything is fetched
+        self.pipeline_spec = load_pipeline_spec(self.options.pipeline) if self.options.pipeline else None
+        self.pipeline = get_pipeline(self.pipeline_spec)
+        self.pipeline_hash = pipeline_hash(self.pipeline_spec)
+
+    def create_saver(self) -> ImageSaver:
+        if self.saver is not None:
+            return self.saver
+
+        if self.options.output == "fs":
+            from src.storage.file_system_saver import FileSystemSaver
+
+            logger.info(f"Using FileSystemSaver to save images to {self.options.output_dir}")
+            self.saver = FileSystemSaver(self.options.output_dir)
+        else:
+            from src.storage.s3_saver import MinioSaver
+
+            logger.info("Using S3Saver to save images")
+            self.saver = MinioSaver(
+                minio_url=os.getenv("MINIO_HOST", "localhost:9000"),
+                access_key=os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
+                secret_key=os.getenv("MINIO_SECRET_KEY", "minioadmin"),
+                bucket_name=self.options.bucket_name,
+                limiter=self.create_limiter("upload")
+            )
+        return self.saver
+
+    def create_link_extractor(self) -> ImageLinkSource:
+        if self.options.link_source == "mediawiki":
+            from src.data_fetchers.mediawiki_link_extractor import MediaWikiImageLinkExtractor
+
+            logger.info("Using the MediaWiki API to resolve image links")
+            return MediaWikiImageLinkExtractor(concat_url(self.base_wikipedia, "/w/api.php"),
+                                               max_concurrent_requests=self.options.max_concurrent_requests,
+                                               sessions=self.sessions, policy=self.create_request_policy(),
+                                               limiter=self.create_limiter("download"))
+
+        from src.data_fetchers.image_link_extractor import ImageLinkExtractor
+        from src.data_fetchers.image_selection import ImageSelectionPolicy
+
+        # Shared by every extractor of the run, so its report covers all of them
+        if self.image_selection is None:
+            self.image_selection = ImageSelectionPolicy(self.options.image_policy, k=self.options.image_top_k,
+                                                        min_px=self.options.min_image_px)
+        return ImageLinkExtractor(self.options.max_concurrent_requests, selection=self.image_selection,
+                                  policy=self.create_request_policy(), limiter=self.create_limiter("download"),
+                                  sessions=self.sessions)
+
+    @property
+    def sessions(self):
+        return self.runtime.sessions if self.runtime is not None else None
+
+    def run_async(self, coroutine):
+        """
+        Runs a coroutine to completion, on the runtime's event loop if there is one, otherwise on a new loop.
+        """
+        if self.runtime is not None:
+            return self.runtime.run(coroutine)
+        import asyncio
+
+        return asyncio.run(coroutine)
+
+    def create_limiter(self, direction: str):
+        """
+        Returns the token bucket shared by every stream of the run in a direction ("download" or "upload"), or
+        None if its rate is not capped.
+        """
+        rate = self.options.download_rate if direction == "download" else self.options.upload_rate
+        if not rate:
+            return None
+        if direction not in self.limiters:
+            from src.utils.token_bucket import TokenBucket
+
+            logger.info(f"Capping the {direction} bandwidth at {rate:.0f} bytes/s")
+            self.limiters[direction] = TokenBucket(rate, name=direction)
+        return self.limiters[direction]
+
+    def create_request_policy(self):
+        # Shared by page and image requests, so breakers and latency stats cover the whole run
+        if self.request_policy is None:
+            from src.data_fetchers.request_policy import RequestPolicy
+
+            self.request_policy = RequestPolicy(self.options.connect_timeout, self.options.read_timeout,
+                                                self.options.request_timeout, self.options.hedge_quantile,
+                                                failure_threshold=self.options.breaker_failures,
+                                                reset_timeout=self.options.breaker_reset)
+        return self.request_policy
+
+    def create_scheduler(self):
+        """
+        Returns a scheduler running the first image of every article before the extras, within the time budget,
+        and images that failed on the last run after the others if a failure log is kept. It runs as many
+        downloads at once as max_concurrent_requests allows.
+        """
+        from src.data_fetchers.download_scheduler import DownloadScheduler, FailureLog
+
+        if self.options.failed_log and self.failure_log is None:
+            self.failure_log = FailureLog(self.options.failed_log)
+        failed_before = self.failure_log.urls if self.failure_log else ()
+        return DownloadScheduler(self.options.max_concurrent_requests, budget=self.options.time_budget,
+                                 drain_timeout=self.options.drain_timeout, failed_before=failed_before)
+
+    def _record_schedule(self, manager) -> None:
+        if self.failure_log is not None and manager.schedule_report is not None:
+            self.failure_log.update(manager.schedule_report)
+            self.failure_log.save()
+
+    def create_data_loader(self):
+        from src.data_fetchers.image_data_loader import ImageDataLoader
+        from src.data_fetchers.image_guards import ImageGuards
+
+        guards = None
+        if self.options.image_guards:
+            guards = ImageGuards(self.options.image_types, max_bytes=self.options.max_image_bytes)
+        downloader = None
+        if self.options.resume_downloads or self.options.spool_dir:
+            from src.data_fetchers.resumable_download import ResumableDownloader
+
+            downloader = ResumableDownloader(self.options.spool_dir, retries=self.options.download_retries,
+                                             parallel_threshold=self.options.parallel_range_bytes,
+                                             limiter=self.create_limiter("download"))
+        return ImageDataLoader(guards, downloader, self.create_request_policy(), self.create_limiter("download"))
+
+    def create_table_writer(self):
+        if not self.options.table_output:
+            return None
+        from src.storage.table_writer import create_table_writer
+
+        logger.info(f"Exporting processed tables to {self.options.table_output}")
+        return create_table_writer(self.options.table_output, self.options.table_format)
+
+    def create_table_cache(self):
+        if not self.options.table_cache:
+            return None
+        if self.table_cache is None:
+            from src.storage.table_cache import TableCache
+
+            # A resident process keeps the tables of the revisions it serves decoded between refreshes
+            memory_entries = 4 if self.runtime is not None else 0
+            self.table_cache = TableCache(self.options.table_cache, self.options.table_cache_max_bytes,
+                                          memory_entries=memory_entries)
+        return self.table_cache
+
+    def create_catalog(self):
+        if self.catalog is None and self.options.catalog:
+            from src.storage.image_catalog import ImageCatalog
+
+            logger.info(f"Recording stored images in the catalog {self.options.catalog}")
+            self.catalog = ImageCatalog(self.options.catalog)
+        return self.catalog
+
+    def create_near_duplicates(self):
+        """
+        Returns the filter skipping near-duplicate images, shared by every download of the process so a daemon
+        remembers what earlier refreshes stored, or None if near-duplicates are stored.
+        """
+        if self.near_duplicates is None and self.options.near_duplicate_distance is not None:
+            from src.data_fetchers.near_duplicates import NearDuplicateFilter
+
+            logger.info(f"Skipping images within {self.options.near_duplicate_distance} bits of a stored one "
+                        f"({self.options.near_duplicate_hash})")
+            self.near_duplicates = NearDuplicateFilter(self.options.near_duplicate_distance,
+                                                       self.options.near_duplicate_hash,
+                                                       workers=self.options.hash_workers)
+        return self.near_duplicates
+
+    def catalog_tables(self, tables):
+        """
+        Queues the rows of processed tables for the catalog, with the article URL of their link column.
+        """
+        if not self.options.catalog:
+            return
+        for table_details in tables:
+            column_index = table_details.schema.index(self.pipeline.link_column)
+            for row in table_details.rows:
+                link = row.cols[column_index].link
+                if link:
+                    values = {header: col.value for header, col in zip(table_details.headers, row.cols)}
+                    self._catalog_rows.append((values, concat_url(self.base_wikipedia, link)))
+
+    def _save_catalog(self, succeeded: bool) -> None:
+        rows, self._catalog_rows = self._catalog_rows, []
+        if self.catalog is None:
+            return
+        if succeeded and rows:
+            count = self.catalog.replace_rows(self.url, rows)
+            logger.info(f"Recorded {count} rows of {self.url} in the image catalog")
+        self.catalog.commit()
+        if self.options.catalog_parquet:
+            try:
+                self.catalog.export_parquet(self.options.catalog_parquet)
+            except Exception as e:
+                logger.error(f"Error exporting the image catalog: {e}")
+
+    def create_seen_urls(self):
+        if self.seen_urls is None and (self.options.dedup_urls or self.options.seen_urls_dir):
+            from src.utils.bloom_filter import SeenUrls
+
+            self.seen_urls = SeenUrls(self.options.dedup_error_rate, directory=self.options.seen_urls_dir)
+        return self.seen_urls
+
+    def fetch_data(self, etag: Optional[str] = None):
+        from src.parsers.web_scraper import WebScraper
 
-    def fetch_data(self):
         try:
             logger.info(f"Fetching data from URL: {self.url}")
-            response = WebScraper.fetch_data_from_url(self.url)
+            with metrics.span("fetch", url=self.url) as span:
+                response = WebScraper.fetch_data_from_url(self.url, headers={"If-None-Match": etag} if etag else None,
+                                                          session=self.runtime.http if self.runtime else None)
+                span.set_attribute("bytes", len(response.content))
+            metrics.count("pipeline_bytes_total", len(response.content), stage="fetch")
             return response
         except Exception as e:
             logger.error(f"Error fetching data from URL: {self.url}: {e}")
             raise
 
     def parse_html(self, content):
+        from src.parsers.beautiful_soup_parser import BeautifulSoupParser
+
         logger.info("Using BeautifulSoup for HTML parsing")
-        parser = BeautifulSoupParser(content)
+        with metrics.span("parse", bytes=len(content)):
+            parser = BeautifulSoupParser(content)
         return parser
 
     def process_tables(self, parser):
-        try:
-            header_extractor = BeautifulSoupHeaderExtractor()
-            table_extractor = TableExtractor(parser)
-            basic_builder = BasicBuilder()
-            row_extractor = RowExtractor(column_builder=basic_builder)
+        """
+        Extracts, transforms and exports the tables of a parsed page and downloads their images. Whether every
+        download succeeded is kept in downloads_succeeded.
 
+        Returns:
+        List[TableDetails]: The processed tables.
+        """
+        try:
             logger.info("Extracting tables from the parsed HTML")
-            tables = table_extractor.extract_tables()
+            with metrics.span("extract") as span:
+                tables = TableExtractor(parser).extract_tables()
+                span.set_attribute("tables", len(tables))
+            metrics.count("pipeline_items_total", len(tables), stage="extract")
+            # Only the tables are needed from here on, so the rest of the page is freed before any download
+            parser.release(keep=tables)
 
-            for table in tables:
-                try:
-                    logger.info("Extracting rows from the table")
-                    row_details = row_extractor.extract_rows_from_table(table)
+            table_writer = self.create_table_writer()
+            try:
+                if self.options.workers > 1 and len(tables) > 1:
+                    processed_tables, self.downloads_succeeded = self._process_tables_in_parallel(tables,
+                                                                                                  table_writer)
+                    return processed_tables
+                processed_tables, self.downloads_succeeded = self._process_tables_serially(
+                    tables, table_writer, download=not self.options.incremental)
+                if self.options.incremental:
+                    # The diff needs every table of the page, so downloads wait for the last one
+                    self.downloads_succeeded = self.download_tables(processed_tables)
+                return processed_tables
+            finally:
+                if table_writer:
+                    table_writer.close()
+        except Exception as e:
+            logger.error(f"Error during table extraction: {e}")
+            raise
+
+    def _process_tables_serially(self, tables, table_writer, download=True):
+        from src.manager.table_worker import extract_table_details, transform_table
+
+        processed_tables = []
+        downloaded = True
+        for index, table in enumerate(tables):
+            # Every table is released once extracted, while the images of the previous ones download
+            tables[index] = None
+            try:
+                with metrics.span("extract") as span:
+                    table_details = extract_table_details(table)
+                    span.set_attribute("rows", len(table_details.rows))
+                del table
+                metrics.count("pipeline_items_total", len(table_details.rows), stage="extract_rows")
+
+                with metrics.span("transform") as span:
+                    table_details = transform_table(table_details, self.pipeline)
+                    span.set_attribute("rows", len(table_details.rows))
+                self._table_processed(table_details, table_writer)
+                processed_tables.append(table_details)
+
+                if download:
+                    downloaded = self.download_images(table_details) and downloaded
+
+            except Exception as e:
+                logger.error("Error processing table: %s", e)
+        return processed_tables, downloaded
 
-                    logger.info("Extracting headers from the table")
-                    headers = header_extractor.extract_headers_from_table(table)
+    def _process_tables_in_parallel(self, tables, table_writer):
+        """
+        Extracts and transforms the tables in a process pool, then downloads the images of every table at once.
 
-                    table_details = TableDetails(headers=headers, rows=row_details)
+        Tables are shipped to the workers as HTML strings; the article links of all processed tables are merged,
+        deduplicated and handed to a single download run.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from src.manager.table_worker import process_table_html
 
-                    logger.info("Finding cells to update in the table details")
-                    indexes = TableProcessor.find_cells_to_update(table_details)
+        table_htmls = [str(table) for table in tables]
+        tables.clear()
+        logger.info(f"Processing {len(table_htmls)} tables with {self.options.workers} worker processes")
+        processed_tables = []
+        with metrics.span("transform", tables=len(table_htmls), workers=self.options.workers) as span:
+            with ProcessPoolExecutor(max_workers=self.options.workers) as pool:
+                futures = [pool.submit(process_table_html, table_html, self.pipeline_spec)
+                           for table_html in table_htmls]
+                # Results are consumed in table order so exports match a serial run
+                for future in futures:
+                    try:
+                        table_details = future.result()
+                    except Exception as e:
+                        logger.error("Error processing table: %s", e)
+                        continue
+                    if table_details is not None:
+                        processed_tables.append(table_details)
+            span.set_attribute("rows", sum(len(table_details.rows) for table_details in processed_tables))
 
-                    logger.info("Inserting values at the found indexes")
-                    table_details = TableProcessor.insert_values_at_indexes(indexes, table_details)
+        for table_details in processed_tables:
+            self._table_processed(table_details, table_writer)
+        return processed_tables, self.download_tables(processed_tables)
 
-                    logger.info("Selecting specific columns by names")
-                    table_details = TableProcessor.select_columns_by_names(table_details,
-                                                                           ["collateral adjective", "animal"])
+    def _table_processed(self, table_details, table_writer):
+        metrics.count("pipeline_items_total", len(table_details.rows), stage="transform")
+        logger.info("Processed table: %d rows", len(table_details.rows))
+        # Rendered by the log handler only when DEBUG is enabled
+        logger.debug("Table details after processing:\n%s", table_details)
+        if table_writer:
+            table_writer.write(table_details)
 
-                    logger.info("Exploding cells in the table details")
-                    table_details = TableProcessor.explode_cells(table_details)
+    def article_urls(self, table_details):
+        logger.info(f"Getting all links by column '{self.pipeline.link_column}'")
+        urls = self.pipeline.links(table_details)
+        return [concat_url(self.base_wikipedia, path) for path in urls]
 
-                    logger.info("Filtering rows by column value")
-                    table_details = TableProcessor.filter_rows_by_column_value(table_details, "collateral adjective",
-                                                                               r'^(?!.*[\u0020\u2014]).*$')
-                    logger.info(f"Table details after processing: {table_details}")
+    def download_tables(self, tables) -> bool:
+        """
+        Merges and deduplicates the article links of several processed tables into a single download run.
 
-                    self.download_images(table_details)
+        In incremental mode only the links of rows that changed since the last run are downloaded.
 
-                except Exception as e:
-                    logger.error(f"Error processing table: {e}")
+        Returns:
+        bool: Whether every image was downloaded.
+        """
+        self.catalog_tables(tables)
+        if self.options.incremental:
+            return self.download_changed_rows(tables)
+        urls = []
+        for table_details in tables:
+            urls.extend(self.article_urls(table_details))
+        unique_urls = list(dict.fromkeys(urls))
+        logger.info(f"Merged {len(urls)} article links from {len(tables)} tables into {len(unique_urls)} unique links")
+        return self.download_links(unique_urls)
+
+    def download_images(self, table_details) -> bool:
+        try:
+            self.catalog_tables([table_details])
+            urls = self.article_urls(table_details)
         except Exception as e:
-            logger.error(f"Error during table extraction: {e}")
-            raise
+            logger.error("Error occurred during image download: %s", e)
+            return False
+        return self.download_links(urls)
+
+    def enqueue_links(self, urls):
+        from src.distributed.work_queue import create_work_queue
+        from src.distributed.worker import Coordinator
 
-    def download_images(self, table_details):
+        queue = create_work_queue(self.options.queue)
         try:
-            logger.info("Getting all links by column 'animal'")
-            urls = TableProcessor.get_all_links_by_column(table_details, "animal")
-            urls = [concat_url(self.base_wikipedia, path) for path in urls]
-            logger.info(f"Concatenated URLs: {urls}")
+            # The articles of every table of a run are enqueued in turn; only the first call purges
+            Coordinator(queue).enqueue_articles(urls, fresh=not self._queue_purged)
+            self._queue_purged = True
+        finally:
+            queue.close()
 
-            logger.info("Using S3Saver to save images")
-            s3_saver = MinioSaver(
-                minio_url=os.getenv("MINIO_HOST", "localhost:9000"),
-                access_key=os.getenv("MINIO_ACCESS_KEY", "minioadmin"),
-                secret_key=os.getenv("MINIO_SECRET_KEY", "minioadmin"),
-                bucket_name=os.getenv("MINIO_BUCKET", "images")
-            )
-            manager = ImageDownloadManager(urls, s3_saver)
-            asyncio.run(manager.run())
+    def download_links(self, urls) -> bool:
+        """
+        Downloads the images of article URLs, or enqueues the articles for the workers of a shared queue.
+
+        Returns:
+        bool: Whether every image was downloaded (or the articles enqueued); errors are logged rather than raised.
+        """
+        if self.options.queue:
+            # Workers pulling from the shared queue do the downloads
+            self.enqueue_links(urls)
+            return True
+        from src.data_fetchers.image_download_manager import ImageDownloadManager
+
+        try:
+            logger.info("Concatenated %d article URLs", len(urls))
+            logger.debug("Concatenated URLs: %s", urls)
+
+            saver = self.create_saver()
+            manager = ImageDownloadManager(urls, saver, max_concurrent_requests=self.options.max_concurrent_requests,
+                                           link_extractor=self.create_link_extractor(),
+                                           seen_urls=self.create_seen_urls(), data_loader=self.create_data_loader(),
+                                           deadline=self.options.run_deadline, scheduler=self.create_scheduler(),
+                                           sessions=self.sessions, catalog=self.create_catalog(),
+                                           near_duplicates=self.create_near_duplicates())
+            with metrics.span("download_images", articles=len(urls)):
+                completed = self.run_async(manager.run())
+            self._record_schedule(manager)
+            if completed:
+                logger.info("Image download completed successfully")
+            else:
+                logger.warning("Image download finished with %d failed images", len(manager.failed_urls))
+            return completed
+        except Exception as e:
+            logger.error("Error occurred during image download: %s", e)
+            return False
+
+    def download_changed_rows(self, tables) -> bool:
+        """
+        Diffs the processed tables against the row index of the last run and downloads the images of added and
+        changed rows only. With gc_removed, images that only removed rows referred to are deleted from the saver.
+
+        Returns:
+        bool: Whether the images of every changed row were downloaded.
+        """
+        from src.storage.row_index import RowFingerprintIndex, row_fingerprints
+
+        index = RowFingerprintIndex(self.options.incremental)
+        fingerprints = row_fingerprints(tables, self.pipeline.link_column)
+        table_diff = index.diff(self.url, fingerprints)
+        logger.info(f"Rows since the last run: {table_diff}")
+        for change in ("added", "changed", "removed"):
+            metrics.count("incremental_rows_total", len(getattr(table_diff, change)), change=change)
+        metrics.count("incremental_rows_total", table_diff.unchanged, change="unchanged")
+
+        article_urls = {concat_url(self.base_wikipedia, link): link for link in table_diff.to_download}
+        images_by_url = self.download_links_by_page(list(article_urls)) if article_urls else {}
+        if images_by_url is None:
+            # Nothing is recorded, so the whole delta is retried on the next run
+            return False
+        images = {article_urls[url]: names for url, names in images_by_url.items()}
+        failed = [link for link in table_diff.to_download if link not in images]
+        orphans = index.update(self.url, fingerprints, images, failed=failed)
+        index.save()
+        if failed:
+            logger.warning(f"{len(failed)} article links failed and will be retried on the next run")
+        if orphans and self.options.gc_removed:
+            self.delete_images(sorted(orphans))
+        return not failed
+
+    def download_links_by_page(self, urls):
+        from src.data_fetchers.image_download_manager import ImageDownloadManager
+
+        try:
+            logger.info("Downloading images of %d changed article URLs", len(urls))
+            saver = self.create_saver()
+            manager = ImageDownloadManager(urls, saver, max_concurrent_requests=self.options.max_concurrent_requests,
+                                           link_extractor=self.create_link_extractor(),
+                                           data_loader=self.create_data_loader(), deadline=self.options.run_deadline,
+                                           scheduler=self.create_scheduler(), sessions=self.sessions,
+                                           catalog=self.create_catalog(), near_duplicates=self.create_near_duplicates())
+            with metrics.span("download_images", articles=len(urls)):
+                images_by_url = self.run_async(manager.run_by_page())
+            self._record_schedule(manager)
             logger.info("Image download completed successfully")
+            return images_by_url
         except Exception as e:
-            logger.error(f"Error occurred during image download: {e}")
+            logger.error("Error occurred during image download: %s", e)
+            return None
+
+    def delete_images(self, names):
+        import asyncio
+
+        saver = self.create_saver()
+
+        async def delete_all():
+            await asyncio.gather(*[saver.delete_image(name) for name in names])
 
-    def run(self):
         try:
-            response = self.fetch_data()
-            parser = self.parse_html(response.content)
-            self.process_tables(parser)
+            with metrics.span("gc_images", images=len(names)):
+                self.run_async(delete_all())
+            if self.near_duplicates is not None:
+                for name in names:
+                    self.near_duplicates.forget(name)
+            metrics.count("pipeline_items_total", len(names), stage="gc")
+            logger.info(f"Deleted {len(names)} images of removed rows")
+        except NotImplementedError:
+            logger.warning(f"{type(saver).__name__} cannot delete images; keeping {len(names)} images of removed rows")
+        except Exception as e:
+            logger.error(f"Error occurred while deleting images of removed rows: {e}")
+
+    def run_worker(self, idle_timeout: float = 0.0):
+        """
+        Processes the article and image tasks of the shared queue until it is drained, see Worker.
+        """
+        import asyncio
+        from src.distributed.work_queue import create_work_queue
+        from src.distributed.worker import Worker
+
+        queue = create_work_queue(self.options.queue)
+        try:
+            worker = Worker(queue, self.create_link_extractor(), self.create_saver(),
+                            batch_size=self.options.queue_batch_size,
+                            visibility_timeout=self.options.visibility_timeout,
+                            data_loader=self.create_data_loader())
+            with metrics.span("worker"):
+                return asyncio.run(worker.run(idle_timeout))
+        finally:
+            queue.close()
+
+    def run(self) -> bool:
+        """
+        Runs the workflow once. Errors are logged rather than raised.
+
+        Returns:
+        bool: Whether the run completed without an error.
+        """
+        succeeded = False
+        self._queue_purged = False
+        try:
+            with metrics.span("run", url=self.url):
+                cache = self.create_table_cache()
+                if cache is not None:
+                    self._run_with_cache(cache)
+                else:
+                    # Neither the page nor its tree is referenced here, so process_tables can free both
+                    self.process_tables(self.parse_html(self.fetch_data().content))
+            succeeded = True
         except Exception as e:
             logger.error(f"Workflow execution failed: {e}")
+        finally:
+            self._save_catalog(succeeded)
+            if self.image_selection is not None and self.image_selection.report.candidates:
+                logger.info(f"Image selection report: {self.image_selection.report}")
+            if self.near_duplicates is not None and self.near_duplicates.report.checked:
+                logger.info(f"Near-duplicate report: {self.near_duplicates.report}")
+            if self.request_policy is not None and self.request_policy.stats.requests:
+                logger.info(f"Request stats: {self.request_policy.report()}")
+            if self.seen_urls is not None:
+                self.seen_urls.close()
+                self.seen_urls = None
+        return succeeded
+
+    def close(self) -> None:
+        """
+        Releases what is kept between runs: the image catalog and the processes hashing images.
+        """
+        if self.catalog is not None:
+            self.catalog.close()
+            self.catalog = None
+        if self.near_duplicates is not None:
+            self.near_duplicates.close()
+            self.near_duplicates = None
+
+    def _run_with_cache(self, cache):
+        """
+        Runs the workflow, reusing the processed tables of an unchanged page revision.
+
+        The ETag of the last cached revision is sent as If-None-Match, so an unchanged page costs a 304 and no body.
+        Otherwise the revision is read from the page; a cache hit skips parsing, extraction and transforms. With
+        skip_unchanged, a revision whose images were already downloaded is not processed at all.
+        """
+        from src.storage.table_cache import page_revision
+
+        latest = cache.latest(self.url, self.pipeline_hash)
+        response = self.fetch_data(etag=latest.etag if latest else None)
+        if response.status_code == 304 and latest:
+            logger.info(f"Page not modified since {latest.revision}")
+            entry = latest
+        else:
+            entry = cache.find(self.url, page_revision(response.content, response.headers.get("ETag")),
+                               self.pipeline_hash)
+
+        tables = cache.load(entry) if entry else None
+        if tables is None:
+            metrics.count("table_cache_requests_total", result="miss")
+            if response.status_code == 304:
+                # The cached entry vanished after the conditional request; fetch the full page again
+                response = self.fetch_data()
+            revision, etag = page_revision(response.content, response.headers.get("ETag")), response.headers.get("ETag")
+            parser = self.parse_html(response.content)
+            del response
+            tables = self.process_tables(parser)
+            entry = cache.put(self.url, revision, self.pipeline_hash, tables, etag=etag)
+            self._mark_completed(cache, entry, self.downloads_succeeded)
+            return
+
+        metrics.count("table_cache_requests_total", result="hit")
+        if entry.completed and self.options.skip_unchanged:
+            logger.info(f"Skipping {self.url}: revision {entry.revision} was already processed")
+            return
+        logger.info(f"Using {len(tables)} cached tables of revision {entry.revision}")
+        table_writer = self.create_table_writer()
+        if table_writer:
+            with table_writer:
+                for table_details in tables:
+                    table_writer.write(table_details)
+        self._mark_completed(cache, entry, self.download_tables(tables))
 
+    def _mark_completed(self, cache, entry, downloaded: bool) -> None:
+        # skip_unchanged skips completed revisions for good, so one with failed downloads is processed again
+        if downloaded:
+            cache.mark_completed(entry)
+        else:
+            logger.warning("Images of %s (%s) failed to download; the revision will be processed again",
+                           self.url, entry.revision)
@@ -1,3 +1,5 @@
+from typing import Any
+
 from bs4 import BeautifulSoup, ResultSet
 
 from src.parsers.html_praser import HTMLParserInterface
@@ -53,3 +55,25 @@ class BeautifulSoupParser(HTMLParserInterface):
             A ResultSet of matching tags.
         """
         return self.soup.find_all(tag, attributes)
+
+    def release(self, keep: Any = ()) -> None:
+        """
+        Detach the kept elements from the document and destroy the rest of it.
+
+        The tree is full of reference cycles (parent, sibling and next element links), so without this it would
+        stay alive until the garbage collector runs, long after the tables were extracted.
+
+        Parameters:
+        -----------
+        keep : Any, optional
+            Elements of the document that are still needed; they stay intact, with their descendants.
+        """
+        if self.soup is None:
+            return
+        kept = {id(tag) for tag in keep}
+        for tag in keep:
+            # Nested kept elements stay attached to the outer one
+            if not any(id(parent) in kept for parent in tag.parents):
+                tag.extract()
+        self.soup.decompose()
+        self.soup = None
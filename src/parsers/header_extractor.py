@@ -1,6 +1,7 @@
 from bs4 import Tag
-from typing import List, Any
+from typing import Dict, List, Any, Tuple
 
+from src.commons.models.table_schema import LEVEL_SEPARATOR, normalize_header
 from src.parsers.header_extractor_interface import HeaderExtractorInterface
 
 
@@ -13,6 +14,9 @@ class BeautifulSoupHeaderExtractor(HeaderExtractorInterface):
     --------
     extract_headers_from_table(table: Tag, **filters: Any) -> List[str]:
         Extracts headers from a given <table> tag, optionally filtering <th> elements based on given attributes.
+
+    extract_column_headers(table: Tag) -> List[str]:
+        Extracts one header per data column, expanding colspan, rowspan and multi-level header rows.
     """
 
     def extract_headers_from_table(self, table: Tag, **filters: Any) -> List[str]:
@@ -34,3 +38,86 @@ class BeautifulSoupHeaderExtractor(HeaderExtractorInterface):
         headers = table.find_all('th', **filters)
         headers = [header for header in headers if header.get("colspan") is None]
         return [header.get_text(strip=True).lower() for header in headers]
+
+    def extract_column_headers(self, table: Tag) -> List[str]:
+        """
+        Extract one normalized header name per data column, aligned with the cells of the body rows.
+
+        Unlike extract_headers_from_table, headers spanning several columns are kept: a header with colspan="2"
+        names both columns it covers, and the leading rows made only of <th> cells are read as header levels,
+        so a "Young" header above "Male" and "Female" gives "young / male" and "young / female". Repeated names
+        get a " (2)", " (3)" suffix.
+
+        Header levels are looked for in the <thead> when the table has one. A row holding a single cell as wide
+        as the table, such as the "A", "B"... section dividers of list tables or a title row, is never a header
+        level: it ends the header rows once they started.
+
+        Parameters:
+        -----------
+        table : Tag
+            A BeautifulSoup Tag object representing a <table> element.
+
+        Returns:
+        --------
+        List[str]
+            The column names, in column order.
+        """
+        all_rows = table.find_all('tr')
+        head = table.find('thead')
+        rows = head.find_all('tr') if head is not None else all_rows
+        body_row = next((row for row in all_rows if row.find('td') is not None), None)
+        table_width = self._width(body_row) if body_row is not None else 0
+
+        header_rows = []
+        for row in rows:
+            if row.find('td') is not None:
+                break
+            if row.find('th') is None:
+                continue
+            if self._is_divider(row, table_width):
+                if header_rows:
+                    break
+                continue
+            header_rows.append(row)
+
+        grid: Dict[Tuple[int, int], str] = {}
+        width = 0
+        for row_index, row in enumerate(header_rows):
+            col_index = 0
+            for cell in row.find_all('th', recursive=False):
+                while (row_index, col_index) in grid:
+                    col_index += 1
+                text = normalize_header(cell.get_text(strip=True))
+                colspan, rowspan = self._span(cell, 'colspan'), self._span(cell, 'rowspan')
+                for spanned_row in range(row_index, min(row_index + rowspan, len(header_rows))):
+                    for spanned_col in range(col_index, col_index + colspan):
+                        grid[(spanned_row, spanned_col)] = text
+                col_index += colspan
+            width = max(width, col_index)
+
+        names: List[str] = []
+        seen: Dict[str, int] = {}
+        for col_index in range(width):
+            levels: List[str] = []
+            for row_index in range(len(header_rows)):
+                text = grid.get((row_index, col_index))
+                if text and (not levels or levels[-1] != text):
+                    levels.append(text)
+            name = LEVEL_SEPARATOR.join(levels)
+            seen[name] = seen.get(name, 0) + 1
+            names.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+        return names
+
+    def _width(self, row: Tag) -> int:
+        return sum(self._span(cell, 'colspan') for cell in row.find_all(['th', 'td'], recursive=False))
+
+    def _is_divider(self, row: Tag, table_width: int) -> bool:
+        cells = row.find_all(['th', 'td'], recursive=False)
+        return len(cells) == 1 and table_width > 1 and self._span(cells[0], 'colspan') >= table_width
+
+    @staticmethod
+    def _span(cell: Tag, attribute: str) -> int:
+        try:
+            return max(1, int(cell.get(attribute, 1)))
+        except (TypeError, ValueError):
+            return 1
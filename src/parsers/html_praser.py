@@ -41,3 +41,14 @@ class HTMLParserInterface(ABC):
             A list of matching tags.
         """
         pass
+
+    def release(self, keep: Any = ()) -> None:
+        """
+        Frees the parsed document once it is consumed, keeping only some of its elements usable.
+
+        Parameters:
+        -----------
+        keep : Any, optional
+            Elements found in the document that are still needed, e.g. the extracted tables.
+        """
+        pass
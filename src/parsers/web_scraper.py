@@ -1,7 +1,8 @@
 import logging
+from typing import Dict, Optional
 
 import requests
-from requests import Response
+from requests import Response, Session
 from requests.exceptions import RequestException
 
 logger = logging.getLogger(__name__)
@@ -13,12 +14,14 @@ class WebScraper:
 
     Methods:
     --------
-    fetch_data_from_url(url: str) -> Response:
+    fetch_data_from_url(url: str, headers: Optional[Dict[str, str]] = None,
+                        session: Optional[Session] = None) -> Response:
         Fetches data from the given URL and returns the response. Raises an exception if the request fails.
     """
 
     @staticmethod
-    def fetch_data_from_url(url: str) -> Response:
+    def fetch_data_from_url(url: str, headers: Optional[Dict[str, str]] = None,
+                            session: Optional[Session] = None) -> Response:
         """
         Fetch data from the given URL.
 
@@ -26,6 +29,10 @@ class WebScraper:
         -----------
         url : str
             The URL to fetch data from.
+        headers : Dict[str, str], optional
+            Extra request headers, e.g. If-None-Match for a conditional request (answered with 304).
+        session : Session, optional
+            A session whose open connections are reused, e.g. by a long-running process. Defaults to a new one.
 
         Returns:
         --------
@@ -38,7 +45,7 @@ class WebScraper:
             If there is an issue with the network request.
         """
         try:
-            response = requests.get(url)
+            response = (session or requests).get(url, headers=headers)
             response.raise_for_status()  # Raise an HTTPError if the HTTP request returned an unsuccessful status code
             return response
         except RequestException as e:
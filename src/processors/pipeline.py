@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.commons.exceptions.exception import PipelineSpecError
+from src.commons.models.table_details import TableDetails
+from src.processors.table_processor import TableProcessor
+
+logger = logging.getLogger(__name__)
+
+SPEC_VERSION = 1
+
+# The transforms WorkflowManager used to hardcode; config/pipeline.yaml ships the same recipe
+DEFAULT_PIPELINE_SPEC: Dict[str, Any] = {
+    "version": SPEC_VERSION,
+    "steps": [
+        "fill_rowspans",
+        {"select_columns": ["collateral adjective", "animal"]},
+        "explode_cells",
+        {"filter_rows": {"column": "collateral adjective", "pattern": r'^(?!.*[\u0020\u2014]).*$'}},
+    ],
+    "links": {"column": "animal"},
+}
+
+Step = Callable[[TableDetails], TableDetails]
+
+
+class PipelinePlan:
+    """
+    A compiled table pipeline: validated steps bound to their arguments and precompiled regexes, ready to be run
+    on any number of tables. Column names are resolved through the O(1) lookup of each table's schema.
+    """
+
+    def __init__(self, steps: List[Tuple[str, Step]], link_column: str):
+        """
+        Initializes the PipelinePlan.
+
+        Parameters:
+        steps (List[Tuple[str, Step]]): The (name, step) pairs, in execution order.
+        link_column (str): The column whose cell links point at the articles to download images from.
+        """
+        self.steps = steps
+        self.link_column = link_column
+
+    def run(self, table: TableDetails) -> TableDetails:
+        """
+        Runs every step on a table.
+
+        Parameters:
+        table (TableDetails): The raw table details.
+
+        Returns:
+        TableDetails: The processed table details.
+        """
+        for name, step in self.steps:
+            logger.debug("Applying step %s", name)
+            table = step(table)
+        return table
+
+    def links(self, table: TableDetails) -> List[str]:
+        """
+        Returns the links of the link column of a processed table.
+
+        Parameters:
+        table (TableDetails): The processed table details.
+
+        Returns:
+        List[str]: The non-empty links, in row order.
+        """
+        column_index = table.schema.index(self.link_column)
+        return [row.cols[column_index].link for row in table.rows if row.cols[column_index].link]
+
+
+def _fill_rowspans(location: str, args: Any) -> Step:
+    if args not in (None, {}):
+        raise PipelineSpecError("fill_rowspans takes no arguments", location)
+
+    def step(table: TableDetails) -> TableDetails:
+        return TableProcessor.insert_values_at_indexes(TableProcessor.find_cells_to_update(table), table)
+    return step
+
+
+def _explode_cells(location: str, args: Any) -> Step:
+    if args not in (None, {}):
+        raise PipelineSpecError("explode_cells takes no arguments", location)
+
+    def step(table: TableDetails) -> TableDetails:
+        return TableProcessor.explode_cells(table)
+    return step
+
+
+def _select_columns(location: str, args: Any) -> Step:
+    if not isinstance(args, list) or not args or not all(isinstance(name, str) for name in args):
+        raise PipelineSpecError("select_columns expects a non-empty list of column names", location)
+    names = list(args)
+
+    def step(table: TableDetails) -> TableDetails:
+        return TableProcessor.select_columns_by_indexes(table, table.schema.indexes(names))
+    return step
+
+
+def _filter_rows(location: str, args: Any) -> Step:
+    if not isinstance(args, dict) or set(args) != {"column", "pattern"}:
+        raise PipelineSpecError("filter_rows expects exactly the keys 'column' and 'pattern'", location)
+    if not isinstance(args["column"], str) or not isinstance(args["pattern"], str):
+        raise PipelineSpecError("filter_rows 'column' and 'pattern' must be strings", location)
+    try:
+        regex = re.compile(args["pattern"])
+    except re.error as e:
+        raise PipelineSpecError(f"invalid pattern {args['pattern']!r}: {e}", location)
+    column = args["column"]
+
+    def step(table: TableDetails) -> TableDetails:
+        return TableProcessor.filter_rows_by_column_index(table, table.schema.index(column), regex)
+    return step
+
+
+STEP_COMPILERS: Dict[str, Callable[[str, Any], Step]] = {
+    "fill_rowspans": _fill_rowspans,
+    "select_columns": _select_columns,
+    "explode_cells": _explode_cells,
+    "filter_rows": _filter_rows,
+}
+
+
+def compile_pipeline(spec: Dict[str, Any]) -> PipelinePlan:
+    """
+    Validates a pipeline spec and compiles it into a plan.
+
+    A spec looks like:
+        version: 1
+        steps:
+          - fill_rowspans
+          - select_columns: [collateral adjective, animal]
+          - explode_cells
+          - filter_rows: {column: collateral adjective, pattern: '^(?!.*[\\u0020\\u2014]).*$'}
+        links:
+          column: animal
+
+    Parameters:
+    spec (Dict[str, Any]): The parsed spec.
+
+    Returns:
+    PipelinePlan: The executable plan.
+
+    Raises:
+    PipelineSpecError: If the spec is malformed, naming the offending entry.
+    """
+    if not isinstance(spec, dict):
+        raise PipelineSpecError("a pipeline spec must be a mapping")
+    unknown_keys = set(spec) - {"version", "steps", "links"}
+    if unknown_keys:
+        raise PipelineSpecError(f"unknown keys {sorted(unknown_keys)}")
+    if spec.get("version", SPEC_VERSION) != SPEC_VERSION:
+        raise PipelineSpecError(f"unsupported version {spec['version']!r}, expected {SPEC_VERSION}", "version")
+
+    raw_steps = spec.get("steps")
+    if not isinstance(raw_steps, list) or not raw_steps:
+        raise PipelineSpecError("expected a non-empty list of steps", "steps")
+    steps = []
+    for position, raw_step in enumerate(raw_steps):
+        location = f"steps[{position}]"
+        if isinstance(raw_step, str):
+            name, args = raw_step, None
+        elif isinstance(raw_step, dict) and len(raw_step) == 1:
+            name, args = next(iter(raw_step.items()))
+        else:
+            raise PipelineSpecError("a step is a name or a mapping with a single name", location)
+        if name not in STEP_COMPILERS:
+            raise PipelineSpecError(f"unknown step {name!r}, expected one of {sorted(STEP_COMPILERS)}", location)
+        steps.append((name, STEP_COMPILERS[name](location, args)))
+
+    links = spec.get("links")
+    if not isinstance(links, dict) or not isinstance(links.get("column"), str) or set(links) != {"column"}:
+        raise PipelineSpecError("expected a mapping with a single 'column' name", "links")
+    return PipelinePlan(steps, links["column"])
+
+
+def load_pipeline_spec(path: str) -> Dict[str, Any]:
+    """
+    Reads a pipeline spec from a YAML or JSON file.
+
+    Parameters:
+    path (str): The spec file; .json files are parsed as JSON, anything else as YAML.
+
+    Returns:
+    Dict[str, Any]: The parsed, not yet validated spec.
+    """
+    with open(path, "rt") as spec_file:
+        if os.path.splitext(path)[1].lower() == ".json":
+            return json.load(spec_file)
+        import yaml
+        return yaml.safe_load(spec_file)
+
+
+_compiled_plans: Dict[str, PipelinePlan] = {}
+
+
+def get_pipeline(spec: Optional[Dict[str, Any]] = None) -> PipelinePlan:
+    """
+    Returns the compiled plan of a spec, compiling each distinct spec only once per process.
+
+    Parameters:
+    spec (Optional[Dict[str, Any]]): The parsed spec; the default recipe when omitted.
+
+    Returns:
+    PipelinePlan: The executable plan.
+    """
+    spec = DEFAULT_PIPELINE_SPEC if spec is None else spec
+    key = json.dumps(spec, sort_keys=True)
+    plan = _compiled_plans.get(key)
+    if plan is None:
+        plan = _compiled_plans[key] = compile_pipeline(spec)
+    return plan
+
+
+def pipeline_hash(spec: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Returns a stable hash of a spec, e.g. to key cached results by the recipe that produced them.
+
+    Parameters:
+    spec (Optional[Dict[str, Any]]): The parsed spec; the default recipe when omitted.
+
+    Returns:
+    str: The hex SHA-256 of the canonical JSON form of the spec.
+    """
+    spec = DEFAULT_PIPELINE_SPEC if spec is None else spec
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
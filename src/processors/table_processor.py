@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List, Set
+from typing import List, Pattern, Set, Union
 import re
 
 from config import WORD_SEPERATOR
@@ -67,12 +67,7 @@ class TableProcessor:
         Returns:
         List[int]: A list of indexes corresponding to the specified column names.
         """
-        column_indexes = []
-        headers = table.headers
-        for index, header in enumerate(headers):
-            if header in column_names:
-                column_indexes.append(index)
-        return column_indexes
+        return table.schema.indexes(column_names)
 
     @staticmethod
     def explode_cells(table: TableDetails) -> TableDetails:
@@ -170,20 +165,35 @@ class TableProcessor:
         return updated_table
 
     @staticmethod
-    def filter_rows_by_column_value(table: TableDetails, column_name: str, pattern: str) -> TableDetails:
+    def filter_rows_by_column_value(table: TableDetails, column_name: str,
+                                    pattern: Union[str, Pattern]) -> TableDetails:
         """
         Filters rows based on a regex pattern applied to a specific column.
 
         Parameters:
         table (TableDetails): The original table details.
         column_name (str): The name of the column to apply the regex pattern.
-        pattern (str): The regex pattern to match values against.
+        pattern (Union[str, Pattern]): The regex pattern to match values against, or a precompiled pattern.
 
         Returns:
         TableDetails: A new TableDetails object with filtered rows.
         """
         column_index = TableProcessor.get_columns_indexes(table, [column_name])[0]
-        regex = re.compile(pattern)
+        return TableProcessor.filter_rows_by_column_index(table, column_index, re.compile(pattern))
+
+    @staticmethod
+    def filter_rows_by_column_index(table: TableDetails, column_index: int, regex: Pattern) -> TableDetails:
+        """
+        Filters rows based on a precompiled regex applied to the column at an index.
+
+        Parameters:
+        table (TableDetails): The original table details.
+        column_index (int): The index of the column to apply the regex to.
+        regex (Pattern): The compiled pattern to search values with.
+
+        Returns:
+        TableDetails: A new TableDetails object with filtered rows.
+        """
         filtered_rows = [
             row for row in table.rows if regex.search(row.cols[column_index].value)
         ]
@@ -201,12 +211,7 @@ class TableProcessor:
         Returns:
         List[str]: A list of links from the specified column in the table cells.
         """
-        column_indexes = TableProcessor.get_columns_indexes(table, [column_name])
-
-        if not column_indexes:
-            raise ValueError(f"Column '{column_name}' not found in the table headers.")
-
-        column_index = column_indexes[0]
+        column_index = table.schema.index(column_name)
         links = []
 
         for row in table.rows:
@@ -0,0 +1,129 @@
+import base64
+import gzip
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+from yarl import URL
+
+from src.commons.models.archived_response import ArchivedResponse
+
+logger = logging.getLogger(__name__)
+
+# Headers describing the transfer rather than the content; the stored body is always decoded
+TRANSFER_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'connection', 'keep-alive'}
+
+
+def normalize_key(method: str, url: Union[str, URL], request_range: Optional[str] = None) -> Tuple[str, str, str]:
+    """
+    Builds the archive key of a request, ignoring the fragment and the order of query parameters.
+
+    Parameters:
+    method (str): The HTTP method.
+    url (Union[str, URL]): The request URL.
+    request_range (Optional[str]): The Range header of the request, if any.
+
+    Returns:
+    Tuple[str, str, str]: The (method, url, range) key.
+    """
+    url = URL(str(url)).with_fragment(None)
+    url = url.with_query(sorted(url.query.items()))
+    return method.upper(), str(url), request_range or ""
+
+
+class HttpArchive:
+    """
+    A class to store recorded HTTP responses in a gzip-compressed JSON lines file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes an empty HttpArchive.
+
+        Parameters:
+        path (str): The path of the archive file.
+        """
+        self.path = path
+        self._entries: Dict[Tuple[str, str, str], ArchivedResponse] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'HttpArchive':
+        """
+        Loads an archive from disk.
+
+        Parameters:
+        path (str): The path of the archive file.
+
+        Returns:
+        HttpArchive: The loaded archive.
+        """
+        archive = cls(path)
+        with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+            for line in archive_file:
+                record = json.loads(line)
+                archive.add(ArchivedResponse(method=record['method'], url=record['url'], status=record['status'],
+                                             body=base64.b64decode(record['body']), headers=record['headers'],
+                                             request_range=record.get('range')))
+        logger.info(f"Loaded {len(archive)} recorded responses from {path}")
+        return archive
+
+    def save(self) -> None:
+        """
+        Writes the archive to disk.
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with self._lock:
+            entries = list(self._entries.values())
+        with gzip.open(self.path, 'wt', encoding='utf-8') as archive_file:
+            for entry in entries:
+                record = {
+                    'method': entry.method,
+                    'url': entry.url,
+                    'status': entry.status,
+                    'headers': entry.headers,
+                    'body': base64.b64encode(entry.body).decode('ascii'),
+                }
+                if entry.request_range:
+                    record['range'] = entry.request_range
+                archive_file.write(json.dumps(record) + '\n')
+        logger.info(f"Saved {len(entries)} recorded responses to {self.path}")
+
+    def add(self, response: ArchivedResponse) -> None:
+        """
+        Adds a response to the archive, replacing any earlier response for the same request.
+
+        Parameters:
+        response (ArchivedResponse): The response to store.
+        """
+        length = {name.lower(): value for name, value in response.headers.items()}.get('content-length')
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in TRANSFER_HEADERS}
+        # A HEAD answer has no body but announces the length of the GET one
+        if response.method.upper() != 'HEAD' or length is None:
+            length = str(len(response.body))
+        headers['Content-Length'] = length
+        response.headers = headers
+        with self._lock:
+            self._entries[normalize_key(response.method, response.url, response.request_range)] = response
+
+    def get(self, method: str, url: Union[str, URL], request_range: Optional[str] = None) -> Optional[ArchivedResponse]:
+        """
+        Looks up the recorded response of a request.
+
+        Parameters:
+        method (str): The HTTP method.
+        url (Union[str, URL]): The request URL.
+        request_range (Optional[str]): The Range header of the request, if any.
+
+        Returns:
+        Optional[ArchivedResponse]: The recorded response, or None if the request was not recorded.
+        """
+        with self._lock:
+            return self._entries.get(normalize_key(method, url, request_range))
+
+    def __len__(self) -> int:
+        return len(self._entries)
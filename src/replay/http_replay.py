@@ -0,0 +1,371 @@
+import asyncio
+import http.client
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Mapping, Optional
+from unittest.mock import patch
+
+import aiohttp
+import requests
+from multidict import CIMultiDict, CIMultiDictProxy
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from yarl import URL
+
+from src.commons.models.archived_response import ArchivedResponse
+from src.replay.http_archive import HttpArchive
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+# The chunk size used to read the rest of a recorded body the caller left unread
+DRAIN_CHUNK_SIZE = 64 * 1024
+
+
+def request_url(str_or_url: Any, params: Any = None) -> URL:
+    """
+    Builds the URL aiohttp requests: the query parameters are appended to those already in the URL.
+    """
+    url = URL(str(str_or_url))
+    if not params:
+        return url
+    return url.with_query(list(url.query.items()) + list(URL.build(query=params).query.items()))
+
+
+def range_header(headers: Optional[Mapping[str, str]]) -> Optional[str]:
+    for name, value in (headers or {}).items():
+        if name.lower() == 'range':
+            return value
+    return None
+
+
+class BufferedContent:
+    """
+    A body already in memory, read through the part of aiohttp's StreamReader interface the fetchers use.
+    """
+
+    def __init__(self, body: bytes):
+        self._body = body
+        self._offset = 0
+        self._exception: Optional[BaseException] = None
+
+    def exception(self) -> Optional[BaseException]:
+        return self._exception
+
+    def set_exception(self, exc: BaseException, exc_cause: Optional[BaseException] = None) -> None:
+        # aiohttp sets it when a response is released; like its StreamReader, no read succeeds after that
+        self._exception = exc
+
+    def at_eof(self) -> bool:
+        return self._offset >= len(self._body)
+
+    async def read(self, n: int = -1) -> bytes:
+        if self._exception is not None:
+            raise self._exception
+        end = len(self._body) if n < 0 else min(len(self._body), self._offset + n)
+        chunk, self._offset = self._body[self._offset:end], end
+        return chunk
+
+    async def readany(self) -> bytes:
+        return await self.read()
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        while not self.at_eof():
+            yield await self.read(n)
+
+
+class RecordingContent:
+    """
+    A live body passed through to the caller as it reads it, the way aiohttp's StreamReader does, so the caller
+    still paces the download (e.g. with a TokenBucket per chunk). The complete body is handed to on_complete
+    once it was read to the end.
+    """
+
+    def __init__(self, content: aiohttp.StreamReader, on_complete: Callable[[bytes], None]):
+        self._content = content
+        self._on_complete = on_complete
+        self._body = bytearray()
+        self.complete = False
+
+    def exception(self) -> Optional[BaseException]:
+        return self._content.exception()
+
+    def set_exception(self, exc: BaseException, *args) -> None:
+        self._content.set_exception(exc, *args)
+
+    def at_eof(self) -> bool:
+        return self._content.at_eof()
+
+    async def read(self, n: int = -1) -> bytes:
+        return self._record(await self._content.read(n))
+
+    async def readany(self) -> bytes:
+        return self._record(await self._content.readany())
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await self.read(n)
+            if not chunk:
+                return
+            yield chunk
+
+    async def drain(self) -> None:
+        """
+        Reads what the caller left unread, so the response is recorded whole.
+        """
+        while not self.complete:
+            await self.read(DRAIN_CHUNK_SIZE)
+
+    def _record(self, chunk: bytes) -> bytes:
+        self._body.extend(chunk)
+        if not self.complete and (not chunk or self._content.at_eof()):
+            self.complete = True
+            self._on_complete(bytes(self._body))
+        return chunk
+
+
+def record_response(response: aiohttp.ClientResponse, on_complete: Callable[[bytes], None]) -> None:
+    """
+    Records a live response as the caller reads it. A body the caller leaves unread is read in the background
+    once the response is released, and the connection is released after it.
+    """
+    content = RecordingContent(response.content, on_complete)
+    original_release, original_wait_for_close = response.release, response.wait_for_close
+    drained = None
+
+    async def drain_and_release():
+        try:
+            await content.drain()
+        except Exception as e:
+            logger.debug("Not recording %s %s: %s", response.method, response.url, e)
+        finally:
+            original_release()
+
+    def release():
+        nonlocal drained
+        if content.complete:
+            return original_release()
+        if drained is None:
+            drained = asyncio.ensure_future(drain_and_release())
+        return drained
+
+    async def wait_for_close():
+        if drained is not None:
+            await drained
+        await original_wait_for_close()
+
+    response.content = content
+    response.release = release
+    response.wait_for_close = wait_for_close
+
+
+class ReplayedResponse:
+    """
+    A recorded response served in place of an aiohttp.ClientResponse, with the attributes and methods the
+    fetchers use.
+    """
+
+    def __init__(self, method: str, url: URL, entry: ArchivedResponse, request_headers: Mapping[str, str]):
+        self.method = method
+        self.url = self.real_url = url
+        self.status = entry.status
+        self.reason = http.client.responses.get(entry.status, '')
+        self.headers = CIMultiDictProxy(CIMultiDict(entry.headers))
+        self.request_info = aiohttp.RequestInfo(url, method, CIMultiDictProxy(CIMultiDict(request_headers)), url)
+        self.history = ()
+        self.content = BufferedContent(b'' if method == 'HEAD' else entry.body)
+        self._body = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('Content-Type', 'application/octet-stream').split(';')[0].strip().lower()
+
+    @property
+    def content_length(self) -> Optional[int]:
+        length = self.headers.get('Content-Length')
+        return int(length) if length is not None else None
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise aiohttp.ClientResponseError(self.request_info, self.history, status=self.status,
+                                              message=self.reason, headers=self.headers)
+
+    def get_encoding(self) -> str:
+        content_type = self.headers.get('Content-Type', '').lower()
+        for parameter in content_type.split(';')[1:]:
+            name, _, value = parameter.strip().partition('=')
+            if name == 'charset' and value:
+                return value.strip('"')
+        return 'utf-8'
+
+    async def read(self) -> bytes:
+        if self._body is None:
+            self._body = await self.content.read()
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = 'strict') -> str:
+        return (await self.read()).decode(encoding or self.get_encoding(), errors=errors)
+
+    async def json(self, *, encoding: Optional[str] = None, loads: Callable[[str], Any] = json.loads,
+                   content_type: Optional[str] = 'application/json') -> Any:
+        body = (await self.read()).strip()
+        if content_type and content_type not in self.content_type:
+            raise aiohttp.ContentTypeError(self.request_info, self.history, headers=self.headers,
+                                           message=f"Attempt to decode JSON with unexpected mimetype: "
+                                                   f"{self.content_type}")
+        return loads(body.decode(encoding or self.get_encoding())) if body else None
+
+    def release(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    async def wait_for_close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> 'ReplayedResponse':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
+
+class HttpReplay:
+    """
+    A context manager that records every HTTP response made through aiohttp and requests into an HttpArchive,
+    or serves them back from the archive through an in-process transport without touching the network.
+
+    Usage:
+        with HttpReplay("fixtures/run.jsonl.gz", mode="replay", latency=0.05):
+            WorkflowManager(url, base_wikipedia).run()
+    """
+
+    def __init__(self, archive_path: str, mode: str, latency: float = 0.0, bandwidth: Optional[float] = None):
+        """
+        Initializes the HttpReplay.
+
+        Parameters:
+        archive_path (str): The path of the archive file to write (record) or read (replay).
+        mode (str): Either "record" or "replay".
+        latency (float): Seconds of latency injected before every replayed response.
+        bandwidth (Optional[float]): Bytes per second used to delay replayed bodies, None for unlimited.
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown replay mode '{mode}', expected '{RECORD}' or '{REPLAY}'")
+        self.mode = mode
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.archive = HttpArchive.load(archive_path) if mode == REPLAY else HttpArchive(archive_path)
+        self._patchers = []
+
+    def __enter__(self) -> 'HttpReplay':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """
+        Installs the recording or replaying transport for aiohttp and requests.
+        """
+        if self.mode == RECORD:
+            original_request = aiohttp.ClientSession._request
+            original_send = requests.adapters.HTTPAdapter.send
+
+            async def record_aiohttp(session, method, str_or_url, **kwargs):
+                response = await original_request(session, method, str_or_url, **kwargs)
+                url = request_url(str_or_url, kwargs.get('params'))
+                headers, request_range = dict(response.headers), range_header(kwargs.get('headers'))
+                # The body is recorded as the caller streams it, so its own pacing of the download holds
+                record_response(response, lambda body: self.archive.add(ArchivedResponse(
+                    method=method, url=str(url), status=response.status, body=body, headers=headers,
+                    request_range=request_range)))
+                return response
+
+            def record_requests(adapter, request, **kwargs):
+                response = original_send(adapter, request, **kwargs)
+                self.archive.add(ArchivedResponse(method=request.method, url=request.url,
+                                                  status=response.status_code, body=response.content,
+                                                  headers=dict(response.headers),
+                                                  request_range=request.headers.get('Range')))
+                return response
+
+            self._patchers = [patch.object(aiohttp.ClientSession, '_request', new=record_aiohttp),
+                              patch.object(requests.adapters.HTTPAdapter, 'send', new=record_requests)]
+        else:
+            async def replay_aiohttp(session, method, str_or_url, **kwargs):
+                return await self._replay_aiohttp(method, str_or_url, **kwargs)
+
+            def replay_requests(adapter, request, **kwargs):
+                return self._replay_requests(request)
+
+            self._patchers = [patch.object(aiohttp.ClientSession, '_request', new=replay_aiohttp),
+                              patch.object(requests.adapters.HTTPAdapter, 'send', new=replay_requests)]
+
+        for patcher in self._patchers:
+            patcher.start()
+        logger.info(f"HTTP {self.mode} mode enabled using {self.archive.path}")
+
+    def stop(self) -> None:
+        """
+        Removes the transport and, in record mode, writes the archive to disk.
+        """
+        for patcher in reversed(self._patchers):
+            patcher.stop()
+        self._patchers = []
+        if self.mode == RECORD:
+            self.archive.save()
+
+    def delay_for(self, entry: ArchivedResponse) -> float:
+        """
+        Computes the injected delay of a replayed response.
+
+        Parameters:
+        entry (ArchivedResponse): The replayed response.
+
+        Returns:
+        float: The delay in seconds.
+        """
+        delay = self.latency
+        if self.bandwidth:
+            delay += len(entry.body) / self.bandwidth
+        return delay
+
+    async def _replay_aiohttp(self, method: str, str_or_url: Any, params: Any = None,
+                              headers: Optional[Mapping[str, str]] = None, **kwargs) -> ReplayedResponse:
+        method = method.upper()
+        url = request_url(str_or_url, params)
+        entry = self.archive.get(method, url, range_header(headers))
+        if entry is None:
+            raise aiohttp.ClientConnectionError(f"No recorded response for {method} {url}")
+        delay = self.delay_for(entry)
+        if delay:
+            await asyncio.sleep(delay)
+        return ReplayedResponse(method, url, entry, headers or {})
+
+    def _replay_requests(self, request: requests.PreparedRequest) -> requests.Response:
+        entry = self.archive.get(request.method, request.url, request.headers.get('Range'))
+        if entry is None:
+            raise requests.ConnectionError(f"No recorded response for {request.method} {request.url}",
+                                           request=request)
+        delay = self.delay_for(entry)
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = entry.status
+        response.reason = http.client.responses.get(entry.status, '')
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = entry.body
+        return response
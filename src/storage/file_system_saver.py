@@ -2,6 +2,7 @@ import logging
 import os
 from src.commons.models.image_data import ImageData
 from src.storage.image_saver import ImageSaver
+from src.telemetry import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +29,38 @@ class FileSystemSaver(ImageSaver):
 
         Parameters:
         image_data (ImageData): The image data to save.
+
+        Raises:
+        OSError: If the image could not be written; the failure is logged.
         """
         try:
             img_path = os.path.join(self.download_folder, image_data.name)
-            with open(img_path, 'wb') as img_file:
-                img_file.write(image_data.data)
-            logger.info(f"Downloaded {image_data.name} to {img_path}")
+            with metrics.span("upload", object=image_data.name, bytes=len(image_data.data)):
+                # Written aside and renamed, so a crash never leaves a partial image and saving twice is harmless
+                temp_path = f"{img_path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as img_file:
+                    img_file.write(image_data.data)
+                os.replace(temp_path, img_path)
+            metrics.count("pipeline_bytes_total", len(image_data.data), stage="upload")
+            metrics.count("pipeline_items_total", stage="upload")
+            logger.info("Downloaded %s to %s", image_data.name, img_path)
         except Exception as e:
-            logger.error(f"Failed to save image {image_data.name}: {e}")
+            metrics.count("pipeline_errors_total", stage="upload")
+            logger.error("Failed to save image %s: %s", image_data.name, e)
+            raise
+
+    async def delete_image(self, name: str) -> None:
+        """
+        Deletes a single image from the local file system; missing files are ignored.
+
+        Parameters:
+        name (str): The name the image was saved under.
+        """
+        img_path = os.path.join(self.download_folder, name)
+        try:
+            os.remove(img_path)
+            logger.info("Deleted %s", img_path)
+        except FileNotFoundError:
+            logger.debug("Image already gone: %s", img_path)
+        except OSError as e:
+            logger.error("Failed to delete image %s: %s", name, e)
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.commons.models.catalog_entry import CatalogEntry
+from src.commons.models.image_data import ImageData
+from src.data_fetchers.image_guards import sniff_content_type
+from src.utils.image_headers import image_dimensions
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the schema changes; a catalog of another version is rebuilt from the next run on
+CATALOG_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    source_url TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    content_type TEXT,
+    stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256);
+CREATE INDEX IF NOT EXISTS images_key ON images (key);
+
+CREATE TABLE IF NOT EXISTS article_images (
+    article_url TEXT NOT NULL,
+    source_url TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    PRIMARY KEY (article_url, source_url)
+);
+
+CREATE TABLE IF NOT EXISTS catalog_rows (
+    id INTEGER PRIMARY KEY,
+    page_url TEXT NOT NULL,
+    article_url TEXT NOT NULL,
+    row_values TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS catalog_rows_page ON catalog_rows (page_url);
+
+CREATE TABLE IF NOT EXISTS row_values (
+    row_id INTEGER NOT NULL REFERENCES catalog_rows (id) ON DELETE CASCADE,
+    column_name TEXT NOT NULL,
+    value TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS row_values_lookup ON row_values (column_name, value);
+CREATE INDEX IF NOT EXISTS row_values_row ON row_values (row_id);
+"""
+
+_ENTRY_COLUMNS = "i.key, i.source_url, i.size, i.sha256, i.width, i.height, i.content_type"
+# Every join is an index search: the value index, the row id, then the article and source URL keys
+FIND_BY_VALUE_SQL = (f"SELECT {_ENTRY_COLUMNS}, r.article_url, r.row_values FROM row_values v "
+                     "JOIN catalog_rows r ON r.id = v.row_id "
+                     "JOIN article_images a ON a.article_url = r.article_url "
+                     "JOIN images i ON i.source_url = a.source_url "
+                     "WHERE v.column_name = ? AND v.value = ? ORDER BY r.id, a.rank")
+
+
+class ImageCatalog:
+    """
+    A class to record, as the pipeline runs, which image was stored for which table row, in an indexed SQLite
+    file, so the image of an animal or a collateral adjective is found without listing the bucket.
+
+    Three things are recorded: the processed rows of every scraped page (every cell value is indexed, so any
+    column can be looked up, case-insensitively), the image URLs found on every article, and every stored image
+    with its object key, size, SHA-256 and dimensions. Lookups by a cell value, a content hash, a source URL or
+    an object key are B-tree index searches, O(log n) in the size of the catalog.
+
+    Writes are committed by commit; the connection may be shared by the threads of a run.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the ImageCatalog.
+
+        Parameters:
+        path (str): The SQLite file, created if missing.
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, CATALOG_VERSION):
+            logger.warning(f"Rebuilding image catalog {path} of version {version}")
+            for table in ("row_values", "catalog_rows", "article_images", "images"):
+                self._connection.execute(f"DROP TABLE IF EXISTS {table}")
+        self._connection.executescript(_SCHEMA)
+        self._connection.execute(f"PRAGMA user_version={CATALOG_VERSION}")
+        self._connection.commit()
+
+    def add_image(self, source_url: str, image_data: ImageData) -> None:
+        """
+        Records a stored image; its size, hash, format and dimensions are read from the bytes.
+
+        Parameters:
+        source_url (str): The URL the image was downloaded from.
+        image_data (ImageData): The image as handed to the saver.
+        """
+        dimensions = image_dimensions(image_data.data) or (None, None)
+        row = (source_url, image_data.name, len(image_data.data), hashlib.sha256(image_data.data).hexdigest(),
+               dimensions[0], dimensions[1], sniff_content_type(image_data.data[:16]), time.time())
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def add_duplicate(self, source_url: str, key: str) -> None:
+        """
+        Records an image that was not stored because it duplicates a stored one, as that stored image.
+
+        Parameters:
+        source_url (str): The URL the duplicate was downloaded from.
+        key (str): The object key of the stored image, which must already be recorded.
+        """
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO images SELECT ?, key, size, sha256, width, height, "
+                                     "content_type, ? FROM images WHERE key = ? LIMIT 1",
+                                     (source_url, time.time(), key))
+
+    def add_links(self, links_by_page: Dict[str, List[str]]) -> None:
+        """
+        Records the image URLs of articles, replacing what was recorded for them before.
+
+        Parameters:
+        links_by_page (Dict[str, List[str]]): The image URLs of every article URL, in page order.
+        """
+        with self._lock:
+            for article_url, links in links_by_page.items():
+                self._connection.execute("DELETE FROM article_images WHERE article_url = ?", (article_url,))
+                self._connection.executemany("INSERT OR IGNORE INTO article_images VALUES (?, ?, ?)",
+                                             [(article_url, link, rank) for rank, link in enumerate(links)])
+
+    def replace_rows(self, page_url: str, rows: Iterable[Tuple[Dict[str, str], str]]) -> int:
+        """
+        Replaces the recorded rows of a scraped page.
+
+        Parameters:
+        page_url (str): The page the tables were scraped from.
+        rows (Iterable[Tuple[Dict[str, str], str]]): The (header -> cell value, article URL) of every row.
+
+        Returns:
+        int: The number of rows recorded.
+        """
+        count = 0
+        with self._lock:
+            self._connection.execute("DELETE FROM catalog_rows WHERE page_url = ?", (page_url,))
+            for values, article_url in rows:
+                cursor = self._connection.execute(
+                    "INSERT INTO catalog_rows (page_url, article_url, row_values) VALUES (?, ?, ?)",
+                    (page_url, article_url, json.dumps(values, ensure_ascii=False)))
+                self._connection.executemany("INSERT INTO row_values VALUES (?, ?, ?)",
+                                             [(cursor.lastrowid, column, value) for column, value in values.items()])
+                count += 1
+        return count
+
+    def commit(self) -> None:
+        with self._lock:
+            self._connection.commit()
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
+
+    def _query(self, sql: str, parameters: tuple) -> List[CatalogEntry]:
+        with self._lock:
+            records = self._connection.execute(sql, parameters).fetchall()
+        return [CatalogEntry(*record[:7], article_url=record[7] if len(record) > 7 else None,
+                             values=json.loads(record[8]) if len(record) > 8 else {})
+                for record in records]
+
+    def find(self, column: str, value: str) -> List[CatalogEntry]:
+        """
+        Returns the stored images of the rows whose cell in a column has a value, e.g. find("animal", "fox").
+
+        Parameters:
+        column (str): The column header.
+        value (str): The cell value, compared case-insensitively.
+
+        Returns:
+        List[CatalogEntry]: The images, by row and then in article order.
+        """
+        return self._query(FIND_BY_VALUE_SQL, (column, value))
+
+    def find_by_hash(self, sha256: str) -> List[CatalogEntry]:
+        return self._query(f"SELECT {_ENTRY_COLUMNS} FROM images i WHERE i.sha256 = ?", (sha256,))
+
+    def find_by_source(self, source_url: str) -> Optional[CatalogEntry]:
+        entries = self._query(f"SELECT {_ENTRY_COLUMNS} FROM images i WHERE i.source_url = ?", (source_url,))
+        return entries[0] if entries else None
+
+    def find_by_key(self, key: str) -> List[CatalogEntry]:
+        return self._query(f"SELECT {_ENTRY_COLUMNS} FROM images i WHERE i.key = ?", (key,))
+
+    def entries(self) -> List[CatalogEntry]:
+        """
+        Returns every stored image of every recorded row, e.g. for an export.
+        """
+        return self._query(f"SELECT {_ENTRY_COLUMNS}, r.article_url, r.row_values FROM catalog_rows r "
+                           "JOIN article_images a ON a.article_url = r.article_url "
+                           "JOIN images i ON i.source_url = a.source_url ORDER BY r.id, a.rank", ())
+
+    def export_parquet(self, path: str) -> int:
+        """
+        Writes every entry to a Parquet file, one row per image of a table row, with a column per cell value.
+
+        pyarrow is an optional dependency and is only imported here.
+
+        Parameters:
+        path (str): The destination file.
+
+        Returns:
+        int: The number of exported rows.
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow") from e
+        entries = self.entries()
+        value_columns = list(dict.fromkeys(column for entry in entries for column in entry.values))
+        columns = {column: [entry.values.get(column) for entry in entries] for column in value_columns}
+        for name in ("article_url", "source_url", "key", "size", "sha256", "width", "height", "content_type"):
+            columns[name] = [getattr(entry, name) for entry in entries]
+        pyarrow.parquet.write_table(pyarrow.table(columns), path)
+        logger.info(f"Exported {len(entries)} catalog entries to {path}")
+        return len(entries)
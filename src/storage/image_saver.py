@@ -7,4 +7,22 @@ class ImageSaver:
     """
 
     async def save_image(self, image_data: ImageData) -> None:
+        """
+        Saves a single image.
+
+        Parameters:
+        image_data (ImageData): The image data to save.
+
+        Raises:
+        Exception: If the image was not saved, so callers never record it as stored.
+        """
         raise NotImplementedError("save_image method not implemented")
+
+    async def delete_image(self, name: str) -> None:
+        """
+        Deletes a previously saved image; used to garbage-collect images of rows removed from the table.
+
+        Parameters:
+        name (str): The name the image was saved under.
+        """
+        raise NotImplementedError("delete_image method not implemented")
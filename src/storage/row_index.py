@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set
+
+from src.commons.models.table_details import TableDetails
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever fingerprints are computed differently; an index of another version is ignored
+INDEX_FORMAT_VERSION = 1
+
+
+def row_fingerprints(tables: Iterable[TableDetails], link_column: str) -> Dict[str, str]:
+    """
+    Fingerprints the processed rows of a page by article link.
+
+    Every link gets a hash of the values and links of all rows pointing at it, so a row that is added, removed or
+    edited (e.g. a new collateral adjective for an animal) changes the fingerprint of its link only. Rows without
+    a link are ignored since they have no images.
+
+    Parameters:
+    tables (Iterable[TableDetails]): The processed tables of the page.
+    link_column (str): The column whose links point at the articles to download images from.
+
+    Returns:
+    Dict[str, str]: A mapping from article link to fingerprint, in first-seen order.
+    """
+    rows_by_link: Dict[str, List[List[str]]] = {}
+    for table in tables:
+        column_index = table.schema.index(link_column)
+        for row in table.rows:
+            link = row.cols[column_index].link
+            if link:
+                rows_by_link.setdefault(link, []).append([part for col in row.cols for part in (col.value, col.link)])
+    return {link: hashlib.sha256(json.dumps(sorted(rows), ensure_ascii=False).encode("utf-8")).hexdigest()
+            for link, rows in rows_by_link.items()}
+
+
+@dataclass
+class TableDiff:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def to_download(self) -> List[str]:
+        return self.added + self.changed
+
+    def __str__(self):
+        return (f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, "
+                f"{self.unchanged} unchanged")
+
+
+class RowFingerprintIndex:
+    """
+    A class to persist, per page URL, the row fingerprints of the last processed table and the names of the
+    images saved for every article link, so the next run only downloads the rows that changed.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initializes the RowFingerprintIndex.
+
+        Parameters:
+        path (str): The JSON index file, created on the first save.
+        """
+        self.path = path
+        self._pages: Dict[str, Dict[str, Dict]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as index_file:
+                payload = json.load(index_file)
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable row index {self.path}: {e}")
+            return {}
+        if payload.get("version") != INDEX_FORMAT_VERSION:
+            logger.warning(f"Ignoring row index {self.path} of version {payload.get('version')}")
+            return {}
+        return payload["pages"]
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as index_file:
+            json.dump({"version": INDEX_FORMAT_VERSION, "pages": self._pages}, index_file)
+        os.replace(temp_path, self.path)
+
+    def diff(self, url: str, fingerprints: Dict[str, str]) -> TableDiff:
+        """
+        Compares the row fingerprints of a page with the ones stored by the previous run.
+
+        Parameters:
+        url (str): The page URL.
+        fingerprints (Dict[str, str]): The current fingerprints, see row_fingerprints.
+
+        Returns:
+        TableDiff: The added, removed and changed article links. On the first run every link is added.
+        """
+        previous = self._pages.get(url, {}).get("rows", {})
+        table_diff = TableDiff(removed=[link for link in previous if link not in fingerprints])
+        for link, fingerprint in fingerprints.items():
+            if link not in previous:
+                table_diff.added.append(link)
+            elif previous[link] != fingerprint:
+                table_diff.changed.append(link)
+            else:
+                table_diff.unchanged += 1
+        return table_diff
+
+    def images(self, url: str, link: str) -> List[str]:
+        return self._pages.get(url, {}).get("images", {}).get(link, [])
+
+    def update(self, url: str, fingerprints: Dict[str, str], images: Dict[str, List[str]],
+               failed: Iterable[str] = ()) -> Set[str]:
+        """
+        Records the rows of a page after a run and returns the images no remaining row refers to.
+
+        Parameters:
+        url (str): The page URL.
+        fingerprints (Dict[str, str]): The current fingerprints, see row_fingerprints.
+        images (Dict[str, List[str]]): The names of the images saved for the downloaded article links.
+        failed (Iterable[str]): Links whose download failed; they keep their previous state and are retried.
+
+        Returns:
+        Set[str]: The names of images that only removed or replaced rows referred to, safe to delete from the saver.
+        """
+        page = self._pages.get(url, {"rows": {}, "images": {}})
+        failed = set(failed)
+        rows, link_images = {}, {}
+        for link, fingerprint in fingerprints.items():
+            if link in failed:
+                if link in page["rows"]:
+                    rows[link] = page["rows"][link]
+                    link_images[link] = page["images"].get(link, [])
+                continue
+            rows[link] = fingerprint
+            link_images[link] = images.get(link, page["images"].get(link, []))
+
+        kept = {name for names in link_images.values() for name in names}
+        orphans = {name for names in page["images"].values() for name in names} - kept
+        self._pages[url] = {"rows": rows, "images": link_images}
+        return orphans
@@ -1,10 +1,13 @@
 import logging
+from typing import Optional
 
 from minio import Minio
 from minio.error import S3Error
 import io
 from src.commons.models.image_data import ImageData
 from src.storage.image_saver import ImageSaver
+from src.telemetry import metrics
+from src.utils.token_bucket import TokenBucket
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +16,8 @@ class MinioSaver(ImageSaver):
     A class to save images to a MinIO bucket.
     """
 
-    def __init__(self, bucket_name: str, minio_url: str, access_key: str, secret_key: str):
+    def __init__(self, bucket_name: str, minio_url: str, access_key: str, secret_key: str,
+                 limiter: Optional[TokenBucket] = None):
         """
         Initializes the MinioSaver with the specified bucket and MinIO credentials.
 
@@ -22,8 +26,11 @@ class MinioSaver(ImageSaver):
         minio_url (str): The MinIO server URL.
         access_key (str): The MinIO access key.
         secret_key (str): The MinIO secret key.
+        limiter (Optional[TokenBucket]): The upload bandwidth. The MinIO client sends an object in one request,
+            so uploads are paced per object: the average rate holds, and bursts are at most one image long.
         """
         self.bucket_name = bucket_name
+        self.limiter = limiter
         self.minio_client = Minio(minio_url, access_key=access_key, secret_key=secret_key, secure=False)
 
         # Create the bucket if it does not exist
@@ -38,19 +45,42 @@ class MinioSaver(ImageSaver):
 
         Parameters:
         image_data (ImageData): The image data to save.
+
+        Raises:
+        Exception: If the upload failed, e.g. S3Error or a connection error; the failure is logged.
         """
+        if self.limiter is not None:
+            await self.limiter.acquire(len(image_data.data))
         try:
             # Convert the bytes object to a BytesIO stream
             data_stream = io.BytesIO(image_data.data)
 
             # Upload the image to MinIO
-            self.minio_client.put_object(
-                self.bucket_name,
-                image_data.name,
-                data_stream,
-                length=len(image_data.data),
-                content_type="application/octet-stream"  # Specify content type if needed
-            )
-            logger.info(f"Uploaded {image_data.name} to MinIO bucket {self.bucket_name}")
+            with metrics.span("upload", object=image_data.name, bytes=len(image_data.data)):
+                self.minio_client.put_object(
+                    self.bucket_name,
+                    image_data.name,
+                    data_stream,
+                    length=len(image_data.data),
+                    content_type="application/octet-stream"  # Specify content type if needed
+                )
+            metrics.count("pipeline_bytes_total", len(image_data.data), stage="upload")
+            metrics.count("pipeline_items_total", stage="upload")
+            logger.info("Uploaded %s to MinIO bucket %s", image_data.name, self.bucket_name)
+        except Exception as e:
+            metrics.count("pipeline_errors_total", stage="upload")
+            logger.error("Failed to upload %s to MinIO: %s", image_data.name, e)
+            raise
+
+    async def delete_image(self, name: str) -> None:
+        """
+        Deletes a single image from the MinIO bucket.
+
+        Parameters:
+        name (str): The object name the image was uploaded under.
+        """
+        try:
+            self.minio_client.remove_object(self.bucket_name, name)
+            logger.info("Deleted %s from MinIO bucket %s", name, self.bucket_name)
         except S3Error as e:
-            logger.error(f"Failed to upload {image_data.name} to MinIO: {e}")
+            logger.error("Failed to delete %s from MinIO: %s", name, e)
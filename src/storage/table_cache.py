@@ -0,0 +1,274 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from src.commons.models.col_details import ColDetails
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the entry encoding or the meaning of cached tables changes; old entries are then never hit
+CACHE_FORMAT_VERSION = 1
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+INDEX_FILE = "index.json"
+
+_REVISION_ID = re.compile(rb'"wgRevisionId"\s*:\s*(\d+)')
+
+
+def page_revision(content: bytes, etag: Optional[str] = None) -> str:
+    """
+    Identifies the revision of a fetched page.
+
+    Parameters:
+    content (bytes): The page HTML.
+    etag (Optional[str]): The ETag response header, if any.
+
+    Returns:
+    str: "rev:<id>" for MediaWiki pages, otherwise "etag:<etag>", otherwise a hash of the content.
+    """
+    match = _REVISION_ID.search(content)
+    if match:
+        return f"rev:{match.group(1).decode()}"
+    if etag:
+        return f"etag:{etag}"
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+def encode_tables(tables: List[TableDetails]) -> bytes:
+    """
+    Encodes processed tables as zlib-compressed JSON arrays (no field names per cell).
+
+    Parameters:
+    tables (List[TableDetails]): The tables to encode.
+
+    Returns:
+    bytes: The compact encoding.
+    """
+    payload = [[list(table.headers), [[[col.value, col.link, col.rawspans_number] for col in row.cols]
+                                      for row in table.rows]]
+               for table in tables]
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_tables(data: bytes) -> List[TableDetails]:
+    """
+    Decodes tables written by encode_tables.
+
+    Parameters:
+    data (bytes): The compact encoding.
+
+    Returns:
+    List[TableDetails]: The tables.
+    """
+    payload = json.loads(zlib.decompress(data).decode("utf-8"))
+    return [TableDetails(headers=headers, rows=[RowDetails([ColDetails(value, link, rawspans)
+                                                            for value, link, rawspans in cols])
+                                                for cols in rows])
+            for headers, rows in payload]
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    url: str
+    revision: str
+    pipeline_hash: str
+    etag: Optional[str]
+    size: int
+    created: float
+    last_access: float
+    # Set once a run went through the image downloads of the cached tables
+    completed: bool = False
+
+
+class TableCache:
+    """
+    A class to persist processed tables on disk, keyed by page URL, page revision and pipeline hash.
+
+    Every entry is a compressed file next to a JSON index holding the entries' metadata. When the total size
+    exceeds max_bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, memory_entries: int = 0):
+        """
+        Initializes the TableCache.
+
+        Parameters:
+        directory (str): The cache folder, created if missing.
+        max_bytes (int): The maximum total size of the cached entries.
+        memory_entries (int): The number of recently used entries also kept decoded in memory, for processes that
+            load the same page revision many times.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._decoded: OrderedDict[str, List[TableDetails]] = OrderedDict()
+        self._lock = threading.Lock()
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._entries: Dict[str, CacheEntry] = self._load_index()
+
+    @staticmethod
+    def cache_key(url: str, revision: str, pipeline_hash: str) -> str:
+        return hashlib.sha256(f"{CACHE_FORMAT_VERSION}\n{url}\n{revision}\n{pipeline_hash}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.tables")
+
+    def _load_index(self) -> Dict[str, CacheEntry]:
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as index_file:
+                entries = {key: CacheEntry(**entry) for key, entry in json.load(index_file).items()}
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable table cache index {path}: {e}")
+            return {}
+        return {key: entry for key, entry in entries.items() if os.path.exists(self._path(key))}
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.directory, INDEX_FILE)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as index_file:
+            json.dump({key: asdict(entry) for key, entry in self._entries.items()}, index_file)
+        os.replace(temp_path, path)
+
+    def latest(self, url: str, pipeline_hash: str) -> Optional[CacheEntry]:
+        """
+        Returns the most recently stored entry of a page for a pipeline, e.g. to send its ETag in If-None-Match.
+
+        Parameters:
+        url (str): The page URL.
+        pipeline_hash (str): The hash of the pipeline spec.
+
+        Returns:
+        Optional[CacheEntry]: The entry, or None if the page is not cached.
+        """
+        with self._lock:
+            entries = [entry for entry in self._entries.values()
+                       if entry.url == url and entry.pipeline_hash == pipeline_hash]
+        return max(entries, key=lambda entry: entry.created) if entries else None
+
+    def find(self, url: str, revision: str, pipeline_hash: str) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._entries.get(self.cache_key(url, revision, pipeline_hash))
+
+    def load(self, entry: CacheEntry) -> Optional[List[TableDetails]]:
+        """
+        Reads the tables of an entry.
+
+        Parameters:
+        entry (CacheEntry): The entry to read.
+
+        Returns:
+        Optional[List[TableDetails]]: The tables, or None if the entry file is missing or corrupt.
+        """
+        with self._lock:
+            tables = self._decoded.get(entry.key)
+        if tables is None:
+            try:
+                with open(self._path(entry.key), "rb") as cache_file:
+                    tables = decode_tables(cache_file.read())
+            except (OSError, ValueError, zlib.error) as e:
+                logger.warning(f"Dropping unreadable table cache entry {entry.key}: {e}")
+                self.invalidate(key=entry.key)
+                return None
+        with self._lock:
+            entry.last_access = time.time()
+            self._remember(entry.key, tables)
+            self._save_index()
+        return tables
+
+    def _remember(self, key: str, tables: List[TableDetails]) -> None:
+        if self.memory_entries < 1:
+            return
+        self._decoded[key] = tables
+        self._decoded.move_to_end(key)
+        while len(self._decoded) > self.memory_entries:
+            self._decoded.popitem(last=False)
+
+    def put(self, url: str, revision: str, pipeline_hash: str, tables: List[TableDetails],
+            etag: Optional[str] = None) -> CacheEntry:
+        """
+        Stores processed tables and evicts the least recently used entries beyond max_bytes.
+
+        Parameters:
+        url (str): The page URL.
+        revision (str): The page revision, see page_revision.
+        pipeline_hash (str): The hash of the pipeline spec.
+        tables (List[TableDetails]): The processed tables.
+        etag (Optional[str]): The ETag of the page response, used for conditional requests.
+
+        Returns:
+        CacheEntry: The stored entry.
+        """
+        key = self.cache_key(url, revision, pipeline_hash)
+        data = encode_tables(tables)
+        temp_path = f"{self._path(key)}.tmp"
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(data)
+        os.replace(temp_path, self._path(key))
+
+        now = time.time()
+        entry = CacheEntry(key=key, url=url, revision=revision, pipeline_hash=pipeline_hash, etag=etag,
+                           size=len(data), created=now, last_access=now)
+        with self._lock:
+            self._entries[key] = entry
+            self._remember(key, tables)
+            self._evict()
+            self._save_index()
+        logger.info("Cached %d tables of %s (%s, %d bytes)", len(tables), url, revision, len(data))
+        return entry
+
+    def mark_completed(self, entry: CacheEntry) -> None:
+        with self._lock:
+            entry.completed = True
+            if entry.key in self._entries:
+                self._save_index()
+
+    def _evict(self) -> None:
+        total = sum(entry.size for entry in self._entries.values())
+        for entry in sorted(self._entries.values(), key=lambda entry: entry.last_access):
+            if total <= self.max_bytes:
+                break
+            total -= entry.size
+            self._remove(entry.key)
+            logger.info("Evicted table cache entry of %s (%s)", entry.url, entry.revision)
+
+    def _remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._decoded.pop(key, None)
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    def invalidate(self, url: Optional[str] = None, key: Optional[str] = None) -> int:
+        """
+        Removes entries: the one with a key, every entry of a URL, or everything when neither is given.
+
+        Parameters:
+        url (Optional[str]): Remove every revision of this page.
+        key (Optional[str]): Remove this entry.
+
+        Returns:
+        int: The number of removed entries.
+        """
+        with self._lock:
+            keys = [entry.key for entry in self._entries.values()
+                    if (key is None or entry.key == key) and (url is None or entry.url == url)]
+            for entry_key in keys:
+                self._remove(entry_key)
+            self._save_index()
+        return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
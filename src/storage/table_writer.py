@@ -0,0 +1,270 @@
+import csv
+import gzip
+import json
+import logging
+import os
+from typing import Dict, Iterator, List, Optional
+
+from src.commons.models.table_details import TableDetails
+
+logger = logging.getLogger(__name__)
+
+TABLE_FORMATS = ("csv", "jsonl", "parquet")
+LINK_SUFFIX = "_link"
+
+
+def field_names(table: TableDetails, include_links: bool = True) -> List[str]:
+    """
+    Returns the exported column names of a table.
+
+    Parameters:
+    table (TableDetails): The table to export.
+    include_links (bool): Add a "<header>_link" column after every header.
+
+    Returns:
+    List[str]: The column names, in export order.
+    """
+    names = []
+    for header in table.headers:
+        names.append(header)
+        if include_links:
+            names.append(f"{header}{LINK_SUFFIX}")
+    return names
+
+
+def table_records(table: TableDetails, include_links: bool = True) -> Iterator[Dict[str, str]]:
+    """
+    Yields the rows of a table one by one as flat records keyed by header.
+
+    Parameters:
+    table (TableDetails): The table to export.
+    include_links (bool): Add the link of every cell under "<header>_link".
+
+    Returns:
+    Iterator[Dict[str, str]]: One record per row; cells missing from a short row are empty strings.
+    """
+    headers = list(table.headers)
+    for row in table.rows:
+        record = {}
+        for index, header in enumerate(headers):
+            col = row.cols[index] if index < len(row.cols) else None
+            record[header] = col.value if col else ""
+            if include_links:
+                record[f"{header}{LINK_SUFFIX}"] = (col.link or "") if col else ""
+        yield record
+
+
+def _open_text(path: str):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class TableWriter:
+    """
+    Abstract base class for table export formats.
+
+    A writer is opened once and write() is called for every processed table; rows are streamed to the
+    destination as they are converted, so exporting never builds a second copy of the table in memory.
+    Paths ending in .gz are compressed for the text formats.
+    """
+
+    def __init__(self, path: str, include_links: bool = True):
+        """
+        Initializes the TableWriter.
+
+        Parameters:
+        path (str): The destination file.
+        include_links (bool): Export the link of every cell next to its value.
+        """
+        self.path = path
+        self.include_links = include_links
+        self.rows_written = 0
+        self._columns: Optional[List[str]] = None
+
+    def _check_columns(self, table: TableDetails) -> List[str]:
+        columns = field_names(table, self.include_links)
+        if self._columns is None:
+            self._columns = columns
+        elif columns != self._columns:
+            raise ValueError(f"Table columns {columns} do not match the columns already written {self._columns}")
+        return columns
+
+    def write(self, table: TableDetails) -> int:
+        """
+        Appends the rows of a table.
+
+        Parameters:
+        table (TableDetails): The table to write; its headers must match the tables written before.
+
+        Returns:
+        int: The number of rows written.
+        """
+        raise NotImplementedError("write method not implemented")
+
+    def close(self) -> None:
+        logger.info("Wrote %d rows to %s", self.rows_written, self.path)
+
+    def __enter__(self) -> 'TableWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class CsvTableWriter(TableWriter):
+    """
+    A class to stream tables to a CSV file with a single header line.
+    """
+
+    def __init__(self, path: str, include_links: bool = True):
+        super().__init__(path, include_links)
+        self._file = _open_text(path)
+        self._writer = csv.writer(self._file)
+
+    def write(self, table: TableDetails) -> int:
+        first_table = self._columns is None
+        columns = self._check_columns(table)
+        if first_table:
+            self._writer.writerow(columns)
+        count = 0
+        for record in table_records(table, self.include_links):
+            self._writer.writerow(record.values())
+            count += 1
+        self.rows_written += count
+        return count
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+class JsonlTableWriter(TableWriter):
+    """
+    A class to stream tables to a JSON lines file, one object per row.
+    """
+
+    def __init__(self, path: str, include_links: bool = True):
+        super().__init__(path, include_links)
+        self._file = _open_text(path)
+
+    def write(self, table: TableDetails) -> int:
+        self._check_columns(table)
+        count = 0
+        for record in table_records(table, self.include_links):
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write("\n")
+            count += 1
+        self.rows_written += count
+        return count
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+class ParquetTableWriter(TableWriter):
+    """
+    A class to write tables to a Parquet file with pyarrow, one or more row groups per table.
+
+    pyarrow is an optional dependency and is only imported when a ParquetTableWriter is created.
+    """
+
+    def __init__(self, path: str, include_links: bool = True, row_group_size: int = 65536,
+                 compression: str = "zstd"):
+        """
+        Initializes the ParquetTableWriter.
+
+        Parameters:
+        path (str): The destination file.
+        include_links (bool): Export the link of every cell next to its value.
+        row_group_size (int): The maximum number of rows converted and written at once.
+        compression (str): The Parquet compression codec.
+        """
+        super().__init__(path, include_links)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export requires pyarrow: pip install pyarrow") from e
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self._writer = None
+
+    def write(self, table: TableDetails) -> int:
+        columns = self._check_columns(table)
+        if self._writer is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            schema = self._pa.schema([(name, self._pa.string()) for name in columns])
+            self._writer = self._pq.ParquetWriter(self.path, schema, compression=self.compression)
+
+        count = 0
+        batch: Dict[str, List[str]] = {name: [] for name in columns}
+        for record in table_records(table, self.include_links):
+            for name, value in record.items():
+                batch[name].append(value)
+            count += 1
+            if count % self.row_group_size == 0:
+                self._flush(batch)
+        self._flush(batch)
+        self.rows_written += count
+        return count
+
+    def _flush(self, batch: Dict[str, List[str]]) -> None:
+        if batch and next(iter(batch.values())):
+            self._writer.write_table(self._pa.table(batch, schema=self._writer.schema))
+            for values in batch.values():
+                values.clear()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        super().close()
+
+
+def infer_table_format(path: str) -> str:
+    """
+    Infers the export format from a file name, ignoring a trailing .gz.
+
+    Parameters:
+    path (str): The destination file, e.g. animals.csv, animals.jsonl.gz or animals.parquet.
+
+    Returns:
+    str: One of TABLE_FORMATS.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lstrip(".").lower()
+    if extension == "json":
+        extension = "jsonl"
+    if extension not in TABLE_FORMATS:
+        raise ValueError(f"Cannot infer the table format of '{path}', expected one of {TABLE_FORMATS}")
+    return extension
+
+
+def create_table_writer(path: str, table_format: Optional[str] = None, include_links: bool = True) -> TableWriter:
+    """
+    Creates the writer for an export format.
+
+    Parameters:
+    path (str): The destination file.
+    table_format (Optional[str]): One of TABLE_FORMATS; inferred from the path when omitted.
+    include_links (bool): Export the link of every cell next to its value.
+
+    Returns:
+    TableWriter: The opened writer.
+    """
+    table_format = table_format or infer_table_format(path)
+    if table_format == "csv":
+        return CsvTableWriter(path, include_links)
+    if table_format == "jsonl":
+        return JsonlTableWriter(path, include_links)
+    if table_format == "parquet":
+        return ParquetTableWriter(path, include_links)
+    raise ValueError(f"Unknown table format '{table_format}', expected one of {TABLE_FORMATS}")
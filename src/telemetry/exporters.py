@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from src.telemetry.metrics import LabelKey, MetricsRegistry, Span
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in key]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render_prometheus(registry: MetricsRegistry) -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    Parameters:
+    registry (MetricsRegistry): The registry to render.
+
+    Returns:
+    str: The metrics as Prometheus text.
+    """
+    lines = []
+    for counter in list(registry.counters.values()):
+        lines.append(f"# HELP {counter.name} {counter.description}")
+        lines.append(f"# TYPE {counter.name} counter")
+        for key, value in sorted(counter.values.items()):
+            lines.append(f"{counter.name}{_format_labels(key)} {_format_number(value)}")
+
+    for histogram in list(registry.histograms.values()):
+        lines.append(f"# HELP {histogram.name} {histogram.description}")
+        lines.append(f"# TYPE {histogram.name} histogram")
+        for key, (counts, total, count) in sorted(histogram.values.items()):
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                labels = _format_labels(key, 'le="%s"' % bound)
+                lines.append(f"{histogram.name}_bucket{labels} {bucket_count}")
+            labels = _format_labels(key, 'le="+Inf"')
+            lines.append(f"{histogram.name}_bucket{labels} {count}")
+            lines.append(f"{histogram.name}_sum{_format_labels(key)} {_format_number(total)}")
+            lines.append(f"{histogram.name}_count{_format_labels(key)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_file(registry: MetricsRegistry, path: str) -> None:
+    """
+    Writes the metrics to a file, e.g. for the node_exporter textfile collector.
+
+    Parameters:
+    registry (MetricsRegistry): The registry to render.
+    path (str): The destination file; it is replaced atomically.
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as metrics_file:
+        metrics_file.write(render_prometheus(registry))
+    os.replace(temp_path, path)
+
+
+class PrometheusServer:
+    """
+    Serves the metrics of a registry on /metrics from a background thread.
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = "0.0.0.0"):
+        """
+        Initializes the PrometheusServer.
+
+        Parameters:
+        registry (MetricsRegistry): The registry to serve.
+        port (int): The port to listen on, 0 for any free port.
+        host (str): The interface to bind.
+        """
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(registry).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        self._thread.start()
+        logger.info(f"Serving Prometheus metrics on port {self.port}")
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class OtlpJsonSpanExporter:
+    """
+    Collects finished spans and writes them in the OTLP/JSON trace format, one export request per line,
+    which OpenTelemetry collectors (otlpjsonfile receiver) and tools such as Jaeger can import.
+    """
+
+    def __init__(self, path: str, service_name: str = "adaptive-shield-scraper"):
+        """
+        Initializes the OtlpJsonSpanExporter.
+
+        Parameters:
+        path (str): The file the spans are appended to.
+        service_name (str): The service.name resource attribute.
+        """
+        self.path = path
+        self.service_name = service_name
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    @staticmethod
+    def _attribute(name: str, value: object) -> dict:
+        if isinstance(value, bool):
+            return {"key": name, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": name, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": name, "value": {"doubleValue": value}}
+        return {"key": name, "value": {"stringValue": str(value)}}
+
+    def to_otlp(self, span: Span) -> dict:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [self._attribute(name, value) for name, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent is not None:
+            otlp_span["parentSpanId"] = span.parent.span_id
+        return otlp_span
+
+    def flush(self) -> None:
+        """
+        Appends the collected spans to the file and clears them.
+        """
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "src.telemetry"}, "spans": [self.to_otlp(span) for span in spans]}],
+        }]}
+        with open(self.path, "a") as trace_file:
+            trace_file.write(json.dumps(request) + "\n")
+        logger.info(f"Exported {len(spans)} spans to {self.path}")
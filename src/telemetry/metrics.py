@@ -0,0 +1,225 @@
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a cached lookup up to a slow page download
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STAGE_DURATION_METRIC = "pipeline_stage_duration_seconds"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Counter:
+    """
+    A monotonically increasing value per label set.
+    """
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+
+class Histogram:
+    """
+    A distribution of observed values per label set, using cumulative buckets like Prometheus.
+    """
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # label key -> (bucket counts, sum, count)
+        self.values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self.values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+
+class Span:
+    """
+    A timed operation, shaped after the OpenTelemetry span model.
+    """
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, attributes: Dict[str, object],
+                 parent: Optional['Span']):
+        self.registry = registry
+        self.name = name
+        self.attributes = dict(attributes)
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        # Wall-clock timestamps, for exporters; the duration is measured on the monotonic clock
+        self.start_ns = 0
+        self.end_ns = 0
+        self.duration_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+        self._started_ns = 0
+
+    @property
+    def duration(self) -> float:
+        return self.duration_ns / 1e9
+
+    def set_attribute(self, name: str, value: object) -> None:
+        self.attributes[name] = value
+
+    def __enter__(self) -> 'Span':
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._started_ns = time.perf_counter_ns()
+        self.registry.start_span(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        # A clock step (NTP, DST) while the span runs moves neither the duration nor the end before the start
+        self.duration_ns = time.perf_counter_ns() - self._started_ns
+        self.end_ns = self.start_ns + self.duration_ns
+        _current_span.reset(self._token)
+        if exc_val is not None:
+            self.error = repr(exc_val)
+        self.registry.finish_span(self)
+
+
+class _NullSpan:
+    """
+    The span handed out while telemetry is disabled; every operation is a no-op.
+    """
+
+    def set_attribute(self, name: str, value: object) -> None:
+        pass
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class MetricsRegistry:
+    """
+    Holds the counters and histograms of a run and hands finished spans to the registered exporters.
+    """
+
+    def __init__(self):
+        self.counters: Dict[str, Counter] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.span_exporters: List[Callable[[Span], None]] = []
+        self.span_start_hooks: List[Callable[[Span], None]] = []
+        self._lock = threading.Lock()
+        self.histogram(STAGE_DURATION_METRIC, "Wall-clock duration of pipeline stages")
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        with self._lock:
+            if name not in self.counters:
+                self.counters[name] = Counter(name, description)
+            return self.counters[name]
+
+    def histogram(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(name, description, buckets)
+            return self.histograms[name]
+
+    def span(self, name: str, **attributes) -> Span:
+        return Span(self, name, attributes, _current_span.get())
+
+    def start_span(self, span: Span) -> None:
+        for hook in self.span_start_hooks:
+            hook(span)
+
+    def finish_span(self, span: Span) -> None:
+        self.histograms[STAGE_DURATION_METRIC].observe(span.duration, stage=span.name)
+        for exporter in self.span_exporters:
+            exporter(span)
+
+    def add_span_exporter(self, exporter: Callable[[Span], None]) -> None:
+        self.span_exporters.append(exporter)
+
+    def add_span_start_hook(self, hook: Callable[[Span], None]) -> None:
+        """
+        Registers a callback run when a span starts, e.g. to take measurements at stage boundaries.
+        """
+        self.span_start_hooks.append(hook)
+
+
+_registry: Optional[MetricsRegistry] = None
+
+
+def enable(registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    """
+    Turns instrumentation on for the whole process.
+
+    Parameters:
+    registry (Optional[MetricsRegistry]): The registry to record into, a new one by default.
+
+    Returns:
+    MetricsRegistry: The active registry.
+    """
+    global _registry
+    _registry = registry or MetricsRegistry()
+    return _registry
+
+
+def disable() -> None:
+    """
+    Turns instrumentation off; instrumented code then only pays for a global lookup per call.
+    """
+    global _registry
+    _registry = None
+
+
+def get_registry() -> Optional[MetricsRegistry]:
+    return _registry
+
+
+def span(name: str, **attributes):
+    """
+    Starts a timed span for a pipeline stage. Use as a context manager.
+
+    Parameters:
+    name (str): The stage name, e.g. "fetch", "parse" or "download".
+    attributes: Extra span attributes such as the URL being processed.
+    """
+    if _registry is None:
+        return NULL_SPAN
+    return _registry.span(name, **attributes)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    """
+    Increments a counter, e.g. count("pipeline_bytes_total", len(body), stage="download").
+    """
+    if _registry is not None:
+        _registry.counter(name).inc(value, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """
+    Records a value in a histogram.
+    """
+    if _registry is not None:
+        _registry.histogram(name).observe(value, **labels)
@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+from typing import Iterable, List, Optional
+
+from src.utils.url_utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# magic, capacity, error rate, hash count, bit count, item count
+_HEADER = struct.Struct("<4sQdIQQ")
+_MAGIC = b"BLM1"
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter: a bit array probed at hash_count positions per item, derived from a single
+    128-bit BLAKE2b digest by double hashing.
+
+    The bits live in a bytearray, or in a memory-mapped file when a path is given so the filter persists across
+    runs. Membership tests may return false positives at about error_rate once capacity items were added, but
+    never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, path: Optional[str] = None):
+        """
+        Initializes an empty BloomFilter; see open to reuse an existing file.
+
+        Parameters:
+        capacity (int): The number of items the filter is sized for.
+        error_rate (float): The false positive rate at capacity, between 0 and 1.
+        path (Optional[str]): The file backing the filter, overwritten if it exists; in memory only when omitted.
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        if not 0 < error_rate < 1:
+            raise ValueError(f"error_rate must be between 0 and 1, got {error_rate}")
+        self.path = path
+        self._file = None
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.count = 0
+        size = (self.bit_count + 7) // 8
+        if path:
+            with open(path, "wb") as filter_file:
+                filter_file.write(self._header())
+                filter_file.truncate(_HEADER.size + size)
+            self._open(path)
+        else:
+            self._bits = bytearray(size)
+
+    @classmethod
+    def open(cls, path: str) -> 'BloomFilter':
+        """
+        Reopens a filter persisted by a previous run.
+
+        Parameters:
+        path (str): The filter file.
+
+        Returns:
+        BloomFilter: The filter, with the sizing and items it was saved with.
+
+        Raises:
+        ValueError: If the file is not a Bloom filter file.
+        """
+        bloom_filter = cls.__new__(cls)
+        bloom_filter.path = path
+        bloom_filter._file = None
+        bloom_filter._open(path)
+        return bloom_filter
+
+    def _header(self) -> bytes:
+        return _HEADER.pack(_MAGIC, self.capacity, self.error_rate, self.hash_count, self.bit_count, self.count)
+
+    def _open(self, path: str) -> None:
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.capacity, self.error_rate, self.hash_count, self.bit_count, self.count = \
+            _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or len(self._map) != _HEADER.size + (self.bit_count + 7) // 8:
+            self.close()
+            raise ValueError(f"{path} is not a Bloom filter file")
+        self._bits = memoryview(self._map)[_HEADER.size:]
+
+    def _positions(self, item: str) -> List[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.bit_count for i in range(self.hash_count)]
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """
+        Adds an item.
+
+        Parameters:
+        item (str): The item to add.
+
+        Returns:
+        bool: True if the item was (probably) present already, False if it was added.
+        """
+        bits = self._bits
+        present = True
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                present = False
+        if not present:
+            self.count += 1
+        return present
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def flush(self) -> None:
+        if self._file:
+            self._map[:_HEADER.size] = self._header()
+            self._map.flush()
+
+    def close(self) -> None:
+        if self._file:
+            if len(self._map) >= _HEADER.size and self._map[:4] == _MAGIC:
+                self.flush()
+            self._bits = None
+            self._map.close()
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class ScalableBloomFilter:
+    """
+    A Bloom filter that grows: once a filter holds its capacity, a larger one with a tighter error rate is added,
+    so the overall false positive rate stays below error_rate however many items are added.
+
+    With a directory, every filter is a memory-mapped file in it and the seen items persist across runs.
+    """
+
+    def __init__(self, initial_capacity: int = 100_000, error_rate: float = 0.001, growth: int = 4,
+                 tightening: float = 0.5, directory: Optional[str] = None):
+        """
+        Initializes the ScalableBloomFilter, reopening the filters in directory if there are any.
+
+        Parameters:
+        initial_capacity (int): The capacity of the first filter.
+        error_rate (float): The overall false positive rate, between 0 and 1.
+        growth (int): The capacity ratio between consecutive filters.
+        tightening (float): The error rate ratio between consecutive filters.
+        directory (Optional[str]): The folder holding the filter files; in memory only when omitted.
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError(f"error_rate must be between 0 and 1, got {error_rate}")
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.directory = directory
+        self.filters: List[BloomFilter] = []
+        if directory:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            while os.path.exists(self._path(len(self.filters))):
+                self.filters.append(BloomFilter.open(self._path(len(self.filters))))
+            if self.filters:
+                logger.info(f"Loaded {len(self)} seen items from {directory}")
+
+    def _path(self, position: int) -> Optional[str]:
+        return os.path.join(self.directory, f"filter-{position}.bloom") if self.directory else None
+
+    def _grow(self) -> BloomFilter:
+        position = len(self.filters)
+        # The error rates form a geometric series summing to error_rate
+        bloom_filter = BloomFilter(self.initial_capacity * self.growth ** position,
+                                   self.error_rate * (1 - self.tightening) * self.tightening ** position,
+                                   self._path(position))
+        self.filters.append(bloom_filter)
+        return bloom_filter
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in bloom_filter for bloom_filter in self.filters)
+
+    def add(self, item: str) -> bool:
+        """
+        Adds an item.
+
+        Parameters:
+        item (str): The item to add.
+
+        Returns:
+        bool: True if the item was (probably) present already, False if it was added.
+        """
+        if item in self:
+            return True
+        bloom_filter = self.filters[-1] if self.filters and not self.filters[-1].full else self._grow()
+        bloom_filter.add(item)
+        return False
+
+    def flush(self) -> None:
+        for bloom_filter in self.filters:
+            bloom_filter.flush()
+
+    def close(self) -> None:
+        for bloom_filter in self.filters:
+            bloom_filter.close()
+
+    def __len__(self) -> int:
+        return sum(len(bloom_filter) for bloom_filter in self.filters)
+
+
+class SeenUrls:
+    """
+    A class to deduplicate URLs before any request is made, using a ScalableBloomFilter over normalized URLs.
+
+    Checking and marking are separate: unseen filters a batch, and the caller adds a URL once it was fetched,
+    so a URL whose download failed is tried again by the next run. A rare false positive skips a URL that was
+    never fetched.
+    """
+
+    def __init__(self, error_rate: float = 0.001, directory: Optional[str] = None,
+                 initial_capacity: int = 100_000):
+        """
+        Initializes SeenUrls.
+
+        Parameters:
+        error_rate (float): The false positive rate, i.e. the share of new URLs wrongly skipped.
+        directory (Optional[str]): The folder persisting the seen URLs across runs; in memory only when omitted.
+        initial_capacity (int): The number of URLs the first filter is sized for.
+        """
+        self._filter = ScalableBloomFilter(initial_capacity, error_rate, directory=directory)
+        self.skipped = 0
+
+    def unseen(self, urls: Iterable[str]) -> List[str]:
+        """
+        Returns the URLs not seen before, in order, without marking them; see add.
+
+        Parameters:
+        urls (Iterable[str]): The URLs to check.
+
+        Returns:
+        List[str]: The new URLs; duplicates (after normalize_url) are dropped.
+        """
+        new_urls = []
+        batch = set()
+        for url in urls:
+            normalized = normalize_url(url)
+            if normalized in batch or normalized in self._filter:
+                self.skipped += 1
+            else:
+                batch.add(normalized)
+                new_urls.append(url)
+        return new_urls
+
+    def add(self, url: str) -> None:
+        """
+        Marks a URL as seen, once it was fetched.
+        """
+        self._filter.add(normalize_url(url))
+
+    def __contains__(self, url: str) -> bool:
+        return normalize_url(url) in self._filter
+
+    def flush(self) -> None:
+        self._filter.flush()
+
+    def close(self) -> None:
+        self._filter.close()
+
+    def __len__(self) -> int:
+        return len(self._filter)
@@ -0,0 +1,93 @@
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class HammingIndex:
+    """
+    A multi-index hashing table to find, among many fixed-width hashes, one within a Hamming distance of a query.
+
+    Every hash is split into a few disjoint chunks of bits, each indexed in its own dict. Two hashes at most
+    max_distance bits apart differ in at most max_distance // chunks bits in at least one chunk (pigeonhole), so
+    a lookup only visits the buckets of the chunk values that close to the query's, instead of comparing it with
+    every hash. Chunks are sized so that a bucket holds about one hash at capacity, which keeps lookups a few
+    hundred dict probes whatever the number of hashes.
+    """
+
+    def __init__(self, max_distance: int, bits: int = 64, capacity: int = 1_000_000):
+        """
+        Initializes an empty HammingIndex.
+
+        Parameters:
+        max_distance (int): The largest number of differing bits a match may have.
+        bits (int): The width of the hashes.
+        capacity (int): The number of hashes the chunks are sized for; more still work, with fuller buckets.
+        """
+        if not 0 <= max_distance < bits:
+            raise ValueError(f"max_distance must be between 0 and {bits - 1}, got {max_distance}")
+        self.max_distance = max_distance
+        self.bits = bits
+        chunks = max(1, min(max_distance + 1, bits // max(1, capacity.bit_length())))
+        radius = max_distance // chunks
+        # (shift, mask, the XOR flips of at most radius bits) of every chunk; the first chunks are one bit wider
+        self._chunks: List[Tuple[int, int, List[int]]] = []
+        shift = 0
+        for chunk in range(chunks):
+            width = bits // chunks + (chunk < bits % chunks)
+            flips = [sum(1 << bit for bit in flipped) for distance in range(radius + 1)
+                     for flipped in combinations(range(width), distance)]
+            self._chunks.append((shift, (1 << width) - 1, flips))
+            shift += width
+        self._tables: List[Dict[int, List[Tuple[int, Any]]]] = [{} for _ in self._chunks]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, value: int, item: Any = None) -> None:
+        """
+        Indexes a hash.
+
+        Parameters:
+        value (int): The hash.
+        item (Any): What a lookup matching the hash returns, e.g. the name of the image.
+        """
+        entry = (value, item)
+        for (shift, mask, _), table in zip(self._chunks, self._tables):
+            table.setdefault((value >> shift) & mask, []).append(entry)
+        self._count += 1
+
+    def remove(self, value: int, item: Any = None) -> None:
+        """
+        Removes a hash added with the same item; does nothing if it is not indexed.
+        """
+        entry = (value, item)
+        removed = False
+        for (shift, mask, _), table in zip(self._chunks, self._tables):
+            bucket = table.get((value >> shift) & mask)
+            if bucket and entry in bucket:
+                bucket.remove(entry)
+                removed = True
+        self._count -= removed
+
+    def find(self, value: int) -> Optional[Tuple[int, Any]]:
+        """
+        Looks up a hash within max_distance of a query.
+
+        Parameters:
+        value (int): The query hash.
+
+        Returns:
+        Optional[Tuple[int, Any]]: The (distance, item) of the closest indexed hash, or None if none is close
+            enough.
+        """
+        best = None
+        for (shift, mask, flips), table in zip(self._chunks, self._tables):
+            key = (value >> shift) & mask
+            for flip in flips:
+                for candidate, item in table.get(key ^ flip, ()):
+                    distance = (candidate ^ value).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[0]):
+                        if distance == 0:
+                            return 0, item
+                        best = (distance, item)
+        return best
@@ -0,0 +1,66 @@
+import struct
+from typing import Optional, Tuple
+
+# JPEG start-of-frame markers carrying the image size; C4 (DHT), C8 (JPG) and CC (DAC) are not frames
+_JPEG_FRAME_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    offset = 2
+    while offset + 4 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            offset += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            # Markers without a length
+            offset += 2
+            continue
+        (length,) = struct.unpack(">H", data[offset + 2:offset + 4])
+        if marker in _JPEG_FRAME_MARKERS:
+            if offset + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def _webp_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Reads the width and height of a JPEG, PNG, GIF or WebP image from its headers, without decoding it.
+
+    Parameters:
+    data (bytes): The image file, or at least its leading bytes (for JPEG, up to the start-of-frame segment).
+
+    Returns:
+    Optional[Tuple[int, int]]: The (width, height) in pixels, or None for other formats and truncated headers.
+    """
+    try:
+        if data.startswith(b"\x89PNG\r\n\x1a\n") and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])
+        if data.startswith((b"GIF87a", b"GIF89a")):
+            return struct.unpack("<HH", data[6:10])
+        if data.startswith(b"\xff\xd8"):
+            return _jpeg_dimensions(data)
+        if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+            return _webp_dimensions(data)
+    except struct.error:
+        return None
+    return None
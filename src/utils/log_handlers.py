@@ -0,0 +1,113 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from typing import Callable, Hashable
+
+# Arguments of these types cannot change after the call, so their messages can be rendered by the listener thread
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    A formatter that renders every record as a single JSON object (JSON lines).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    A filter that rate limits records per logger and message template with a token bucket.
+
+    Per-item messages (one per image or per row) share a template such as "Processing image: %s", so a burst
+    of them is cut down to `rate` records per second while one-off messages always pass. Messages logged
+    without arguments (e.g. already formatted f-strings) are limited per call site instead, since each of them
+    is a distinct string. The number of suppressed records is appended to the next record that gets through.
+
+    At most max_keys buckets are kept; the least recently used one is dropped first.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 20, clock: Callable[[], float] = time.monotonic,
+                 max_keys: int = 1024):
+        """
+        Initializes the RateLimitFilter.
+
+        Parameters:
+        rate (float): The records per second allowed for each template.
+        burst (int): The records allowed in a burst before rate limiting starts.
+        clock (Callable[[], float]): The time source, in seconds.
+        max_keys (int): The templates and call sites tracked at once.
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(record: logging.LogRecord) -> Hashable:
+        if record.args:
+            return record.name, str(record.msg)
+        return record.name, record.pathname, record.lineno
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = self._key(record)
+        now = self._clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [tokens, last refill, suppressed records]
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    A QueueHandler that leaves message rendering to the listener thread whenever it is safe.
+
+    The standard QueueHandler renders every message in the logging thread before enqueuing it. Records whose
+    arguments are immutable are enqueued as they are, so the event loop only pays for creating the record;
+    records with mutable arguments (which could change before the listener renders them) or exceptions are
+    rendered eagerly as before.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args or ()
+        immutable = (isinstance(record.msg, str) and isinstance(args, tuple)
+                     and all(isinstance(arg, _IMMUTABLE_ARG_TYPES) for arg in args))
+        if record.exc_info or not immutable:
+            return super().prepare(record)
+        return record
@@ -1,7 +1,11 @@
+import atexit
 import logging
-import logging.config
 import os
-import yaml
+from typing import List, Optional
+
+_configured = False
+_listeners: List = []
+
 
 def find_logging_config(filename='custom_logging.yaml'):
     # Define possible locations for the logging configuration file
@@ -15,26 +19,107 @@ def find_logging_config(filename='custom_logging.yaml'):
     # Check each possible location for the configuration file
     for location in possible_locations:
         config_path = os.path.join(location, filename)
-        print(f"Checking {config_path}")
         if os.path.exists(config_path):
-            print(f"Found logging configuration at: {config_path}")
             return config_path
 
     return None
-def setup_logging(default_path='custom_logging.yaml', default_level=logging.INFO):
-    config_path = find_logging_config(default_path)
 
-    if config_path:
-        print(f"Loading logging configuration from: {config_path}")
+
+def _create_log_directories(config):
+    # FileHandler fails when the folder of its log file does not exist yet
+    for handler in config.get('handlers', {}).values():
+        directory = os.path.dirname(handler.get('filename', ''))
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+
+def setup_logging(default_path='custom_logging.yaml', default_level=logging.INFO, force=False, async_logging=False,
+                  json_lines=False, rate_limit: Optional[float] = None, burst=20):
+    """
+    Configures logging once per process; later calls are no-ops unless force is set.
+
+    Parameters:
+    default_path (str): The logging configuration file name, overridden by the LOGGING_CONFIG variable.
+    default_level (int): The level used when no configuration file can be loaded.
+    force (bool): Reconfigure even if logging was already set up.
+    async_logging (bool): Move the configured handlers behind a queue drained by a background thread.
+    json_lines (bool): Render every record as a JSON object.
+    rate_limit (Optional[float]): Records per second allowed for each message template, None for no limit.
+    burst (int): Records allowed per message template before rate limiting starts.
+    """
+    global _configured
+    if _configured and not force:
+        return
+    shutdown_logging()
+    _configured = True
+
+    config_path = os.getenv('LOGGING_CONFIG') or find_logging_config(default_path)
+    if not config_path:
+        logging.basicConfig(level=default_level, force=force)
+        logging.getLogger(__name__).debug("Configuration file not found. Using default logging configuration.")
+    else:
+        import logging.config
+        import yaml
+
         with open(config_path, 'rt') as f:
             config = yaml.safe_load(f.read())
-        print(f"Loaded configuration: {config}")
         try:
+            _create_log_directories(config)
             logging.config.dictConfig(config)
-            print("Logging configured successfully.")
         except Exception as e:
-            print(f"Error configuring logging: {e}")
-            logging.basicConfig(level=default_level)
+            logging.basicConfig(level=default_level, force=force)
+            logging.getLogger(__name__).warning("Error configuring logging from %s: %s", config_path, e)
+
+    loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger) and logger.handlers]
+    if json_lines:
+        from src.utils.log_handlers import JsonFormatter
+
+        for logger in loggers:
+            for handler in logger.handlers:
+                handler.setFormatter(JsonFormatter())
+    if async_logging or rate_limit:
+        for logger in loggers:
+            _wrap_handlers(logger, async_logging, rate_limit, burst)
+    if config_path:
+        logging.getLogger(__name__).debug("Logging configured from %s", config_path)
+
+
+def _wrap_handlers(logger: logging.Logger, async_logging: bool, rate_limit: Optional[float], burst: int) -> None:
+    """
+    Moves the handlers of a logger behind a queue and/or puts a rate limit in front of them.
+    """
+    from src.utils.log_handlers import LazyQueueHandler, RateLimitFilter
+
+    handlers = list(logger.handlers)
+    if not handlers:
+        return
+    if async_logging:
+        import queue
+        from logging.handlers import QueueListener
+
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+        for handler in handlers:
+            logger.removeHandler(handler)
+        front_handlers = [LazyQueueHandler(log_queue)]
+        logger.addHandler(front_handlers[0])
     else:
-        print(f"Configuration file not found. Using default logging configuration.")
-        logging.basicConfig(level=default_level)
+        front_handlers = handlers
+    if rate_limit:
+        # Dropping records before they are queued keeps floods of per-item messages off the event loop too
+        for handler in front_handlers:
+            handler.addFilter(RateLimitFilter(rate_limit, burst))
+
+
+def shutdown_logging():
+    """
+    Stops the queue listeners started by setup_logging, writing out every record still queued.
+    """
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(shutdown_logging)
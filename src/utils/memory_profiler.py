@@ -0,0 +1,235 @@
+import gc
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.telemetry.metrics import MetricsRegistry, Span
+
+logger = logging.getLogger(__name__)
+
+# Allocations between the end of a stage and the start of the next below this are attributed to the next one
+SITES_REUSE_BYTES = 64 * 1024
+
+
+@dataclass
+class StageMemory:
+    """
+    A dataclass to store the traced memory of one pipeline stage, in bytes.
+    """
+    name: str
+    start_bytes: int
+    end_bytes: int = 0
+    # The highest traced memory while the stage ran, nested stages included
+    peak_bytes: int = 0
+    seconds: float = 0.0
+    # The allocation sites that grew the most between the start and the end of the stage
+    top_allocations: List[Dict] = field(default_factory=list)
+
+    @property
+    def retained_bytes(self) -> int:
+        return self.end_bytes - self.start_bytes
+
+    @property
+    def peak_increase_bytes(self) -> int:
+        return self.peak_bytes - self.start_bytes
+
+    def to_dict(self) -> Dict:
+        return dict(asdict(self), retained_bytes=self.retained_bytes, peak_increase_bytes=self.peak_increase_bytes)
+
+
+# Allocation site ("file:line") -> (bytes, blocks) allocated there and still alive
+Sites = Dict[str, Tuple[int, int]]
+
+
+def _top_allocations(before: Sites, after: Sites, top: int) -> List[Dict]:
+    grown = []
+    for site, (size, count) in after.items():
+        size_before, count_before = before.get(site, (0, 0))
+        if size > size_before:
+            grown.append((size - size_before, count - count_before, site))
+    return [{"site": site, "size_diff": size_diff, "count_diff": count_diff}
+            for size_diff, count_diff, site in sorted(grown, reverse=True)[:top]]
+
+
+class MemoryProfiler:
+    """
+    A context manager that accounts the memory of every pipeline stage with tracemalloc and writes a JSON report.
+
+    Stages are the spans of the run: the run itself and the spans directly under it (fetch, parse, extract,
+    transform, download_images...). Deeper spans, such as the downloads of single images, overlap each other and
+    are not accounted separately. At every stage boundary the garbage collector runs and the traced memory is
+    read, so each stage gets the bytes it retained and the peak it reached; with top > 0 a snapshot is also taken
+    and the allocation sites that grew the most are reported. Sites still grown at the end of the profile compared
+    with its start are reported as leak suspects.
+
+    The report is written when the run span ends (after every refresh of a daemon) and on exit. tracemalloc
+    slows the run down severalfold, so this is an instrumentation mode, not for production runs.
+    """
+
+    def __init__(self, output: str, registry: MetricsRegistry, top: int = 10, frames: int = 1, max_depth: int = 1):
+        """
+        Initializes the MemoryProfiler.
+
+        Parameters:
+        output (str): The JSON report file.
+        registry (MetricsRegistry): The registry whose spans delimit the stages.
+        top (int): The number of allocation sites reported per stage, 0 to skip snapshots.
+        frames (int): The stack frames tracemalloc stores per allocation.
+        max_depth (int): The deepest span accounted as a stage, 0 for the run only.
+        """
+        self.output = output
+        self.top = top
+        self.frames = frames
+        self.max_depth = max_depth
+        self.stages: List[StageMemory] = []
+        self.peak_bytes = 0
+        self._registry = registry
+        self._lock = threading.Lock()
+        # (span, stage, allocation sites at its start, perf_counter at its start) of the stages in progress
+        self._open: List[tuple] = []
+        self._baseline: Optional[Sites] = None
+        # The sites and traced bytes of the last snapshot; a stage starting with about as many bytes traced
+        # reuses them instead of taking a snapshot of its own
+        self._last_sites: Optional[Tuple[Sites, int]] = None
+        self._started_tracing = False
+
+    def __enter__(self) -> 'MemoryProfiler':
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._baseline = self._sites()
+        self._registry.add_span_start_hook(self._stage_started)
+        self._registry.add_span_exporter(self._stage_finished)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._registry.span_start_hooks.remove(self._stage_started)
+        self._registry.span_exporters.remove(self._stage_finished)
+        self.write_report()
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def _sites(self) -> Optional[Sites]:
+        if not self.top:
+            return None
+        # Grouping the traces is the slow part (seconds for millions of blocks), so no filter pass is added to it
+        snapshot = tracemalloc.take_snapshot()
+        own_files = (tracemalloc.__file__, __file__)
+        sites = {f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}": (stat.size, stat.count)
+                 for stat in snapshot.statistics("lineno") if stat.traceback[0].filename not in own_files}
+        del snapshot
+        # Only the small per-site totals are kept; the spike of taking the snapshot is no stage's peak
+        tracemalloc.reset_peak()
+        self._last_sites = (sites, tracemalloc.get_traced_memory()[0])
+        return sites
+
+    def _depth(self, span: Span) -> int:
+        depth = 0
+        while span.parent is not None:
+            span = span.parent
+            depth += 1
+        return depth
+
+    def _read(self) -> int:
+        # The peak since the last boundary counts for every stage in progress, then restarts from here
+        current, peak = tracemalloc.get_traced_memory()
+        for _, stage, _, _ in self._open:
+            stage.peak_bytes = max(stage.peak_bytes, peak)
+        self.peak_bytes = max(self.peak_bytes, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _stage_started(self, span: Span) -> None:
+        if self._depth(span) > self.max_depth:
+            return
+        with self._lock:
+            gc.collect()
+            self._read()
+            current = tracemalloc.get_traced_memory()[0]
+            if self._last_sites is not None and abs(current - self._last_sites[1]) <= SITES_REUSE_BYTES:
+                sites = self._last_sites[0]
+            else:
+                sites = self._sites()
+                current = tracemalloc.get_traced_memory()[0]
+            stage = StageMemory(span.name, start_bytes=current, peak_bytes=current)
+            self._open.append((span, stage, sites, time.perf_counter()))
+
+    def _stage_finished(self, span: Span) -> None:
+        with self._lock:
+            position = next((index for index, item in enumerate(self._open) if item[0] is span), None)
+            if position is None:
+                return
+            self._read()
+            _, stage, before, started = self._open.pop(position)
+            gc.collect()
+            stage.end_bytes = tracemalloc.get_traced_memory()[0]
+            stage.seconds = round(time.perf_counter() - started, 6)
+            if before is not None:
+                stage.top_allocations = _top_allocations(before, self._sites(), self.top)
+            self.stages.append(stage)
+        if span.parent is None:
+            self.write_report()
+
+    def totals(self) -> Dict[str, Dict]:
+        """
+        Sums the stages by name, e.g. the extract and transform spans of every table.
+
+        Returns:
+        Dict[str, Dict]: The calls, retained bytes, highest peak increase and seconds of every stage name.
+        """
+        totals: Dict[str, Dict] = {}
+        for stage in self.stages:
+            total = totals.setdefault(stage.name, {"calls": 0, "retained_bytes": 0, "max_peak_increase_bytes": 0,
+                                                   "seconds": 0.0})
+            total["calls"] += 1
+            total["retained_bytes"] += stage.retained_bytes
+            total["max_peak_increase_bytes"] = max(total["max_peak_increase_bytes"], stage.peak_increase_bytes)
+            total["seconds"] = round(total["seconds"] + stage.seconds, 6)
+        return totals
+
+    def report(self) -> Dict:
+        """
+        Builds the memory report.
+
+        Returns:
+        Dict: The traced and peak bytes of the process, the maximum RSS, every stage in the order it finished,
+            the totals by stage and the leak suspects.
+        """
+        with self._lock:
+            gc.collect()
+            traced = self._read()
+            leak_suspects = []
+            if self._baseline is not None:
+                leak_suspects = _top_allocations(self._baseline, self._sites(), self.top)
+            stages = list(self.stages)
+        try:
+            import resource
+
+            # Kilobytes on Linux
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            max_rss = None
+        return {
+            "traced_bytes": traced,
+            "peak_bytes": self.peak_bytes,
+            "max_rss_bytes": max_rss,
+            "tracemalloc_frames": self.frames,
+            "stages": [stage.to_dict() for stage in stages],
+            "totals": self.totals(),
+            "leak_suspects": leak_suspects,
+        }
+
+    def write_report(self) -> None:
+        report = self.report()
+        directory = os.path.dirname(self.output)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.output, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        logger.info(f"Memory report written to {self.output}: peak {report['peak_bytes'] / 2 ** 20:.1f} MiB traced, "
+                    f"{report['traced_bytes'] / 2 ** 20:.1f} MiB still traced")
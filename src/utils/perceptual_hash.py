@@ -0,0 +1,122 @@
+import io
+import math
+from typing import List, Sequence
+
+HASH_ALGORITHMS = ("ahash", "dhash", "phash")
+HASH_BITS = 64
+
+# pHash keeps the 8x8 lowest frequencies of the DCT of a 32x32 thumbnail
+_PHASH_SIZE = 32
+_PHASH_FREQUENCIES = 8
+_DCT = [[math.cos(math.pi * (2 * x + 1) * u / (2 * _PHASH_SIZE)) for x in range(_PHASH_SIZE)]
+        for u in range(_PHASH_FREQUENCIES)]
+
+
+def _bits(flags) -> int:
+    value = 0
+    for flag in flags:
+        value = (value << 1) | bool(flag)
+    return value
+
+
+def average_hash(pixels: Sequence[int]) -> int:
+    """
+    Hashes an 8x8 grayscale thumbnail: one bit per pixel, set when it is brighter than the mean.
+
+    Parameters:
+    pixels (Sequence[int]): The 64 pixels, row by row.
+
+    Returns:
+    int: The 64-bit hash.
+    """
+    mean = sum(pixels) / len(pixels)
+    return _bits(pixel > mean for pixel in pixels)
+
+
+def difference_hash(pixels: Sequence[int]) -> int:
+    """
+    Hashes a 9x8 (width x height) grayscale thumbnail: one bit per pair of horizontal neighbours, set when the
+    left one is brighter.
+
+    Parameters:
+    pixels (Sequence[int]): The 72 pixels, row by row.
+
+    Returns:
+    int: The 64-bit hash.
+    """
+    return _bits(pixels[row * 9 + column] > pixels[row * 9 + column + 1] for row in range(8) for column in range(8))
+
+
+def dct_hash(pixels: Sequence[int]) -> int:
+    """
+    Hashes a 32x32 grayscale thumbnail (pHash): the 8x8 lowest frequencies of its discrete cosine transform, one
+    bit per frequency, set when it is above their median (the DC term, i.e. the mean brightness, left out).
+
+    Parameters:
+    pixels (Sequence[int]): The 1024 pixels, row by row.
+
+    Returns:
+    int: The 64-bit hash.
+    """
+    size = _PHASH_SIZE
+    # The transform is separable: rows first, then the columns of the row transform, low frequencies only
+    rows = [[sum(weight * pixel for weight, pixel in zip(basis, pixels[y * size:(y + 1) * size])) for basis in _DCT]
+            for y in range(size)]
+    coefficients = [sum(basis[y] * rows[y][u] for y in range(size)) for basis in _DCT for u in range(len(_DCT))]
+    median = sorted(coefficients[1:])[len(coefficients) // 2 - 1]
+    return _bits(coefficient > median for coefficient in coefficients)
+
+
+_THUMBNAILS = {"ahash": ((8, 8), average_hash), "dhash": ((9, 8), difference_hash),
+               "phash": ((_PHASH_SIZE, _PHASH_SIZE), dct_hash)}
+
+
+def grayscale_thumbnail(data: bytes, width: int, height: int) -> List[int]:
+    """
+    Decodes an image and shrinks it to a grayscale thumbnail.
+
+    Pillow is an optional dependency and is only imported here.
+
+    Parameters:
+    data (bytes): The image file.
+    width (int): The thumbnail width.
+    height (int): The thumbnail height.
+
+    Returns:
+    List[int]: The width * height pixels, row by row, from 0 (black) to 255.
+    """
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError("Perceptual hashing requires Pillow: pip install Pillow") from e
+    with Image.open(io.BytesIO(data)) as image:
+        # draft lets JPEG decode at a fraction of its size, which is most of the cost for large photos
+        image.draft("L", (width * 4, height * 4))
+        return list(image.convert("L").resize((width, height), Image.BILINEAR).tobytes())
+
+
+def perceptual_hash(data: bytes, algorithm: str = "phash") -> int:
+    """
+    Computes the perceptual hash of an image. Unlike a content hash, images that look alike (resized,
+    re-encoded, slightly cropped or recoloured) get hashes a small Hamming distance apart.
+
+    A module-level function, so it can run in a ProcessPoolExecutor.
+
+    Parameters:
+    data (bytes): The image file.
+    algorithm (str): One of HASH_ALGORITHMS.
+
+    Returns:
+    int: The 64-bit hash.
+
+    Raises:
+    ValueError: If the algorithm is unknown.
+    """
+    if algorithm not in _THUMBNAILS:
+        raise ValueError(f"Unknown hash algorithm '{algorithm}', expected one of {HASH_ALGORITHMS}")
+    (width, height), hash_pixels = _THUMBNAILS[algorithm]
+    return hash_pixels(grayscale_thumbnail(data, width, height))
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
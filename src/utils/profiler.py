@@ -0,0 +1,211 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # ';' separates frames in the collapsed format, so it must not appear inside a label
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    A class to sample the stacks of every running thread at a fixed interval from a background thread.
+
+    The samples are aggregated into collapsed stacks ("root;caller;callee count"), the input format of
+    flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Initializes the SamplingProfiler.
+
+        Parameters:
+        interval (float): Seconds between two samples.
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def write_collapsed(self, path: str) -> None:
+        """
+        Writes the samples as collapsed stacks.
+
+        Parameters:
+        path (str): The destination file.
+        """
+        with open(path, "w") as collapsed_file:
+            for stack, count in self.stacks.most_common():
+                collapsed_file.write(f"{stack} {count}\n")
+
+    def hot_functions(self, top: int) -> List[Tuple[str, int]]:
+        """
+        Returns the functions found most often at the top of the sampled stacks (self time).
+
+        Parameters:
+        top (int): The number of functions to return.
+
+        Returns:
+        List[Tuple[str, int]]: (function, samples) pairs, hottest first.
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(top)
+
+
+class SlowCallbackMonitor(logging.Handler):
+    """
+    A class to record asyncio callbacks and task steps that block the event loop for too long.
+
+    Event loops created while the monitor is installed run in debug mode, where asyncio logs every callback
+    slower than slow_callback_duration; the monitor captures those records instead of parsing logs later.
+    """
+
+    def __init__(self, slow_callback_duration: float = 0.05):
+        """
+        Initializes the SlowCallbackMonitor.
+
+        Parameters:
+        slow_callback_duration (float): Seconds a callback may block the loop before it is recorded.
+        """
+        super().__init__(level=logging.WARNING)
+        self.slow_callback_duration = slow_callback_duration
+        self.slow_callbacks: List[Tuple[str, float]] = []
+        self._previous_policy = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if isinstance(record.msg, str) and record.msg.startswith("Executing") and len(record.args or ()) == 2:
+            handle, duration = record.args
+            self.slow_callbacks.append((str(handle), float(duration)))
+
+    def install(self) -> None:
+        monitor = self
+        base_policy = asyncio.get_event_loop_policy()
+        self._previous_policy = base_policy
+
+        class DebugEventLoopPolicy(type(base_policy)):
+            def new_event_loop(self):
+                loop = super().new_event_loop()
+                loop.set_debug(True)
+                loop.slow_callback_duration = monitor.slow_callback_duration
+                return loop
+
+        asyncio.set_event_loop_policy(DebugEventLoopPolicy())
+        logging.getLogger("asyncio").addHandler(self)
+
+    def uninstall(self) -> None:
+        logging.getLogger("asyncio").removeHandler(self)
+        asyncio.set_event_loop_policy(self._previous_policy)
+
+
+class RunProfiler:
+    """
+    A context manager that profiles a whole run and writes a hot-path report.
+
+    It combines cProfile (exact call counts and cumulative times), a sampling profiler (collapsed stacks
+    for flame graphs) and a slow asyncio callback monitor. On exit it writes:
+        <output>.pstats     raw cProfile data, e.g. for snakeviz
+        <output>.collapsed  collapsed stacks for flamegraph.pl / speedscope
+        <output>.txt        top-N hot functions and the slowest event loop callbacks
+    """
+
+    def __init__(self, output: str = "profile", top: int = 25, interval: float = 0.005,
+                 slow_callback_duration: float = 0.05):
+        """
+        Initializes the RunProfiler.
+
+        Parameters:
+        output (str): The path prefix of the report files.
+        top (int): The number of entries in each section of the summary.
+        interval (float): Seconds between two stack samples.
+        slow_callback_duration (float): Seconds a callback may block the loop before it is reported.
+        """
+        self.output = output
+        self.top = top
+        self._profile = cProfile.Profile()
+        self._sampler = SamplingProfiler(interval)
+        self._monitor = SlowCallbackMonitor(slow_callback_duration)
+
+    def __enter__(self) -> 'RunProfiler':
+        self._monitor.install()
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._profile.disable()
+        self._sampler.stop()
+        self._monitor.uninstall()
+        self.write_report()
+
+    def summary(self) -> str:
+        """
+        Builds the text summary of the run.
+
+        Returns:
+        str: The top functions by cumulative and own time, the hottest sampled frames and the slow callbacks.
+        """
+        buffer = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=buffer)
+        buffer.write(f"=== Top {self.top} functions by cumulative time ===\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        buffer.write(f"=== Top {self.top} functions by own time ===\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+
+        total_samples = sum(self._sampler.stacks.values()) or 1
+        buffer.write(f"=== Top {self.top} sampled frames ({total_samples} samples) ===\n")
+        for function, samples in self._sampler.hot_functions(self.top):
+            buffer.write(f"{samples / total_samples:7.1%}  {samples:7d}  {function}\n")
+
+        slow_callbacks = sorted(self._monitor.slow_callbacks, key=lambda item: item[1], reverse=True)
+        buffer.write(f"\n=== Event loop blocked longer than {self._monitor.slow_callback_duration}s "
+                     f"({len(slow_callbacks)} callbacks) ===\n")
+        for handle, duration in slow_callbacks[:self.top]:
+            buffer.write(f"{duration:8.3f}s  {handle}\n")
+        return buffer.getvalue()
+
+    def write_report(self) -> None:
+        directory = os.path.dirname(self.output)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._profile.dump_stats(f"{self.output}.pstats")
+        self._sampler.write_collapsed(f"{self.output}.collapsed")
+        with open(f"{self.output}.txt", "w") as summary_file:
+            summary_file.write(self.summary())
+        logger.info(f"Profile written to {self.output}.txt, {self.output}.collapsed and {self.output}.pstats")
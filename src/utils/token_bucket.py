@@ -0,0 +1,63 @@
+import asyncio
+import time
+from typing import Callable
+
+from src.telemetry import metrics
+
+DEFAULT_BURST = 64 * 1024
+
+
+class TokenBucket:
+    """
+    A class to cap the byte rate of every stream sharing it, e.g. all image downloads of a run.
+
+    Tokens are bytes, refilled at rate per second up to burst. Each caller reserves the bytes it is about to send,
+    or has just received, and waits until the bucket can pay for them. Reservations are served strictly in arrival
+    order, so streams moving chunks of the same size get an equal share of the rate, and a large chunk delays the
+    callers behind it instead of being starved by smaller ones. Chunks larger than burst put the bucket into debt,
+    which the waits of the next callers pay back, so the long-run rate stays exact.
+
+    The state is a single "paid until" time rather than a token count, so a reservation is O(1) and needs no
+    queue of waiters.
+    """
+
+    def __init__(self, rate: float, burst: int = DEFAULT_BURST, name: str = "bandwidth",
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes the TokenBucket.
+
+        Parameters:
+        rate (float): The bytes per second allowed through.
+        burst (int): The bytes allowed through at once after the bucket was idle.
+        name (str): The direction label of the throttling metric, e.g. "download".
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self._clock = clock
+        # The time at which the reservations made so far are paid for; a full bucket is burst/rate behind now
+        self._paid_until = clock() - burst / rate
+
+    def reserve(self, amount: int) -> float:
+        """
+        Reserves bytes without waiting.
+
+        Parameters:
+        amount (int): The number of bytes.
+
+        Returns:
+        float: The seconds the caller must wait before sending (or after receiving) the bytes.
+        """
+        now = self._clock()
+        self._paid_until = max(self._paid_until, now - self.burst / self.rate) + amount / self.rate
+        delay = max(0.0, self._paid_until - now)
+        if delay:
+            metrics.count("throttled_seconds_total", delay, direction=self.name)
+        return delay
+
+    async def acquire(self, amount: int) -> None:
+        delay = self.reserve(amount)
+        if delay:
+            await asyncio.sleep(delay)
@@ -1,4 +1,5 @@
-from urllib.parse import urljoin
+from urllib.parse import quote, unquote, urljoin, urlsplit, urlunsplit
+
 
 def concat_url(base_url: str, path: str) -> str:
     """
@@ -11,4 +12,32 @@ def concat_url(base_url: str, path: str) -> str:
     Returns:
     str: The complete URL formed by concatenating the base URL with the path.
     """
-    return urljoin(base_url, path)
\ No newline at end of file
+    return urljoin(base_url, path)
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so equivalent spellings compare equal: lowercase scheme and host, no default port, no
+    fragment and a single percent-encoding. Paths stay case-sensitive, as wiki titles are.
+
+    Parameters:
+    url (str): The URL to normalize.
+
+    Returns:
+    str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or _DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=-._~") or "/"
+    return urlunsplit((scheme, netloc, path, parts.query, ""))
@@ -65,5 +65,51 @@ class TestBeautifulSoupHeaderExtractor(unittest.TestCase):
         headers = self.extractor.extract_headers_from_table(self.table)
         self.assertEqual(headers, expected_headers)
 
+    def test_extract_column_headers_expands_colspan(self):
+        headers = self.extractor.extract_column_headers(self.table)
+        self.assertEqual(headers, ['header 1', 'header 2', 'header 3', 'header 3 (2)'])
+
+    def test_extract_column_headers_multi_level(self):
+        self.html = """
+        <table>
+            <tr><th rowspan="2">Animal</th><th colspan="2">Young</th><th rowspan="2">Collateral adjective[a]</th></tr>
+            <tr><th>Male</th><th>Female</th></tr>
+            <tr><td>Cat</td><td>tom</td><td>queen</td><td>feline</td></tr>
+            <tr><th colspan="4">B</th></tr>
+        </table>
+        """
+        self.table = BeautifulSoup(self.html, 'html.parser').find('table')
+        headers = self.extractor.extract_column_headers(self.table)
+        self.assertEqual(headers, ['animal', 'young / male', 'young / female', 'collateral adjective'])
+
+    def test_extract_column_headers_skips_section_dividers(self):
+        self.html = """
+        <table>
+            <tr><th colspan="3">List of animal names</th></tr>
+            <tr><th>Animal</th><th>Young</th><th>Collateral adjective</th></tr>
+            <tr><th colspan="3">A</th></tr>
+            <tr><td>Ant</td><td>antling</td><td>formic</td></tr>
+            <tr><th colspan="3">B</th></tr>
+            <tr><td>Bear</td><td>cub</td><td>ursine</td></tr>
+        </table>
+        """
+        self.table = BeautifulSoup(self.html, 'html.parser').find('table')
+        headers = self.extractor.extract_column_headers(self.table)
+        self.assertEqual(headers, ['animal', 'young', 'collateral adjective'])
+
+    def test_extract_column_headers_reads_thead_only(self):
+        self.html = """
+        <table>
+            <thead><tr><th>Animal</th><th>Collateral adjective</th></tr></thead>
+            <tbody>
+                <tr><th>Mammals</th><th>Adjective</th></tr>
+                <tr><td>Cat</td><td>feline</td></tr>
+            </tbody>
+        </table>
+        """
+        self.table = BeautifulSoup(self.html, 'html.parser').find('table')
+        headers = self.extractor.extract_column_headers(self.table)
+        self.assertEqual(headers, ['animal', 'collateral adjective'])
+
 if __name__ == '__main__':
     unittest.main()
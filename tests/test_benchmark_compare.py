@@ -0,0 +1,44 @@
+import unittest
+
+from benchmarks.compare import compare_results, same_host
+
+
+def results(**stages):
+    return {"scales": {"100": {stage: {"median": seconds} for stage, seconds in stages.items()}}}
+
+
+class TestCompareResults(unittest.TestCase):
+
+    def test_flags_stage_slower_than_threshold(self):
+        regressions = compare_results(results(html_parse=0.010, explode_cells=0.010),
+                                      results(html_parse=0.0105, explode_cells=0.020), threshold=0.25)
+
+        self.assertEqual([(r.scale, r.stage) for r in regressions], [("100", "explode_cells")])
+        self.assertAlmostEqual(regressions[0].ratio, 2.0)
+
+    def test_ignores_stages_below_noise_floor(self):
+        regressions = compare_results(results(find_cells_to_update=0.0001),
+                                      results(find_cells_to_update=0.0005))
+
+        self.assertEqual(regressions, [])
+
+    def test_ignores_stages_and_scales_missing_from_baseline(self):
+        current = results(image_fetch=1.0)
+        current["scales"]["5000"] = {"html_parse": {"median": 3.0}}
+
+        self.assertEqual(compare_results(results(html_parse=0.5), current), [])
+
+
+class TestSameHost(unittest.TestCase):
+
+    def test_only_results_of_the_same_host_compare(self):
+        meta = {"host": "bench-1", "platform": "Linux-6.1-x86_64", "python": "3.11.7"}
+
+        self.assertTrue(same_host({"meta": meta}, {"meta": dict(meta)}))
+        self.assertFalse(same_host({"meta": meta}, {"meta": {**meta, "host": "laptop"}}))
+        self.assertFalse(same_host({"meta": {**meta, "host": None}}, {"meta": {**meta, "host": None}}))
+        self.assertFalse(same_host({}, {"meta": meta}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.commons.exceptions.exception import ImageDataLoaderException
+from src.commons.models.image_data import ImageData
+from src.data_fetchers.image_download_manager import ImageDownloadManager
+from src.storage.image_saver import ImageSaver
+from src.utils.bloom_filter import BloomFilter, ScalableBloomFilter, SeenUrls
+from src.utils.url_utils import normalize_url
+
+
+class TestNormalizeUrl(unittest.TestCase):
+
+    def test_equivalent_spellings_normalize_equal(self):
+        self.assertEqual(normalize_url("HTTPS://En.Wikipedia.org:443/wiki/Ca%c3%afman#Description"),
+                         "https://en.wikipedia.org/wiki/Ca%C3%AFman")
+        self.assertEqual(normalize_url("https://en.wikipedia.org/wiki/Caïman"),
+                         "https://en.wikipedia.org/wiki/Ca%C3%AFman")
+        self.assertEqual(normalize_url("http://example.com"), "http://example.com/")
+
+    def test_keeps_what_changes_the_resource(self):
+        self.assertNotEqual(normalize_url("https://en.wikipedia.org/wiki/Cat"),
+                            normalize_url("https://en.wikipedia.org/wiki/cat"))
+        self.assertEqual(normalize_url("http://example.com:8080/a?b=1"), "http://example.com:8080/a?b=1")
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom_filter = BloomFilter(5000, 0.01)
+        for i in range(5000):
+            bloom_filter.add(f"item-{i}")
+
+        self.assertTrue(all(f"item-{i}" in bloom_filter for i in range(5000)))
+        false_positives = sum(f"other-{i}" in bloom_filter for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.02)
+
+    def test_persists_in_a_memory_mapped_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "seen.bloom")
+            bloom_filter = BloomFilter(100, 0.01, path)
+            self.assertFalse(bloom_filter.add("cat"))
+            self.assertTrue(bloom_filter.add("cat"))
+            bloom_filter.close()
+
+            reopened = BloomFilter.open(path)
+            self.assertIn("cat", reopened)
+            self.assertNotIn("dog", reopened)
+            self.assertEqual(len(reopened), 1)
+            reopened.close()
+
+    def test_rejects_foreign_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "not.bloom")
+            with open(path, "wb") as other_file:
+                other_file.write(b"x" * 64)
+
+            with self.assertRaises(ValueError):
+                BloomFilter.open(path)
+
+
+class TestScalableBloomFilter(unittest.TestCase):
+
+    def test_grows_past_its_initial_capacity(self):
+        bloom_filter = ScalableBloomFilter(initial_capacity=100, error_rate=0.01)
+        for i in range(2000):
+            bloom_filter.add(f"item-{i}")
+
+        self.assertGreater(len(bloom_filter.filters), 1)
+        self.assertTrue(all(f"item-{i}" in bloom_filter for i in range(2000)))
+        false_positives = sum(f"other-{i}" in bloom_filter for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.02)
+
+    def test_reopens_every_filter_of_a_directory(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            bloom_filter = ScalableBloomFilter(initial_capacity=50, error_rate=0.01, directory=temp_dir)
+            for i in range(300):
+                bloom_filter.add(f"item-{i}")
+            bloom_filter.close()
+
+            reopened = ScalableBloomFilter(initial_capacity=50, error_rate=0.01, directory=temp_dir)
+            self.assertEqual(len(reopened.filters), len(bloom_filter.filters))
+            self.assertTrue(all(f"item-{i}" in reopened for i in range(300)))
+            reopened.close()
+
+
+class TestSeenUrls(unittest.TestCase):
+
+    def test_unseen_drops_duplicates_after_normalization(self):
+        seen_urls = SeenUrls()
+
+        first = seen_urls.unseen(["https://en.wikipedia.org/wiki/Cat", "https://EN.wikipedia.org/wiki/Cat#Range",
+                                  "https://en.wikipedia.org/wiki/Dog"])
+        seen_urls.add("https://en.wikipedia.org/wiki/Dog")
+        second = seen_urls.unseen(["https://en.wikipedia.org/wiki/Dog", "https://en.wikipedia.org/wiki/Wolf"])
+
+        self.assertEqual(first, ["https://en.wikipedia.org/wiki/Cat", "https://en.wikipedia.org/wiki/Dog"])
+        self.assertEqual(second, ["https://en.wikipedia.org/wiki/Wolf"])
+        self.assertEqual(seen_urls.skipped, 2)
+
+    def test_unseen_does_not_mark_urls_as_seen(self):
+        seen_urls = SeenUrls()
+
+        seen_urls.unseen(["https://en.wikipedia.org/wiki/Cat"])
+
+        self.assertNotIn("https://en.wikipedia.org/wiki/Cat", seen_urls)
+        self.assertEqual(seen_urls.unseen(["https://en.wikipedia.org/wiki/Cat"]), ["https://en.wikipedia.org/wiki/Cat"])
+
+
+class TestImageDownloadManagerDedup(unittest.IsolatedAsyncioTestCase):
+
+    async def test_seen_articles_and_images_are_not_requested(self):
+        seen_urls = SeenUrls()
+        seen_urls.add("http://example.com/page1")
+        seen_urls.add("http://example.com/old.jpg")
+        saver = MagicMock(ImageSaver)
+        saver.save_image = AsyncMock()
+        manager = ImageDownloadManager(["http://example.com/page1", "http://example.com/page2"], saver=saver,
+                                       seen_urls=seen_urls)
+        manager._link_extractor.load_all_image_links = AsyncMock(
+            return_value=["http://example.com/old.jpg", "http://example.com/new.jpg", "http://example.com/new.jpg"])
+        manager._data_loader.fetch_image_data = AsyncMock(return_value=ImageData(name="new.jpg", data=b"data"))
+
+        await manager.run()
+
+        manager._link_extractor.load_all_image_links.assert_called_once_with(["http://example.com/page2"])
+        manager._data_loader.fetch_image_data.assert_called_once()
+        self.assertEqual(manager._data_loader.fetch_image_data.call_args.args[1], "http://example.com/new.jpg")
+        self.assertIn("http://example.com/new.jpg", seen_urls)
+        self.assertIn("http://example.com/page2", seen_urls)
+
+    async def test_failed_download_is_retried_by_the_next_run(self):
+        links = ["http://example.com/cat.jpg", "http://example.com/dog.jpg"]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for attempt in range(2):
+                seen_urls = SeenUrls(directory=temp_dir)
+                saver = MagicMock(ImageSaver)
+                saver.save_image = AsyncMock()
+                manager = ImageDownloadManager(["http://example.com/page"], saver=saver, seen_urls=seen_urls)
+                manager._link_extractor.load_all_image_links = AsyncMock(return_value=links)
+                manager._data_loader.fetch_image_data = AsyncMock(side_effect=[
+                    ImageData(name="cat.jpg", data=b"cat"),
+                    ImageDataLoaderException("Failed to fetch image", links[1]) if attempt == 0
+                    else ImageData(name="dog.jpg", data=b"dog")])
+
+                completed = await manager.run()
+                page_seen = "http://example.com/page" in seen_urls
+                seen_urls.close()
+
+                if attempt == 0:
+                    self.assertFalse(completed)
+                    self.assertFalse(page_seen)
+                    self.assertEqual(manager._data_loader.fetch_image_data.call_count, 2)
+
+            self.assertTrue(completed)
+            self.assertTrue(page_seen)
+            manager._data_loader.fetch_image_data.assert_called_once()
+            self.assertEqual(manager._data_loader.fetch_image_data.call_args.args[1], links[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.data_fetchers.session_pool import open_session
+from src.manager.daemon import RefreshDaemon, WarmRuntime
+from src.manager.workflow_manager import WorkflowManager
+from src.telemetry import metrics
+
+
+class TestWarmRuntime(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = WarmRuntime()
+        self.peers = []
+
+        async def peer(request):
+            self.peers.append(request.transport.get_extra_info("peername")[1])
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_get("/", peer)
+        self.server = TestServer(app)
+        self.runtime.run(self.server.start_server())
+
+    def tearDown(self):
+        self.runtime.run(self.server.close())
+        self.runtime.close()
+        metrics.disable()
+
+    def fetch(self):
+        async def get():
+            async with open_session(self.runtime.sessions, "pages") as session:
+                async with session.get(self.server.make_url("/")) as response:
+                    return await response.text()
+
+        return self.runtime.run(get())
+
+    def test_runs_reuse_the_pooled_connection(self):
+        self.assertEqual(self.fetch(), "ok")
+        self.assertEqual(self.fetch(), "ok")
+
+        self.assertEqual(len(self.peers), 2)
+        self.assertEqual(self.peers[0], self.peers[1])
+
+    def test_coroutines_run_in_the_callers_context(self):
+        registry = metrics.enable()
+        finished = []
+        registry.add_span_exporter(finished.append)
+
+        async def stage():
+            with metrics.span("download"):
+                pass
+
+        with metrics.span("run") as run_span:
+            self.runtime.run(stage())
+
+        self.assertIs(finished[0].parent, run_span)
+
+    def test_workflow_manager_runs_on_the_runtime_loop(self):
+        manager = WorkflowManager("https://example.com/list", "https://en.wikipedia.org", runtime=self.runtime)
+
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        self.assertIs(manager.run_async(current_loop()), self.runtime.loop)
+        self.assertIs(manager.sessions, self.runtime.sessions)
+
+
+class TestRefreshDaemon(unittest.TestCase):
+
+    def setUp(self):
+        metrics.enable()
+        self.refreshed = threading.Semaphore(0)
+        self.fail = False
+        self.daemon = RefreshDaemon(self.refresh, port=0)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.stop()
+        self.thread.join(5)
+        metrics.disable()
+
+    def refresh(self):
+        try:
+            if self.fail == "raise":
+                raise RuntimeError("page unavailable")
+            return not self.fail
+        finally:
+            self.refreshed.release()
+
+    def request(self, path, method="GET"):
+        request = urllib.request.Request(f"http://127.0.0.1:{self.daemon.port}{path}", method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, response.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode("utf-8")
+
+    def wait_for_refresh(self):
+        self.assertTrue(self.refreshed.acquire(timeout=5))
+        # The state is updated right after the refresh callable returns
+        deadline = time.monotonic() + 5
+        while self.daemon.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_binds_the_loopback_interface_by_default(self):
+        self.wait_for_refresh()
+        self.assertEqual(self.daemon._server.server_address[0], "127.0.0.1")
+
+    def test_refreshes_at_startup_and_on_trigger(self):
+        self.wait_for_refresh()
+
+        status, body = self.request("/refresh", method="POST")
+        self.assertEqual(status, 202)
+        self.wait_for_refresh()
+
+        self.assertEqual(self.daemon.refreshes, 2)
+        status, body = self.request("/healthz")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["status"], "ok")
+        status, body = self.request("/metrics")
+        self.assertIn('refreshes_total{outcome="ok"} 2', body)
+        self.assertIn("refresh_duration_seconds_count 2", body)
+
+    def test_failed_refreshes_turn_health_red(self):
+        self.wait_for_refresh()
+        self.fail = "raise"
+        self.request("/refresh", method="POST")
+        self.wait_for_refresh()
+
+        status, body = self.request("/healthz")
+        self.assertEqual(status, 503)
+        self.assertEqual(json.loads(body)["last_error"], "page unavailable")
+
+        self.fail = True
+        self.request("/refresh", method="POST")
+        self.wait_for_refresh()
+        self.assertEqual(json.loads(self.request("/healthz")[1])["failures"], 2)
+
+        self.fail = False
+        self.request("/refresh", method="POST")
+        self.wait_for_refresh()
+        self.assertEqual(self.request("/healthz")[0], 200)
+        self.assertEqual(self.request("/nothing")[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
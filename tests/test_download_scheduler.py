@@ -0,0 +1,181 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.commons.models.image_data import ImageData
+from src.commons.models.workflow_options import WorkflowOptions
+from src.data_fetchers.download_scheduler import DownloadScheduler, FailureLog, ScheduleReport
+from src.data_fetchers.image_download_manager import ImageDownloadManager
+from src.manager.workflow_manager import WorkflowManager
+
+LINKS_BY_PAGE = {
+    "https://en.wikipedia.org/wiki/Fox": ["https://upload.wikimedia.org/fox1.jpg",
+                                          "https://upload.wikimedia.org/fox2.jpg",
+                                          "https://upload.wikimedia.org/fox3.jpg"],
+    "https://en.wikipedia.org/wiki/Owl": ["https://upload.wikimedia.org/owl1.jpg",
+                                          "https://upload.wikimedia.org/owl2.jpg"],
+    "https://en.wikipedia.org/wiki/Elk": ["https://upload.wikimedia.org/elk1.jpg"],
+}
+
+
+def names(tasks):
+    return [task.url.rsplit("/", 1)[1] for task in tasks]
+
+
+class TestPlan(unittest.TestCase):
+
+    def test_first_images_of_every_article_go_first(self):
+        tasks = DownloadScheduler().plan(LINKS_BY_PAGE)
+
+        self.assertEqual(names(tasks), ["fox1.jpg", "owl1.jpg", "elk1.jpg", "fox2.jpg", "owl2.jpg", "fox3.jpg"])
+
+    def test_failed_images_and_priorities(self):
+        priorities = {"https://en.wikipedia.org/wiki/Fox": 3, "https://en.wikipedia.org/wiki/Owl": 1,
+                      "https://en.wikipedia.org/wiki/Elk": 2}
+        scheduler = DownloadScheduler(priority=priorities.get, failed_before=["https://upload.wikimedia.org/owl1.jpg"])
+
+        tasks = scheduler.plan(LINKS_BY_PAGE)
+
+        # A failed first image still goes before every extra
+        self.assertEqual(names(tasks), ["elk1.jpg", "fox1.jpg", "owl1.jpg", "owl2.jpg", "fox2.jpg", "fox3.jpg"])
+
+    def test_shared_images_are_planned_once_at_their_best_rank(self):
+        shared = "https://upload.wikimedia.org/map.png"
+        tasks = DownloadScheduler().plan({"https://en.wikipedia.org/wiki/Fox": ["https://upload.wikimedia.org/fox.jpg",
+                                                                                shared],
+                                          "https://en.wikipedia.org/wiki/Owl": [shared]})
+
+        self.assertEqual(names(tasks), ["fox.jpg", "map.png"])
+        self.assertEqual((tasks[1].page, tasks[1].rank), ("https://en.wikipedia.org/wiki/Owl", 0))
+
+
+class TestRun(unittest.IsolatedAsyncioTestCase):
+
+    async def test_runs_in_priority_order(self):
+        scheduler = DownloadScheduler(concurrency=1)
+        started = []
+
+        async def process(task):
+            started.append(task)
+            return "fox" not in task.url
+
+        report = await scheduler.run(scheduler.plan(LINKS_BY_PAGE), process)
+
+        self.assertEqual(names(started), names(scheduler.plan(LINKS_BY_PAGE)))
+        self.assertEqual(names(report.done), ["owl1.jpg", "elk1.jpg", "owl2.jpg"])
+        self.assertEqual(names(report.failed), ["fox1.jpg", "fox2.jpg", "fox3.jpg"])
+        self.assertEqual((report.left, report.budget_reached), ([], False))
+
+    async def test_budget_drains_in_flight_work_and_reports_the_rest(self):
+        scheduler = DownloadScheduler(concurrency=2, budget=0.1, drain_timeout=0.3)
+        delays = {"fox1.jpg": 0.05, "owl1.jpg": 0.2, "elk1.jpg": 0.03, "fox2.jpg": 5}
+
+        async def process(task):
+            await asyncio.sleep(delays.get(names([task])[0], 0.05))
+            return True
+
+        started = time.monotonic()
+        report = await scheduler.run(scheduler.plan(LINKS_BY_PAGE), process)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(report.budget_reached)
+        # owl1 finished while draining; fox2 outlived the drain timeout and was cancelled
+        self.assertEqual(names(report.done), ["fox1.jpg", "elk1.jpg", "owl1.jpg"])
+        self.assertEqual(names(report.left), ["fox2.jpg", "owl2.jpg", "fox3.jpg"])
+        self.assertEqual(report.pages_without_image, [])
+        self.assertIn("3 left undone by the time budget", str(report))
+
+    async def test_exceptions_count_as_failures(self):
+        scheduler = DownloadScheduler()
+
+        async def process(task):
+            raise RuntimeError("boom")
+
+        report = await scheduler.run(scheduler.plan({"https://en.wikipedia.org/wiki/Elk": LINKS_BY_PAGE[
+            "https://en.wikipedia.org/wiki/Elk"]}), process)
+
+        self.assertEqual(names(report.failed), ["elk1.jpg"])
+        self.assertEqual(report.pages_without_image, ["https://en.wikipedia.org/wiki/Elk"])
+
+
+class TestFailureLog(unittest.TestCase):
+
+    def test_round_trip(self):
+        tasks = DownloadScheduler().plan(LINKS_BY_PAGE)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "state", "failed.json")
+            log = FailureLog(path)
+            log.update(ScheduleReport(done=tasks[:2], failed=tasks[2:4]))
+            log.save()
+
+            log = FailureLog(path)
+            self.assertEqual(log.urls, {tasks[2].url, tasks[3].url})
+            log.update(ScheduleReport(done=[tasks[2]]))
+            self.assertEqual(log.urls, {tasks[3].url})
+
+    def test_unreadable_logs_are_ignored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "failed.json")
+            with open(path, "w") as log_file:
+                log_file.write("{not json")
+
+            self.assertEqual(FailureLog(path).urls, set())
+
+
+class ImageNameLoader:
+    policy = None
+
+    async def fetch_image_data(self, session, img_url):
+        if "slow" in img_url:
+            await asyncio.sleep(10)
+        return ImageData(name=img_url.rsplit("/", 1)[1], data=b"\xff\xd8\xff")
+
+
+class TestConcurrency(unittest.IsolatedAsyncioTestCase):
+
+    async def test_downloads_follow_max_concurrent_requests(self):
+        manager = WorkflowManager("https://en.wikipedia.org/wiki/List_of_animal_names", "https://en.wikipedia.org",
+                                  options=WorkflowOptions(max_concurrent_requests=7))
+        self.assertEqual(manager.create_scheduler().concurrency, 7)
+
+        downloads = ImageDownloadManager([], MagicMock(), max_concurrent_requests=7)
+        async with downloads._session() as session:
+            self.assertEqual((session.connector.limit, session.connector.limit_per_host), (7, 7))
+
+
+class TestScheduledManager(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        link_extractor = MagicMock()
+        link_extractor.load_image_links_by_page = AsyncMock(return_value={
+            "https://en.wikipedia.org/wiki/Fox": ["https://upload.wikimedia.org/slow.jpg",
+                                                  "https://upload.wikimedia.org/fox.jpg"],
+            "https://en.wikipedia.org/wiki/Owl": ["https://upload.wikimedia.org/owl.jpg"],
+        })
+        self.saver = MagicMock()
+        self.saver.save_image = AsyncMock()
+        self.manager = ImageDownloadManager(list(link_extractor.load_image_links_by_page.return_value), self.saver,
+                                            link_extractor=link_extractor, data_loader=ImageNameLoader(),
+                                            scheduler=DownloadScheduler(concurrency=1, budget=0.1,
+                                                                        drain_timeout=0.1))
+
+    async def test_run_reports_what_the_budget_left(self):
+        await self.manager.run()
+
+        self.assertEqual(self.saver.save_image.await_args_list, [])
+        self.assertEqual(names(self.manager.schedule_report.left), ["slow.jpg", "owl.jpg", "fox.jpg"])
+
+    async def test_run_by_page_leaves_out_articles_with_undone_images(self):
+        self.manager._scheduler.concurrency = 2
+
+        images_by_url = await self.manager.run_by_page()
+
+        self.assertEqual(images_by_url, {"https://en.wikipedia.org/wiki/Owl": ["owl.jpg"]})
+        self.assertEqual(names(self.manager.schedule_report.left), ["slow.jpg"])
+
+
+if __name__ == '__main__':
+    unittest.main()
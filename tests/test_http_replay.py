@@ -0,0 +1,140 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+import aiohttp
+import requests
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.data_fetchers.image_link_extractor import ImageLinkExtractor
+from src.replay.http_archive import HttpArchive
+from src.replay.http_replay import HttpReplay
+
+
+class TestHttpReplay(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        async def article(request):
+            return web.Response(text='<html><body><img src="/images/fox.jpg"/></body></html>',
+                                content_type='text/html')
+
+        async def image(request):
+            body = b"\xff\xd8\xff" + b"x" * 1000
+            if request.http_range.start is not None:
+                return web.Response(status=206, body=body[request.http_range], content_type='image/jpeg',
+                                    headers={'Content-Range': f"bytes {request.http_range.start}-1002/1003"})
+            return web.Response(body=body, content_type='image/jpeg')
+
+        app = web.Application()
+        app.router.add_get('/wiki/Fox', article)
+        app.router.add_get('/images/fox.jpg', image)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive_path = os.path.join(self.temp_dir.name, "fixtures", "run.jsonl.gz")
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self.temp_dir.cleanup()
+
+    async def record(self):
+        article_url = str(self.server.make_url('/wiki/Fox'))
+        with HttpReplay(self.archive_path, mode="record"):
+            page = await asyncio.to_thread(requests.get, article_url)
+            image_links = await ImageLinkExtractor().load_all_image_links([article_url])
+            async with aiohttp.ClientSession() as session:
+                image_data = await ImageDataLoader().fetch_image_data(session, image_links[0])
+        return article_url, page, image_links, image_data
+
+    async def test_record_writes_archive(self):
+        article_url, page, image_links, image_data = await self.record()
+
+        archive = HttpArchive.load(self.archive_path)
+        self.assertEqual(len(archive), 2)
+        self.assertEqual(archive.get("GET", article_url).body, page.content)
+        self.assertEqual(archive.get("GET", image_links[0]).body, image_data.data)
+        self.assertEqual(archive.get("GET", image_links[0]).headers['Content-Length'], "1003")
+
+    async def test_replay_serves_recorded_responses_offline(self):
+        article_url, page, image_links, image_data = await self.record()
+        await self.server.close()
+
+        with HttpReplay(self.archive_path, mode="replay"):
+            replayed_page = await asyncio.to_thread(requests.get, article_url)
+            replayed_links = await ImageLinkExtractor().load_all_image_links([article_url])
+            async with aiohttp.ClientSession() as session:
+                replayed_image = await ImageDataLoader().fetch_image_data(session, image_links[0])
+
+        self.assertEqual(replayed_page.text, page.text)
+        self.assertEqual(replayed_links, image_links)
+        self.assertEqual(replayed_image, image_data)
+
+    async def test_replay_missing_response_raises_connection_error(self):
+        await self.record()
+
+        with HttpReplay(self.archive_path, mode="replay"):
+            with self.assertRaises(requests.ConnectionError):
+                await asyncio.to_thread(requests.get, "http://example.com/unknown")
+            async with aiohttp.ClientSession() as session:
+                with self.assertRaises(aiohttp.ClientConnectionError):
+                    await session.get("http://example.com/unknown")
+
+    async def test_replay_injects_latency_and_bandwidth(self):
+        _, _, image_links, _ = await self.record()
+
+        with HttpReplay(self.archive_path, mode="replay", latency=0.05, bandwidth=10_000):
+            start = time.monotonic()
+            async with aiohttp.ClientSession() as session:
+                await ImageDataLoader().fetch_image_data(session, image_links[0])
+            elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 0.05 + 1003 / 10_000)
+
+    async def test_range_and_head_requests_are_recorded_apart(self):
+        image_url = str(self.server.make_url('/images/fox.jpg'))
+
+        async def fetch_all():
+            async with aiohttp.ClientSession() as session:
+                async with session.head(image_url) as response:
+                    head = (response.status, response.content_length, await response.read())
+                async with session.get(image_url, headers={'Range': 'bytes=1000-'}) as response:
+                    partial = (response.status, await response.read())
+                async with session.get(image_url, params={'width': '120'}) as response:
+                    full = (response.status, b"".join([chunk async for chunk in response.content.iter_chunked(64)]))
+            return head, partial, full
+
+        with HttpReplay(self.archive_path, mode="record"):
+            recorded = await fetch_all()
+        await self.server.close()
+        with HttpReplay(self.archive_path, mode="replay"):
+            replayed = await fetch_all()
+
+        self.assertEqual(recorded, ((200, 1003, b""), (206, b"xxx"), (200, b"\xff\xd8\xff" + b"x" * 1000)))
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(len(HttpArchive.load(self.archive_path)), 3)
+
+
+    async def test_recorded_bodies_are_streamed_to_the_caller(self):
+        image_url = str(self.server.make_url('/images/fox.jpg'))
+        article_url = str(self.server.make_url('/wiki/Fox'))
+
+        with HttpReplay(self.archive_path, mode="record") as replay:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(image_url) as response:
+                    first = await response.content.read(64)
+                    self.assertIsNone(replay.archive.get("GET", image_url))
+                    rest = b"".join([chunk async for chunk in response.content.iter_chunked(64)])
+                self.assertEqual(replay.archive.get("GET", image_url).body, first + rest)
+                # A body left unread is still recorded whole once the response is released
+                async with session.get(article_url) as response:
+                    self.assertEqual(response.status, 200)
+
+        self.assertEqual(first + rest, b"\xff\xd8\xff" + b"x" * 1000)
+        self.assertIn(b"fox.jpg", HttpArchive.load(self.archive_path).get("GET", article_url).body)
+
+if __name__ == '__main__':
+    unittest.main()
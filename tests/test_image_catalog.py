@@ -0,0 +1,201 @@
+import hashlib
+import os
+import struct
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.commons.models.col_details import ColDetails
+from src.commons.models.image_data import ImageData
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+from src.commons.models.workflow_options import WorkflowOptions
+from src.data_fetchers.download_scheduler import DownloadScheduler
+from src.data_fetchers.image_download_manager import ImageDownloadManager
+from src.manager.workflow_manager import WorkflowManager
+from src.storage.file_system_saver import FileSystemSaver
+from src.storage.image_catalog import FIND_BY_VALUE_SQL, ImageCatalog
+from src.utils.image_headers import image_dimensions
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, height, width, 3) + b"\x01\x22\x00\x02\x11\x01\x03\x11\x01"
+    return b"\xff\xd8" + app0 + sof0 + b"\xff\xda" + b"\x00" * 32
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x02"
+
+
+FOX = "https://en.wikipedia.org/wiki/Fox"
+OWL = "https://en.wikipedia.org/wiki/Owl"
+FOX_IMAGE = "https://upload.wikimedia.org/fox.jpg"
+FOX_MAP = "https://upload.wikimedia.org/fox_range.png"
+OWL_IMAGE = "https://upload.wikimedia.org/owl.jpg"
+
+
+class TestImageDimensions(unittest.TestCase):
+
+    def test_formats(self):
+        self.assertEqual(image_dimensions(jpeg(640, 480)), (640, 480))
+        self.assertEqual(image_dimensions(png(1024, 768)), (1024, 768))
+        self.assertEqual(image_dimensions(b"GIF89a" + struct.pack("<HH", 32, 16) + b"\x00" * 4), (32, 16))
+        webp = b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x00" * 8 + (299).to_bytes(3, "little") + (199).to_bytes(3, "little")
+        self.assertEqual(image_dimensions(webp), (300, 200))
+
+    def test_unknown_and_truncated_headers(self):
+        self.assertIsNone(image_dimensions(b"<html></html>"))
+        self.assertIsNone(image_dimensions(jpeg(640, 480)[:24]))
+        self.assertIsNone(image_dimensions(b"\x89PNG\r\n\x1a\n\x00\x00"))
+
+
+class TestImageCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "catalog", "images.db")
+        self.catalog = ImageCatalog(self.path)
+        self.catalog.replace_rows("https://en.wikipedia.org/wiki/List_of_animal_names", [
+            ({"collateral adjective": "vulpine", "animal": "Fox"}, FOX),
+            ({"collateral adjective": "strigine", "animal": "Owl"}, OWL),
+        ])
+        self.catalog.add_links({FOX: [FOX_IMAGE, FOX_MAP], OWL: [OWL_IMAGE]})
+        self.catalog.add_image(FOX_IMAGE, ImageData("fox.jpg", jpeg(640, 480)))
+        self.catalog.add_image(FOX_MAP, ImageData("fox_range.png", png(300, 200)))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.temp_dir.cleanup()
+
+    def test_find_by_any_column(self):
+        entries = self.catalog.find("animal", "FOX")
+
+        self.assertEqual([entry.key for entry in entries], ["fox.jpg", "fox_range.png"])
+        fox = entries[0]
+        self.assertEqual((fox.width, fox.height, fox.content_type), (640, 480, "image/jpeg"))
+        self.assertEqual(fox.size, len(jpeg(640, 480)))
+        self.assertEqual(fox.values, {"collateral adjective": "vulpine", "animal": "Fox"})
+        self.assertEqual(fox.article_url, FOX)
+        self.assertEqual([entry.key for entry in self.catalog.find("collateral adjective", "vulpine")],
+                         ["fox.jpg", "fox_range.png"])
+        # The owl's image was never stored
+        self.assertEqual(self.catalog.find("animal", "owl"), [])
+        self.assertEqual(self.catalog.find("collateral adjective", "fox"), [])
+
+    def test_find_by_image(self):
+        sha256 = hashlib.sha256(png(300, 200)).hexdigest()
+
+        self.assertEqual([entry.key for entry in self.catalog.find_by_hash(sha256)], ["fox_range.png"])
+        self.assertEqual(self.catalog.find_by_source(FOX_IMAGE).sha256, hashlib.sha256(jpeg(640, 480)).hexdigest())
+        self.assertEqual(self.catalog.find_by_key("fox.jpg")[0].source_url, FOX_IMAGE)
+        self.assertIsNone(self.catalog.find_by_source(OWL_IMAGE))
+
+    def test_lookups_use_indexes(self):
+        queries = [
+            (FIND_BY_VALUE_SQL, ("animal", "fox")),
+            ("SELECT key FROM images WHERE sha256 = ?", ("0" * 64,)),
+            ("SELECT key FROM images WHERE key = ?", ("fox.jpg",)),
+        ]
+        for sql, parameters in queries:
+            plan = [row[-1] for row in self.catalog._connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)]
+            self.assertFalse([step for step in plan if step.startswith("SCAN")], plan)
+
+    def test_rows_and_links_are_replaced_and_persisted(self):
+        self.catalog.replace_rows("https://en.wikipedia.org/wiki/List_of_animal_names",
+                                  [({"collateral adjective": "vulpine", "animal": "Red fox"}, FOX)])
+        self.catalog.add_links({FOX: [FOX_MAP]})
+        self.catalog.commit()
+
+        reopened = ImageCatalog(self.path)
+        try:
+            self.assertEqual(reopened.find("animal", "fox"), [])
+            self.assertEqual([entry.key for entry in reopened.find("animal", "red fox")], ["fox_range.png"])
+            self.assertEqual(len(reopened.entries()), 1)
+        finally:
+            reopened.close()
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_export(self):
+        path = os.path.join(self.temp_dir.name, "catalog.parquet")
+
+        self.assertEqual(self.catalog.export_parquet(path), 2)
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.column("animal").to_pylist(), ["Fox", "Fox"])
+
+
+class ImageLoader:
+    policy = None
+
+    async def fetch_image_data(self, session, img_url):
+        return ImageData(name=img_url.rsplit("/", 1)[1], data=jpeg(64, 48))
+
+
+class TestCatalogedRuns(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.catalog = ImageCatalog(os.path.join(self.temp_dir.name, "images.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.temp_dir.cleanup()
+
+    async def test_downloads_are_recorded(self):
+        link_extractor = MagicMock()
+        link_extractor.load_image_links_by_page = AsyncMock(return_value={FOX: [FOX_IMAGE], OWL: [OWL_IMAGE]})
+        saver = MagicMock()
+        saver.save_image = AsyncMock()
+        manager = ImageDownloadManager([FOX, OWL], saver, link_extractor=link_extractor, data_loader=ImageLoader(),
+                                       scheduler=DownloadScheduler(), catalog=self.catalog)
+
+        await manager.run()
+
+        self.catalog.replace_rows("list", [({"animal": "Owl"}, OWL)])
+        entries = self.catalog.find("animal", "owl")
+        self.assertEqual([(entry.key, entry.width, entry.height) for entry in entries], [("owl.jpg", 64, 48)])
+
+    async def test_failed_saves_are_not_recorded(self):
+        link_extractor = MagicMock()
+        link_extractor.load_image_links_by_page = AsyncMock(return_value={FOX: [FOX_IMAGE], OWL: [OWL_IMAGE]})
+        saver = FileSystemSaver(os.path.join(self.temp_dir.name, "images"))
+        # A folder in the way of fox.jpg makes its write fail
+        os.mkdir(os.path.join(saver.download_folder, "fox.jpg"))
+        manager = ImageDownloadManager([FOX, OWL], saver, link_extractor=link_extractor, data_loader=ImageLoader(),
+                                       scheduler=DownloadScheduler(), catalog=self.catalog)
+
+        with self.assertLogs("src.storage.file_system_saver", "ERROR"):
+            await manager.run()
+
+        self.catalog.replace_rows("list", [({"animal": "Fox"}, FOX), ({"animal": "Owl"}, OWL)])
+        self.assertEqual(self.catalog.find("animal", "fox"), [])
+        self.assertEqual([entry.key for entry in self.catalog.find("animal", "owl")], ["owl.jpg"])
+
+    def test_workflow_records_rows_of_successful_runs(self):
+        options = WorkflowOptions(catalog=self.catalog.path)
+        manager = WorkflowManager("https://en.wikipedia.org/wiki/List_of_animal_names", "https://en.wikipedia.org",
+                                  options=options)
+        manager.catalog = self.catalog
+        table = TableDetails(headers=["collateral adjective", "animal"],
+                             rows=[RowDetails([ColDetails("vulpine", "", 1), ColDetails("Fox", "/wiki/Fox", 1)]),
+                                   RowDetails([ColDetails("none", "", 1), ColDetails("Unlinked", "", 1)])])
+        self.catalog.add_links({FOX: [FOX_IMAGE]})
+        self.catalog.add_image(FOX_IMAGE, ImageData("fox.jpg", jpeg(64, 48)))
+
+        manager.catalog_tables([table])
+        manager._save_catalog(succeeded=False)
+        self.assertEqual(self.catalog.find("animal", "fox"), [])
+
+        manager.catalog_tables([table])
+        manager._save_catalog(succeeded=True)
+        self.assertEqual([entry.article_url for entry in self.catalog.find("animal", "fox")], [FOX])
+        self.assertEqual(self.catalog.find("animal", "unlinked"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
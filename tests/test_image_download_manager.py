@@ -3,6 +3,8 @@ from unittest.mock import AsyncMock, patch, MagicMock
 import aiohttp
 import logging
 
+from src.commons.exceptions.exception import ImageDataLoaderException, ImageRejectedError
+from src.data_fetchers.download_scheduler import DownloadScheduler
 from src.data_fetchers.image_data_loader import ImageDataLoader
 from src.data_fetchers.image_link_extractor import ImageLinkExtractor
 from src.storage.image_saver import ImageSaver
@@ -45,6 +47,54 @@ class TestImageDownloadManager(unittest.IsolatedAsyncioTestCase):
         for data in image_data:
             mock_save_image.assert_any_call(data)
 
+    async def test_run_by_page_maps_articles_to_saved_images(self):
+        urls = ["http://example.com/page1", "http://example.com/page2"]
+        links_by_page = {urls[0]: ["http://example.com/shared.jpg", "http://example.com/empty.jpg"],
+                         urls[1]: ["http://example.com/shared.jpg"]}
+        images = {"http://example.com/shared.jpg": ImageData(name="shared.jpg", data=b"data"),
+                  "http://example.com/empty.jpg": ImageData(name="empty.jpg", data=b"")}
+
+        saver = MagicMock(ImageSaver)
+        saver.save_image = AsyncMock()
+        manager = ImageDownloadManager(urls, saver=saver)
+        manager._link_extractor.load_image_links_by_page = AsyncMock(return_value=links_by_page)
+        manager._data_loader.fetch_image_data = AsyncMock(side_effect=lambda session, url: images[url])
+
+        result = await manager.run_by_page()
+
+        self.assertEqual(result, {urls[0]: ["shared.jpg"], urls[1]: ["shared.jpg"]})
+        # The shared image is downloaded and saved once
+        self.assertEqual(manager._data_loader.fetch_image_data.call_count, 2)
+        saver.save_image.assert_called_once_with(images["http://example.com/shared.jpg"])
+
+    async def test_run_by_page_leaves_out_articles_with_failed_images(self):
+        urls = ["http://example.com/page1", "http://example.com/page2", "http://example.com/page3"]
+        links_by_page = {urls[0]: ["http://example.com/cat.jpg", "http://example.com/timeout.jpg"],
+                         urls[1]: ["http://example.com/dog.jpg", "http://example.com/huge.tiff"],
+                         urls[2]: ["http://example.com/timeout.jpg"]}
+
+        def fetch_image_data(session, url):
+            if url.endswith("timeout.jpg"):
+                raise ImageDataLoaderException("Exception occurred: timeout", url)
+            if url.endswith("huge.tiff"):
+                raise ImageRejectedError("Image rejected", url, "too_large")
+            return ImageData(name=url.rsplit("/", 1)[1], data=b"data")
+
+        for scheduler in (None, DownloadScheduler(concurrency=1)):
+            with self.subTest(scheduled=scheduler is not None):
+                saver = MagicMock(ImageSaver)
+                saver.save_image = AsyncMock()
+                manager = ImageDownloadManager(urls, saver=saver, scheduler=scheduler)
+                manager._link_extractor.load_image_links_by_page = AsyncMock(return_value=links_by_page)
+                manager._data_loader.fetch_image_data = AsyncMock(side_effect=fetch_image_data)
+
+                result = await manager.run_by_page()
+
+                # A rejected image would be rejected again, a failed one is retried with its article
+                self.assertEqual(result, {urls[1]: ["dog.jpg"]})
+                self.assertEqual(manager.failed_urls, {"http://example.com/timeout.jpg"})
+                self.assertFalse(manager.completed)
+
     async def test_process_image(self):
         img_url = "http://example.com/image1.jpg"
         image_data = ImageData(name="image1.jpg", data=b"fake_image_data")
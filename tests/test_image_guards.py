@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.commons.exceptions.exception import ImageRejectedError
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.data_fetchers.image_guards import ImageGuards, sniff_content_type
+
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 2000
+CHUNK = 64 * 1024
+
+
+class TestSniffContentType(unittest.TestCase):
+
+    def test_known_formats(self):
+        self.assertEqual(sniff_content_type(JPEG[:12]), "image/jpeg")
+        self.assertEqual(sniff_content_type(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d"), "image/png")
+        self.assertEqual(sniff_content_type(b"GIF89a\x01\x00"), "image/gif")
+        self.assertEqual(sniff_content_type(b"RIFF\x24\x00\x00\x00WEBP"), "image/webp")
+        self.assertEqual(sniff_content_type(b"II*\x00\x08\x00\x00\x00"), "image/tiff")
+        self.assertEqual(sniff_content_type(b"  <!DOCTYPE html>"), "text/html")
+        self.assertIsNone(sniff_content_type(b"\x00\x01\x02"))
+
+    def test_header_checks(self):
+        guards = ImageGuards(max_bytes=1000)
+
+        guards.check_headers("u", "image/jpeg; charset=binary", 1000)
+        guards.check_headers("u", None, None)
+        with self.assertRaises(ImageRejectedError) as context:
+            guards.check_headers("u", "text/html; charset=UTF-8", 10)
+        self.assertEqual(context.exception.reason, "content_type")
+        with self.assertRaises(ImageRejectedError) as context:
+            guards.check_headers("u", "image/jpeg", 1001)
+        self.assertEqual(context.exception.reason, "too_large")
+
+
+class TestGuardedImageDataLoader(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.streamed = {}
+
+        async def image(request):
+            return web.Response(body=JPEG, content_type="image/jpeg")
+
+        async def tiny(request):
+            return web.Response(body=JPEG[:4], content_type="image/jpeg")
+
+        async def error_page(request):
+            return web.Response(text="<html>Not found</html>", content_type="text/html")
+
+        async def huge(request):
+            return web.Response(body=b"II*\x00" + b"\x00" * 5000, content_type="image/tiff")
+
+        async def stream(request):
+            # An untyped body of 64 MB without Content-Length, starting like the name says
+            response = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+            await response.prepare(request)
+            name = request.match_info["name"]
+            first = JPEG[:12] if name == "endless.jpg" else b"<html><body>"
+            self.streamed[name] = 0
+            try:
+                for index in range(1024):
+                    chunk = first + b"\x00" * (CHUNK - 12) if index == 0 else b"\x00" * CHUNK
+                    await response.write(chunk)
+                    self.streamed[name] += len(chunk)
+            except (ConnectionResetError, asyncio.CancelledError):
+                pass
+            return response
+
+        app = web.Application()
+        app.router.add_get("/image.jpg", image)
+        app.router.add_get("/tiny.jpg", tiny)
+        app.router.add_get("/missing.jpg", error_page)
+        app.router.add_get("/huge.tif", huge)
+        app.router.add_get("/stream/{name}", stream)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.loader = ImageDataLoader(ImageGuards(max_bytes=4 * 1024 * 1024))
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def fetch(self, path):
+        async with aiohttp.ClientSession() as session:
+            return await self.loader.fetch_image_data(session, str(self.server.make_url(path)))
+
+    async def assertRejected(self, path, reason):
+        with self.assertRaises(ImageRejectedError) as context:
+            await self.fetch(path)
+        self.assertEqual(context.exception.reason, reason)
+
+    async def test_accepts_images(self):
+        image_data = await self.fetch("/image.jpg")
+        self.assertEqual((image_data.name, image_data.data), ("image.jpg", JPEG))
+
+        self.assertEqual((await self.fetch("/tiny.jpg")).data, JPEG[:4])
+
+    async def test_rejects_by_headers(self):
+        await self.assertRejected("/missing.jpg", "content_type")
+        self.loader.guards.allowed_types += ("image/tiff",)
+        self.loader.guards.max_bytes = 1000
+        await self.assertRejected("/huge.tif", "too_large")
+
+    async def test_sniffing_aborts_after_the_first_chunk(self):
+        await self.assertRejected("/stream/page.jpg", "content_mismatch")
+        await asyncio.sleep(0.1)
+
+        # Socket buffers let the server run ahead a little, but nowhere near the 64 MB body
+        self.assertLess(self.streamed["page.jpg"], 16 * 1024 * 1024)
+
+    async def test_size_limit_aborts_undeclared_bodies(self):
+        await self.assertRejected("/stream/endless.jpg", "too_large")
+        await asyncio.sleep(0.1)
+
+        self.assertLess(self.streamed["endless.jpg"], 16 * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+import aiohttp
+from aioresponses import aioresponses
+from bs4 import BeautifulSoup
+
+from src.data_fetchers.image_link_extractor import ImageLinkExtractor
+from src.data_fetchers.image_selection import ImageSelectionPolicy, image_candidates
+
+PAGE_URL = "https://en.wikipedia.org/wiki/Red_fox"
+ARTICLE = """
+<html><body>
+    <img src="/static/logo.jpg" width="50" height="50"/>
+    <table class="infobox biota">
+        <tr><td><img src="//upload.wikimedia.org/fox.jpg" width="250" height="188"/></td></tr>
+        <tr><td><img src="//upload.wikimedia.org/range.jpg" width="250" height="120"/></td></tr>
+    </table>
+    <figure><img src="//upload.wikimedia.org/skull.jpg" width="300" height="400"/></figure>
+    <figure><img src="//upload.wikimedia.org/cubs.jpeg"/></figure>
+    <table class="navbox">
+        <tr><td><img src="//upload.wikimedia.org/icon.jpg" width="16px" height="16"/></td></tr>
+    </table>
+    <img src="//upload.wikimedia.org/map.png" width="400" height="400"/>
+</body></html>
+"""
+
+
+class TestImageSelectionPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.candidates = image_candidates(BeautifulSoup(ARTICLE, "html.parser"), PAGE_URL)
+
+    def select(self, **kwargs):
+        policy = ImageSelectionPolicy(**kwargs)
+        return [candidate.url.rsplit("/", 1)[1] for candidate in policy.select(self.candidates)], policy.report
+
+    def test_candidates_carry_size_and_infobox(self):
+        self.assertEqual([candidate.url for candidate in self.candidates][:2],
+                         ["https://en.wikipedia.org/static/logo.jpg", "https://upload.wikimedia.org/fox.jpg"])
+        self.assertEqual([(c.width, c.height, c.in_infobox) for c in self.candidates],
+                         [(50, 50, False), (250, 188, True), (250, 120, True), (300, 400, False), (None, None, False),
+                          (16, 16, False)])
+
+    def test_all_keeps_every_image(self):
+        names, report = self.select()
+
+        self.assertEqual(names, ["logo.jpg", "fox.jpg", "range.jpg", "skull.jpg", "cubs.jpeg", "icon.jpg"])
+        self.assertEqual(report.avoided_requests, 0)
+
+    def test_lead_prefers_the_infobox_image(self):
+        names, report = self.select(mode="lead")
+
+        self.assertEqual(names, ["fox.jpg"])
+        self.assertEqual(report.avoided_requests, 5)
+        self.assertEqual(report.avoided_pixels, 50 * 50 + 250 * 120 + 300 * 400 + 16 * 16)
+        self.assertEqual(report.avoided_unsized, 1)
+        self.assertEqual(report.avoided_bytes, int(report.avoided_pixels * 0.25))
+
+    def test_lead_falls_back_to_the_first_image(self):
+        policy = ImageSelectionPolicy(mode="lead", min_px=100)
+        candidates = [candidate for candidate in self.candidates if not candidate.in_infobox]
+
+        self.assertEqual([candidate.url for candidate in policy.select(candidates)],
+                         ["https://upload.wikimedia.org/skull.jpg"])
+
+    def test_top_k_keeps_the_largest_in_page_order(self):
+        names, _ = self.select(mode="top-k", k=2)
+
+        self.assertEqual(names, ["fox.jpg", "skull.jpg"])
+
+    def test_min_px_skips_small_images_but_keeps_unsized_ones(self):
+        names, report = self.select(min_px=100)
+
+        self.assertEqual(names, ["fox.jpg", "range.jpg", "skull.jpg", "cubs.jpeg"])
+        self.assertEqual(report.avoided_requests, 2)
+
+    def test_rejects_unknown_modes(self):
+        with self.assertRaises(ValueError):
+            ImageSelectionPolicy(mode="random")
+
+
+class TestImageLinkExtractorSelection(unittest.IsolatedAsyncioTestCase):
+
+    async def test_selection_is_applied_before_downloads(self):
+        policy = ImageSelectionPolicy(mode="lead")
+        extractor = ImageLinkExtractor(selection=policy)
+        urls = [PAGE_URL, "https://en.wikipedia.org/wiki/Arctic_fox"]
+
+        with aioresponses() as m:
+            for url in urls:
+                m.get(url, status=200, body=ARTICLE)
+            image_links = await extractor.load_all_image_links(urls)
+
+        self.assertEqual(image_links, ["https://upload.wikimedia.org/fox.jpg"] * 2)
+        self.assertEqual(policy.report.candidates, 12)
+        self.assertEqual(policy.report.avoided_requests, 10)
+
+    async def test_extract_image_links_without_a_policy_keeps_every_jpeg(self):
+        with aioresponses() as m:
+            m.get(PAGE_URL, status=200, body=ARTICLE)
+            async with aiohttp.ClientSession() as session:
+                image_links = await ImageLinkExtractor().extract_image_links(session, PAGE_URL)
+
+        self.assertEqual(len(image_links), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
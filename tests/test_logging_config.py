@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.utils import logging_config
+from src.utils.log_handlers import JsonFormatter, LazyQueueHandler, RateLimitFilter
+
+
+def make_record(msg, *args, name="test", lineno=1):
+    return logging.LogRecord(name, logging.INFO, __file__, lineno, msg, args, None)
+
+
+class TestRateLimitFilter(unittest.TestCase):
+
+    def test_limits_each_template_and_reports_suppressed_records(self):
+        now = [0.0]
+        rate_filter = RateLimitFilter(rate=1.0, burst=2, clock=lambda: now[0])
+
+        passed = [rate_filter.filter(make_record("Processing image: %s", i)) for i in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        # Other templates have their own bucket
+        self.assertTrue(rate_filter.filter(make_record("Download completed")))
+
+        now[0] = 1.0
+        record = make_record("Processing image: %s", 5)
+        self.assertTrue(rate_filter.filter(record))
+        self.assertEqual(record.getMessage(), "Processing image: 5 (3 similar messages suppressed)")
+
+    def test_formatted_messages_are_limited_per_call_site(self):
+        rate_filter = RateLimitFilter(rate=1.0, burst=2, clock=lambda: 0.0)
+
+        passed = [rate_filter.filter(make_record(f"Error occurred during image download: {i}", lineno=7))
+                  for i in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        self.assertTrue(rate_filter.filter(make_record("Refresh 1 finished", lineno=8)))
+
+    def test_keeps_at_most_max_keys_buckets(self):
+        rate_filter = RateLimitFilter(rate=1.0, burst=1, clock=lambda: 0.0, max_keys=3)
+
+        for i in range(100):
+            rate_filter.filter(make_record(f"Template {i}: %s", i))
+        self.assertEqual(len(rate_filter._buckets), 3)
+        # The most recent templates are still limited
+        self.assertFalse(rate_filter.filter(make_record("Template 99: %s", 0)))
+        self.assertTrue(rate_filter.filter(make_record("Template 0: %s", 0)))
+
+
+class TestLogHandlers(unittest.TestCase):
+
+    def test_json_formatter(self):
+        entry = json.loads(JsonFormatter().format(make_record("Fetched image %s", "cat.jpg")))
+        self.assertEqual(entry["message"], "Fetched image cat.jpg")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertEqual(entry["logger"], "test")
+
+    def test_lazy_queue_handler_defers_only_immutable_arguments(self):
+        handler = LazyQueueHandler(None)
+
+        lazy = handler.prepare(make_record("Processing image: %s", "cat.jpg"))
+        self.assertEqual(lazy.args, ("cat.jpg",))
+
+        eager = handler.prepare(make_record("Table: %s", ["mutable"]))
+        self.assertEqual(eager.msg, "Table: ['mutable']")
+        self.assertIsNone(eager.args)
+
+
+class TestSetupLogging(unittest.TestCase):
+
+    def setUp(self):
+        root = logging.getLogger()
+        self.saved = (root.level, root.handlers[:], logging_config._configured)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.temp_dir.name, "nested", "app.log")
+        config_path = os.path.join(self.temp_dir.name, "logging.yaml")
+        with open(config_path, "w") as config_file:
+            config_file.write(
+                "version: 1\n"
+                "disable_existing_loggers: False\n"
+                "handlers:\n"
+                "    file_handler:\n"
+                "        class: logging.FileHandler\n"
+                f"        filename: {self.log_path}\n"
+                "root:\n"
+                "    level: DEBUG\n"
+                "    handlers: [file_handler]\n")
+        self.env = patch.dict(os.environ, {"LOGGING_CONFIG": config_path})
+        self.env.start()
+
+    def tearDown(self):
+        logging_config.shutdown_logging()
+        self.env.stop()
+        root = logging.getLogger()
+        for handler in root.handlers:
+            handler.close()
+        root.setLevel(self.saved[0])
+        root.handlers[:] = self.saved[1]
+        logging_config._configured = self.saved[2]
+        self.temp_dir.cleanup()
+
+    def test_async_json_logging_writes_through_the_queue(self):
+        logging_config.setup_logging(force=True, async_logging=True, json_lines=True)
+        root = logging.getLogger()
+        self.assertEqual([type(handler) for handler in root.handlers], [LazyQueueHandler])
+
+        logging.getLogger("src.test").info("Fetched image %s", "cat.jpg")
+        logging_config.shutdown_logging()
+
+        with open(self.log_path) as log_file:
+            entries = [json.loads(line) for line in log_file]
+        entry = entries[-1]
+        self.assertEqual(entry["message"], "Fetched image cat.jpg")
+        self.assertEqual(entry["logger"], "src.test")
+
+    def test_rate_limit_drops_floods_of_per_item_messages(self):
+        logging_config.setup_logging(force=True, rate_limit=0.001, burst=3)
+
+        logger = logging.getLogger("src.test")
+        for i in range(10):
+            logger.debug("Processing image: %s", i)
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+        with open(self.log_path) as log_file:
+            lines = [line for line in log_file if line.startswith("Processing image")]
+        self.assertEqual(lines, ["Processing image: 0\n", "Processing image: 1\n", "Processing image: 2\n"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.data_fetchers.mediawiki_link_extractor import MediaWikiImageLinkExtractor
+from src.data_fetchers.request_policy import RequestPolicy
+
+
+class StubMediaWikiApi:
+    """
+    A minimal stand-in for api.php serving pageimages, images and imageinfo queries.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+        # Titles whose query never answers
+        self.stalled = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        params = request.query
+        self.requests.append(dict(params))
+        titles = params['titles'].split('|')
+        if self.stalled.intersection(titles):
+            await asyncio.sleep(60)
+        props = params['prop'].split('|')
+        result = {'normalized': [], 'pages': []}
+        for title in titles:
+            if title[0].islower():
+                result['normalized'].append({'from': title, 'to': title.capitalize()})
+                title = title.capitalize()
+            page = {'title': title}
+            if 'pageimages' in props and title in self.pages:
+                page['original'] = {'source': self.pages[title]['lead']}
+            if 'images' in props and title in self.pages:
+                page['images'] = [{'title': name} for name in self.pages[title]['files']]
+            if 'imageinfo' in props:
+                page['imageinfo'] = [{'url': f"http://upload.example/{title[len('File:'):]}"}]
+            result['pages'].append(page)
+        return web.json_response({'batchcomplete': True, 'query': result})
+
+
+class TestMediaWikiImageLinkExtractor(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        pages = {f"Animal {i}": {'lead': f"http://upload.example/animal_{i}.jpg",
+                                 'files': [f"File:Animal {i} range.png", f"File:Animal {i} skull.jpeg"]}
+                 for i in range(120)}
+        self.api = StubMediaWikiApi(pages)
+        app = web.Application()
+        app.router.add_get('/w/api.php', self.api.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.api_url = str(self.server.make_url('/w/api.php'))
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    def test_title_from_url(self):
+        self.assertEqual(MediaWikiImageLinkExtractor.title_from_url("https://en.wikipedia.org/wiki/Red_fox"),
+                         "Red fox")
+        self.assertEqual(MediaWikiImageLinkExtractor.title_from_url("https://en.wikipedia.org/wiki/Ca%C3%AFman"),
+                         "Caïman")
+        self.assertIsNone(MediaWikiImageLinkExtractor.title_from_url("https://en.wikipedia.org/w/index.php"))
+
+    @patch('builtins.print')
+    async def test_load_all_image_links_batches_titles(self, mock_print):
+        extractor = MediaWikiImageLinkExtractor(self.api_url)
+        urls = [f"https://en.wikipedia.org/wiki/Animal_{i}" for i in range(120)]
+
+        image_links = await extractor.load_all_image_links(urls)
+
+        self.assertEqual(len(self.api.requests), 3)
+        self.assertTrue(all(len(r['titles'].split('|')) <= 50 for r in self.api.requests))
+        self.assertEqual(image_links, [f"http://upload.example/animal_{i}.jpg" for i in range(120)])
+
+    @patch('builtins.print')
+    async def test_load_all_image_links_resolves_normalized_titles(self, mock_print):
+        extractor = MediaWikiImageLinkExtractor(self.api_url)
+        self.api.pages['Dog'] = {'lead': "http://upload.example/dog.jpg", 'files': []}
+
+        image_links = await extractor.load_all_image_links(["https://en.wikipedia.org/wiki/dog"])
+
+        self.assertEqual(image_links, ["http://upload.example/dog.jpg"])
+
+    @patch('builtins.print')
+    async def test_load_all_image_links_with_all_images(self, mock_print):
+        extractor = MediaWikiImageLinkExtractor(self.api_url, all_images=True)
+
+        image_links = await extractor.load_all_image_links(["https://en.wikipedia.org/wiki/Animal_1"])
+
+        self.assertEqual(image_links, ["http://upload.example/animal_1.jpg",
+                                       "http://upload.example/Animal 1 skull.jpeg"])
+        self.assertEqual(self.api.requests[1]['prop'], 'imageinfo')
+
+    @patch('builtins.print')
+    async def test_load_image_links_by_page(self, mock_print):
+        extractor = MediaWikiImageLinkExtractor(self.api_url)
+        self.api.pages['Dog'] = {'lead': "http://upload.example/dog.jpg", 'files': []}
+        urls = ["https://en.wikipedia.org/wiki/Animal_2", "https://en.wikipedia.org/wiki/dog",
+                "https://en.wikipedia.org/wiki/Unknown", "https://en.wikipedia.org/w/index.php"]
+
+        links_by_page = await extractor.load_image_links_by_page(urls)
+
+        self.assertEqual(links_by_page, {urls[0]: ["http://upload.example/animal_2.jpg"],
+                                         urls[1]: ["http://upload.example/dog.jpg"],
+                                         urls[2]: []})
+
+    @patch('builtins.print')
+    @patch('src.data_fetchers.mediawiki_link_extractor.DEFAULT_BURST', 64)
+    async def test_query_bandwidth_is_acquired_per_chunk(self, mock_print):
+        limiter = MagicMock(acquire=AsyncMock())
+        extractor = MediaWikiImageLinkExtractor(self.api_url, limiter=limiter)
+
+        image_links = await extractor.load_all_image_links(["https://en.wikipedia.org/wiki/Animal_1"])
+
+        self.assertEqual(image_links, ["http://upload.example/animal_1.jpg"])
+        chunk_sizes = [call.args[0] for call in limiter.acquire.await_args_list]
+        self.assertGreater(len(chunk_sizes), 1)
+        self.assertTrue(all(size <= 64 for size in chunk_sizes))
+
+    @patch('builtins.print')
+    async def test_load_all_image_links_api_failure(self, mock_print):
+        extractor = MediaWikiImageLinkExtractor(str(self.server.make_url('/missing.php')))
+
+        image_links = await extractor.load_all_image_links(["https://en.wikipedia.org/wiki/Animal_1"])
+
+        self.assertEqual(image_links, [])
+
+    @patch('builtins.print')
+    async def test_load_all_image_links_is_empty_if_a_batch_fails(self, mock_print):
+        self.api.stalled.add("Animal 60")
+        extractor = MediaWikiImageLinkExtractor(self.api_url, policy=RequestPolicy(total_timeout=0.2))
+        urls = [f"https://en.wikipedia.org/wiki/Animal_{i}" for i in range(120)]
+
+        self.assertEqual(await asyncio.wait_for(extractor.load_all_image_links(urls), timeout=5), [])
+
+    @patch('builtins.print')
+    async def test_stalled_query_times_out_through_the_policy(self, mock_print):
+        self.api.stalled.add("Animal 60")
+        policy = RequestPolicy(total_timeout=0.2)
+        extractor = MediaWikiImageLinkExtractor(self.api_url, policy=policy)
+        urls = [f"https://en.wikipedia.org/wiki/Animal_{i}" for i in range(120)]
+
+        links_by_page = await asyncio.wait_for(extractor.load_image_links_by_page(urls), timeout=5)
+
+        # Only the titles of the stalled batch are left out
+        self.assertEqual(list(links_by_page), urls[:50] + urls[100:])
+        self.assertEqual(links_by_page[urls[100]], ["http://upload.example/animal_100.jpg"])
+        self.assertEqual(policy.stats.requests, 3)
+        self.assertEqual(policy.stats.failures, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.parsers.beautiful_soup_parser import BeautifulSoupParser
+from src.telemetry.metrics import MetricsRegistry
+from src.utils.memory_profiler import MemoryProfiler
+
+MB = 1_000_000
+
+
+class TestMemoryProfiler(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.output = os.path.join(temp_dir.name, "reports", "memory.json")
+        self.registry = MetricsRegistry()
+
+    def test_accounts_retained_and_peak_bytes_per_stage(self):
+        parsed = []
+        with MemoryProfiler(self.output, self.registry, top=3) as profiler:
+            with self.registry.span("run"):
+                with self.registry.span("parse"):
+                    parsed.append(bytearray(2 * MB))
+                with self.registry.span("transform"):
+                    scratch = bytearray(5 * MB)
+                    del scratch
+                    with self.registry.span("download_image"):
+                        pass
+
+        stages = {stage.name: stage for stage in profiler.stages}
+        self.assertEqual([stage.name for stage in profiler.stages], ["parse", "transform", "run"])
+        self.assertGreaterEqual(stages["parse"].retained_bytes, 2 * MB)
+        self.assertLess(abs(stages["transform"].retained_bytes), MB)
+        self.assertGreaterEqual(stages["transform"].peak_increase_bytes, 5 * MB)
+        self.assertGreaterEqual(stages["run"].peak_increase_bytes, 7 * MB)
+        self.assertIn(__file__, stages["parse"].top_allocations[0]["site"])
+        self.assertGreaterEqual(stages["parse"].top_allocations[0]["size_diff"], 2 * MB)
+        self.assertEqual(self.registry.span_start_hooks, [])
+
+    def test_writes_json_report_with_totals(self):
+        with MemoryProfiler(self.output, self.registry, top=0, max_depth=0) as profiler:
+            for _ in range(2):
+                with self.registry.span("run"):
+                    with self.registry.span("parse"):
+                        pass
+
+        with open(self.output) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(report["totals"]["run"]["calls"], 2)
+        self.assertNotIn("parse", report["totals"])
+        self.assertEqual(report["stages"][0]["top_allocations"], [])
+        self.assertGreaterEqual(report["peak_bytes"], report["traced_bytes"])
+        self.assertEqual(report["peak_bytes"], profiler.peak_bytes)
+        for key in ("max_rss_bytes", "tracemalloc_frames", "leak_suspects"):
+            self.assertIn(key, report)
+
+
+class TestParserRelease(unittest.TestCase):
+
+    def test_release_keeps_the_extracted_tables(self):
+        page = ('<html><body><table class="wikitable"><tr><td><table class="wikitable"><tr><td>inner</td></tr>'
+                '</table></td></tr></table><p>text</p></body></html>')
+        parser = BeautifulSoupParser(page)
+        tables = parser.find_all("table", {"class": "wikitable"})
+
+        parser.release(keep=tables)
+
+        self.assertIsNone(parser.soup)
+        self.assertEqual(tables[0].find("table"), tables[1])
+        self.assertEqual(tables[1].get_text(), "inner")
+        self.assertIsNone(tables[0].parent)
+
+
+if __name__ == '__main__':
+    unittest.main()
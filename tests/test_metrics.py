@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+import aiohttp
+from aioresponses import aioresponses
+
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.telemetry import metrics
+from src.telemetry.exporters import OtlpJsonSpanExporter, PrometheusServer, render_prometheus
+
+
+class TestMetrics(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_disabled_instrumentation_is_a_no_op(self):
+        self.assertIs(metrics.span("parse"), metrics.NULL_SPAN)
+        with metrics.span("parse") as span:
+            span.set_attribute("bytes", 10)
+        metrics.count("pipeline_items_total", stage="parse")
+        self.assertIsNone(metrics.get_registry())
+
+    def test_spans_nest_and_record_stage_durations(self):
+        registry = metrics.enable()
+        finished = []
+        registry.add_span_exporter(finished.append)
+
+        with metrics.span("run") as run_span:
+            with metrics.span("parse", bytes=42):
+                pass
+
+        parse_span, outer_span = finished
+        self.assertIs(outer_span, run_span)
+        self.assertIs(parse_span.parent, run_span)
+        self.assertEqual(parse_span.trace_id, run_span.trace_id)
+        self.assertEqual(parse_span.attributes, {"bytes": 42})
+        durations = registry.histograms[metrics.STAGE_DURATION_METRIC].values
+        self.assertEqual(durations[(("stage", "parse"),)][2], 1)
+
+    def test_span_duration_ignores_wall_clock_steps(self):
+        registry = metrics.enable()
+        # The wall clock is stepped back an hour while the span runs
+        with patch("time.time_ns", side_effect=[10 ** 18, 10 ** 18 - 3600 * 10 ** 9]):
+            with metrics.span("parse") as span:
+                pass
+
+        self.assertGreaterEqual(span.duration, 0)
+        self.assertEqual(span.start_ns, 10 ** 18)
+        self.assertEqual(span.end_ns, span.start_ns + span.duration_ns)
+        durations = registry.histograms[metrics.STAGE_DURATION_METRIC].values
+        self.assertGreaterEqual(durations[(("stage", "parse"),)][1], 0)
+
+    def test_render_prometheus(self):
+        registry = metrics.enable()
+        metrics.count("pipeline_bytes_total", 100, stage="download")
+        metrics.count("pipeline_bytes_total", 50, stage="download")
+        metrics.observe(metrics.STAGE_DURATION_METRIC, 0.02, stage="fetch")
+
+        text = render_prometheus(registry)
+
+        self.assertIn('pipeline_bytes_total{stage="download"} 150', text)
+        self.assertIn('# TYPE pipeline_stage_duration_seconds histogram', text)
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="fetch",le="0.01"} 0', text)
+        self.assertIn('pipeline_stage_duration_seconds_bucket{stage="fetch",le="0.025"} 1', text)
+        self.assertIn('pipeline_stage_duration_seconds_count{stage="fetch"} 1', text)
+
+    def test_prometheus_server(self):
+        registry = metrics.enable()
+        metrics.count("pipeline_items_total", 3, stage="upload")
+        server = PrometheusServer(registry, port=0, host="127.0.0.1")
+        server.start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                body = response.read().decode()
+        finally:
+            server.stop()
+
+        self.assertIn('pipeline_items_total{stage="upload"} 3', body)
+
+    def test_otlp_json_span_exporter(self):
+        registry = metrics.enable()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "spans.jsonl")
+            exporter = OtlpJsonSpanExporter(path)
+            registry.add_span_exporter(exporter)
+            with metrics.span("run"):
+                with self.assertRaises(ValueError):
+                    with metrics.span("transform", rows=3):
+                        raise ValueError("bad table")
+            exporter.flush()
+
+            with open(path) as trace_file:
+                request = json.loads(trace_file.readline())
+
+        spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        transform, run = spans
+        self.assertEqual(transform["parentSpanId"], run["spanId"])
+        self.assertEqual(transform["status"]["code"], 2)
+        self.assertEqual(transform["attributes"], [{"key": "rows", "value": {"intValue": "3"}}])
+        self.assertNotIn("parentSpanId", run)
+
+
+class TestImageDataLoaderMetrics(unittest.IsolatedAsyncioTestCase):
+
+    def tearDown(self):
+        metrics.disable()
+
+    @patch('builtins.print')
+    async def test_download_counts_bytes_and_items(self, mock_print):
+        registry = metrics.enable()
+        img_url = "http://example.com/test.jpg"
+
+        with aioresponses() as m:
+            m.get(img_url, status=200, body=b"fake_image_data")
+            async with aiohttp.ClientSession() as session:
+                await ImageDataLoader().fetch_image_data(session, img_url)
+
+        self.assertEqual(registry.counters["pipeline_bytes_total"].values[(("stage", "download"),)], 15)
+        self.assertEqual(registry.counters["pipeline_items_total"].values[(("stage", "download"),)], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,275 @@
+import asyncio
+import io
+import math
+import os
+import random
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock
+
+from src.commons.models.image_data import ImageData
+from src.data_fetchers.download_scheduler import DownloadScheduler
+from src.data_fetchers.image_download_manager import ImageDownloadManager
+from src.data_fetchers.near_duplicates import NearDuplicateFilter
+from src.storage.file_system_saver import FileSystemSaver
+from src.storage.image_catalog import ImageCatalog
+from src.utils.hamming_index import HammingIndex
+from src.utils.perceptual_hash import (average_hash, dct_hash, difference_hash, hamming_distance,
+                                       perceptual_hash)
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def gradient(width, height, brightness=0, noise=0, seed=0):
+    rng = random.Random(seed)
+    return [min(255, max(0, (x * 7 + y * 3) % 200 + brightness + rng.randint(-noise, noise)))
+            for y in range(height) for x in range(width)]
+
+
+def waves(width, height, x_period, y_period):
+    return [int(127 + 60 * math.sin(x / x_period) + 60 * math.cos(y / y_period + x / 41))
+            for y in range(height) for x in range(width)]
+
+
+def header_hash(data, algorithm):
+    # Images of these tests carry their "perceptual hash" in their first 8 bytes
+    return int.from_bytes(data[:8], "big")
+
+
+def image(name, value, size=100):
+    return ImageData(name, value.to_bytes(8, "big") + b"\x00" * (size - 8))
+
+
+class TestPerceptualHash(unittest.TestCase):
+
+    def test_look_alikes_are_close_and_others_far(self):
+        for hash_pixels, width, height in ((average_hash, 8, 8), (difference_hash, 9, 8), (dct_hash, 32, 32)):
+            with self.subTest(hash_pixels.__name__):
+                original = hash_pixels(gradient(width, height))
+                self.assertEqual(hash_pixels(gradient(width, height, brightness=20)), original)
+                self.assertLessEqual(hamming_distance(hash_pixels(gradient(width, height, noise=4)), original), 6)
+                inverted = hash_pixels([255 - pixel for pixel in gradient(width, height)])
+                self.assertGreater(hamming_distance(inverted, original), 32)
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            perceptual_hash(b"", "md5")
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_resized_image_is_a_near_duplicate(self):
+        def encoded(pixels, size, image_format):
+            picture = Image.new("L", (256, 192))
+            picture.putdata(pixels)
+            buffer = io.BytesIO()
+            picture.resize(size).convert("RGB").save(buffer, image_format)
+            return buffer.getvalue()
+
+        photo = waves(256, 192, 23, 17)
+        for algorithm in ("ahash", "dhash", "phash"):
+            with self.subTest(algorithm):
+                original = perceptual_hash(encoded(photo, (256, 192), "PNG"), algorithm)
+                thumbnail = perceptual_hash(encoded(photo, (128, 96), "JPEG"), algorithm)
+                other = perceptual_hash(encoded(waves(256, 192, 7, 29), (256, 192), "PNG"), algorithm)
+                self.assertLessEqual(hamming_distance(original, thumbnail), 6)
+                self.assertGreater(hamming_distance(original, other), 16)
+
+
+class TestHammingIndex(unittest.TestCase):
+
+    def test_matches_a_linear_scan(self):
+        rng = random.Random(7)
+        for max_distance, capacity in ((0, 1000), (3, 1000), (6, 1000), (9, 16)):
+            with self.subTest(max_distance=max_distance, capacity=capacity):
+                index = HammingIndex(max_distance, capacity=capacity)
+                hashes = [rng.getrandbits(64) for _ in range(500)]
+                for position, value in enumerate(hashes):
+                    index.add(value, position)
+                self.assertEqual(len(index), 500)
+                for value in hashes[:50]:
+                    for flips in (max_distance, max_distance + 1):
+                        query = value
+                        for bit in rng.sample(range(64), flips):
+                            query ^= 1 << bit
+                        nearest = min(hamming_distance(query, other) for other in hashes)
+                        found = index.find(query)
+                        if nearest <= max_distance:
+                            self.assertEqual(found[0], nearest)
+                        else:
+                            self.assertIsNone(found)
+
+    def test_remove(self):
+        index = HammingIndex(2)
+        index.add(0b1111, "a")
+        index.add(0b1111, "b")
+        index.remove(0b1111, "a")
+        index.remove(0b1111, "missing")
+
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.find(0b1101), (1, "b"))
+
+    def test_invalid_distance(self):
+        with self.assertRaises(ValueError):
+            HammingIndex(64)
+
+
+class TestNearDuplicateFilter(unittest.IsolatedAsyncioTestCase):
+
+    def executor(self):
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        return executor
+
+    async def test_hashes_in_a_process_pool(self):
+        near_duplicates = NearDuplicateFilter(2, workers=1, hasher=header_hash)
+        try:
+            self.assertIsNone(await near_duplicates.admit(image("fox.jpg", 0b1010)))
+            near_duplicates.stored("fox.jpg")
+            self.assertEqual(await near_duplicates.admit(image("fox_small.jpg", 0b1011, size=40)), "fox.jpg")
+            self.assertIsNone(await near_duplicates.admit(image("owl.jpg", 0b1010 ^ 0b111 << 8)))
+        finally:
+            near_duplicates.close()
+
+        report = near_duplicates.report
+        self.assertEqual((report.checked, report.skipped, report.bytes_saved, report.lookups), (3, 1, 40, 3))
+        self.assertIn("skipped 1 of 3 images", str(report))
+
+    async def test_unhashable_images_are_stored(self):
+        def failing_hash(data, algorithm):
+            raise OSError("cannot identify image file")
+
+        near_duplicates = NearDuplicateFilter(2, executor=self.executor(), hasher=failing_hash)
+
+        self.assertIsNone(await near_duplicates.admit(image("map.svg", 0)))
+        self.assertIsNone(await near_duplicates.admit(image("map.svg", 0)))
+        self.assertEqual(near_duplicates.report.unhashable, 2)
+
+    async def test_forgotten_images_are_stored_again(self):
+        near_duplicates = NearDuplicateFilter(2, executor=self.executor(), hasher=header_hash)
+        await near_duplicates.admit(image("fox.jpg", 1))
+        near_duplicates.forget("fox.jpg")
+
+        self.assertIsNone(await near_duplicates.admit(image("fox_small.jpg", 1)))
+
+    async def test_look_alikes_wait_until_the_image_is_stored(self):
+        near_duplicates = NearDuplicateFilter(2, executor=self.executor(), hasher=header_hash)
+        await near_duplicates.admit(image("fox.jpg", 1))
+        await near_duplicates.admit(image("owl.jpg", 0xFF << 40))
+
+        fox_small = asyncio.ensure_future(near_duplicates.admit(image("fox_small.jpg", 1)))
+        owl_small = asyncio.ensure_future(near_duplicates.admit(image("owl_small.jpg", 0xFF << 40)))
+        await asyncio.sleep(0.05)
+        self.assertFalse(fox_small.done() or owl_small.done())
+
+        near_duplicates.stored("fox.jpg")
+        near_duplicates.forget("owl.jpg")
+
+        # The look-alike of an image that was not stored is stored itself
+        self.assertEqual(await fox_small, "fox.jpg")
+        self.assertIsNone(await owl_small)
+        self.assertEqual(near_duplicates.report.skipped, 1)
+
+    async def test_images_sharing_a_name_are_told_apart_by_key(self):
+        near_duplicates = NearDuplicateFilter(2, executor=self.executor(), hasher=header_hash)
+        await near_duplicates.admit(image("fox.jpg", 1), key="https://a.org/fox.jpg")
+        await near_duplicates.admit(image("fox.jpg", 0xFF << 40), key="https://b.org/fox.jpg")
+
+        fox_small = asyncio.ensure_future(near_duplicates.admit(image("fox_small.jpg", 1), key="fox_small"))
+        near_duplicates.discard("https://b.org/fox.jpg")
+        await asyncio.sleep(0.05)
+        self.assertFalse(fox_small.done())
+
+        near_duplicates.stored("https://a.org/fox.jpg")
+        self.assertEqual(await fox_small, "fox.jpg")
+
+
+class TestNearDuplicateDownloads(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.links_by_page = {"fox": ["fox.jpg", "fox_small.jpg"], "owl": ["owl.jpg"], "fennec": ["fox_copy.jpg"]}
+        self.images = {"fox.jpg": image("fox.jpg", 0xF0F0, 1000), "fox_small.jpg": image("fox_small.jpg", 0xF0F1),
+                       "owl.jpg": image("owl.jpg", 0x0F0F << 16), "fox_copy.jpg": image("fox_copy.jpg", 0xF0F0)}
+        self.link_extractor = MagicMock()
+        self.link_extractor.load_image_links_by_page = AsyncMock(return_value=self.links_by_page)
+        self.data_loader = MagicMock()
+        self.data_loader.policy = None
+        self.data_loader.fetch_image_data = AsyncMock(side_effect=lambda session, url: self.images[url])
+        self.saver = MagicMock()
+        self.saver.save_image = AsyncMock()
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        self.near_duplicates = NearDuplicateFilter(4, executor=executor, hasher=header_hash)
+
+    def manager(self, **kwargs):
+        return ImageDownloadManager(list(self.links_by_page), self.saver, link_extractor=self.link_extractor,
+                                    data_loader=self.data_loader, near_duplicates=self.near_duplicates, **kwargs)
+
+    async def test_articles_map_to_the_stored_look_alike(self):
+        images_by_page = await self.manager(scheduler=DownloadScheduler(concurrency=1)).run_by_page()
+
+        self.assertEqual(images_by_page, {"fox": ["fox.jpg", "fox.jpg"], "owl": ["owl.jpg"], "fennec": ["fox.jpg"]})
+        self.assertEqual(sorted(call.args[0].name for call in self.saver.save_image.call_args_list),
+                         ["fox.jpg", "owl.jpg"])
+        self.assertEqual(self.near_duplicates.report.skipped, 2)
+
+    async def test_failed_saves_are_forgotten(self):
+        self.saver.save_image = AsyncMock(side_effect=[OSError("bucket unavailable"), None, None, None])
+        self.links_by_page.update(fox=["fox.jpg"], owl=[], fennec=[])
+        self.assertEqual(await self.manager().run_by_page(), {"owl": [], "fennec": []})
+
+        self.links_by_page.update(fox=[], fennec=["fox_copy.jpg"])
+        self.assertEqual(await self.manager().run_by_page(), {"fox": [], "owl": [], "fennec": ["fox_copy.jpg"]})
+
+    async def test_look_alikes_of_a_failed_file_system_save_are_not_mapped_to_it(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            folder = os.path.join(temp_dir, "images")
+            self.saver = FileSystemSaver(folder)
+            # The folder is gone, so every write fails
+            os.rmdir(folder)
+            self.links_by_page.update(fox=["fox.jpg"], owl=[])
+            manager = self.manager(scheduler=DownloadScheduler(concurrency=1))
+
+            with self.assertLogs("src.storage.file_system_saver", "ERROR") as logs:
+                images_by_page = await manager.run_by_page()
+
+        self.assertEqual(images_by_page, {"owl": []})
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(manager.failed_urls, {"fox.jpg", "fox_copy.jpg"})
+        self.assertEqual(self.near_duplicates.report.skipped, 0)
+
+    async def test_duplicates_are_mapped_once_the_look_alike_was_saved(self):
+        events = []
+
+        async def save_image(image_data):
+            await asyncio.sleep(0.05)
+            events.append(f"saved {image_data.name}")
+
+        self.saver.save_image = AsyncMock(side_effect=save_image)
+        self.links_by_page.update(fox=["fox.jpg"], owl=[])
+        catalog = MagicMock()
+        catalog.add_duplicate.side_effect = lambda url, name: events.append(f"{url} is {name}")
+
+        images_by_page = await self.manager(catalog=catalog).run_by_page()
+
+        self.assertEqual(images_by_page, {"fox": ["fox.jpg"], "owl": [], "fennec": ["fox.jpg"]})
+        self.assertEqual(events, ["saved fox.jpg", "fox_copy.jpg is fox.jpg"])
+
+    async def test_duplicates_are_catalogued_as_the_stored_image(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            catalog = ImageCatalog(os.path.join(temp_dir, "images.db"))
+            try:
+                await self.manager(scheduler=DownloadScheduler(concurrency=1), catalog=catalog).run_by_page()
+                catalog.replace_rows("list", [({"animal": "Fennec fox"}, "fennec")])
+
+                entries = catalog.find("animal", "fennec fox")
+                self.assertEqual([(entry.key, entry.source_url, entry.size) for entry in entries],
+                                 [("fox.jpg", "fox_copy.jpg", 1000)])
+            finally:
+                catalog.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.commons.exceptions.exception import PipelineSpecError
+from src.commons.models.col_details import ColDetails
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+from src.processors.pipeline import DEFAULT_PIPELINE_SPEC, compile_pipeline, get_pipeline, load_pipeline_spec
+from src.processors.table_processor import TableProcessor
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+
+
+def make_table():
+    return TableDetails(headers=["animal", "young", "collateral adjective"], rows=[
+        RowDetails([ColDetails("Cat", "/wiki/Cat", 1), ColDetails("kitten", "", 1),
+                    ColDetails("feline###felid", "", 1)]),
+        RowDetails([ColDetails("Bear", "/wiki/Bear", 1), ColDetails("cub", "", 2), ColDetails("ursine", "", 1)]),
+        RowDetails([ColDetails("Wolf", "/wiki/Wolf", 1), ColDetails("lupine", "", 1)]),
+        RowDetails([ColDetails("Ant", "/wiki/Ant", 1), ColDetails("ant", "", 1), ColDetails("—", "", 1)]),
+    ])
+
+
+def values(table):
+    return [[col.value for col in row.cols] for row in table.rows]
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_default_plan_matches_the_table_processor_steps(self):
+        table = make_table()
+        expected = TableProcessor.insert_values_at_indexes(TableProcessor.find_cells_to_update(table), table)
+        expected = TableProcessor.select_columns_by_names(expected, ["collateral adjective", "animal"])
+        expected = TableProcessor.explode_cells(expected)
+        expected = TableProcessor.filter_rows_by_column_value(expected, "collateral adjective",
+                                                              r'^(?!.*[ —]).*$')
+
+        plan = get_pipeline()
+        result = plan.run(make_table())
+
+        self.assertEqual(result, expected)
+        self.assertEqual(values(result), [["Cat", "feline"], ["Cat", "felid"], ["Bear", "ursine"],
+                                          ["Wolf", "lupine"]])
+        self.assertEqual(plan.links(result), ["/wiki/Cat", "/wiki/Cat", "/wiki/Bear", "/wiki/Wolf"])
+
+    def test_shipped_yaml_spec_is_the_default_recipe(self):
+        self.assertEqual(load_pipeline_spec(os.path.join(CONFIG_DIR, "pipeline.yaml")), DEFAULT_PIPELINE_SPEC)
+
+    def test_json_spec_and_plan_cache(self):
+        spec = {"steps": [{"select_columns": ["animal"]}], "links": {"column": "animal"}}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "pipeline.json")
+            with open(path, "w") as spec_file:
+                json.dump(spec, spec_file)
+            loaded = load_pipeline_spec(path)
+
+        plan = get_pipeline(loaded)
+        self.assertIs(get_pipeline(dict(spec)), plan)
+        self.assertEqual(values(plan.run(make_table()))[0], ["Cat"])
+
+    def test_invalid_specs_name_the_offending_entry(self):
+        invalid_specs = {
+            "steps[1]": {"steps": ["explode_cells", "sort_rows"], "links": {"column": "animal"}},
+            "steps[0]": {"steps": [{"filter_rows": {"column": "animal", "pattern": "("}}],
+                         "links": {"column": "animal"}},
+            "links": {"steps": ["explode_cells"]},
+            "version": {"version": 2, "steps": ["explode_cells"], "links": {"column": "animal"}},
+        }
+        for location, spec in invalid_specs.items():
+            with self.subTest(location=location):
+                with self.assertRaises(PipelineSpecError) as context:
+                    compile_pipeline(spec)
+                self.assertEqual(context.exception.location, location)
+
+    def test_missing_filter_column_raises(self):
+        plan = compile_pipeline({"steps": [{"filter_rows": {"column": "habitat", "pattern": "."}}],
+                                 "links": {"column": "animal"}})
+        with self.assertRaises(ValueError):
+            plan.run(make_table())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from src.utils.profiler import RunProfiler
+
+
+def busy_parse(seconds: float) -> int:
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+async def blocking_download() -> None:
+    # Simulates a synchronous call (e.g. a MinIO upload) made from inside the event loop
+    time.sleep(0.1)
+
+
+class TestRunProfiler(unittest.TestCase):
+
+    def test_writes_report_collapsed_stacks_and_slow_callbacks(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, "reports", "run")
+            with RunProfiler(output, top=10, interval=0.001, slow_callback_duration=0.05):
+                busy_parse(0.2)
+                asyncio.run(blocking_download())
+
+            with open(f"{output}.txt") as summary_file:
+                summary = summary_file.read()
+            with open(f"{output}.collapsed") as collapsed_file:
+                collapsed = collapsed_file.read().splitlines()
+            self.assertTrue(os.path.exists(f"{output}.pstats"))
+
+        self.assertIn("busy_parse", summary)
+        self.assertIn("blocking_download", summary.split("Event loop blocked")[1])
+        self.assertTrue(collapsed)
+        stack, count = collapsed[0].rsplit(" ", 1)
+        self.assertTrue(stack.startswith("MainThread;"))
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any("busy_parse (test_profiler.py" in line for line in collapsed))
+
+    def test_restores_event_loop_policy(self):
+        policy = asyncio.get_event_loop_policy()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with RunProfiler(os.path.join(temp_dir, "run")):
+                self.assertIsNot(asyncio.get_event_loop_policy(), policy)
+        self.assertIs(asyncio.get_event_loop_policy(), policy)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+import aiohttp
+
+from src.commons.exceptions.exception import CircuitOpenError, ImageDataLoaderException
+from src.commons.models.image_data import ImageData
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.data_fetchers.image_download_manager import ImageDownloadManager
+from src.data_fetchers.request_policy import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyTracker, RequestPolicy,
+                                              is_host_failure)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_quantiles_cover_the_recent_window(self):
+        latencies = LatencyTracker(window=100)
+        self.assertIsNone(latencies.quantile(0.95))
+
+        for latency in range(1, 201):
+            latencies.add(latency / 100)
+
+        self.assertEqual(len(latencies), 100)
+        self.assertEqual(latencies.quantile(0.0), 1.01)
+        self.assertEqual(latencies.quantile(0.95), 1.96)
+        self.assertEqual(latencies.quantile(1.0), 2.0)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker("upload.wikimedia.org", failure_threshold=3, reset_timeout=30, clock=self.clock)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.before_request()
+            self.breaker.record_failure()
+
+    def test_opens_after_failures_in_a_row(self):
+        self.fail(2)
+        self.breaker.record_success()
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self.fail(1)
+
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError) as context:
+            self.breaker.before_request()
+        self.assertEqual(context.exception.retry_in, 30)
+
+    def test_half_open_lets_one_probe_through(self):
+        self.fail(3)
+        self.clock.now = 30
+
+        self.breaker.before_request()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        self.fail(3)
+        self.clock.now = 45
+
+        self.fail(1)
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.clock.now = 74
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_request()
+
+
+class TestRequestPolicy(unittest.IsolatedAsyncioTestCase):
+
+    def test_host_failures(self):
+        request_info = MagicMock()
+        self.assertTrue(is_host_failure(aiohttp.ClientResponseError(request_info, (), status=503)))
+        self.assertTrue(is_host_failure(asyncio.TimeoutError()))
+        self.assertFalse(is_host_failure(aiohttp.ClientResponseError(request_info, (), status=404)))
+        self.assertFalse(is_host_failure(ValueError()))
+
+    async def test_open_circuits_fail_fast(self):
+        policy = RequestPolicy(failure_threshold=2)
+        request = AsyncMock(side_effect=aiohttp.ServerDisconnectedError())
+
+        for _ in range(2):
+            with self.assertRaises(aiohttp.ServerDisconnectedError):
+                await policy.call("https://upload.wikimedia.org/a.jpg", request)
+        with self.assertRaises(CircuitOpenError):
+            await policy.call("https://upload.wikimedia.org/b.jpg", request)
+
+        self.assertEqual(request.await_count, 2)
+        self.assertEqual(await policy.call("https://en.wikipedia.org/wiki/Fox", AsyncMock(return_value="ok")), "ok")
+        stats = policy.report()
+        self.assertEqual((stats.requests, stats.failures, stats.rejected), (3, 2, 1))
+        self.assertEqual(stats.circuits, {"upload.wikimedia.org": OPEN, "en.wikipedia.org": CLOSED})
+
+    async def test_slow_requests_are_hedged(self):
+        policy = RequestPolicy(hedge_quantile=0.95, min_samples=5, hedge_budget=0.5)
+        for _ in range(5):
+            await policy.call("https://upload.wikimedia.org/a.jpg", lambda: asyncio.sleep(0.01, "fast"))
+        delays = [5.0, 0.01]
+
+        started = time.monotonic()
+        result = await policy.call("https://upload.wikimedia.org/b.jpg", lambda: asyncio.sleep(delays.pop(0), "b"))
+
+        self.assertEqual(result, "b")
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual((policy.stats.hedged, policy.stats.hedges_won), (1, 1))
+        self.assertIn("1 hedged (1 won)", str(policy.report()))
+
+    async def test_hedging_respects_its_budget_and_opt_out(self):
+        policy = RequestPolicy(hedge_quantile=0.5, min_samples=1, hedge_budget=0.0)
+        await policy.call("https://upload.wikimedia.org/a.jpg", lambda: asyncio.sleep(0, "fast"))
+        calls = []
+
+        async def request():
+            calls.append(1)
+            return await asyncio.sleep(0.05, "slow")
+
+        await policy.call("https://upload.wikimedia.org/b.jpg", request)
+        policy.hedge_budget = 1.0
+        await policy.call("https://upload.wikimedia.org/c.jpg", request, hedge=False)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(policy.stats.hedged, 0)
+
+
+class SlowDataLoader:
+    policy = None
+
+    async def fetch_image_data(self, session, img_url):
+        if "slow" in img_url:
+            await asyncio.sleep(10)
+        return ImageData(name=img_url.rsplit("/", 1)[1], data=b"\xff\xd8\xff")
+
+
+class TestRunDeadline(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.links = ["https://upload.wikimedia.org/fast.jpg", "https://upload.wikimedia.org/slow.jpg"]
+        link_extractor = MagicMock()
+        link_extractor.load_all_image_links = AsyncMock(return_value=self.links)
+        link_extractor.load_image_links_by_page = AsyncMock(return_value={"https://en.wikipedia.org/wiki/Fox":
+                                                                          self.links})
+        self.saver = MagicMock()
+        self.saver.save_image = AsyncMock()
+        self.manager = ImageDownloadManager(["https://en.wikipedia.org/wiki/Fox"], self.saver,
+                                            link_extractor=link_extractor, data_loader=SlowDataLoader(),
+                                            deadline=0.2)
+
+    async def test_run_keeps_what_finished_before_the_deadline(self):
+        started = time.monotonic()
+
+        await self.manager.run()
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual([call.args[0].name for call in self.saver.save_image.await_args_list], ["fast.jpg"])
+
+    async def test_run_by_page_raises_at_the_deadline(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.manager.run_by_page()
+
+    async def test_circuit_open_images_are_skipped(self):
+        policy = RequestPolicy(failure_threshold=1)
+        policy.breaker("https://upload.wikimedia.org/").record_failure()
+        loader = ImageDataLoader(policy=policy)
+
+        with self.assertRaises(ImageDataLoaderException) as context:
+            await loader.fetch_image_data(MagicMock(), self.links[0])
+        self.assertIn("Circuit open for upload.wikimedia.org", str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.commons.exceptions.exception import ImageDataLoaderException, ImageRejectedError
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.data_fetchers.image_guards import ImageGuards
+from src.data_fetchers.resumable_download import ResumableDownloader
+
+JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + bytes(range(256)) * 2048
+
+
+class FlakyImageServer:
+    """
+    Serves one image with an ETag and honours Range and If-Range. Each entry of drops cuts the connection of the
+    next GET after that many body bytes; next_version replaces the image when the first ranged GET arrives.
+    """
+
+    def __init__(self, body: bytes, etag: str = '"v1"'):
+        self.body = body
+        self.etag = etag
+        self.content_type = "image/jpeg"
+        self.drops = []
+        self.next_version = None
+        self.requests = []
+        self.sent = 0
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        if request.headers.get("Range") and self.next_version:
+            (self.body, self.etag), self.next_version = self.next_version, None
+        start, end, status = 0, len(self.body) - 1, 200
+        match = re.match(r'bytes=(\d+)-(\d*)$', request.headers.get("Range", ""))
+        if match and request.headers.get("If-Range", self.etag) == self.etag:
+            start, status = int(match.group(1)), 206
+            end = int(match.group(2)) if match.group(2) else end
+        headers = {"ETag": self.etag, "Accept-Ranges": "bytes", "Content-Type": self.content_type}
+        if request.method == "HEAD":
+            return web.Response(body=self.body, headers=headers)
+        self.requests.append(request.headers.get("Range"))
+        payload = self.body[start:end + 1]
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(self.body)}"
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = len(payload)
+        await response.prepare(request)
+        limit = self.drops.pop(0) if self.drops else None
+        if limit is not None:
+            await response.write(payload[:limit])
+            self.sent += limit
+            request.transport.close()
+            return response
+        await response.write(payload)
+        self.sent += len(payload)
+        await response.write_eof()
+        return response
+
+
+class TestResumableDownloader(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.image = FlakyImageServer(JPEG)
+        app = web.Application()
+        app.router.add_get("/large.jpg", self.image.handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.url = str(self.server.make_url("/large.jpg"))
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        shutil.rmtree(self.spool_dir)
+
+    async def fetch(self, downloader, guards=None):
+        async with aiohttp.ClientSession() as session:
+            return await downloader.fetch(session, self.url, guards)
+
+    def downloader(self, **kwargs):
+        return ResumableDownloader(self.spool_dir, retry_delay=0, **kwargs)
+
+    async def test_resumes_dropped_transfers_from_the_last_byte(self):
+        self.image.drops = [100_000, 200_000]
+
+        body = await self.fetch(self.downloader())
+
+        self.assertEqual(body, JPEG)
+        self.assertEqual(self.image.requests, [None, "bytes=100000-", "bytes=300000-"])
+        self.assertEqual(self.image.sent, len(JPEG))
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    async def test_starts_over_when_the_image_changed(self):
+        self.image.drops = [100_000]
+        self.image.next_version = (JPEG[::-1], '"v2"')
+
+        body = await self.fetch(self.downloader())
+
+        self.assertEqual(body, JPEG[::-1])
+        self.assertEqual(self.image.requests, [None, "bytes=100000-"])
+
+    async def test_a_later_run_resumes_the_spool_left_behind(self):
+        self.image.drops = [150_000, 0, 0]
+
+        with self.assertRaises(ImageDataLoaderException):
+            await self.fetch(self.downloader(retries=1))
+        self.assertEqual(len(os.listdir(self.spool_dir)), 2)
+
+        body = await self.fetch(self.downloader())
+
+        self.assertEqual(body, JPEG)
+        self.assertEqual(self.image.requests[-1], "bytes=150000-")
+        self.assertEqual(self.image.sent, len(JPEG))
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    async def test_fetches_large_bodies_as_parallel_ranges(self):
+        self.image.drops = [10_000]
+
+        body = await self.fetch(self.downloader(parallel_threshold=100_000, parts=4))
+
+        self.assertEqual(body, JPEG)
+        self.assertEqual(len(self.image.requests), 5)
+        self.assertTrue(all(request.startswith("bytes=") for request in self.image.requests))
+        self.assertEqual(self.image.sent, len(JPEG))
+
+    async def test_parallel_ranges_skip_small_bodies(self):
+        body = await self.fetch(self.downloader(parallel_threshold=len(JPEG) + 1))
+
+        self.assertEqual(body, JPEG)
+        self.assertEqual(self.image.requests, [None])
+
+    async def test_guards_reject_and_discard_the_spool(self):
+        self.image.content_type = "text/html"
+
+        with self.assertRaises(ImageRejectedError):
+            await self.fetch(self.downloader(), ImageGuards())
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    async def test_image_data_loader_uses_the_downloader(self):
+        self.image.drops = [50_000]
+        loader = ImageDataLoader(ImageGuards(), self.downloader())
+
+        async with aiohttp.ClientSession() as session:
+            image_data = await loader.fetch_image_data(session, self.url)
+
+        self.assertEqual((image_data.name, image_data.data), ("large.jpg", JPEG))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.commons.models.col_details import ColDetails
+from src.commons.models.image_data import ImageData
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+from src.commons.models.workflow_options import WorkflowOptions
+from src.manager.workflow_manager import WorkflowManager
+from src.parsers.beautiful_soup_parser import BeautifulSoupParser
+from src.storage.file_system_saver import FileSystemSaver
+from src.storage.row_index import RowFingerprintIndex, row_fingerprints
+
+BASE_URL = "https://en.wikipedia.org"
+PAGE_URL = "https://example.com/list"
+
+
+def build_table(rows):
+    return TableDetails(headers=["collateral adjective", "animal"],
+                        rows=[RowDetails([ColDetails(adjective, None, 0), ColDetails(animal, f"/wiki/{animal}", 0)])
+                              for adjective, animal in rows])
+
+
+def build_page(animals):
+    rows = "".join(f'<tr><td><a href="/wiki/{animal}">{animal}</a></td><td>{adjective}</td></tr>'
+                   for animal, adjective in animals)
+    return (f'<html><body><table class="wikitable"><tr><th>Animal</th><th>Collateral adjective</th></tr>{rows}'
+            f'</table></body></html>')
+
+
+class TestRowFingerprintIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "rows.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fingerprints_group_rows_by_link(self):
+        fingerprints = row_fingerprints([build_table([("feline", "Cat"), ("canine", "Dog")]),
+                                         build_table([("felid", "Cat")])], "animal")
+
+        self.assertEqual(list(fingerprints), ["/wiki/Cat", "/wiki/Dog"])
+        # Row order does not matter, but every row of a link does
+        self.assertEqual(fingerprints, row_fingerprints([build_table([("felid", "Cat"), ("canine", "Dog"),
+                                                                      ("feline", "Cat")])], "animal"))
+        self.assertNotEqual(fingerprints["/wiki/Cat"],
+                            row_fingerprints([build_table([("feline", "Cat")])], "animal")["/wiki/Cat"])
+
+    def test_diff_against_the_previous_run(self):
+        index = RowFingerprintIndex(self.path)
+        first = row_fingerprints([build_table([("feline", "Cat"), ("canine", "Dog"), ("lupine", "Wolf")])], "animal")
+        self.assertEqual(index.diff(PAGE_URL, first).added, list(first))
+        index.update(PAGE_URL, first, {"/wiki/Cat": ["cat.jpg"], "/wiki/Dog": ["dog.jpg"], "/wiki/Wolf": []})
+        index.save()
+
+        second = row_fingerprints([build_table([("felid", "Cat"), ("canine", "Dog"), ("ursine", "Bear")])], "animal")
+        table_diff = RowFingerprintIndex(self.path).diff(PAGE_URL, second)
+
+        self.assertEqual(table_diff.added, ["/wiki/Bear"])
+        self.assertEqual(table_diff.changed, ["/wiki/Cat"])
+        self.assertEqual(table_diff.removed, ["/wiki/Wolf"])
+        self.assertEqual(table_diff.unchanged, 1)
+        self.assertEqual(table_diff.to_download, ["/wiki/Bear", "/wiki/Cat"])
+
+    def test_update_returns_images_only_removed_rows_refer_to(self):
+        index = RowFingerprintIndex(self.path)
+        first = row_fingerprints([build_table([("feline", "Cat"), ("canine", "Dog")])], "animal")
+        index.update(PAGE_URL, first, {"/wiki/Cat": ["cat.jpg", "pets.jpg"], "/wiki/Dog": ["dog.jpg", "pets.jpg"]})
+
+        second = row_fingerprints([build_table([("canine", "Dog")])], "animal")
+        orphans = index.update(PAGE_URL, second, {})
+
+        self.assertEqual(orphans, {"cat.jpg"})
+        self.assertEqual(index.images(PAGE_URL, "/wiki/Dog"), ["dog.jpg", "pets.jpg"])
+
+    def test_failed_links_are_retried(self):
+        index = RowFingerprintIndex(self.path)
+        fingerprints = row_fingerprints([build_table([("feline", "Cat"), ("canine", "Dog")])], "animal")
+        index.update(PAGE_URL, fingerprints, {"/wiki/Cat": ["cat.jpg"]}, failed=["/wiki/Dog"])
+
+        self.assertEqual(index.diff(PAGE_URL, fingerprints).added, ["/wiki/Dog"])
+
+    def test_unreadable_index_starts_over(self):
+        with open(self.path, "w") as index_file:
+            index_file.write("{not json")
+
+        index = RowFingerprintIndex(self.path)
+
+        self.assertEqual(index.diff(PAGE_URL, {"/wiki/Cat": "x"}).added, ["/wiki/Cat"])
+
+
+class TestIncrementalWorkflow(unittest.TestCase):
+
+    def run_page(self, index_path, animals, downloaded):
+        manager = WorkflowManager(PAGE_URL, BASE_URL, options=WorkflowOptions(incremental=index_path,
+                                                                              gc_removed=True))
+        with patch.object(WorkflowManager, "download_links_by_page",
+                          side_effect=lambda urls: {url: downloaded.get(url, []) for url in urls}) as download, \
+                patch.object(WorkflowManager, "delete_images") as delete_images:
+            manager.process_tables(BeautifulSoupParser(build_page(animals)))
+        return download, delete_images
+
+    def test_only_changed_rows_are_downloaded_and_removed_rows_collected(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index_path = os.path.join(temp_dir, "rows.json")
+            images = {f"{BASE_URL}/wiki/Cat": ["cat.jpg"], f"{BASE_URL}/wiki/Dog": ["dog.jpg"],
+                      f"{BASE_URL}/wiki/Bear": ["bear.jpg"]}
+
+            download, _ = self.run_page(index_path, [("Cat", "feline"), ("Dog", "canine")], images)
+            download.assert_called_once_with([f"{BASE_URL}/wiki/Cat", f"{BASE_URL}/wiki/Dog"])
+
+            download, delete_images = self.run_page(index_path, [("Dog", "canine"), ("Bear", "ursine")], images)
+            download.assert_called_once_with([f"{BASE_URL}/wiki/Bear"])
+            delete_images.assert_called_once_with(["cat.jpg"])
+
+            download, delete_images = self.run_page(index_path, [("Dog", "canine"), ("Bear", "ursine")], images)
+            download.assert_not_called()
+            delete_images.assert_not_called()
+
+    def test_rows_whose_saves_failed_are_downloaded_again(self):
+        animals = [("Cat", "feline"), ("Dog", "canine")]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            saver = FileSystemSaver(os.path.join(temp_dir, "images"))
+            # A folder in the way of dog.jpg makes its write fail
+            blocker = os.path.join(saver.download_folder, "dog.jpg")
+            os.mkdir(blocker)
+            link_extractor = MagicMock()
+            link_extractor.load_image_links_by_page = AsyncMock(
+                side_effect=lambda urls: {url: [f"https://upload.example/{url.rsplit('/', 1)[1].lower()}.jpg"]
+                                          for url in urls})
+            data_loader = MagicMock()
+            data_loader.policy = None
+            data_loader.fetch_image_data = AsyncMock(
+                side_effect=lambda session, url: ImageData(url.rsplit("/", 1)[1], b"\xff\xd8\xff"))
+
+            def run_page():
+                manager = WorkflowManager(PAGE_URL, BASE_URL, saver=saver,
+                                          options=WorkflowOptions(incremental=os.path.join(temp_dir, "rows.json")))
+                with patch.object(WorkflowManager, "create_link_extractor", return_value=link_extractor), \
+                        patch.object(WorkflowManager, "create_data_loader", return_value=data_loader):
+                    manager.process_tables(BeautifulSoupParser(build_page(animals)))
+                return [call.args[0] for call in link_extractor.load_image_links_by_page.call_args_list]
+
+            with self.assertLogs("src.storage.file_system_saver", "ERROR"):
+                self.assertEqual(run_page(), [[f"{BASE_URL}/wiki/Cat", f"{BASE_URL}/wiki/Dog"]])
+
+            os.rmdir(blocker)
+            link_extractor.load_image_links_by_page.reset_mock()
+            self.assertEqual(run_page(), [[f"{BASE_URL}/wiki/Dog"]])
+            self.assertTrue(os.path.isfile(blocker))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("bs4", "aiohttp", "minio", "requests", "yaml")
+
+
+class TestStartup(unittest.TestCase):
+
+    def loaded_heavy_modules(self, code: str):
+        script = f"import sys\n{code}\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+        return [module for module in result.stdout.strip().split(",") if module]
+
+    def test_importing_entry_point_skips_heavy_backends(self):
+        self.assertEqual(self.loaded_heavy_modules("import src.main"), [])
+
+    def test_importing_workflow_manager_skips_heavy_backends(self):
+        self.assertEqual(self.loaded_heavy_modules("import src.manager.workflow_manager"), [])
+
+    def test_help_does_not_configure_logging_or_print(self):
+        result = subprocess.run([sys.executable, "-m", "src.main", "--help"], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertTrue(result.stdout.startswith("usage:"))
+        self.assertNotIn("Checking", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
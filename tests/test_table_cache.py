@@ -0,0 +1,193 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.commons.models.col_details import ColDetails
+from src.commons.models.image_data import ImageData
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+from src.commons.models.workflow_options import WorkflowOptions
+from src.manager.workflow_manager import WorkflowManager
+from src.storage.file_system_saver import FileSystemSaver
+from src.storage.table_cache import TableCache, decode_tables, encode_tables, page_revision
+
+URL = "https://en.wikipedia.org/wiki/List_of_animal_names"
+PAGE = ('<html><script>"wgRevisionId":1234</script><body><table class="wikitable">'
+        '<tr><th>Animal</th><th>Collateral adjective</th></tr>'
+        '<tr><td><a href="/wiki/Cat">Cat</a></td><td>feline</td></tr></table></body></html>').encode()
+
+
+def make_tables(rows=1):
+    return [TableDetails(headers=["collateral adjective", "animal"],
+                         rows=[RowDetails([ColDetails(f"adjective {i}", "", 1), ColDetails("Cat", "/wiki/Cat", 1)])
+                               for i in range(rows)])]
+
+
+def make_response(status=200, content=PAGE, etag='"abc"'):
+    response = MagicMock()
+    response.status_code = status
+    response.content = content if status == 200 else b""
+    response.headers = {"ETag": etag}
+    return response
+
+
+class TestTableCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, "cache")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_encoding_round_trip(self):
+        tables = make_tables(3)
+        self.assertEqual(decode_tables(encode_tables(tables)), tables)
+
+    def test_page_revision(self):
+        self.assertEqual(page_revision(PAGE, '"abc"'), "rev:1234")
+        self.assertEqual(page_revision(b"<html/>", '"abc"'), 'etag:"abc"')
+        self.assertTrue(page_revision(b"<html/>").startswith("sha256:"))
+
+    def test_put_find_and_reload_from_disk(self):
+        cache = TableCache(self.directory)
+        cache.put(URL, "rev:1", "pipeline", make_tables(), etag='"abc"')
+
+        reopened = TableCache(self.directory)
+        entry = reopened.find(URL, "rev:1", "pipeline")
+        self.assertEqual(reopened.load(entry), make_tables())
+        self.assertEqual(reopened.latest(URL, "pipeline").etag, '"abc"')
+        self.assertIsNone(reopened.find(URL, "rev:1", "other pipeline"))
+        self.assertIsNone(reopened.find(URL, "rev:2", "pipeline"))
+
+    def test_evicts_least_recently_used_entries(self):
+        size = len(encode_tables(make_tables(200)))
+        cache = TableCache(self.directory, max_bytes=int(size * 2.5))
+        for revision in ("rev:1", "rev:2"):
+            cache.put(URL, revision, "pipeline", make_tables(200))
+        cache.load(cache.find(URL, "rev:1", "pipeline"))
+
+        cache.put(URL, "rev:3", "pipeline", make_tables(200))
+
+        self.assertIsNone(cache.find(URL, "rev:2", "pipeline"))
+        self.assertIsNotNone(cache.find(URL, "rev:1", "pipeline"))
+        self.assertEqual(len(cache), 2)
+
+    def test_invalidate_and_corrupt_entries(self):
+        cache = TableCache(self.directory)
+        entry = cache.put(URL, "rev:1", "pipeline", make_tables())
+        cache.put("https://example.com/other", "rev:1", "pipeline", make_tables())
+        with open(os.path.join(self.directory, f"{entry.key}.tables"), "wb") as cache_file:
+            cache_file.write(b"not zlib")
+
+        self.assertIsNone(cache.load(entry))
+        self.assertIsNone(cache.find(URL, "rev:1", "pipeline"))
+        self.assertEqual(cache.invalidate(), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_recent_entries_stay_decoded_in_memory(self):
+        cache = TableCache(self.directory, memory_entries=1)
+        first = cache.put(URL, "rev:1", "pipeline", make_tables())
+        second = cache.put(URL, "rev:2", "pipeline", make_tables())
+
+        tables = cache.load(second)
+        self.assertIs(cache.load(second), tables)
+        self.assertEqual(cache.load(first), make_tables())
+        # Only one entry is kept in memory, so the second one is read from disk again
+        self.assertIsNot(cache.load(second), tables)
+
+        cache.invalidate(url=URL)
+        self.assertIsNone(cache.load(first))
+
+
+class TestWorkflowManagerTableCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.options = WorkflowOptions(table_cache=self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_manager(self, response, skip_unchanged=False):
+        self.options.skip_unchanged = skip_unchanged
+        manager = WorkflowManager(URL, "https://en.wikipedia.org", options=self.options)
+        with patch("src.parsers.web_scraper.WebScraper.fetch_data_from_url", return_value=response) as fetch, \
+                patch.object(WorkflowManager, "parse_html", wraps=manager.parse_html) as parse_html, \
+                patch.object(WorkflowManager, "download_links") as download_links:
+            manager.run()
+        return fetch, parse_html, download_links
+
+    def test_unchanged_page_skips_parsing(self):
+        _, parse_html, download_links = self.run_manager(make_response())
+        parse_html.assert_called_once()
+        download_links.assert_called_once_with(["https://en.wikipedia.org/wiki/Cat"])
+
+        fetch, parse_html, download_links = self.run_manager(make_response(status=304))
+        self.assertEqual(fetch.call_args.kwargs["headers"], {"If-None-Match": '"abc"'})
+        parse_html.assert_not_called()
+        download_links.assert_called_once_with(["https://en.wikipedia.org/wiki/Cat"])
+
+        _, parse_html, download_links = self.run_manager(make_response(etag='"new etag, same revision"'),
+                                                         skip_unchanged=True)
+        parse_html.assert_not_called()
+        download_links.assert_not_called()
+
+    def test_revision_with_failed_downloads_is_not_completed(self):
+        self.options.skip_unchanged = True
+        saver = MagicMock()
+        saver.save_image = AsyncMock(side_effect=OSError("bucket unavailable"))
+        link_extractor = MagicMock()
+        link_extractor.load_image_links_by_page = AsyncMock(
+            return_value={"https://en.wikipedia.org/wiki/Cat": ["https://upload.example/cat.jpg"]})
+        data_loader = MagicMock()
+        data_loader.policy = None
+        data_loader.fetch_image_data = AsyncMock(return_value=ImageData("cat.jpg", b"\xff\xd8\xff cat"))
+
+        def run_manager():
+            manager = WorkflowManager(URL, "https://en.wikipedia.org", options=self.options, saver=saver)
+            with patch("src.parsers.web_scraper.WebScraper.fetch_data_from_url", return_value=make_response()), \
+                    patch.object(WorkflowManager, "create_link_extractor", return_value=link_extractor), \
+                    patch.object(WorkflowManager, "create_data_loader", return_value=data_loader):
+                manager.run()
+            return TableCache(self.temp_dir.name).latest(URL, manager.pipeline_hash)
+
+        self.assertFalse(run_manager().completed)
+        self.assertFalse(run_manager().completed)
+
+        saver.save_image = AsyncMock()
+        self.assertTrue(run_manager().completed)
+        saver.save_image.assert_awaited_once()
+
+    def test_revision_whose_file_system_saves_failed_is_not_completed(self):
+        self.options.skip_unchanged = True
+        saver = FileSystemSaver(os.path.join(self.temp_dir.name, "images"))
+        # A folder in the way of cat.jpg makes its write fail
+        blocker = os.path.join(saver.download_folder, "cat.jpg")
+        os.mkdir(blocker)
+        link_extractor = MagicMock()
+        link_extractor.load_image_links_by_page = AsyncMock(
+            return_value={"https://en.wikipedia.org/wiki/Cat": ["https://upload.example/cat.jpg"]})
+        data_loader = MagicMock()
+        data_loader.policy = None
+        data_loader.fetch_image_data = AsyncMock(return_value=ImageData("cat.jpg", b"\xff\xd8\xff cat"))
+
+        def run_manager():
+            manager = WorkflowManager(URL, "https://en.wikipedia.org", options=self.options, saver=saver)
+            with patch("src.parsers.web_scraper.WebScraper.fetch_data_from_url", return_value=make_response()), \
+                    patch.object(WorkflowManager, "create_link_extractor", return_value=link_extractor), \
+                    patch.object(WorkflowManager, "create_data_loader", return_value=data_loader):
+                manager.run()
+            return TableCache(self.temp_dir.name).latest(URL, manager.pipeline_hash)
+
+        with self.assertLogs("src.storage.file_system_saver", "ERROR"):
+            self.assertFalse(run_manager().completed)
+
+        os.rmdir(blocker)
+        self.assertTrue(run_manager().completed)
+        self.assertTrue(os.path.isfile(blocker))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from src.commons.models.col_details import ColDetails
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+
+
+def make_table(rows):
+    return TableDetails(headers=["animal", "adjective"],
+                        rows=[RowDetails([ColDetails(animal, "", 1), ColDetails(adjective, "", 1)])
+                              for animal, adjective in rows])
+
+
+class TestTableDetailsRender(unittest.TestCase):
+
+    def test_each_column_is_as_wide_as_its_longest_value(self):
+        table = make_table([("aardvark", "orycteropodian"), ("cat", "feline")])
+
+        self.assertEqual(table.render().splitlines(), [
+            "animal   | adjective     ",
+            "-------------------------",
+            "aardvark | orycteropodian",
+            "cat      | feline        ",
+        ])
+
+    def test_str_truncates_rows(self):
+        table = make_table([(f"animal{i}", "x") for i in range(60)])
+
+        lines = str(table).splitlines()
+
+        self.assertEqual(len(lines), 2 + 50 + 1)
+        self.assertEqual(lines[-1], "... 10 more rows")
+
+    def test_render_without_limit_keeps_every_row(self):
+        table = make_table([(f"animal{i}", "x") for i in range(60)])
+        self.assertEqual(len(table.render().splitlines()), 62)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from src.commons.models.col_details import ColDetails
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+from src.commons.models.table_schema import normalize_header
+from src.processors.table_processor import TableProcessor
+
+
+def make_table():
+    return TableDetails(headers=["animal", "collateral adjective[a]", "count", "weight", "young / male", "animal"],
+                        rows=[
+                            RowDetails([ColDetails("Cat", "/wiki/Cat", 1), ColDetails("feline###felid", "", 1),
+                                        ColDetails("1,200", "", 1), ColDetails("4.5", "", 1),
+                                        ColDetails("tom", "", 1), ColDetails("", "", 1)]),
+                            RowDetails([ColDetails("Dog", "/wiki/Dog", 1), ColDetails("canine", "", 1),
+                                        ColDetails("7", "", 1), ColDetails("20", "", 1),
+                                        ColDetails("dog", "", 1), ColDetails("", "", 1)]),
+                        ])
+
+
+class TestTableSchema(unittest.TestCase):
+
+    def test_normalize_header(self):
+        self.assertEqual(normalize_header("  Collateral\n  Adjective[a][1] "), "collateral adjective")
+
+    def test_lookups_use_normalized_names(self):
+        schema = make_table().schema
+
+        self.assertEqual(schema.index("Collateral adjective"), 1)
+        self.assertIn("YOUNG / MALE", schema)
+        self.assertEqual(schema.columns[4].path, ("young", "male"))
+        self.assertEqual(schema.indexes(["weight", "animal", "habitat"]), [0, 3, 5])
+        with self.assertRaises(ValueError):
+            schema.index("habitat")
+
+    def test_inferred_types(self):
+        types = [column.type for column in make_table().schema.columns]
+        self.assertEqual(types, ["link", "list", "integer", "number", "string", "empty"])
+
+    def test_schema_is_cached_until_headers_change(self):
+        table = make_table()
+        schema = table.schema
+        self.assertIs(table.schema, schema)
+
+        table.headers = ["a", "b", "c", "d", "e", "f"]
+        self.assertEqual(table.schema.names, ["a", "b", "c", "d", "e", "f"])
+
+    def test_table_processor_lookups_follow_the_schema(self):
+        table = TableProcessor.select_columns_by_names(make_table(), ["collateral adjective", "animal"])
+
+        self.assertEqual(table.headers, ["animal", "collateral adjective[a]", "animal"])
+        self.assertEqual(TableProcessor.get_all_links_by_column(table, "animal"), ["/wiki/Cat", "/wiki/Dog"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from src.commons.models.col_details import ColDetails
+from src.commons.models.row_details import RowDetails
+from src.commons.models.table_details import TableDetails
+from src.storage.table_writer import create_table_writer, infer_table_format, CsvTableWriter, JsonlTableWriter
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def make_table():
+    return TableDetails(headers=["animal", "collateral adjective"], rows=[
+        RowDetails([ColDetails("Cat", "/wiki/Cat", 1), ColDetails("feline", "", 1)]),
+        RowDetails([ColDetails("Dog", "/wiki/Dog", 1)]),
+    ])
+
+
+class TestTableWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def test_infer_table_format(self):
+        self.assertEqual(infer_table_format("animals.csv"), "csv")
+        self.assertEqual(infer_table_format("out/animals.jsonl.gz"), "jsonl")
+        self.assertEqual(infer_table_format("animals.parquet"), "parquet")
+        with self.assertRaises(ValueError):
+            infer_table_format("animals.txt")
+
+    def test_csv_writes_one_header_for_several_tables(self):
+        path = self.path("animals.csv")
+        with create_table_writer(path) as writer:
+            self.assertIsInstance(writer, CsvTableWriter)
+            writer.write(make_table())
+            writer.write(make_table())
+
+        with open(path, newline="") as csv_file:
+            rows = list(csv.reader(csv_file))
+        self.assertEqual(rows[0], ["animal", "animal_link", "collateral adjective", "collateral adjective_link"])
+        self.assertEqual(rows[1], ["Cat", "/wiki/Cat", "feline", ""])
+        self.assertEqual(rows[2], ["Dog", "/wiki/Dog", "", ""])
+        self.assertEqual(len(rows), 5)
+
+    def test_gzipped_jsonl_without_links(self):
+        path = self.path("animals.jsonl.gz")
+        with create_table_writer(path, include_links=False) as writer:
+            self.assertIsInstance(writer, JsonlTableWriter)
+            self.assertEqual(writer.write(make_table()), 2)
+
+        with gzip.open(path, "rt") as jsonl_file:
+            records = [json.loads(line) for line in jsonl_file]
+        self.assertEqual(records, [{"animal": "Cat", "collateral adjective": "feline"},
+                                   {"animal": "Dog", "collateral adjective": ""}])
+
+    def test_rejects_tables_with_different_columns(self):
+        with create_table_writer(self.path("animals.jsonl")) as writer:
+            writer.write(make_table())
+            with self.assertRaises(ValueError):
+                writer.write(TableDetails(headers=["animal"], rows=[]))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_round_trip(self):
+        path = self.path("animals.parquet")
+        with create_table_writer(path) as writer:
+            writer.write(make_table())
+
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.column("animal").to_pylist(), ["Cat", "Dog"])
+        self.assertEqual(table.column("animal_link").to_pylist(), ["/wiki/Cat", "/wiki/Dog"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import time
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.utils.token_bucket import TokenBucket
+
+IMAGE = b"\xff\xd8\xff\xe0" + b"\x00" * (160 * 1024 - 4)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(1000, burst=500, clock=self.clock)
+
+    def test_burst_then_rate(self):
+        self.assertEqual(self.bucket.reserve(500), 0)
+        self.assertAlmostEqual(self.bucket.reserve(250), 0.25)
+        self.assertAlmostEqual(self.bucket.reserve(250), 0.5)
+
+    def test_reservations_are_served_in_arrival_order(self):
+        self.bucket.reserve(500)
+
+        # A large chunk goes into debt; the small one behind it waits for the debt to be paid
+        self.assertAlmostEqual(self.bucket.reserve(2000), 2.0)
+        self.assertAlmostEqual(self.bucket.reserve(100), 2.1)
+
+    def test_idle_time_refills_up_to_burst(self):
+        self.bucket.reserve(1500)
+        self.clock.now += 60
+
+        self.assertEqual(self.bucket.reserve(500), 0)
+        self.assertAlmostEqual(self.bucket.reserve(100), 0.1)
+
+    def test_rejects_non_positive_rates(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class TestThrottledDownloads(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        async def image(request):
+            return web.Response(body=IMAGE, content_type="image/jpeg")
+
+        app = web.Application()
+        app.router.add_get("/{name}", image)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def test_concurrent_downloads_share_the_rate_fairly(self):
+        rate, burst = 320 * 1024, 16 * 1024
+        loader = ImageDataLoader(limiter=TokenBucket(rate, burst=burst))
+        finished = {}
+
+        async def fetch(session, name):
+            image_data = await loader.fetch_image_data(session, str(self.server.make_url(f"/{name}")))
+            finished[name] = time.monotonic() - started
+            return image_data
+
+        started = time.monotonic()
+        async with aiohttp.ClientSession() as session:
+            images = await asyncio.gather(*[fetch(session, f"{index}.jpg") for index in range(4)])
+        elapsed = time.monotonic() - started
+
+        self.assertTrue(all(image_data.data == IMAGE for image_data in images))
+        expected = (4 * len(IMAGE) - burst) / rate
+        self.assertLess(abs(elapsed - expected) / expected, 0.05)
+        # Every stream gets its share all along instead of the first ones finishing early
+        self.assertGreater(min(finished.values()), 0.75 * max(finished.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
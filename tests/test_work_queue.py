@@ -0,0 +1,317 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import unittest
+import uuid
+from typing import Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.commons.exceptions.exception import WorkQueueError
+from src.commons.models.workflow_options import WorkflowOptions
+from src.data_fetchers.image_data_loader import ImageDataLoader
+from src.data_fetchers.image_link_source import ImageLinkSource
+from src.distributed.redis_queue import RedisWorkQueue
+from src.distributed.sqlite_queue import SQLiteWorkQueue
+from src.distributed.work_queue import ARTICLES, IMAGES, create_work_queue
+from src.distributed.worker import Coordinator, Worker
+from src.manager.workflow_manager import WorkflowManager
+from src.parsers.beautiful_soup_parser import BeautifulSoupParser
+from src.storage.file_system_saver import FileSystemSaver
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def lease_until_empty(path: str) -> List[str]:
+    queue = SQLiteWorkQueue(path)
+    payloads = []
+    while True:
+        leases = queue.lease(ARTICLES, count=3)
+        if not leases:
+            break
+        for lease in leases:
+            queue.ack(lease)
+            payloads.append(lease.payload)
+    queue.close()
+    return payloads
+
+
+class WorkQueueTests:
+    """
+    The behaviour every WorkQueue shares; subclasses set self.queue (with max_attempts=2) and self.clock.
+    """
+
+    def test_put_skips_known_payloads(self):
+        self.assertEqual(self.queue.put(ARTICLES, ["a", "b", "a"]), 2)
+        self.queue.ack(self.queue.lease(ARTICLES)[0])
+
+        self.assertEqual(self.queue.put(ARTICLES, ["a", "b", "c"]), 1)
+        self.assertEqual(self.queue.pending(ARTICLES), 2)
+        self.assertEqual(self.queue.put(IMAGES, ["a"]), 1)
+
+    def test_leased_tasks_are_hidden_until_the_visibility_timeout(self):
+        self.queue.put(ARTICLES, ["a", "b"])
+
+        first = self.queue.lease(ARTICLES, count=5, visibility_timeout=10)
+        self.assertEqual([lease.payload for lease in first], ["a", "b"])
+        self.assertEqual(self.queue.lease(ARTICLES), [])
+        self.assertEqual(self.queue.pending(ARTICLES), 2)
+
+        self.clock.now += 11
+        second = self.queue.lease(ARTICLES, count=5)
+        self.assertEqual([(lease.payload, lease.attempts) for lease in second], [("a", 2), ("b", 2)])
+        # The first worker's lease expired and was handed out again, so its ack is refused
+        self.assertFalse(self.queue.ack(first[0]))
+        self.assertTrue(self.queue.ack(second[0]))
+
+    def test_released_tasks_are_retried_then_dead(self):
+        self.queue.put(ARTICLES, ["a"])
+
+        self.queue.release(self.queue.lease(ARTICLES)[0], delay=5)
+        self.assertEqual(self.queue.lease(ARTICLES), [])
+        self.clock.now += 5
+        self.queue.release(self.queue.lease(ARTICLES)[0])
+
+        self.assertEqual(self.queue.lease(ARTICLES), [])
+        self.assertEqual(self.queue.pending(ARTICLES), 0)
+
+    def test_expired_tasks_out_of_attempts_are_dead(self):
+        self.queue.put(ARTICLES, ["a"])
+        for _ in range(2):
+            self.queue.lease(ARTICLES, visibility_timeout=1)
+            self.clock.now += 2
+
+        self.assertEqual(self.queue.pending(ARTICLES), 0)
+        self.assertEqual(self.queue.lease(ARTICLES), [])
+
+    def test_purge_forgets_finished_tasks(self):
+        self.queue.put(ARTICLES, ["a", "b"])
+        self.queue.ack(self.queue.lease(ARTICLES)[0])
+
+        self.queue.purge(ARTICLES)
+
+        self.assertEqual(self.queue.put(ARTICLES, ["a", "b"]), 1)
+
+    def test_purge_keeps_leased_tasks(self):
+        self.queue.put(ARTICLES, ["a", "b", "c"])
+        first, second = self.queue.lease(ARTICLES, count=2)
+        self.queue.ack(first)
+
+        self.queue.purge(ARTICLES)
+
+        self.assertTrue(self.queue.ack(second))
+        self.assertEqual(self.queue.put(ARTICLES, ["a", "b", "c"]), 1)
+        self.assertEqual(self.queue.pending(ARTICLES), 2)
+
+
+class TestSQLiteWorkQueue(WorkQueueTests, unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "queue.db")
+        self.clock = FakeClock()
+        self.queue = SQLiteWorkQueue(self.path, max_attempts=2, clock=self.clock)
+
+    def tearDown(self):
+        self.queue.close()
+        self.temp_dir.cleanup()
+
+    def test_concurrent_processes_never_share_a_task(self):
+        payloads = [f"https://en.wikipedia.org/wiki/Animal_{i}" for i in range(300)]
+        self.queue.put(ARTICLES, payloads)
+
+        with multiprocessing.get_context("spawn").Pool(3) as pool:
+            results = pool.map(lease_until_empty, [self.path] * 3)
+
+        leased = [payload for result in results for payload in result]
+        self.assertEqual(sorted(leased), sorted(payloads))
+
+    def test_create_work_queue(self):
+        queue = create_work_queue(f"sqlite:///{os.path.join(self.temp_dir.name, 'other.db')}")
+        self.assertIsInstance(queue, SQLiteWorkQueue)
+        queue.close()
+        with self.assertRaises(WorkQueueError):
+            create_work_queue("amqp://localhost")
+
+
+class TestRedisWorkQueue(WorkQueueTests, unittest.TestCase):
+    """
+    Runs the Lua scripts against the Redis server at TEST_REDIS_URL; skipped when none is reachable.
+    """
+
+    def setUp(self):
+        try:
+            import redis
+        except ImportError:
+            self.skipTest("the redis package is not installed")
+        self.client = redis.Redis.from_url(os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15"),
+                                           decode_responses=True)
+        try:
+            self.client.ping()
+        except redis.exceptions.ConnectionError:
+            self.client.close()
+            self.skipTest("no Redis server is reachable")
+        self.prefix = f"test:{uuid.uuid4().hex}"
+        self.clock = FakeClock()
+        self.queue = RedisWorkQueue("", prefix=self.prefix, max_attempts=2, client=self.client, clock=self.clock)
+
+    def tearDown(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}:*"))
+        if keys:
+            self.client.delete(*keys)
+        self.queue.close()
+
+
+class StubLinkSource(ImageLinkSource):
+
+    def __init__(self, links_by_page: Dict[str, List[str]]):
+        self.links_by_page = links_by_page
+        self.requested = []
+
+    async def load_all_image_links(self, urls: List[str]) -> List[str]:
+        return [link for url in urls for link in self.links_by_page.get(url, [])]
+
+    async def load_image_links_by_page(self, urls: List[str]) -> Dict[str, List[str]]:
+        self.requested.extend(urls)
+        return {url: self.links_by_page[url] for url in urls if url in self.links_by_page}
+
+
+class TestWorker(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.downloads = []
+
+        async def image(request):
+            self.downloads.append(request.match_info["name"])
+            return web.Response(body=request.match_info["name"].encode())
+
+        app = web.Application()
+        app.router.add_get("/images/{name}", image)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self.temp_dir.cleanup()
+
+    async def test_workers_share_the_crawl(self):
+        articles = [f"https://en.wikipedia.org/wiki/Animal_{i}" for i in range(10)]
+        # Neighbouring articles share an image, which is downloaded once
+        links_by_page = {url: [str(self.server.make_url(f"/images/animal_{i}.jpg")),
+                               str(self.server.make_url(f"/images/animal_{i + 1}.jpg"))]
+                         for i, url in enumerate(articles[:-1])}
+        queue = SQLiteWorkQueue(os.path.join(self.temp_dir.name, "queue.db"), max_attempts=1)
+        Coordinator(queue).enqueue_articles(articles)
+        saver = FileSystemSaver(os.path.join(self.temp_dir.name, "images"))
+        link_source = StubLinkSource(links_by_page)
+
+        workers = [Worker(queue, link_source, saver, batch_size=2, poll_interval=0.01) for _ in range(3)]
+        results = await asyncio.gather(*[worker.run() for worker in workers])
+
+        self.assertEqual(sorted(link_source.requested), sorted(articles))
+        self.assertEqual(sum(result[ARTICLES] for result in results), 9)
+        self.assertEqual(sum(result[IMAGES] for result in results), 10)
+        self.assertEqual(sorted(self.downloads), sorted(f"animal_{i}.jpg" for i in range(10)))
+        self.assertEqual(sorted(os.listdir(saver.download_folder)), sorted(f"animal_{i}.jpg" for i in range(10)))
+        queue.close()
+
+    async def process_images(self, saver, names, **kwargs):
+        queue = SQLiteWorkQueue(os.path.join(self.temp_dir.name, "queue.db"))
+        self.addCleanup(queue.close)
+        queue.put(IMAGES, [str(self.server.make_url(f"/images/{name}")) for name in names])
+        worker = Worker(queue, StubLinkSource({}), saver, **kwargs)
+        async with aiohttp.ClientSession() as session:
+            await worker.process_images(session, queue.lease(IMAGES, count=len(names)))
+        return queue, worker
+
+    async def test_failed_saves_are_retried(self):
+        folder = os.path.join(self.temp_dir.name, "images")
+        saver = FileSystemSaver(folder)
+        # The folder is gone, so every write fails
+        os.rmdir(folder)
+
+        queue, worker = await self.process_images(saver, ["cat.jpg"])
+
+        self.assertEqual(worker.processed[IMAGES], 0)
+        self.assertEqual(queue.pending(IMAGES), 1)
+
+    async def test_a_raising_saver_does_not_abort_the_batch(self):
+        async def save_image(image_data):
+            if image_data.name == "cat.jpg":
+                raise ConnectionError("connection reset")
+
+        saver = MagicMock()
+        saver.save_image = AsyncMock(side_effect=save_image)
+        queue, worker = await self.process_images(saver, ["cat.jpg", "dog.jpg", "owl.jpg"])
+
+        self.assertEqual(worker.processed[IMAGES], 2)
+        self.assertEqual(queue.pending(IMAGES), 1)
+        self.assertEqual(saver.save_image.await_count, 3)
+
+    async def test_an_unexpected_error_releases_only_its_task(self):
+        data_loader = ImageDataLoader()
+        fetch_image_data = data_loader.fetch_image_data
+
+        async def fetch(session, url):
+            if url.endswith("cat.jpg"):
+                raise RuntimeError("decoder crashed")
+            return await fetch_image_data(session, url)
+
+        data_loader.fetch_image_data = fetch
+        saver = FileSystemSaver(os.path.join(self.temp_dir.name, "images"))
+        queue, worker = await self.process_images(saver, ["cat.jpg", "dog.jpg"], data_loader=data_loader)
+
+        self.assertEqual(worker.processed[IMAGES], 1)
+        self.assertEqual(queue.pending(IMAGES), 1)
+        self.assertEqual(os.listdir(saver.download_folder), ["dog.jpg"])
+
+
+class TestCoordinatorWorkflow(unittest.TestCase):
+
+    def test_processed_tables_are_enqueued_instead_of_downloaded(self):
+        page = ('<html><body><table class="wikitable"><tr><th>Animal</th><th>Collateral adjective</th></tr>'
+                '<tr><td><a href="/wiki/Cat">Cat</a></td><td>feline</td></tr>'
+                '<tr><td><a href="/wiki/Dog">Dog</a></td><td>canine</td></tr></table></body></html>')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "queue.db")
+            manager = WorkflowManager("https://example.com/list", "https://en.wikipedia.org",
+                                      options=WorkflowOptions(queue=f"sqlite:///{path}"))
+            with patch("src.data_fetchers.image_download_manager.ImageDownloadManager.run") as run:
+                manager.process_tables(BeautifulSoupParser(page))
+            run.assert_not_called()
+
+            queue = SQLiteWorkQueue(path)
+            self.assertEqual(sorted(lease.payload for lease in queue.lease(ARTICLES, count=5)),
+                             ["https://en.wikipedia.org/wiki/Cat", "https://en.wikipedia.org/wiki/Dog"])
+            queue.close()
+
+    def test_the_queue_is_purged_once_per_run(self):
+        table = ('<table class="wikitable"><tr><th>Animal</th><th>Collateral adjective</th></tr>'
+                 '<tr><td><a href="/wiki/{0}">{0}</a></td><td>{1}</td></tr></table>')
+        page = f'<html><body>{table.format("Cat", "feline")}{table.format("Dog", "canine")}</body></html>'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = WorkflowManager("https://example.com/list", "https://en.wikipedia.org",
+                                      options=WorkflowOptions(queue=f"sqlite:///{os.path.join(temp_dir, 'queue.db')}"))
+            manager.fetch_data = MagicMock(return_value=MagicMock(content=page))
+            with patch.object(Coordinator, "enqueue_articles", autospec=True, return_value=1) as enqueue:
+                for _ in range(2):
+                    self.assertTrue(manager.run())
+
+        self.assertEqual([call.args[1] for call in enqueue.call_args_list],
+                         [["https://en.wikipedia.org/wiki/Cat"], ["https://en.wikipedia.org/wiki/Dog"]] * 2)
+        self.assertEqual([call.kwargs["fresh"] for call in enqueue.call_args_list], [True, False, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
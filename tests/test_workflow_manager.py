@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.commons.models.workflow_options import WorkflowOptions
+from src.manager.workflow_manager import WorkflowManager
+from src.parsers.beautiful_soup_parser import BeautifulSoupParser
+
+BASE_URL = "https://en.wikipedia.org"
+
+
+def build_table(animals):
+    rows = "".join(f'<tr><td><a href="/wiki/{animal}">{animal}</a></td><td>{adjective}</td></tr>'
+                   for animal, adjective in animals)
+    return f'<table class="wikitable"><tr><th>Animal</th><th>Collateral adjective</th></tr>{rows}</table>'
+
+
+PAGE = "<html><body>" + "".join([
+    build_table([("Cat", "feline"), ("Dog", "canine")]),
+    build_table([("Dog", "canine"), ("Wolf", "lupine")]),
+    build_table([("Bear", "ursine"), ("Ant", "—")]),
+]) + "</body></html>"
+
+
+class TestWorkflowManagerTables(unittest.TestCase):
+
+    def process(self, workers, table_output):
+        manager = WorkflowManager("https://example.com/list", BASE_URL,
+                                  options=WorkflowOptions(workers=workers, table_output=table_output))
+        with patch.object(WorkflowManager, "download_links") as download_links:
+            manager.process_tables(BeautifulSoupParser(PAGE))
+        return [call.args[0] for call in download_links.call_args_list]
+
+    def test_parallel_run_matches_serial_run_and_downloads_once(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            serial_path = os.path.join(temp_dir, "serial.csv")
+            parallel_path = os.path.join(temp_dir, "parallel.csv")
+
+            serial_downloads = self.process(1, serial_path)
+            parallel_downloads = self.process(2, parallel_path)
+
+            with open(serial_path) as serial_file, open(parallel_path) as parallel_file:
+                self.assertEqual(serial_file.read(), parallel_file.read())
+
+        self.assertEqual(len(serial_downloads), 3)
+        expected_urls = [f"{BASE_URL}/wiki/{animal}" for animal in ("Cat", "Dog", "Wolf", "Bear")]
+        self.assertEqual(parallel_downloads, [expected_urls])
+
+    def test_section_divider_rows_keep_the_link_column(self):
+        page = ('<html><body><table class="wikitable"><tr><th>Animal</th><th>Collateral adjective</th></tr>'
+                '<tr><th colspan="2">C</th></tr><tr><td><a href="/wiki/Cat">Cat</a></td><td>feline</td></tr>'
+                '<tr><th colspan="2">D</th></tr><tr><td><a href="/wiki/Dog">Dog</a></td><td>canine</td></tr>'
+                '</table></body></html>')
+        manager = WorkflowManager("https://example.com/list", BASE_URL)
+        with patch.object(WorkflowManager, "download_links") as download_links:
+            manager.process_tables(BeautifulSoupParser(page))
+
+        download_links.assert_called_once_with([f"{BASE_URL}/wiki/Cat", f"{BASE_URL}/wiki/Dog"])
+
+    def test_rejects_invalid_worker_count(self):
+        with self.assertRaises(ValueError):
+            WorkflowManager("https://example.com/list", BASE_URL, options=WorkflowOptions(workers=0))
+
+
+if __name__ == '__main__':
+    unittest.main()